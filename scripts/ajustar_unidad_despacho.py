@@ -0,0 +1,280 @@
+"""
+ajustar_unidad_despacho.py
+
+Barrido de unidad_despacho para los dominios priorizados. La unidad está fija en 10 en los
+problemas. Una unidad más gruesa acorta el plan (menos acciones despachar_*) y la búsqueda, pero deja
+sin servir hasta una unidad por hora y se aleja del óptimo MILP. Para cada escenario:
+
+  1. Genera un problema por tamaño de unidad (--unidades): copia del problema con (= (unidad_despacho) u).
+  2. Los planifica en paralelo con enhsp_asincrono.run_all, con un tiempo máximo por caso (--timeout);
+     el verificador incremental comprueba por el camino compuertas, horas y goal.
+  3. Verifica cada plan con parse_priorizado_plan_sim.simulate (el clamp de siempre) y con
+     verificar_restricciones.check_tabla (rampas y presupuesto de data_<escenario>).
+  4. Calcula el gap de coste frente al óptimo MILP del escenario (milp_model sobre data_<escenario>).
+     La demanda que el plan deja sin servir se valora al coste térmico, para que una unidad gruesa no
+     parezca más barata por servir menos. Sin MILP, la referencia es el mejor plan válido del barrido.
+  5. Frente de Pareto (acciones, tiempo hasta el plan, gap) entre los planes válidos (ENHSP terminó
+     en ok, sin clamps y sin violaciones en check_tabla) y unidad recomendada: la que antes da el
+     plan entre las de gap <= --gap-max (si ninguna cumple, la de menor gap).
+
+Salidas en --out-dir (por defecto results_<escenario>/unidad_despacho/): problemas y logs por
+unidad, unidad_despacho_barrido.csv (una fila por escenario y unidad, con la marca de Pareto) y
+unidad_despacho_recomendada.csv. Si ya hay logs de un barrido anterior en esa carpeta, no se
+sobrescriben sin --force. Cada plan queda en el registro de ejecuciones (enfoque pddl).
+
+Uso:
+  python scripts/ajustar_unidad_despacho.py --enhsp enhsp.jar --timeout 120 --unidades 5 10 20 25 50 100 \\
+      --caso models/pddl_caso_base/domain_priorizado2.pddl models/pddl_caso_base/problem_priorizado2.pddl \\
+      --caso models/pddl_escenario3/domain_escenario3.pddl models/pddl_escenario3/problem_escenario3.pddl
+  (Opcional) --solver appsi_highs --gap-max 0.01 --max-concurrentes 4 --out-dir /tmp/unidad
+             --planner-cmd "java -Xmx4g -jar {enhsp} -o {domain} -f {problem} -planner sat-hadd"
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+import enhsp_asincrono as stream
+import parse_priorizado_plan_sim as sim
+from planificar_por_horas import DEFAULT_PLANNER_CMD
+
+UNIDADES_DEFAULT = [5.0, 10.0, 20.0, 25.0, 50.0, 100.0]
+GAP_MAX_DEFAULT = 0.01
+RGX_UNIDAD = re.compile(r"(\(=\s*\(\s*unidad_despacho\s*\)\s*)([+-]?\d+(?:\.\d+)?)(\s*\))", re.IGNORECASE)
+COLUMNS = ["escenario", "problema", "unidad", "estado", "valido", "acciones", "t_plan_s", "t_total_s", "coste",
+           "demanda_restante", "clamps", "coste_ajustado", "referencia", "coste_referencia", "gap",
+           "restricciones", "pareto", "recomendada"]
+REC_COLUMNS = ["escenario", "problema", "unidad_recomendada", "acciones", "t_plan_s", "gap", "criterio", "frente"]
+
+
+# =========================
+# Problemas por unidad
+# =========================
+
+def _fmt(u: float) -> str:
+    return f"{u:g}"
+
+
+def problema_con_unidad(text: str, u: float) -> str:
+    """Copia del problema con (= (unidad_despacho) u); ValueError si el problema no la declara."""
+    out, n = RGX_UNIDAD.subn(lambda m: f"{m.group(1)}{_fmt(u)}{m.group(3)}", text)
+    if n == 0:
+        raise ValueError("el problema no declara (= (unidad_despacho) ...)")
+    return out
+
+
+def generar_casos(domain: Path, problem: Path, unidades, out_dir: Path, name: str) -> list:
+    """Un stream.Caso por unidad, con su problema escrito en out_dir/problemas/."""
+    text = problem.read_text(encoding="utf-8", errors="ignore")
+    stem = problem.stem.replace("problem_", "", 1)
+    (out_dir / "problemas").mkdir(parents=True, exist_ok=True)
+    casos = []
+    for u in unidades:
+        path = out_dir / "problemas" / f"{problem.stem}_u{_fmt(u)}.pddl"
+        path.write_text(problema_con_unidad(text, u), encoding="utf-8")
+        casos.append(stream.Caso(domain, path, out_dir / f"plan_enhsp_{stem}_u{_fmt(u)}.txt", name=name))
+    return casos
+
+
+# =========================
+# Verificación y referencia
+# =========================
+
+def verificar(caso, data_dir: Path | None) -> dict:
+    """Simulación del log con parse_priorizado_plan_sim y restricciones con verificar_restricciones."""
+    import verificar_restricciones as vr
+
+    hours, scalars, per_h = sim.parse_problem(caso.problem, verbose=False)
+    actions, _metric = sim.parse_plan(caso.out, verbose=False) if caso.out.exists() else ([], None)
+    rep = sim.simulate(actions, hours, scalars, per_h)
+    lim = vr.Limites.de_problema(hours, scalars, per_h)
+    if data_dir is not None:
+        lim = lim.completar(data_dir)
+    served = [[rep["per_hour"][k].get(h, 0.0) for h in hours] for k in ("pv", "hidro", "termica")]
+    ver = vr.check_tabla(*served, lim, tolerancias={"deficit": rep["params"]["unidad"] - vr.TOL})
+    restante = rep["demand"]["remaining"]
+    clamps = sum(rep["warnings"].values())
+    return {
+        "acciones": len(actions), "coste": rep["accum_cost_sim"], "demanda_restante": restante, "clamps": clamps,
+        "coste_ajustado": rep["accum_cost_sim"] + restante * rep["params"]["costo_termica"],
+        "restricciones": ver.resumen(),
+        # Con data_dir, check_tabla incluye rampas y presupuesto del escenario: un plan que los viola no es válido
+        "valido": caso.estado == "ok" and clamps == 0 and bool(actions) and bool(ver.ok[0]),
+    }
+
+
+def coste_milp(data_dir: Path | None, solver_name: str) -> float | None:
+    """Óptimo MILP del escenario (None si no hay carpeta data_* o el modelo no es óptimo)."""
+    if data_dir is None:
+        return None
+    import despacho_api as api
+
+    sol = api.solve_milp(api.load_scenario(data_dir), solver_name=solver_name)
+    return sol.total_cost_usd if sol.termination_condition == "optimal" else None
+
+
+# =========================
+# Pareto y recomendación
+# =========================
+
+OBJETIVOS = ("acciones", "t_plan_s", "gap")
+
+
+def frente_pareto(rows: list) -> list:
+    """Filas válidas no dominadas en (acciones, t_plan_s, gap), todas a minimizar."""
+    cand = [r for r in rows if r["valido"] and all(r[k] is not None for k in OBJETIVOS)]
+
+    def domina(a, b):
+        return all(a[k] <= b[k] for k in OBJETIVOS) and any(a[k] < b[k] for k in OBJETIVOS)
+    return [r for r in cand if not any(domina(o, r) for o in cand if o is not r)]
+
+
+def recomendar(frente: list, gap_max: float) -> tuple:
+    """(fila, criterio): la que antes da el plan con gap <= gap_max; si ninguna, la de menor gap."""
+    if not frente:
+        return None, "sin planes válidos"
+    ok = [r for r in frente if r["gap"] <= gap_max]
+    if ok:
+        return min(ok, key=lambda r: (r["t_plan_s"], r["acciones"])), f"plan más rápido con gap <= {gap_max:.2%}"
+    return min(frente, key=lambda r: (r["gap"], r["t_plan_s"])), f"ningún gap <= {gap_max:.2%}: menor gap"
+
+
+def evaluar_escenario(casos: list, data_dir: Path | None, ref_milp: float | None, gap_max: float) -> tuple:
+    """Filas del barrido de un escenario (ordenadas por unidad) y su fila de recomendación."""
+    rows = []
+    for c in casos:
+        v = verificar(c, data_dir)
+        unidad = sim.parse_problem(c.problem, verbose=False)[1].get("unidad_despacho")
+        rows.append({"escenario": c.name, "problema": c.problem.name, "unidad": unidad, "estado": c.estado,
+                     "t_plan_s": c.t_plan_s, "t_total_s": c.t_total_s, **v})
+    validos = [r for r in rows if r["valido"]]
+    if ref_milp is not None:
+        ref, referencia = ref_milp, "milp"
+    else:
+        ref = min((r["coste_ajustado"] for r in validos), default=None)
+        referencia = "mejor_plan"
+    for r in rows:
+        r["referencia"], r["coste_referencia"] = referencia, ref
+        r["gap"] = (r["coste_ajustado"] - ref) / ref if ref and r["valido"] else None
+    rows.sort(key=lambda r: r["unidad"])
+    frente = frente_pareto(rows)
+    best, criterio = recomendar(frente, gap_max)
+    for r in rows:
+        r["pareto"] = any(r is f for f in frente)
+        r["recomendada"] = r is best
+    rec = {"escenario": casos[0].name, "problema": casos[0].problem.name.rsplit("_u", 1)[0] + ".pddl",
+           "unidad_recomendada": best["unidad"] if best else None,
+           "acciones": best["acciones"] if best else None, "t_plan_s": best["t_plan_s"] if best else None,
+           "gap": best["gap"] if best else None, "criterio": criterio,
+           "frente": " ".join(_fmt(r["unidad"]) for r in frente)}
+    return rows, rec
+
+
+# =========================
+# Salida
+# =========================
+
+def write_csv(rows: list, columns: list, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore", lineterminator="\n")
+        w.writeheader()
+        w.writerows(rows)
+
+
+def print_table(rows: list, rec: dict) -> None:
+    print(f"\n=== {rec['escenario']} ({rec['problema']}): referencia {rows[0]['referencia']} "
+          f"= {rows[0]['coste_referencia'] or 0:,.2f} ===")
+    print(f"{'unidad':>7} {'estado':<18} {'acciones':>8} {'t_plan_s':>9} {'coste':>13} {'restante':>9} "
+          f"{'gap':>8}  frente")
+    for r in rows:
+        gap = f"{r['gap']:.2%}" if r["gap"] is not None else "-"
+        t = f"{r['t_plan_s']:.2f}" if r["t_plan_s"] is not None else "-"
+        mark = "*" if r["recomendada"] else ("P" if r["pareto"] else "")
+        print(f"{_fmt(r['unidad']):>7} {r['estado']:<18} {r['acciones']:>8} {t:>9} {r['coste']:>13,.0f} "
+              f"{r['demanda_restante']:>9,.0f} {gap:>8}  {mark}")
+        if r["restricciones"] != "OK":
+            print(f"{'':>8}restricciones: {r['restricciones']}")
+    if rec["unidad_recomendada"] is None:
+        print(f"[AVISO] {rec['escenario']}: {rec['criterio']}")
+    else:
+        print(f"[OK] Unidad recomendada: {_fmt(rec['unidad_recomendada'])} ({rec['criterio']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido de unidad_despacho: longitud de plan, tiempo y gap de coste")
+    parser.add_argument("--caso", nargs=2, action="append", required=True, metavar=("DOMINIO", "PROBLEMA"),
+                        help="Par domain.pddl problem.pddl (repetible)")
+    parser.add_argument("--unidades", type=float, nargs="+", default=UNIDADES_DEFAULT,
+                        help="Tamaños de unidad_despacho a probar [MW]")
+    parser.add_argument("--enhsp", type=str, default="enhsp.jar", help="Ruta a enhsp.jar")
+    parser.add_argument("--planner-cmd", type=str, default=DEFAULT_PLANNER_CMD,
+                        help="Plantilla del comando del planificador ({enhsp}, {domain}, {problem})")
+    parser.add_argument("--timeout", type=float, default=None, help="Tiempo máximo por plan [s]")
+    parser.add_argument("--max-concurrentes", type=int, default=os.cpu_count() or 1,
+                        help="Planificadores a la vez (cada ENHSP es una JVM)")
+    parser.add_argument("--solver", type=str, default="glpk", help="Solver Pyomo del óptimo MILP de referencia")
+    parser.add_argument("--gap-max", type=float, default=GAP_MAX_DEFAULT,
+                        help="Gap de coste máximo aceptable para la recomendación (fracción)")
+    parser.add_argument("--out-dir", type=str, default=None,
+                        help="Carpeta de problemas, logs y CSV (por defecto results_<escenario>/unidad_despacho/)")
+    parser.add_argument("--force", action="store_true", help="Sobrescribe los logs de un barrido anterior")
+    args = parser.parse_args()
+
+    import registro_ejecuciones as registro
+    from verificar_restricciones import carpeta_datos
+
+    repo = Path(__file__).resolve().parent.parent
+    grupos = []
+    for domain, problem in args.caso:
+        problem = Path(problem)
+        name = registro.scenario_name(problem)
+        out_dir = Path(args.out_dir) if args.out_dir else repo / f"results_{name}" / "unidad_despacho"
+        try:
+            casos = generar_casos(Path(domain), problem, sorted(set(args.unidades)), out_dir, name)
+        except ValueError as ex:
+            sys.exit(f"[ERROR] {problem}: {ex}")
+        grupos.append((casos, carpeta_datos(problem), out_dir))
+
+    todos = [c for casos, _, _ in grupos for c in casos]
+    existentes = stream.logs_existentes(todos)
+    if existentes and not args.force:
+        sys.exit(f"[ERROR] Ya existen {len(existentes)} logs del barrido (p.ej. {existentes[0]}); "
+                 "usa --force para sobrescribirlos u otra --out-dir")
+    t0 = time.perf_counter()
+    asyncio.run(stream.run_all(todos, args.planner_cmd, args.enhsp, args.timeout,
+                               max_concurrentes=args.max_concurrentes))
+    print(f"{len(todos)} planes ({len(grupos)} escenarios × {len(set(args.unidades))} unidades) "
+          f"en {time.perf_counter() - t0:.2f} s")
+
+    por_carpeta = {}
+    for casos, data_dir, out_dir in grupos:
+        ref = None
+        try:
+            ref = coste_milp(data_dir, args.solver)
+        except Exception as ex:
+            print(f"[AVISO] {casos[0].name}: no se pudo resolver el MILP de referencia ({ex})")
+        if ref is None:
+            print(f"[AVISO] {casos[0].name}: sin óptimo MILP; el gap se mide contra el mejor plan del barrido")
+        rows, rec = evaluar_escenario(casos, data_dir, ref, args.gap_max)
+        print_table(rows, rec)
+        for c in casos:
+            stream.register(c, args.planner_cmd)
+        rows_all, recs = por_carpeta.setdefault(out_dir, ([], []))
+        rows_all.extend(rows)
+        recs.append(rec)
+
+    for out_dir, (rows, recs) in por_carpeta.items():
+        write_csv(rows, COLUMNS, out_dir / "unidad_despacho_barrido.csv")
+        write_csv(recs, REC_COLUMNS, out_dir / "unidad_despacho_recomendada.csv")
+        print(f"\nCSV → {out_dir / 'unidad_despacho_barrido.csv'} | {out_dir / 'unidad_despacho_recomendada.csv'}")
+
+
+if __name__ == "__main__":
+    main()
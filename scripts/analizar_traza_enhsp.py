@@ -0,0 +1,279 @@
+"""
+analizar_traza_enhsp.py
+
+Analiza la traza de búsqueda de ENHSP (líneas ' g(n)= ... h(n)= ...' del log) que el resto de scripts
+descarta. La búsqueda voraz imprime una línea cada vez que mejora h, así que la traza se carga en
+arrays NumPy (k = índice de la mejora, g = coste acumulado, h = heurística) y de ellos se obtiene:
+  - la tasa de descenso de h (por mejora, relativa y por USD de g) y los pasos hasta el 50/90/99 %,
+  - las mesetas: tramos de al menos --min-len mejoras con descenso relativo menor que --tol-rel,
+  - el esfuerzo de búsqueda por MWh despachado (nodos expandidos, estados evaluados y ms de búsqueda),
+    con la energía simulada sobre el problem (parse_priorizado_plan_sim.simulate).
+
+Por cada log escribe traza_<plan>.csv (y traza_<plan>.png salvo --no-plots) y una fila en
+traza_resumen.csv.
+
+Uso:
+  python scripts/analizar_traza_enhsp.py
+  (Opcional) python scripts/analizar_traza_enhsp.py results_escenario3/plan_enhsp_escenario3.txt \\
+      --problem models/pddl_escenario3/problem_escenario3.pddl --tol-rel 1e-3 --min-len 5 --out-dir results_trazas
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+import parse_priorizado_plan_sim as sim
+
+REPO = sim.REPO
+FLOAT = sim.FLOAT
+RGX_TRACE = re.compile(r"^\s*g\(n\)=\s*(" + FLOAT + r")\s+h\(n\)=\s*(" + FLOAT + r")", re.MULTILINE)
+RGX_H0 = re.compile(r"h\(n\s*=\s*s_0\)=\s*(" + FLOAT + r")")
+RGX_STATS = {
+    "plan_length": re.compile(r"Plan-Length:\s*(\d+)"),
+    "planning_ms": re.compile(r"Planning Time \(msec\):\s*(\d+)"),
+    "heuristic_ms": re.compile(r"Heuristic Time \(msec\):\s*(\d+)"),
+    "search_ms": re.compile(r"Search Time \(msec\):\s*(\d+)"),
+    "expanded": re.compile(r"Expanded Nodes:\s*(\d+)"),
+    "evaluated": re.compile(r"States Evaluated:\s*(\d+)"),
+}
+
+TRACE_COLUMNS = ["k", "g", "h", "dh", "dh_rel", "dh_por_usd", "meseta"]
+SUMMARY_COLUMNS = [
+    "plan", "mejoras", "h0", "h_final", "g_final", "metric", "expanded", "evaluated", "search_ms",
+    "pasos_50pct", "pasos_90pct", "pasos_99pct", "dh_rel_mediana", "dh_por_usd_mediana",
+    "decaimiento_log10_por_paso", "r2_h_vs_g", "mesetas", "meseta_max", "frac_en_meseta",
+    "mwh_despachados", "expanded_por_mwh", "evaluated_por_mwh", "search_ms_por_mwh", "mejoras_por_mwh",
+]
+
+
+@dataclass
+class Trace:
+    """Traza de una ejecución: k/g/h (el estado inicial s_0 va en k=0 con g=0) y estadísticas finales."""
+    name: str
+    k: np.ndarray
+    g: np.ndarray
+    h: np.ndarray
+    stats: dict = field(default_factory=dict)
+
+
+# =========================
+# Carga
+# =========================
+
+def load_trace(text: str, name: str = "") -> Trace:
+    pairs = RGX_TRACE.findall(text)
+    g = np.fromiter((float(a) for a, _ in pairs), dtype=float, count=len(pairs))
+    h = np.fromiter((float(b) for _, b in pairs), dtype=float, count=len(pairs))
+    m0 = RGX_H0.search(text)
+    if m0:
+        g = np.concatenate(([0.0], g))
+        h = np.concatenate(([float(m0.group(1))], h))
+
+    stats = {}
+    for key, rgx in RGX_STATS.items():
+        m = rgx.search(text)
+        stats[key] = int(m.group(1)) if m else None
+    mm = sim.RE_METRIC.search(text)
+    stats["metric"] = float(mm.group(1)) if mm else None
+    return Trace(name=name, k=np.arange(len(h)), g=g, h=h, stats=stats)
+
+
+# =========================
+# Análisis
+# =========================
+
+def _runs(mask: np.ndarray, min_len: int) -> list:
+    """Tramos [ini, fin) de True consecutivos con longitud >= min_len."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = (ends - starts) >= min_len
+    return list(zip(starts[keep].tolist(), ends[keep].tolist()))
+
+
+def analyze(trace: Trace, tol_rel: float = 1e-3, min_len: int = 5) -> tuple:
+    """
+    Devuelve (pasos, resumen, mesetas):
+      pasos: arrays por mejora (dh, dh_rel, dh_por_usd, meseta) alineados con k[1:]
+      resumen: indicadores escalares de convergencia
+      mesetas: lista de tramos (k_ini, k_fin) en índices de paso
+    """
+    g, h = trace.g, trace.h
+    dh = -np.diff(h)
+    dg = np.diff(g)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dh_rel = np.where(h[:-1] > 0, dh / h[:-1], np.nan)
+        dh_usd = np.where(dg > 0, dh / dg, np.nan)
+
+    stalled = np.nan_to_num(dh_rel, nan=0.0) < tol_rel
+    plateaus = _runs(stalled, min_len)
+    in_plateau = np.zeros(len(dh), dtype=bool)
+    for a, b in plateaus:
+        in_plateau[a:b] = True
+
+    summary = {"mejoras": int(len(dh))}
+    if len(h):
+        h0 = h[0]
+        summary.update(h0=float(h0), h_final=float(h[-1]), g_final=float(g[-1]))
+        reduced = 1.0 - h / h0 if h0 > 0 else np.zeros_like(h)
+        for pct in (50, 90, 99):
+            idx = int(np.searchsorted(np.maximum.accumulate(reduced), pct / 100.0))
+            summary[f"pasos_{pct}pct"] = idx if idx < len(h) else None
+        pos = h > 0
+        if pos.sum() >= 2:
+            summary["decaimiento_log10_por_paso"] = float(-np.polyfit(trace.k[pos], np.log10(h[pos]), 1)[0])
+        if len(h) >= 3 and np.std(g) > 0 and np.std(h) > 0:
+            summary["r2_h_vs_g"] = float(np.corrcoef(g, h)[0, 1] ** 2)
+    if len(dh):
+        summary["dh_rel_mediana"] = float(np.nanmedian(dh_rel)) if np.isfinite(dh_rel).any() else None
+        summary["dh_por_usd_mediana"] = float(np.nanmedian(dh_usd)) if np.isfinite(dh_usd).any() else None
+        summary["mesetas"] = len(plateaus)
+        summary["meseta_max"] = max((b - a for a, b in plateaus), default=0)
+        summary["frac_en_meseta"] = float(in_plateau.mean())
+
+    steps = {"dh": dh, "dh_rel": dh_rel, "dh_por_usd": dh_usd, "meseta": in_plateau}
+    return steps, summary, plateaus
+
+
+def dispatched_mwh(text: str, problem_path: Path) -> float:
+    """Energía servida por el plan del log según la simulación con recorte de parse_priorizado_plan_sim."""
+    hours, scalars, per_h = sim.parse_problem(problem_path, verbose=False)
+    actions, _ = sim.parse_plan_text(text, verbose=False)
+    return sim.simulate(actions, hours, scalars, per_h)["totals_mwh"]["sum"]
+
+
+def effort_per_mwh(trace: Trace, mwh: float | None) -> dict:
+    out = {"mwh_despachados": mwh}
+    for key in ("expanded", "evaluated", "search_ms"):
+        val = trace.stats.get(key)
+        out[f"{key}_por_mwh"] = val / mwh if (val is not None and mwh) else None
+    out["mejoras_por_mwh"] = (len(trace.h) - 1) / mwh if mwh else None
+    return out
+
+
+# =========================
+# Exportación
+# =========================
+
+def export_trace(trace: Trace, steps: dict, out_csv: Path) -> None:
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    nan = np.array([np.nan])
+    table = np.column_stack([
+        trace.k, trace.g, trace.h,
+        np.concatenate((nan, steps["dh"])),
+        np.concatenate((nan, steps["dh_rel"])),
+        np.concatenate((nan, steps["dh_por_usd"])),
+        np.concatenate(([0], steps["meseta"].astype(int))),
+    ])
+    np.savetxt(out_csv, table, delimiter=",", header=",".join(TRACE_COLUMNS), comments="",
+               fmt=["%d", "%.6g", "%.8g", "%.8g", "%.6g", "%.6g", "%d"])
+
+
+def export_plot(trace: Trace, steps: dict, plateaus: list, out_png: Path) -> bool:
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except Exception:
+        print("[AVISO] matplotlib no está disponible: se omite la gráfica")
+        return False
+
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(9, 6), sharex=True)
+    pos = trace.h > 0
+    ax1.semilogy(trace.k[pos], trace.h[pos], lw=1)
+    ax1.set_ylabel("h(n)")
+    ax1.set_title(f"Convergencia de la heurística — {trace.name}")
+    ax2.semilogy(trace.k[1:], np.where(steps["dh_rel"] > 0, steps["dh_rel"], np.nan), lw=0.8)
+    ax2.set_ylabel("descenso relativo de h")
+    ax2.set_xlabel("mejora k")
+    for a, b in plateaus:
+        for ax in (ax1, ax2):
+            ax.axvspan(a + 1, b + 1, color="tab:red", alpha=0.15, lw=0)
+    fig.tight_layout()
+    out_png.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(out_png, dpi=120)
+    plt.close(fig)
+    return True
+
+
+def write_summary(rows: list, out_csv: Path) -> None:
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    with out_csv.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, lineterminator="\n", extrasaction="ignore")
+        w.writeheader()
+        w.writerows(rows)
+
+
+# =========================
+# main
+# =========================
+
+def analyze_log(plan_path: Path, problem_path: Path | None, tol_rel: float, min_len: int,
+                out_dir: Path | None, plots: bool) -> dict:
+    text = plan_path.read_text(encoding="utf-8", errors="ignore")
+    trace = load_trace(text, name=plan_path.stem)
+    if len(trace.h) == 0:
+        print(f"[AVISO] {plan_path}: no hay líneas g(n)/h(n) en el log")
+        return {"plan": str(plan_path), "mejoras": 0}
+
+    steps, summary, plateaus = analyze(trace, tol_rel=tol_rel, min_len=min_len)
+    if problem_path is None:
+        problem_path = sim.problem_for_plan(plan_path)
+    mwh = dispatched_mwh(text, problem_path) if problem_path is not None else None
+    if mwh is None:
+        print(f"[AVISO] {plan_path.name}: sin problem asociado, no se calcula el esfuerzo por MWh")
+
+    target = out_dir if out_dir is not None else plan_path.parent
+    export_trace(trace, steps, target / f"traza_{plan_path.stem}.csv")
+    if plots:
+        export_plot(trace, steps, plateaus, target / f"traza_{plan_path.stem}.png")
+
+    try:
+        plan_name = str(plan_path.resolve().relative_to(REPO))
+    except ValueError:
+        plan_name = str(plan_path)
+    return {"plan": plan_name, **summary, **{k: trace.stats.get(k) for k in ("metric", "expanded", "evaluated", "search_ms")},
+            **effort_per_mwh(trace, mwh)}
+
+
+def _fmt(x, spec=",.0f"):
+    return "-" if x is None else format(x, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analítica de la traza g(n)/h(n) de ENHSP")
+    parser.add_argument("plans", nargs="*", help="Logs de ENHSP (por defecto results_*/plan_*.txt)")
+    parser.add_argument("--problem", type=str, default=None,
+                        help="problem.pddl para la energía despachada (por defecto se deduce del nombre del plan)")
+    parser.add_argument("--tol-rel", type=float, default=1e-3,
+                        help="Descenso relativo de h por mejora por debajo del cual se considera estancada")
+    parser.add_argument("--min-len", type=int, default=5, help="Mejoras estancadas seguidas para contar una meseta")
+    parser.add_argument("--out-dir", type=str, default=None, help="Carpeta de salida (por defecto, la del plan)")
+    parser.add_argument("--no-plots", action="store_true", help="No generar las gráficas PNG")
+    args = parser.parse_args()
+
+    plans = [Path(p) for p in args.plans] if args.plans else sorted(REPO.glob("results_*/plan_*.txt"))
+    problem = Path(args.problem) if args.problem else None
+    out_dir = Path(args.out_dir) if args.out_dir else None
+
+    rows = []
+    print(f"{'plan':<42} {'mejoras':>7} {'h0':>10} {'p90':>6} {'mesetas':>7} {'exp/MWh':>8} {'ms/MWh':>8}")
+    for plan in plans:
+        r = analyze_log(plan, problem, args.tol_rel, args.min_len, out_dir, not args.no_plots)
+        rows.append(r)
+        print(f"{plan.stem:<42} {r.get('mejoras', 0):>7} {_fmt(r.get('h0'), '.3g'):>10} "
+              f"{_fmt(r.get('pasos_90pct'), 'd'):>6} {_fmt(r.get('mesetas'), 'd'):>7} "
+              f"{_fmt(r.get('expanded_por_mwh'), '.3f'):>8} {_fmt(r.get('search_ms_por_mwh'), '.4f'):>8}")
+
+    summary_csv = (out_dir if out_dir is not None else REPO / "results_benchmarks") / "traza_resumen.csv"
+    write_summary(rows, summary_csv)
+    print(f"Resumen: {summary_csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+benchmark_flota.py
+
+Escalado del MILP por unidad (flota_milp.py): tiempo de construcción y de solve para flotas
+sintéticas de 3 a 500 unidades sobre 24 y 168 horas, con las filas precalculadas desde índices
+NumPy ('bulk') y, como referencia, con reglas Pyomo por índice ('rules').
+
+Uso:
+  python scripts/benchmark_flota.py --solver appsi_highs
+  (Opcional) python scripts/benchmark_flota.py --units 3 10 50 100 250 500 --hours 24 168 \\
+      --methods bulk rules --repeats 3 --out results_benchmarks/flota_benchmark.csv
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import time
+from pathlib import Path
+
+import flota_milp
+import milp_model
+
+BUILDERS = {
+    "bulk": flota_milp.build_fleet_model,
+    "rules": flota_milp.build_fleet_model_rules,
+}
+OUT_COLUMNS = ["method", "units", "hours", "variables", "constraints", "build_s", "solve_s", "total_cost_usd", "status"]
+
+
+def run_case(method: str, n_units: int, n_hours: int, solver_name: str, glpk_executable, voll: float, seed: int) -> dict:
+    import pyomo.environ as pyo
+
+    fleet = flota_milp.synthetic_fleet(n_units, n_hours, seed=seed)
+    t0 = time.perf_counter()
+    model = BUILDERS[method](fleet, voll=voll)
+    build_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    summary = milp_model.solve_model(model, solver_name=solver_name, glpk_executable=glpk_executable)
+    solve_s = time.perf_counter() - t0
+    return {
+        "method": method,
+        "units": fleet.n_units,
+        "hours": n_hours,
+        "variables": sum(1 for _ in model.component_data_objects(pyo.Var)),
+        "constraints": sum(1 for _ in model.component_data_objects(pyo.Constraint)),
+        "build_s": build_s,
+        "solve_s": solve_s,
+        "total_cost_usd": summary["total_cost_usd"],
+        "status": summary["termination_condition"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de construcción/solve del MILP por unidad")
+    parser.add_argument("--units", type=int, nargs="+", default=[3, 10, 50, 100, 250, 500])
+    parser.add_argument("--hours", type=int, nargs="+", default=[24, 168])
+    parser.add_argument("--methods", nargs="+", default=["bulk", "rules"], choices=sorted(BUILDERS))
+    parser.add_argument("--repeats", type=int, default=1, help="Repeticiones por caso (se guarda el mejor tiempo)")
+    parser.add_argument("--solver", type=str, default="glpk", help="Nombre de solver Pyomo (glpk, cbc, appsi_highs, etc.)")
+    parser.add_argument("--glpk-exe", type=str, default=None, help="Ruta a glpsol (por defecto, el del PATH)")
+    parser.add_argument("--voll", type=float, default=1000.0, help="VoLL de la ENS (mantiene factibles las flotas sintéticas)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=str, default=None, help="CSV de salida (por defecto results_benchmarks/flota_benchmark.csv)")
+    args = parser.parse_args()
+
+    out = Path(args.out) if args.out else Path(__file__).resolve().parent.parent / "results_benchmarks" / "flota_benchmark.csv"
+    out.parent.mkdir(parents=True, exist_ok=True)
+
+    rows = []
+    print(f"{'método':<6} {'unid':>5} {'horas':>5} {'vars':>8} {'restr':>8} {'build[s]':>9} {'solve[s]':>9}  coste")
+    for n_hours in args.hours:
+        for n_units in args.units:
+            for method in args.methods:
+                best = None
+                for _ in range(max(1, args.repeats)):
+                    r = run_case(method, n_units, n_hours, args.solver, args.glpk_exe, args.voll, args.seed)
+                    if best is None or r["build_s"] + r["solve_s"] < best["build_s"] + best["solve_s"]:
+                        best = r
+                rows.append(best)
+                print(f"{best['method']:<6} {best['units']:>5} {best['hours']:>5} {best['variables']:>8} "
+                      f"{best['constraints']:>8} {best['build_s']:>9.3f} {best['solve_s']:>9.3f}  "
+                      f"{best['total_cost_usd']:,.0f} ({best['status']})")
+
+    with out.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=OUT_COLUMNS, lineterminator="\n")
+        w.writeheader()
+        w.writerows(rows)
+    print(f"Resultados: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+benchmark_parsers.py
+
+Micro-benchmarks de los caminos calientes de los scripts de plan:
+  - parse_priorizado_plan_sim.py: parse_plan, parse_problem, simulate
+  - resumir_plan_priorizado.py: parse_plan, parse_problem, build_summary
+  - verificar_y_visualizar_plan_priorizado.py: parse_plan, parse_problem, simulate_plan, build_summary, verify
+
+Se miden sobre los logs grabados (results_*/plan_*.txt con su problem de models/) y sobre logs
+sintéticos en formato ENHSP de 10^5 a 10^7 acciones. Para cada función se guarda la mediana de
+--repeats muestras de al menos --ventana segundos, el throughput (acciones/s; líneas/s en
+parse_problem y filas horarias/s en build_summary y verify), el tiempo relativo a una carga de
+referencia medida entre muestras (columna 'relativo') y el pico de memoria (tracemalloc, en una
+pasada aparte para no falsear el tiempo).
+
+Con --check se compara el tiempo relativo contra la línea base guardada
+(results_benchmarks/parsers_baseline.csv) y el script termina con código 1 si algún throughput
+relativo cae más de --umbral respecto a ella. Al normalizar por la carga de referencia la línea
+base sirve en otro equipo y no la falsea un equipo cargado; los tiempos absolutos son informativos.
+
+Uso:
+  python scripts/benchmark_parsers.py
+  python scripts/benchmark_parsers.py --check --umbral 0.3
+  (Opcional) python scripts/benchmark_parsers.py --sizes 100000 1000000 10000000 --repeats 5 \\
+      --save-baseline --out results_benchmarks/parsers_benchmark.csv
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import gc
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import parse_priorizado_plan_sim as sim
+import resumir_plan_priorizado as resumir
+import verificar_y_visualizar_plan_priorizado as verificar
+
+REPO = Path(__file__).resolve().parent.parent
+MODELS = REPO / "models"
+BASELINE = REPO / "results_benchmarks" / "parsers_baseline.csv"
+SYNTH_PROBLEM = MODELS / "pddl_caso_base" / "problem_priorizado2.pddl"
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+OUT_COLUMNS = ["caso", "funcion", "n", "unidad", "segundos", "throughput", "relativo", "pico_mb"]
+
+# Patrón por hora del log sintético: reparte el despacho entre las tres fuentes y cierra con las
+# acciones de control, como en los planes reales del dominio priorizado.
+_SYNTH_DISPATCH = ("despachar_pv", "despachar_hidro", "despachar_termica")
+
+
+# =========================
+# Casos de prueba
+# =========================
+
+def recorded_cases() -> list:
+    cases = []
+    for plan in sorted(REPO.glob("results_*/plan_*.txt")):
+        problem = sim.problem_for_plan(plan)
+        if problem is None:
+            print(f"[AVISO] Sin problem para {plan.relative_to(REPO)}: se omite")
+            continue
+        cases.append((f"{plan.parent.name}/{plan.stem}", problem, plan))
+    return cases
+
+
+def write_synthetic_plan(path: Path, n_actions: int, n_hours: int = 24) -> None:
+    """Log ENHSP ('Found Plan:' + 't: (accion hX)') con n_actions acciones repartidas en n_hours horas."""
+    per_hour = max(1, n_actions // n_hours)
+    step = 0
+    with path.open("w", encoding="utf-8") as f:
+        f.write("Running Greedy Best First Search\nFound Plan:\n")
+        for h in range(n_hours):
+            lines = [f"{step + i}.0: ({_SYNTH_DISPATCH[i % 3]} h{h})" for i in range(per_hour - 2)]
+            step += len(lines)
+            lines.append(f"{step}.0: (marcar_pv_agotado h{h})")
+            lines.append(f"{step + 1}.0: (avanzar_hora h{h} h{(h + 1) % n_hours})")
+            step += 2
+            f.write("\n".join(lines))
+            f.write("\n")
+        f.write(f"\nPlan-Length:{step}\nMetric (Search):0.0\n")
+
+
+# =========================
+# Medición
+# =========================
+
+# Carga de referencia: regex + float + dict sobre líneas en formato ENHSP, la misma mezcla de trabajo
+# que los parsers. Se cronometra junto a cada función para expresar su tiempo en "calibraciones"
+# y que la comparación con la línea base no dependa de la velocidad del equipo ni de su carga.
+_CALIB_LINES = [f"{i}.0: ({_SYNTH_DISPATCH[i % 3]} h{i % 24})" for i in range(2000)]
+_TRAMOS = 4
+_CALIB_RE = re.compile(r"^\s*(\d+(?:\.\d+)?):\s*\(([a-z_]+)\s+h(\d+)\)$")
+
+
+def _calibracion() -> None:
+    counts = {}
+    for ln in _CALIB_LINES:
+        m = _CALIB_RE.match(ln)
+        key = (m.group(2), int(m.group(3)))
+        counts[key] = counts.get(key, 0.0) + float(m.group(1))
+
+
+def _bucle(fn, loops: int) -> float:
+    gc.collect()
+    t0 = time.perf_counter()
+    for _ in range(loops):
+        fn()
+    return (time.perf_counter() - t0) / loops
+
+
+def _loops_para(fn, ventana: float) -> int:
+    """Repeticiones de fn por muestra para que cada muestra dure al menos 'ventana' segundos."""
+    loops = 1
+    while True:
+        dt = _bucle(fn, loops) * loops
+        if dt >= ventana or loops >= 10_000_000:
+            return loops
+        loops = min(10_000_000, max(loops * 2, int(loops * ventana / max(dt, 1e-9) * 1.2)))
+
+
+def _medir(fn, repeats: int, ventana: float) -> tuple:
+    """
+    (segundos, relativo) por llamada: medianas de 'repeats' muestras de al menos 'ventana' segundos.
+    Cada muestra se alterna con la carga de referencia y 'relativo' es la mediana de los cocientes,
+    así que una ralentización del equipo durante la ejecución afecta a ambos por igual.
+    """
+    loops = _loops_para(fn, ventana / _TRAMOS)
+    loops_cal = _loops_para(_calibracion, ventana / (2 * _TRAMOS))
+    tiempos, relativos = [], []
+    for _ in range(max(1, repeats)):
+        # La muestra se parte en tramos alternados con la referencia: ambas ven la misma carga del equipo
+        dt = cal = 0.0
+        for _ in range(_TRAMOS):
+            dt += _bucle(fn, loops)
+            cal += _bucle(_calibracion, loops_cal)
+        tiempos.append(dt / _TRAMOS)
+        relativos.append(dt / cal)
+    return statistics.median(tiempos), statistics.median(relativos)
+
+
+def _peak_mb(fn) -> float:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1e6
+
+
+def bench_case(caso: str, problem: Path, plan: Path, repeats: int, ventana: float = 0.2,
+               memory: bool = True) -> list:
+    """Cronometra las funciones de los tres scripts sobre un par (problem, plan)."""
+    n_problem = len(problem.read_text(encoding="utf-8", errors="ignore").splitlines())
+
+    # Entradas ya parseadas para las etapas posteriores
+    hours, scalars, per_h = sim.parse_problem(problem, verbose=False)
+    actions, _metric = sim.parse_plan(plan, verbose=False)
+    counts_r, _ = resumir.parse_plan(plan)
+    markers = verificar.parse_plan(plan)
+    n = len(actions)
+
+    try:
+        params_r = resumir.parse_problem(problem)
+        params_v = verificar.parse_problem(problem)
+    except ValueError as ex:
+        print(f"[AVISO] {caso}: {ex}; solo se mide parse_priorizado_plan_sim")
+        params_r = params_v = None
+
+    cases = [
+        ("sim.parse_plan", n, "acciones", lambda: sim.parse_plan(plan, verbose=False)),
+        ("sim.parse_problem", n_problem, "lineas", lambda: sim.parse_problem(problem, verbose=False)),
+        ("sim.simulate", n, "acciones", lambda: sim.simulate(actions, hours, scalars, per_h)),
+    ]
+    if params_r is not None:
+        counts_v, demanda_final, _ = verificar.simulate_plan(markers, params_v)
+        rows_v, _tot = verificar.build_summary(counts_v, demanda_final, params_v)
+        cases += [
+            ("resumir.parse_plan", n, "acciones", lambda: resumir.parse_plan(plan)),
+            ("resumir.parse_problem", n_problem, "lineas", lambda: resumir.parse_problem(problem)),
+            ("resumir.build_summary", len(rows_v), "filas", lambda: resumir.build_summary(counts_r, params_r)),
+            ("verificar.parse_plan", n, "acciones", lambda: verificar.parse_plan(plan)),
+            ("verificar.parse_problem", n_problem, "lineas", lambda: verificar.parse_problem(problem)),
+            ("verificar.simulate_plan", n, "acciones", lambda: verificar.simulate_plan(markers, params_v)),
+            ("verificar.build_summary", len(rows_v), "filas",
+             lambda: verificar.build_summary(counts_v, demanda_final, params_v)),
+            ("verificar.verify", len(rows_v), "filas", lambda: verificar.verify(rows_v, params_v)),
+        ]
+
+    rows = []
+    for funcion, count, unidad, fn in cases:
+        seconds, relativo = _medir(fn, repeats, ventana)
+        rows.append({
+            "caso": caso,
+            "funcion": funcion,
+            "n": count,
+            "unidad": unidad,
+            "segundos": seconds,
+            "throughput": count / seconds if seconds > 0 else float("inf"),
+            "relativo": relativo,
+            "pico_mb": _peak_mb(fn) if memory else "",
+        })
+    return rows
+
+
+# =========================
+# Línea base
+# =========================
+
+def read_results(path: Path) -> dict:
+    with path.open(encoding="utf-8") as f:
+        return {(r["caso"], r["funcion"]): r for r in csv.DictReader(f)}
+
+
+def write_results(rows: list, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=OUT_COLUMNS, lineterminator="\n")
+        w.writeheader()
+        for r in rows:
+            w.writerow({**r, "segundos": f"{r['segundos']:.6g}", "throughput": f"{r['throughput']:.6g}",
+                        "relativo": f"{r['relativo']:.6g}",
+                        "pico_mb": f"{r['pico_mb']:.3f}" if r["pico_mb"] != "" else ""})
+
+
+def regressions(rows: list, baseline: dict, threshold: float) -> list:
+    """
+    Mensajes para cada (caso, función) cuyo tiempo relativo a la carga de referencia sube más de lo
+    que corresponde a una caída de throughput de 'threshold' frente a la base.
+    """
+    out = []
+    for r in rows:
+        ref = baseline.get((r["caso"], r["funcion"]))
+        if ref is None or not ref.get("relativo"):
+            continue
+        ref_rel = float(ref["relativo"])
+        ratio = ref_rel / r["relativo"] if r["relativo"] > 0 else float("inf")   # throughput actual / base
+        if ratio < 1.0 - threshold:
+            out.append(f"{r['caso']} {r['funcion']}: {r['relativo']:.4g} calibraciones/llamada "
+                       f"vs base {ref_rel:.4g} (throughput {ratio - 1.0:+.0%})")
+    return out
+
+
+def calibrated(baseline: dict) -> bool:
+    """La línea base trae la columna 'relativo' (las de antes solo tenían tiempos absolutos)."""
+    return any(r.get("relativo") for r in baseline.values())
+
+
+# =========================
+# main
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de los parsers/simuladores de plan")
+    parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES,
+                        help="Tamaños (acciones) de los logs sintéticos; 10000000 necesita varios GB de RAM")
+    parser.add_argument("--no-recorded", action="store_true", help="No medir los logs grabados en results_*/")
+    parser.add_argument("--repeats", type=int, default=5, help="Muestras por función (se guarda la mediana)")
+    parser.add_argument("--ventana", type=float, default=0.2,
+                        help="Duración mínima de cada muestra [s]; las funciones rápidas se repiten hasta cubrirla")
+    parser.add_argument("--no-memory", action="store_true", help="No medir el pico de memoria (más rápido)")
+    parser.add_argument("--out", type=str, default=None, help="CSV con los resultados de esta ejecución")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="CSV de línea base (por defecto results_benchmarks/parsers_baseline.csv)")
+    parser.add_argument("--save-baseline", action="store_true", help="Guardar esta ejecución como línea base")
+    parser.add_argument("--check", action="store_true", help="Fallar si el throughput cae más de --umbral")
+    parser.add_argument("--umbral", type=float, default=0.25,
+                        help="Caída relativa de throughput tolerada frente a la base (por defecto 0.25)")
+    args = parser.parse_args()
+
+    baseline_path = Path(args.baseline) if args.baseline else BASELINE
+    rows = []
+    print(f"{'caso':<48} {'función':<26} {'n':>9} {'t[s]':>10} {'throughput':>14} {'pico[MB]':>9}")
+
+    def report(new_rows):
+        for r in new_rows:
+            pico = f"{r['pico_mb']:9.1f}" if r["pico_mb"] != "" else f"{'-':>9}"
+            print(f"{r['caso']:<48} {r['funcion']:<26} {r['n']:>9} {r['segundos']:>10.4g} "
+                  f"{r['throughput']:>12,.0f}/s {pico}")
+        rows.extend(new_rows)
+
+    if not args.no_recorded:
+        for caso, problem, plan in recorded_cases():
+            report(bench_case(caso, problem, plan, args.repeats, args.ventana, memory=not args.no_memory))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            plan = Path(tmp) / f"plan_sintetico_{size}.txt"
+            write_synthetic_plan(plan, size)
+            report(bench_case(f"sintetico/{size}", SYNTH_PROBLEM, plan, args.repeats, args.ventana,
+                              memory=not args.no_memory))
+            plan.unlink()
+
+    if args.out:
+        write_results(rows, Path(args.out))
+        print(f"Resultados: {args.out}")
+    if args.save_baseline:
+        write_results(rows, baseline_path)
+        print(f"Línea base guardada: {baseline_path}")
+
+    if args.check:
+        if not baseline_path.exists():
+            print(f"[AVISO] No existe la línea base {baseline_path}: ejecuta con --save-baseline")
+            sys.exit(2)
+        baseline = read_results(baseline_path)
+        if not calibrated(baseline):
+            print(f"[AVISO] {baseline_path.name} no tiene tiempos relativos a la carga de referencia "
+                  f"(columna 'relativo'): regénérala con --save-baseline en el equipo de referencia")
+            sys.exit(2)
+        bad = regressions(rows, baseline, args.umbral)
+        if bad:
+            print(f"\nRegresiones de throughput (> {args.umbral:.0%}):")
+            for msg in bad:
+                print(f"  {msg}")
+            sys.exit(1)
+        print(f"\nSin regresiones de throughput frente a {baseline_path.name} (umbral {args.umbral:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+cache_milp.py
+
+Caché persistente de modelos MILP resueltos para milp_model.py (--cache).
+
+La clave es un hash canónico (SHA-256 de un JSON ordenado) de las entradas ya parseadas por
+_read_csvs más las opciones de solver y de formulación: cambiar espacios, el orden de columnas o
+el formato numérico de los CSV no invalida la entrada; cambiar un dato o una opción, sí. Cada
+entrada guarda el resumen, los valores de las variables, los CSV exportados (milp_dispatch.csv,
+milp_summary.csv, duales y rangos) y, opcionalmente, el modelo en LP/MPS.
+
+  - Petición idéntica: se copian los CSV guardados y no se construye ni se resuelve el modelo.
+  - Petición distinta con la misma estructura (horas, UC sí/no, solver): la solución más reciente de
+    esa estructura se carga como punto de partida (warm start) si el solver lo admite.
+  - El tamaño en disco se acota con --cache-max-mb, expulsando primero las entradas usadas hace
+    más tiempo (LRU).
+
+Al cambiar la formulación de build_model hay que subir FORMULATION_VERSION para invalidar la caché.
+
+Uso:
+  python scripts/milp_model.py --data-dir data_caso_base --results-dir results_caso_base --solver appsi_highs --cache
+  (Opcional) --cache-dir .cache_milp --cache-max-mb 200 --cache-export lp
+  python scripts/cache_milp.py --listar
+  python scripts/cache_milp.py --vaciar
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+CACHE_DIR = REPO / ".cache_milp"
+FORMULATION_VERSION = 1
+CACHED_FILES = ("milp_dispatch.csv", "milp_summary.csv", "milp_duals.csv", "milp_duals_resumen.csv", "milp_ranging.csv")
+ENTRY_FILE = "entry.json"
+
+
+# =========================
+# Claves canónicas
+# =========================
+
+def _canon(x):
+    """Estructura JSON estable: dicts ordenados por clave y números como repr(float)."""
+    if isinstance(x, dict):
+        return [[str(k), _canon(v)] for k, v in sorted(x.items(), key=lambda kv: str(kv[0]))]
+    if isinstance(x, (list, tuple)):
+        return [_canon(v) for v in x]
+    if x is None or isinstance(x, (bool, str)):
+        return x
+    try:
+        return repr(float(x))
+    except (TypeError, ValueError):
+        return str(x)
+
+
+def _digest(obj) -> str:
+    payload = json.dumps(_canon(obj), separators=(",", ":"), ensure_ascii=True)
+    return hashlib.sha256(payload.encode("ascii")).hexdigest()
+
+
+def input_key(inputs: tuple, options: dict) -> str:
+    """Hash de las entradas de _read_csvs + opciones (solver, UC, límites, MIP start, ...)."""
+    return _digest({"v": FORMULATION_VERSION, "inputs": inputs, "options": options})
+
+
+def structure_key(inputs: tuple, options: dict) -> str:
+    """Hash de lo que determina la forma del modelo: entre entradas con la misma estructura se reutiliza el warm start."""
+    return _digest({"v": FORMULATION_VERSION, "hours": inputs[0], "uc": options.get("uc") is not None,
+                    "solver": options.get("solver")})
+
+
+def file_digest(path: Path | None) -> str | None:
+    if path is None:
+        return None
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+# =========================
+# Caché en disco
+# =========================
+
+class ModelCache:
+    """Una carpeta por clave con entry.json y los archivos guardados; LRU por 'last_used'."""
+
+    def __init__(self, root: Path = CACHE_DIR, max_mb: float = 200.0):
+        self.root = Path(root)
+        self.max_bytes = int(max_mb * 1e6)
+
+    def _dir(self, key: str) -> Path:
+        return self.root / key
+
+    def _read(self, key: str) -> dict | None:
+        path = self._dir(key) / ENTRY_FILE
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key: str, entry: dict) -> None:
+        path = self._dir(key) / ENTRY_FILE
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(entry), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def entries(self) -> list:
+        if not self.root.is_dir():
+            return []
+        out = []
+        for d in self.root.iterdir():
+            entry = self._read(d.name) if d.is_dir() else None
+            if entry is not None:
+                entry["bytes"] = sum(f.stat().st_size for f in d.iterdir() if f.is_file())
+                out.append(entry)
+        return out
+
+    def restore(self, key: str, results_dir: Path) -> dict | None:
+        """Si la clave existe, copia sus CSV a results_dir, la marca como usada y devuelve el resumen."""
+        entry = self._read(key)
+        if entry is None or any(not (self._dir(key) / f).exists() for f in entry["files"]):
+            return None
+        results_dir.mkdir(parents=True, exist_ok=True)
+        for name in entry["files"]:
+            shutil.copyfile(self._dir(key) / name, results_dir / name)
+        entry["last_used"] = time.time()
+        entry["hits"] = entry.get("hits", 0) + 1
+        self._write(key, entry)
+        return entry["summary"]
+
+    def warm_start(self, structure: str) -> dict | None:
+        """Valores de variables de la entrada más reciente con la misma estructura (o None)."""
+        same = [e for e in self.entries() if e.get("structure") == structure and e.get("values")]
+        if not same:
+            return None
+        return max(same, key=lambda e: e["last_used"])["values"]
+
+    def store(self, key: str, structure: str, summary: dict, values: dict, results_dir: Path,
+              model=None, export: str | None = None) -> None:
+        d = self._dir(key)
+        d.mkdir(parents=True, exist_ok=True)
+        files = [name for name in CACHED_FILES if (results_dir / name).exists()]
+        for name in files:
+            shutil.copyfile(results_dir / name, d / name)
+        model_file = None
+        if model is not None and export:
+            model_file = f"model.{export}"
+            model.write(str(d / model_file), io_options={"symbolic_solver_labels": True})
+        now = time.time()
+        self._write(key, {"key": key, "structure": structure, "created": now, "last_used": now, "hits": 0,
+                          "summary": summary, "values": values, "files": files, "model_file": model_file})
+        self.evict(keep=key)
+
+    def evict(self, keep: str | None = None) -> list:
+        """Borra las entradas menos usadas hasta quedar por debajo de max_bytes."""
+        entries = sorted(self.entries(), key=lambda e: e["last_used"])
+        total = sum(e["bytes"] for e in entries)
+        removed = []
+        for e in entries:
+            if total <= self.max_bytes:
+                break
+            if e["key"] == keep:
+                continue
+            shutil.rmtree(self._dir(e["key"]), ignore_errors=True)
+            total -= e["bytes"]
+            removed.append(e["key"])
+        return removed
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gestión de la caché de modelos MILP resueltos")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Carpeta de la caché (por defecto .cache_milp/)")
+    parser.add_argument("--listar", action="store_true", help="Listar las entradas (de la más reciente a la más antigua)")
+    parser.add_argument("--vaciar", action="store_true", help="Borrar toda la caché")
+    args = parser.parse_args()
+
+    cache = ModelCache(Path(args.cache_dir) if args.cache_dir else CACHE_DIR)
+    if args.vaciar:
+        cache.clear()
+        print(f"Caché vaciada: {cache.root}")
+        return
+    entries = sorted(cache.entries(), key=lambda e: -e["last_used"])
+    print(f"{len(entries)} entradas, {sum(e['bytes'] for e in entries) / 1e6:.2f} MB en {cache.root}")
+    for e in entries:
+        used = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(e["last_used"]))
+        print(f"  {e['key'][:12]}  usado {used}  aciertos={e.get('hits', 0):<3} "
+              f"coste={e['summary'].get('total_cost_usd', float('nan')):,.2f}  modelo={e.get('model_file') or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,18 +7,25 @@ USO con archivos del verificador:
       --pddl-xlsx     results/resumen_plan_enhsp_sat_hadd_priorizado2.xlsx \
       --pddl-report   results/verificacion_plan_enhsp_sat_hadd_priorizado2.txt \
       --outdir        results
+  (Opcional) --profile: perfil_comparar_resultados_fase5.* en --outdir (ver perfilado.py)
 
 
 """
+from __future__ import annotations
+
 import argparse
 import os
 import sys
 import re
-from typing import Dict, Optional, Tuple, List
+import time
+from typing import Dict, Optional, Tuple, List, TYPE_CHECKING
+
+import perfilado
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
+# pandas/numpy se importan al leer datos y matplotlib solo al graficar, para que
+# `--help` y las ejecuciones con `--no-plots` arranquen sin cargar lo que no usan.
+if TYPE_CHECKING:
+    import pandas as pd
 
 def df_to_markdown_simple(df: pd.DataFrame) -> str:
     # Simple Markdown table without external 'tabulate' dependency
@@ -46,6 +53,7 @@ TOL = 1e-6
 # ---------------------------- Utilidades de I/O --------------------------------
 
 def read_csv_safe(path: str) -> pd.DataFrame:
+    import pandas as pd
     if not os.path.isfile(path):
         print(f"[ERROR] No se encontró el archivo: {path}", file=sys.stderr)
         sys.exit(1)
@@ -56,6 +64,7 @@ def read_csv_safe(path: str) -> pd.DataFrame:
         sys.exit(1)
 
 def read_excel_safe(path: str) -> Dict[str, pd.DataFrame]:
+    import pandas as pd
     if not os.path.isfile(path):
         print(f"[ERROR] No se encontró el archivo: {path}", file=sys.stderr)
         sys.exit(1)
@@ -136,6 +145,7 @@ def _score_dispatch_like(df: pd.DataFrame) -> int:
     return score
 
 def try_extract_pddl_dispatch_from_excel(xls: Dict[str, pd.DataFrame]) -> Tuple[Optional[pd.DataFrame], str]:
+    import pandas as pd
     best_df = None
     best_name = ""
     best_score = -1
@@ -152,6 +162,7 @@ def try_extract_pddl_dispatch_from_excel(xls: Dict[str, pd.DataFrame]) -> Tuple[
     return best_df, best_name
 
 def try_extract_pddl_summary_from_excel(xls: Dict[str, pd.DataFrame]) -> Dict[str, Optional[float]]:
+    import pandas as pd
     keys_cost = ["costo_total", "total_cost", "coste_total", "objective", "obj", "obj_value", "objective_value", "total-cost"]
     keys_time = ["runtime_s", "time_s", "solve_time", "walltime", "seconds", "tiempo", "duración"]
     # 1) intento directo: hoja con columnas clave
@@ -255,7 +266,9 @@ def extract_summary_from_report_txt(txt: str) -> Dict[str, Optional[float]]:
 
 # ----------------------------- Métricas por caso -------------------------------
 
-def compute_dispatch_metrics(df: pd.DataFrame, label: str) -> Tuple[Dict[str, float], pd.DataFrame]:
+def compute_dispatch_metrics(df: pd.DataFrame, label: str, tol: float = TOL) -> Tuple[Dict[str, float], pd.DataFrame]:
+    import pandas as pd
+    import numpy as np
     cols = guess_columns(df)
     for tech in ["pv", "hidro", "termica", "demanda"]:
         if cols[tech] is None and tech != "termica":
@@ -277,7 +290,7 @@ def compute_dispatch_metrics(df: pd.DataFrame, label: str) -> Tuple[Dict[str, fl
     except Exception:
         std["hora_num"] = pd.to_numeric(std["hora"], errors="coerce").fillna(range(n)).astype(float)
     std["gen_total"] = std[["pv", "hidro", "termica"]].sum(axis=1)
-    cobertura_ok = (std["gen_total"] - std["demanda"]).abs() <= TOL
+    cobertura_ok = (std["gen_total"] - std["demanda"]).abs() <= tol
     coverage_pct = 100.0 * (cobertura_ok.sum() / max(1, len(std)))
     total_gen_sum = std["gen_total"].sum()
     pct_renovables = 0.0
@@ -301,6 +314,8 @@ def compute_dispatch_metrics(df: pd.DataFrame, label: str) -> Tuple[Dict[str, fl
 # ------------------------------- Gráficos --------------------------------------
 
 def plot_stack_technologies(std: pd.DataFrame, title: str, outpath: str) -> None:
+    import numpy as np
+    import matplotlib.pyplot as plt
     plt.figure()
     x = std["hora_num"].values if "hora_num" in std else np.arange(len(std))
     pv = np.maximum(std["pv"].values, 0.0)
@@ -316,6 +331,8 @@ def plot_stack_technologies(std: pd.DataFrame, title: str, outpath: str) -> None
     plt.close()
 
 def plot_demand_vs_generation(std_milp: pd.DataFrame, std_pddl: pd.DataFrame, outpath: str) -> None:
+    import numpy as np
+    import matplotlib.pyplot as plt
     plt.figure()
     x = std_milp["hora_num"].values if "hora_num" in std_milp else np.arange(len(std_milp))
 
@@ -387,6 +404,7 @@ def extract_summary_metrics_from_df(df: pd.DataFrame) -> Dict[str, Optional[floa
         return {"costo_total": cost, "runtime_s": runtime}
     return {"costo_total": None, "runtime_s": None}
 
+@perfilado.perfilable("comparar_resultados_fase5")
 def main():
     parser = argparse.ArgumentParser(description="Comparar resultados MILP vs PDDL (FASE 5)")
     parser.add_argument("--milp-dispatch", required=True, help="CSV de despacho MILP (por hora)")
@@ -397,63 +415,75 @@ def main():
     parser.add_argument("--pddl-xlsx", required=False, help="Excel resumen del verificador ENHSP")
     parser.add_argument("--pddl-report", required=False, help="Reporte TXT del verificador ENHSP")
     parser.add_argument("--outdir", default="results", help="Carpeta de salida para tablas y gráficos")
+    parser.add_argument("--tol-cobertura-pddl", type=float, default=TOL,
+                        help="Tolerancia |despacho - demanda| de la cobertura PDDL (p.ej. la unidad_despacho del problema)")
+    parser.add_argument("--no-plots", action="store_true", help="No generar gráficos (evita importar matplotlib)")
+    perfilado.add_profile_args(parser)
     args = parser.parse_args()
+    t_start = time.perf_counter()
+    perfilado.salida(args.outdir)
+
+    with perfilado.etapa("importar_pandas"):
+        import pandas as pd
+        import numpy as np
 
     os.makedirs(args.outdir, exist_ok=True)
 
     # ---------------- MILP ----------------
-    milp_dispatch = read_csv_safe(args.milp_dispatch)
-    milp_summary_df = read_csv_safe(args.milp_summary)
-    milp_summary = extract_summary_metrics_from_df(milp_summary_df)
-    milp_metrics, milp_std = compute_dispatch_metrics(milp_dispatch, "MILP")
+    with perfilado.etapa("milp"):
+        milp_dispatch = read_csv_safe(args.milp_dispatch)
+        milp_summary_df = read_csv_safe(args.milp_summary)
+        milp_summary = extract_summary_metrics_from_df(milp_summary_df)
+        milp_metrics, milp_std = compute_dispatch_metrics(milp_dispatch, "MILP")
 
     # ---------------- PDDL ----------------
-    pddl_metrics_dict = None
-    pddl_std = None
-    pddl_summary = {"costo_total": None, "runtime_s": None}
-
-    used_excel_sheet = ""
-    debug_lines = []
-
-    if args.pddl_dispatch and args.pddl_summary:
-        # Modo A: CSV directos
-        pddl_dispatch_df = read_csv_safe(args.pddl_dispatch)
-        pddl_metrics_dict, pddl_std = compute_dispatch_metrics(pddl_dispatch_df, "PDDL")
-        pddl_summary = extract_summary_metrics_from_df(read_csv_safe(args.pddl_summary))
-        debug_lines.append("PDDL: modo CSV (dispatch+summary).")
-    else:
-        # Modo B: Excel (+ opcional TXT)
-        if not args.pddl_xlsx:
-            print("[ERROR] Debe proporcionar --pddl-dispatch y --pddl-summary, o bien --pddl-xlsx.", file=sys.stderr)
-            sys.exit(1)
-        xls = read_excel_safe(args.pddl_xlsx)
-        dispatch_df, used_excel_sheet = try_extract_pddl_dispatch_from_excel(xls)
-        if dispatch_df is None:
-            print("[ERROR] No se pudo encontrar una hoja con despacho horario en el Excel PDDL.", file=sys.stderr)
-            sys.exit(1)
-        pddl_metrics_dict, pddl_std = compute_dispatch_metrics(dispatch_df, "PDDL")
-        pddl_summary = try_extract_pddl_summary_from_excel(xls)
-        if (pddl_summary.get("costo_total") is None or pddl_summary.get("runtime_s") is None) and args.pddl_report:
-            txt = read_text_safe(args.pddl_report)
-            rep_metrics = extract_summary_from_report_txt(txt)
-            for k in ["costo_total", "runtime_s"]:
-                if pddl_summary.get(k) is None and rep_metrics.get(k) is not None:
-                    pddl_summary[k] = rep_metrics[k]
-        debug_lines.append(f"PDDL: modo Excel. Hoja despacho usada: '{used_excel_sheet}'. Resumen: {pddl_summary}")
-
-        # Intento enlazar PNGs del verificador
-        xlsx_dir = os.path.dirname(os.path.abspath(args.pddl_xlsx))
-        cand1 = None
-        cand2 = None
-        # buscar por patrones comunes
-        for fname in os.listdir(xlsx_dir):
-            fl = fname.lower()
-            if "grafica_despacho" in fl and fl.endswith(".png"):
-                cand1 = os.path.join(xlsx_dir, fname)
-            if "grafica_costo" in fl and fl.endswith(".png"):
-                cand2 = os.path.join(xlsx_dir, fname)
-        pddl_plot_despacho = copy_if_exists(cand1, args.outdir, "pddl_grafica_despacho_original.png") if cand1 else None
-        pddl_plot_costo = copy_if_exists(cand2, args.outdir, "pddl_grafica_costo_acumulado_original.png") if cand2 else None
+    with perfilado.etapa("pddl"):
+        pddl_metrics_dict = None
+        pddl_std = None
+        pddl_summary = {"costo_total": None, "runtime_s": None}
+
+        used_excel_sheet = ""
+        debug_lines = []
+
+        if args.pddl_dispatch and args.pddl_summary:
+            # Modo A: CSV directos
+            pddl_dispatch_df = read_csv_safe(args.pddl_dispatch)
+            pddl_metrics_dict, pddl_std = compute_dispatch_metrics(pddl_dispatch_df, "PDDL", tol=args.tol_cobertura_pddl)
+            pddl_summary = extract_summary_metrics_from_df(read_csv_safe(args.pddl_summary))
+            debug_lines.append("PDDL: modo CSV (dispatch+summary).")
+        else:
+            # Modo B: Excel (+ opcional TXT)
+            if not args.pddl_xlsx:
+                print("[ERROR] Debe proporcionar --pddl-dispatch y --pddl-summary, o bien --pddl-xlsx.", file=sys.stderr)
+                sys.exit(1)
+            xls = read_excel_safe(args.pddl_xlsx)
+            dispatch_df, used_excel_sheet = try_extract_pddl_dispatch_from_excel(xls)
+            if dispatch_df is None:
+                print("[ERROR] No se pudo encontrar una hoja con despacho horario en el Excel PDDL.", file=sys.stderr)
+                sys.exit(1)
+            pddl_metrics_dict, pddl_std = compute_dispatch_metrics(dispatch_df, "PDDL", tol=args.tol_cobertura_pddl)
+            pddl_summary = try_extract_pddl_summary_from_excel(xls)
+            if (pddl_summary.get("costo_total") is None or pddl_summary.get("runtime_s") is None) and args.pddl_report:
+                txt = read_text_safe(args.pddl_report)
+                rep_metrics = extract_summary_from_report_txt(txt)
+                for k in ["costo_total", "runtime_s"]:
+                    if pddl_summary.get(k) is None and rep_metrics.get(k) is not None:
+                        pddl_summary[k] = rep_metrics[k]
+            debug_lines.append(f"PDDL: modo Excel. Hoja despacho usada: '{used_excel_sheet}'. Resumen: {pddl_summary}")
+
+            # Intento enlazar PNGs del verificador
+            xlsx_dir = os.path.dirname(os.path.abspath(args.pddl_xlsx))
+            cand1 = None
+            cand2 = None
+            # buscar por patrones comunes
+            for fname in os.listdir(xlsx_dir):
+                fl = fname.lower()
+                if "grafica_despacho" in fl and fl.endswith(".png"):
+                    cand1 = os.path.join(xlsx_dir, fname)
+                if "grafica_costo" in fl and fl.endswith(".png"):
+                    cand2 = os.path.join(xlsx_dir, fname)
+            pddl_plot_despacho = copy_if_exists(cand1, args.outdir, "pddl_grafica_despacho_original.png") if cand1 else None
+            pddl_plot_costo = copy_if_exists(cand2, args.outdir, "pddl_grafica_costo_acumulado_original.png") if cand2 else None
 
     # --- Gap relativo de coste ---
     gap_cost = None
@@ -501,18 +531,20 @@ def main():
     out_png_milp = os.path.join(args.outdir, "gen_milp_24h.png")
     out_png_pddl = os.path.join(args.outdir, "gen_pddl_24h.png")
     out_png_dvg = os.path.join(args.outdir, "demanda_vs_generacion.png")
-    try:
-        plot_stack_technologies(milp_std, "Generación por tecnología (MILP)", out_png_milp)
-    except Exception as e:
-        print(f"[WARN] No se pudo generar gráfico MILP: {e}", file=sys.stderr)
-    try:
-        plot_stack_technologies(pddl_std, "Generación por tecnología (PDDL)", out_png_pddl)
-    except Exception as e:
-        print(f"[WARN] No se pudo generar gráfico PDDL: {e}", file=sys.stderr)
-    try:
-        plot_demand_vs_generation(milp_std, pddl_std, out_png_dvg)
-    except Exception as e:
-        print(f"[WARN] No se pudo generar gráfico Demanda vs Generación: {e}", file=sys.stderr)
+    with perfilado.etapa("graficos"):
+        if not args.no_plots:
+            try:
+                plot_stack_technologies(milp_std, "Generación por tecnología (MILP)", out_png_milp)
+            except Exception as e:
+                print(f"[WARN] No se pudo generar gráfico MILP: {e}", file=sys.stderr)
+            try:
+                plot_stack_technologies(pddl_std, "Generación por tecnología (PDDL)", out_png_pddl)
+            except Exception as e:
+                print(f"[WARN] No se pudo generar gráfico PDDL: {e}", file=sys.stderr)
+            try:
+                plot_demand_vs_generation(milp_std, pddl_std, out_png_dvg)
+            except Exception as e:
+                print(f"[WARN] No se pudo generar gráfico Demanda vs Generación: {e}", file=sys.stderr)
 
     # --- Markdown resumen ---
     out_md = os.path.join(args.outdir, "comparativa_fase5.md")
@@ -525,10 +557,11 @@ def main():
             f.write(f"**Gap relativo de coste (PDDL vs MILP)**: {gap_cost:.4%}\n\n")
         else:
             f.write("**Gap relativo de coste (PDDL vs MILP)**: N/D\n\n")
-        f.write("## Gráficas generadas por el comparador\n\n")
-        f.write(f"- MILP: `gen_milp_24h.png`\n")
-        f.write(f"- PDDL: `gen_pddl_24h.png`\n")
-        f.write(f"- Demanda vs Generación: `demanda_vs_generacion.png`\n\n")
+        if not args.no_plots:
+            f.write("## Gráficas generadas por el comparador\n\n")
+            f.write(f"- MILP: `gen_milp_24h.png`\n")
+            f.write(f"- PDDL: `gen_pddl_24h.png`\n")
+            f.write(f"- Demanda vs Generación: `demanda_vs_generacion.png`\n\n")
         # Si existen las PNG originales del verificador, referenciarlas
         if 'pddl_plot_despacho' in locals() and pddl_plot_despacho:
             f.write("## Gráficas originales del verificador (PDDL)\n\n")
@@ -542,11 +575,25 @@ def main():
     with open(debug_path, "w", encoding="utf-8") as f:
         f.write("\n".join(debug_lines))
 
+    # --- Registro de la ejecución (registro_ejecuciones.py) ---
+    import registro_ejecuciones as registro
+    inputs = [p for p in (args.milp_dispatch, args.milp_summary, args.pddl_dispatch, args.pddl_summary,
+                          args.pddl_xlsx, args.pddl_report) if p]
+    registro.record_run(
+        "comparar_resultados_fase5.py", "comparacion", escenario=registro.scenario_name(os.path.abspath(args.outdir)),
+        estado="ok", input_hash=registro.hash_files(*inputs),
+        opciones={"entradas": [os.path.basename(p) for p in inputs], "coste_milp": milp_summary["costo_total"],
+                  "gap_coste": gap_cost},
+        etapas={"pddl_reportado": pddl_summary["runtime_s"], "milp_reportado": milp_summary["runtime_s"]},
+        coste=pddl_summary["costo_total"], cobertura=pddl_metrics_dict["coverage_pct"] / 100.0,
+        t_total_s=time.perf_counter() - t_start)
+
     # --- Mensaje final ---
     print("[OK] Comparativa FASE 5 completada.")
     print(f" - Tabla CSV: {out_csv}")
     print(f" - Tabla MD : {out_md}")
-    print(f" - Gráficos : {out_png_milp}, {out_png_pddl}, {out_png_dvg}")
+    if not args.no_plots:
+        print(f" - Gráficos : {out_png_milp}, {out_png_pddl}, {out_png_dvg}")
     if gap_cost is not None:
         print(f" - Gap relativo de coste (PDDL vs MILP): {gap_cost:.4%}")
     else:
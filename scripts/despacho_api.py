@@ -0,0 +1,276 @@
+"""
+despacho_api.py
+
+API en memoria del pipeline MILP/PDDL: cada etapa devuelve objetos tipados y la siguiente
+los consume directamente, sin escribir ni releer CSV/XLSX. La exportación a disco es
+opcional y se hace al final (mismos nombres y columnas que los scripts de siempre).
+
+Uso como biblioteca (con scripts/ en sys.path):
+  from despacho_api import load_scenario, solve_milp, load_plan, load_problem, simulate, compare
+  sc = load_scenario("data_caso_base")
+  milp = solve_milp(sc, solver_name="appsi_highs")
+  rep = simulate(load_plan(plan_txt), load_problem(problem_txt))
+  cmp = compare(milp, rep)
+
+Uso CLI:
+  python scripts/despacho_api.py --data-dir data_caso_base \\
+      --problem models/pddl_caso_base/problem_priorizado2.pddl \\
+      --plan results_caso_base/plan_enhsp_sat_hadd_priorizado2.txt \\
+      [--solver appsi_highs] [--outdir results_caso_base]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import milp_model
+import parse_priorizado_plan_sim as sim
+from escenarios import ScenarioData, load_scenario_dir
+
+DISPATCH_COLUMNS = ["hour", "PV_gen_MW", "Hydro_gen_MW", "Thermal_gen_MW", "Demand_MW"]
+
+
+# =========================
+# Objetos del pipeline
+# =========================
+
+@dataclass
+class DispatchTable:
+    """Despacho horario por tecnología (MW; con pasos de 1 h, también MWh)."""
+    source: str
+    hours: List[int]
+    pv: List[float]
+    hydro: List[float]
+    thermal: List[float]
+    demand: List[float]
+
+    def rows(self) -> List[dict]:
+        return [dict(zip(DISPATCH_COLUMNS, vals))
+                for vals in zip(self.hours, self.pv, self.hydro, self.thermal, self.demand)]
+
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame(self.rows(), columns=DISPATCH_COLUMNS)
+
+    def to_csv(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=DISPATCH_COLUMNS, lineterminator="\n")
+            w.writeheader()
+            w.writerows(self.rows())
+
+
+@dataclass
+class MilpSolution:
+    dispatch: DispatchTable
+    total_cost_usd: float
+    solver_status: str
+    termination_condition: str
+
+    def summary(self) -> dict:
+        """Misma fila que milp_summary.csv."""
+        return {
+            "solver_status": self.solver_status,
+            "termination_condition": self.termination_condition,
+            "total_cost_usd": self.total_cost_usd,
+        }
+
+
+@dataclass
+class PddlProblem:
+    """Bloque :init de un problem.pddl (ver parse_priorizado_plan_sim.parse_problem)."""
+    hours: List[int]
+    scalars: Dict[str, float]
+    per_hour: Dict[str, Dict[int, float]]
+
+
+@dataclass
+class Plan:
+    """Acciones (acción, hora, hora_siguiente) de un plan ENHSP y su métrica reportada."""
+    actions: List[Tuple[str, int, Optional[int]]]
+    metric: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+
+@dataclass
+class SimulationReport:
+    """Resultado de simular un plan con la semántica de clamp de parse_priorizado_plan_sim."""
+    problem: PddlProblem
+    raw: dict
+
+    @property
+    def total_cost(self) -> float:
+        return self.raw["total_cost_recalc"]
+
+    @property
+    def remaining_demand(self) -> float:
+        return self.raw["demand"]["remaining"]
+
+    @property
+    def warnings(self) -> Dict[str, int]:
+        return self.raw["warnings"]
+
+    def dispatch(self) -> DispatchTable:
+        hours = self.problem.hours
+        per_hour = self.raw["per_hour"]
+        demanda = self.problem.per_hour.get("demanda", {})
+        return DispatchTable(
+            source="PDDL",
+            hours=list(hours),
+            pv=[per_hour["pv"].get(h, 0.0) for h in hours],
+            hydro=[per_hour["hidro"].get(h, 0.0) for h in hours],
+            thermal=[per_hour["termica"].get(h, 0.0) for h in hours],
+            demand=[demanda.get(h, 0.0) for h in hours],
+        )
+
+
+@dataclass
+class ComparisonMetrics:
+    """Métricas de comparativa_fase5.csv para ambos enfoques y el gap relativo de coste."""
+    rows: List[dict] = field(default_factory=list)
+    gap_cost: Optional[float] = None
+
+    def by_approach(self, enfoque: str) -> dict:
+        return next(r for r in self.rows if r["enfoque"] == enfoque)
+
+
+# =========================
+# Etapas
+# =========================
+
+def load_scenario(data_dir) -> ScenarioData:
+    """Perfiles como arrays NumPy indexados por hora (ver escenarios.ScenarioData)."""
+    return load_scenario_dir(Path(data_dir))
+
+
+def solve_milp(scenario: ScenarioData, solver=None, solver_name: str = "glpk",
+               glpk_executable: str | None = None) -> MilpSolution:
+    model = milp_model.build_model(*scenario.model_inputs())
+    summary = milp_model.solve_model(model, solver=solver, solver_name=solver_name, glpk_executable=glpk_executable)
+    rows = milp_model.extract_dispatch(model)
+    table = DispatchTable(
+        source="MILP",
+        hours=[r["hour"] for r in rows],
+        pv=[r["PV_gen_MW"] for r in rows],
+        hydro=[r["Hydro_gen_MW"] for r in rows],
+        thermal=[r["Thermal_gen_MW"] for r in rows],
+        demand=[r["Demand_MW"] for r in rows],
+    )
+    return MilpSolution(table, summary["total_cost_usd"], summary["solver_status"], summary["termination_condition"])
+
+
+def load_problem(text: str) -> PddlProblem:
+    hours, scalars, per_h = sim.parse_problem_text(text, verbose=False)
+    return PddlProblem(hours, scalars, per_h)
+
+
+def load_plan(text: str) -> Plan:
+    actions, metric = sim.parse_plan_text(text, verbose=False)
+    return Plan(actions, metric)
+
+
+def simulate(plan: Plan, problem: PddlProblem) -> SimulationReport:
+    return SimulationReport(problem, sim.simulate(plan.actions, problem.hours, problem.scalars, problem.per_hour))
+
+
+def compare(milp: MilpSolution, pddl: SimulationReport) -> ComparisonMetrics:
+    """Mismas métricas que comparar_resultados_fase5.py (reutiliza compute_dispatch_metrics)."""
+    from comparar_resultados_fase5 import compute_dispatch_metrics
+
+    milp_metrics, _ = compute_dispatch_metrics(milp.dispatch.to_frame(), "MILP")
+    pddl_metrics, _ = compute_dispatch_metrics(pddl.dispatch().to_frame(), "PDDL")
+
+    gap = None
+    if milp.total_cost_usd:
+        gap = (pddl.total_cost - milp.total_cost_usd) / abs(milp.total_cost_usd)
+
+    rows = []
+    for enfoque, cost, metrics in (("MILP", milp.total_cost_usd, milp_metrics), ("PDDL", pddl.total_cost, pddl_metrics)):
+        rows.append({
+            "enfoque": enfoque,
+            "costo_total": cost,
+            "tiempo_s": None,
+            "demanda_cubierta_pct": metrics["coverage_pct"],
+            "porcentaje_renovables_pct": metrics["pct_renovables"],
+            "pv_no_utilizada_mwh": metrics["pv_curtailment_mwh"],
+        })
+    return ComparisonMetrics(rows, gap)
+
+
+# =========================
+# Exportación (opcional, al final)
+# =========================
+
+def export_milp(solution: MilpSolution, results_dir: Path) -> None:
+    solution.dispatch.to_csv(results_dir / "milp_dispatch.csv")
+    with (results_dir / "milp_summary.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(solution.summary()), lineterminator="\n")
+        w.writeheader()
+        w.writerow(solution.summary())
+
+
+def export_simulation(report: SimulationReport, results_dir: Path) -> None:
+    sim.save_csv(report.raw, results_dir / "pddl_dispatch_priorizado_sim.csv", report.problem.hours)
+
+
+def export_comparison(metrics: ComparisonMetrics, results_dir: Path) -> None:
+    results_dir.mkdir(parents=True, exist_ok=True)
+    with (results_dir / "comparativa_fase5.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(metrics.rows[0]), lineterminator="\n")
+        w.writeheader()
+        w.writerows(metrics.rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline MILP + simulación PDDL + comparativa en un solo proceso")
+    parser.add_argument("--data-dir", required=True, help="Carpeta data_* del escenario")
+    parser.add_argument("--problem", required=True, help="problem.pddl del escenario")
+    parser.add_argument("--plan", required=True, help="Plan ENHSP (.txt)")
+    parser.add_argument("--solver", type=str, default="glpk", help="Nombre de solver Pyomo (glpk, cbc, appsi_highs, etc.)")
+    parser.add_argument("--glpk-exe", type=str, default=None, help="Ruta a glpsol (por defecto, el del PATH)")
+    parser.add_argument("--outdir", type=str, default=None, help="Si se indica, exporta CSV finales aquí")
+    args = parser.parse_args()
+
+    import registro_ejecuciones as registro
+
+    etapas = registro.Etapas()
+    with etapas.medir("lectura"):
+        scenario = load_scenario(args.data_dir)
+    with etapas.medir("milp"):
+        milp = solve_milp(scenario, solver_name=args.solver, glpk_executable=args.glpk_exe)
+    with etapas.medir("simulacion"):
+        problem = load_problem(Path(args.problem).read_text(encoding="utf-8", errors="ignore"))
+        plan = load_plan(Path(args.plan).read_text(encoding="utf-8", errors="ignore"))
+        report = simulate(plan, problem)
+    with etapas.medir("comparacion"):
+        metrics = compare(milp, report)
+
+    print(f"=== Pipeline {scenario.name} ===")
+    print(f"MILP: {milp.total_cost_usd:,.2f} USD ({milp.termination_condition})")
+    print(f"PDDL: {report.total_cost:,.2f} USD  | acciones={len(plan)}  | demanda restante={report.remaining_demand:,.0f} MWh")
+    print(f"Gap relativo de coste (PDDL vs MILP): {metrics.gap_cost:.4%}" if metrics.gap_cost is not None else "Gap: N/D")
+
+    if args.outdir:
+        outdir = Path(args.outdir)
+        export_milp(milp, outdir)
+        export_simulation(report, outdir)
+        export_comparison(metrics, outdir)
+        print(f"CSV exportados en: {outdir}")
+
+    pddl_row = metrics.by_approach("PDDL")
+    registro.record_run(
+        "despacho_api.py", "comparacion", escenario=registro.scenario_name(args.data_dir), estado=milp.termination_condition,
+        input_hash=registro.hash_inputs(scenario.model_inputs()),
+        opciones={"solver": args.solver, "plan": Path(args.plan).name, "problem": Path(args.problem).name,
+                  "coste_milp": milp.total_cost_usd, "gap_coste": metrics.gap_cost},
+        etapas=etapas, coste=report.total_cost, plan_len=len(plan),
+        cobertura=pddl_row["demanda_cubierta_pct"] / 100.0 if pddl_row["demanda_cubierta_pct"] is not None else None)
+
+
+if __name__ == "__main__":
+    main()
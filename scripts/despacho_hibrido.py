@@ -0,0 +1,297 @@
+"""
+despacho_hibrido.py
+
+Despacho con plazo: lanza ENHSP con un presupuesto de tiempo de reloj y, en paralelo, el LP de
+milp_model (en un proceso aparte, para poder abandonarlo) y un despacho voraz por orden de mérito
+(PV → hidro → térmica, con el presupuesto hídrico en orden cronológico, instantáneo). Al vencer el
+plazo, o antes si ya terminaron todos los caminos o el LP devolvió el óptimo, se queda con el
+resultado válido de menor coste.
+
+Todos los candidatos se validan y se costean igual, con los datos del escenario (capacidades,
+balance, presupuesto hídrico y rampas) y los costes de costs.csv. Se escribe:
+  - hibrido_dispatch.csv: despacho ganador (mismas columnas que milp_dispatch.csv)
+  - hibrido_resumen.csv: una fila por camino (estado, latencia, coste, validez, ganador)
+
+Uso:
+  python scripts/despacho_hibrido.py --data-dir data_escenario3 \\
+      --domain models/pddl_escenario3/domain_escenario3.pddl \\
+      --problem models/pddl_escenario3/problem_escenario3.pddl \\
+      --enhsp enhsp.jar --deadline 5 --solver appsi_highs --results-dir results_escenario3
+  (Opcional) --planner-cmd "java -Xmx2g -jar {enhsp} -o {domain} -f {problem} -planner sat-hadd"
+             --sin-planificador  -> solo LP y voraz
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import multiprocessing as mp
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import despacho_api as api
+from planificar_por_horas import DEFAULT_PLANNER_CMD
+
+SUMMARY_COLUMNS = ["camino", "estado", "latencia_s", "total_cost_usd", "valido", "violaciones", "ganador"]
+TOL = 1e-6
+
+
+# =========================
+# Validación y coste comunes
+# =========================
+
+def dispatch_cost(table: api.DispatchTable, scenario: api.ScenarioData) -> float:
+    c_pv, c_hy, c_th = scenario.costs
+    return sum(c_pv * p + c_hy * hy + c_th * th for p, hy, th in zip(table.pv, table.hydro, table.thermal))
+
+
+def check_dispatch(table: api.DispatchTable, scenario: api.ScenarioData, tol: float = TOL) -> list:
+    """Violaciones del despacho frente a las restricciones del MILP (lista vacía = válido)."""
+    issues = []
+    by_hour = {h: (p, hy, th) for h, p, hy, th in zip(table.hours, table.pv, table.hydro, table.thermal)}
+    for h in scenario.hours:
+        p, hy, th = by_hour.get(h, (0.0, 0.0, 0.0))
+        if abs(p + hy + th - scenario.demand[h]) > tol:
+            issues.append(f"[h{h}] balance: {p + hy + th:g} != demanda {scenario.demand[h]:g}")
+        for name, val, cap in (("PV", p, scenario.pv_avail[h]), ("Hidro", hy, scenario.hydro_max[h]),
+                               ("Térmica", th, scenario.thermal_max[h])):
+            if val < -tol or val > cap + tol:
+                issues.append(f"[h{h}] {name} fuera de [0, {cap:g}]: {val:g}")
+    if scenario.hydro_budget is not None and sum(table.hydro) > scenario.hydro_budget + tol:
+        issues.append(f"presupuesto hidro: {sum(table.hydro):g} > {scenario.hydro_budget:g}")
+    for name, series, ramp in (("térmica", table.thermal, scenario.ramp_thermal),
+                               ("hidro", table.hydro, scenario.ramp_hydro)):
+        if ramp is None:
+            continue
+        for i in range(1, len(series)):
+            if abs(series[i] - series[i - 1]) > ramp + tol:
+                issues.append(f"[h{table.hours[i]}] rampa {name}: |{series[i]:g} - {series[i - 1]:g}| > {ramp:g}")
+    return issues
+
+
+# =========================
+# Caminos
+# =========================
+
+def greedy_dispatch(scenario: api.ScenarioData) -> api.DispatchTable:
+    """Orden de mérito por hora (la misma prioridad que el dominio PDDL); no mira las rampas."""
+    budget = scenario.hydro_budget if scenario.hydro_budget is not None else float("inf")
+    pv, hydro, thermal = [], [], []
+    for h in scenario.hours:
+        rest = scenario.demand[h]
+        p = min(rest, scenario.pv_avail[h])
+        rest -= p
+        hy = min(rest, scenario.hydro_max[h], budget)
+        rest -= hy
+        budget -= hy
+        th = min(rest, scenario.thermal_max[h])
+        pv.append(p)
+        hydro.append(hy)
+        thermal.append(th)
+    return api.DispatchTable("voraz", list(scenario.hours), pv, hydro, thermal,
+                             [scenario.demand[h] for h in scenario.hours])
+
+
+def _milp_worker(data_dir: str, solver_name: str, glpk_executable: str | None, queue) -> None:
+    try:
+        sol = api.solve_milp(api.load_scenario(data_dir), solver_name=solver_name, glpk_executable=glpk_executable)
+        queue.put(("ok", sol))
+    except Exception as ex:
+        queue.put(("error", repr(ex)))
+
+
+def start_planner(cmd_template: str, enhsp: str, domain: Path, problem: Path, log_path: Path):
+    cmd = cmd_template.format(enhsp=enhsp, domain=str(domain), problem=str(problem))
+    log = log_path.open("w", encoding="utf-8")
+    try:
+        return subprocess.Popen(shlex.split(cmd, posix=(sys.platform != "win32")),
+                                stdout=log, stderr=subprocess.STDOUT, text=True), log
+    except OSError:
+        log.close()
+        raise
+
+
+def planner_dispatch(log_text: str, problem_path: Path) -> api.DispatchTable:
+    if "Found Plan" not in log_text:
+        tail = log_text.strip().splitlines()[-3:]
+        raise RuntimeError("El planificador no devolvió plan: " + " | ".join(tail))
+    problem = api.load_problem(problem_path.read_text(encoding="utf-8", errors="ignore"))
+    report = api.simulate(api.load_plan(log_text), problem)
+    table = report.dispatch()
+    table.source = "planificador"
+    return table
+
+
+# =========================
+# Carrera con plazo
+# =========================
+
+def solve_with_deadline(data_dir: Path, deadline_s: float, solver_name: str = "glpk", glpk_executable: str | None = None,
+                        domain: Path | None = None, problem: Path | None = None, enhsp: str = "enhsp.jar",
+                        planner_cmd: str = DEFAULT_PLANNER_CMD, poll_s: float = 0.02) -> tuple:
+    """
+    Devuelve (ganador, filas): ganador es el DispatchTable válido de menor coste (o None) y filas
+    el resumen por camino. El LP óptimo acota por debajo a cualquier despacho válido, así que en
+    cuanto llega se cancela lo que siga en marcha.
+    """
+    t0 = time.perf_counter()
+    started = {}
+    results = {}
+
+    def record(path: str, estado: str, table: api.DispatchTable | None = None, extra: dict | None = None):
+        row = {"camino": path, "estado": estado, "latencia_s": time.perf_counter() - started.get(path, t0),
+               "total_cost_usd": None, "valido": False, "violaciones": "", "ganador": False}
+        if table is not None:
+            issues = check_dispatch(table, scenario)
+            row.update(total_cost_usd=dispatch_cost(table, scenario), valido=not issues,
+                       violaciones="; ".join(issues[:3]) + (f" (+{len(issues) - 3})" if len(issues) > 3 else ""))
+        row.update(extra or {})
+        results[path] = (row, table)
+
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    milp_proc = ctx.Process(target=_milp_worker, args=(str(data_dir), solver_name, glpk_executable, queue), daemon=True)
+    started["milp_lp"] = time.perf_counter()
+    milp_proc.start()
+
+    tmp = tempfile.TemporaryDirectory(prefix="tfm_hibrido_")
+    planner = planner_log = None
+    log_path = Path(tmp.name) / "enhsp.log"
+    if domain is not None and problem is not None:
+        started["planificador"] = time.perf_counter()
+        try:
+            planner, planner_log = start_planner(planner_cmd, enhsp, domain, problem, log_path)
+        except OSError as ex:
+            record("planificador", "error", extra={"violaciones": repr(ex)})
+
+    # Los datos se cargan mientras el LP y el planificador ya están en marcha
+    scenario = api.load_scenario(data_dir)
+    started["voraz"] = time.perf_counter()
+    record("voraz", "ok", greedy_dispatch(scenario))
+
+    try:
+        while time.perf_counter() - t0 < deadline_s:
+            if "milp_lp" not in results and not queue.empty():
+                status, payload = queue.get()
+                if status == "ok":
+                    record("milp_lp", payload.termination_condition, payload.dispatch)
+                else:
+                    record("milp_lp", "error", extra={"violaciones": payload})
+            if "milp_lp" not in results and not milp_proc.is_alive() and queue.empty():
+                record("milp_lp", "error", extra={"violaciones": f"proceso terminado ({milp_proc.exitcode})"})
+            if planner is not None and "planificador" not in results and planner.poll() is not None:
+                planner_log.close()
+                try:
+                    table = planner_dispatch(log_path.read_text(encoding="utf-8", errors="ignore"), problem)
+                    record("planificador", "ok", table)
+                except Exception as ex:
+                    record("planificador", "error", extra={"violaciones": str(ex)})
+
+            lp = results.get("milp_lp")
+            lp_optimal = lp is not None and lp[0]["valido"] and lp[0]["estado"] == "optimal"
+            pending = ("milp_lp" not in results) or (planner is not None and "planificador" not in results)
+            if lp_optimal or not pending:
+                break
+            time.sleep(poll_s)
+    finally:
+        lp = results.get("milp_lp")
+        cancel = "cancelado" if (lp is not None and lp[0]["estado"] == "optimal") else "plazo"
+        if planner is not None and planner.poll() is None:
+            planner.kill()
+            planner.wait()
+        if planner_log is not None and not planner_log.closed:
+            planner_log.close()
+        if planner is not None and "planificador" not in results:
+            record("planificador", cancel)
+        if milp_proc.is_alive():
+            milp_proc.terminate()
+            milp_proc.join()
+        if "milp_lp" not in results:
+            record("milp_lp", cancel)
+        tmp.cleanup()
+
+    # A igualdad de coste se prefiere el LP (certifica el óptimo), luego el plan y por último el voraz
+    order = ("milp_lp", "planificador", "voraz")
+    valid = [results[k] for k in order if k in results and results[k][0]["valido"]]
+    winner = min(valid, key=lambda rt: round(rt[0]["total_cost_usd"], 6)) if valid else None
+    if winner is not None:
+        winner[0]["ganador"] = True
+    rows = [results[k][0] for k in order if k in results]
+    return (winner[1] if winner else None), rows
+
+
+def write_summary(rows: list, out_csv: Path) -> None:
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    with out_csv.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, lineterminator="\n")
+        w.writeheader()
+        w.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Despacho con plazo: ENHSP con presupuesto de tiempo + LP + voraz")
+    parser.add_argument("--data-dir", required=True, help="Carpeta data_* del escenario")
+    parser.add_argument("--domain", type=str, default=None, help="domain.pddl para ENHSP")
+    parser.add_argument("--problem", type=str, default=None, help="problem.pddl para ENHSP")
+    parser.add_argument("--enhsp", type=str, default="enhsp.jar", help="Ruta a enhsp.jar")
+    parser.add_argument("--planner-cmd", type=str, default=DEFAULT_PLANNER_CMD,
+                        help="Plantilla del comando del planificador ({enhsp}, {domain}, {problem})")
+    parser.add_argument("--sin-planificador", action="store_true", help="No lanzar ENHSP (solo LP y voraz)")
+    parser.add_argument("--deadline", type=float, default=10.0, help="Plazo de reloj en segundos")
+    parser.add_argument("--solver", type=str, default="glpk", help="Nombre de solver Pyomo (glpk, cbc, appsi_highs, etc.)")
+    parser.add_argument("--glpk-exe", type=str, default=None, help="Ruta a glpsol (por defecto, el del PATH)")
+    parser.add_argument("--results-dir", type=str, default=None, help="Carpeta de salida (por defecto, results_<escenario>)")
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    use_planner = not args.sin_planificador and args.domain and args.problem
+    if not args.sin_planificador and not use_planner:
+        print("[AVISO] Sin --domain/--problem: solo se ejecutan el LP y el despacho voraz")
+
+    t0 = time.perf_counter()
+    winner, rows = solve_with_deadline(
+        data_dir, args.deadline, solver_name=args.solver, glpk_executable=args.glpk_exe,
+        domain=Path(args.domain) if use_planner else None, problem=Path(args.problem) if use_planner else None,
+        enhsp=args.enhsp, planner_cmd=args.planner_cmd)
+    wall_s = time.perf_counter() - t0
+
+    results_dir = Path(args.results_dir) if args.results_dir else \
+        data_dir.resolve().parent / data_dir.name.replace("data_", "results_", 1)
+    print(f"=== Despacho con plazo {args.deadline:g} s — {data_dir.name} ===")
+    for r in rows:
+        cost = f"{r['total_cost_usd']:,.2f}" if r["total_cost_usd"] is not None else "-"
+        mark = " <- ganador" if r["ganador"] else ""
+        print(f"{r['camino']:<13} {r['estado']:<10} {r['latencia_s']:7.3f} s  coste={cost:>14}  "
+              f"válido={'sí' if r['valido'] else 'no'}{mark}")
+        if r["violaciones"] and not r["valido"]:
+            print(f"    {r['violaciones']}")
+
+    write_summary(rows, results_dir / "hibrido_resumen.csv")
+    _register_run(args, data_dir, rows, wall_s)
+    if winner is None:
+        print("[AVISO] Ningún camino devolvió un despacho válido antes del plazo")
+        sys.exit(1)
+    winner.to_csv(results_dir / "hibrido_dispatch.csv")
+    print(f"Resultados: {results_dir / 'hibrido_dispatch.csv'}")
+
+
+def _register_run(args, data_dir: Path, rows: list, wall_s: float) -> None:
+    """Una fila en el registro de ejecuciones: el camino ganador es el estado; las latencias, las etapas."""
+    import registro_ejecuciones as registro
+
+    best = next((r for r in rows if r["ganador"]), None)
+    registro.record_run(
+        "despacho_hibrido.py", "hibrido", escenario=registro.scenario_name(data_dir),
+        estado=best["camino"] if best else "sin_solucion",
+        input_hash=registro.hash_inputs(api.load_scenario(data_dir).model_inputs()),
+        opciones={"deadline": args.deadline, "solver": args.solver, "planificador": bool(args.domain and args.problem)
+                  and not args.sin_planificador, "estados": {r["camino"]: r["estado"] for r in rows}},
+        etapas={r["camino"]: r["latencia_s"] for r in rows},
+        coste=best["total_cost_usd"] if best else None, cobertura=1.0 if best else None, t_total_s=wall_s)
+
+
+if __name__ == "__main__":
+    main()
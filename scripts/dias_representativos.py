@@ -0,0 +1,377 @@
+"""
+dias_representativos.py
+
+Agregación temporal para estudios de un año: en lugar de resolver los D días del horizonte, se
+resuelven k días representativos ponderados y el resultado se lleva de vuelta al calendario.
+
+  1. Días idénticos: los días con los mismos perfiles (demanda, PV, hidro y térmica, con
+     tolerancia --tol) se funden en uno con peso = número de días. Como los días solo se acoplan
+     por el presupuesto hídrico total, el orden no importa y la fusión es exacta (el LP es convexo
+     y días iguales admiten el mismo despacho óptimo).
+  2. Clustering (--k > 0): los días distintos se agrupan con k-means ponderado sobre los perfiles
+     normalizados (cada serie por su máximo; las series constantes, como hidro y térmica en los
+     datos de ejemplo, no pesan) y cada grupo se representa por su medoide, un día real.
+  3. Modelo agregado: un bloque de milp_model.build_model por representante, objetivo
+     Σ_r w_r·coste_r y presupuesto hídrico Σ_r w_r·Σ_t hidro_r,t ≤ B (el acoplamiento se conserva).
+  4. Vuelta al calendario: cada día toma el programa hidro horario de su representante (recortado
+     a su capacidad y a su demanda neta de PV), la térmica cubre el resto hasta su capacidad y lo
+     que falta se cubre con el agua que haya sobrado del presupuesto; el resto es ENS. Se hace en
+     NumPy para los D días a la vez y el presupuesto se cumple. Las rampas no se re-optimizan: se
+     cuentan las horas que las violan.
+
+Salvo --sin-referencia se resuelve también el modelo completo (un bloque por día, como
+lagrange_hidro.solve_reference) y se reporta el error del coste agregado y del coste en el
+calendario, el error diario y el speedup.
+
+El horizonte se carga como en lagrange_hidro.py: --profiles (day,hour,...) o el día de --data-dir
+repetido --days veces con ruido diario --perturb.
+
+Salidas en --results-dir: dias_representativos.csv (representante, peso, días), dias_mapeo.csv (día ->
+representante), dias_dispatch.csv (despacho horario del calendario) y dias_resumen.csv.
+
+Uso:
+  python scripts/dias_representativos.py --data-dir data_caso_base --days 365 --k 12 \\
+      --solver appsi_highs --results-dir results_caso_base
+  (Opcional) --profiles horizonte.csv --budget-factor 0.8 --tol 1e-6 --sin-referencia
+             --exportar dias_rep.csv   (representantes en formato largo de escenarios.py)
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import time
+from pathlib import Path
+
+import numpy as np
+
+import milp_model
+from lagrange_hidro import _day_inputs, load_horizon
+
+SERIES = ("demand", "pv", "hydro", "thermal")
+DISPATCH_COLUMNS = ["day", "hour", "representante", "PV_gen_MW", "Hydro_gen_MW", "Thermal_gen_MW", "ENS_MW", "Demand_MW"]
+TOL_RAMPA = 1e-6
+
+
+# =========================
+# Agregación
+# =========================
+
+def day_features(hz: dict) -> np.ndarray:
+    """Perfiles del día concatenados (D × 4·24), cada serie dividida por su máximo del horizonte."""
+    cols = []
+    for k in SERIES:
+        a = np.asarray(hz[k], dtype=float)
+        scale = np.abs(a).max()
+        cols.append(a / scale if scale > 0 else a)
+    return np.hstack(cols)
+
+
+def merge_identical(hz: dict, tol: float = 0.0) -> tuple:
+    """(representantes, inverso, pesos): un día por perfil distinto (redondeado a tol)."""
+    raw = np.hstack([np.asarray(hz[k], dtype=float) for k in SERIES])
+    key = np.round(raw / tol) if tol > 0 else raw
+    _, first, inverse, counts = np.unique(key, axis=0, return_index=True, return_inverse=True, return_counts=True)
+    order = np.argsort(first)                    # representantes en orden de calendario
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return first[order], rank[inverse.ravel()], counts[order]
+
+
+def _kmeans_pp(X: np.ndarray, w: np.ndarray, k: int, rng) -> np.ndarray:
+    centers = [X[rng.choice(len(X), p=w / w.sum())]]
+    d2 = ((X - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        p = w * d2
+        if p.sum() <= 0:
+            break
+        centers.append(X[rng.choice(len(X), p=p / p.sum())])
+        d2 = np.minimum(d2, ((X - centers[-1]) ** 2).sum(axis=1))
+    return np.array(centers)
+
+
+def weighted_kmedoids(X: np.ndarray, w: np.ndarray, k: int, seed: int = 0, max_iter: int = 100) -> tuple:
+    """
+    k-means ponderado (k-means++ y Lloyd) y medoide de cada grupo. Devuelve (medoides, etiqueta por fila);
+    los medoides son índices de fila de X.
+    """
+    rng = np.random.default_rng(seed)
+    centers = _kmeans_pp(X, w, min(k, len(X)), rng)
+    labels = np.zeros(len(X), dtype=int)
+    for it in range(max_iter):
+        d2 = ((X[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        new = d2.argmin(axis=1)
+        if it and np.array_equal(new, labels):
+            break
+        labels = new
+        for c in range(len(centers)):
+            m = labels == c
+            if m.any():
+                centers[c] = np.average(X[m], axis=0, weights=w[m])
+    medoids, final = [], np.empty(len(X), dtype=int)
+    for c in range(len(centers)):
+        idx = np.flatnonzero(labels == c)
+        if idx.size == 0:
+            continue
+        best = idx[((X[idx] - centers[c]) ** 2).sum(axis=1).argmin()]
+        final[idx] = len(medoids)
+        medoids.append(best)
+    return np.array(medoids), final
+
+
+def aggregate(hz: dict, k: int = 0, tol: float = 0.0, seed: int = 0) -> dict:
+    """
+    Días representativos del horizonte. Devuelve representantes (índice de día), pesos y, para cada
+    día, el representante asignado y su distancia (perfiles normalizados) al representante.
+    """
+    first, inverse, counts = merge_identical(hz, tol)
+    X = day_features(hz)
+    if k and k < len(first):
+        medoids, labels = weighted_kmedoids(X[first], counts.astype(float), k, seed)
+        reps = first[medoids]
+        assign = labels[inverse]
+    else:
+        reps, assign = first, inverse
+    weights = np.bincount(assign, minlength=len(reps))
+    dist = np.sqrt(((X - X[reps][assign]) ** 2).sum(axis=1))
+    return {"reps": reps, "weights": weights, "assign": assign, "dist": dist, "unique_days": len(first)}
+
+
+# =========================
+# Modelos
+# =========================
+
+def build_weighted(hz: dict, days, weights, budget: float, voll: float):
+    """Un bloque por día con su peso en el objetivo y en el presupuesto hídrico total."""
+    import pyomo.environ as pyo
+
+    m = pyo.ConcreteModel(name="DespachoPonderado")
+    objs, hydro = [], []
+    for i, (d, w) in enumerate(zip(days, weights)):
+        blk = milp_model.build_model(*_day_inputs(hz, int(d)), voll=voll)
+        blk.total_cost.deactivate()
+        m.add_component(f"dia{i}", blk)
+        objs.append(float(w) * blk.total_cost.expr)
+        hydro.append(float(w) * sum(blk.P_hydro[t] for t in blk.T))
+    m.budget = pyo.Constraint(expr=sum(hydro) <= budget)
+    m.total_cost = pyo.Objective(expr=sum(objs), sense=pyo.minimize)
+    m.n_blocks = len(objs)
+    return m
+
+
+def block_dispatch(m) -> np.ndarray:
+    """Despacho de cada bloque como array (bloques × 4 × horas): PV, hidro, térmica, ENS."""
+    import pyomo.environ as pyo
+
+    out = []
+    for i in range(m.n_blocks):
+        blk = m.component(f"dia{i}")
+        T = list(blk.T)
+        out.append([[pyo.value(v[t]) for t in T] for v in (blk.P_pv, blk.P_hydro, blk.P_thermal, blk.ENS)])
+    return np.array(out, dtype=float)
+
+
+def solve_weighted(hz: dict, days, weights, budget: float, solver_name: str, glpk_executable, voll: float) -> dict:
+    t0 = time.perf_counter()
+    m = build_weighted(hz, days, weights, budget, voll)
+    build_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    summary = milp_model.solve_model(m, solver_name=solver_name, glpk_executable=glpk_executable)
+    solve_s = time.perf_counter() - t0
+    return {"total_cost_usd": summary["total_cost_usd"], "termination": summary["termination_condition"],
+            "dispatch": block_dispatch(m), "build_s": build_s, "solve_s": solve_s}
+
+
+# =========================
+# Vuelta al calendario
+# =========================
+
+def map_to_calendar(hz: dict, assign: np.ndarray, rep_dispatch: np.ndarray, budget: float | None = None) -> dict:
+    """
+    Despacho (D × 24) de cada serie a partir del programa hidro de su representante. Si queda ENS y
+    sobra presupuesto (el recorte deja agua sin usar), se cubre con hidro hasta su capacidad,
+    repartiendo el sobrante en proporción si no alcanza.
+    """
+    dem, pv, hy_cap, th_cap = (np.asarray(hz[k], dtype=float) for k in SERIES)
+    pv_g = np.minimum(pv, dem)
+    resid = dem - pv_g
+    hy_g = np.clip(rep_dispatch[assign, 1, :], 0.0, None)
+    hy_g = np.minimum(np.minimum(hy_g, hy_cap), resid)
+    resid = resid - hy_g
+    th_g = np.minimum(th_cap, resid)
+    ens = resid - th_g
+    if budget is not None and ens.any():
+        extra = np.minimum(ens, hy_cap - hy_g)
+        left = budget - hy_g.sum()
+        if extra.sum() > left:
+            extra *= max(left, 0.0) / extra.sum()
+        hy_g = hy_g + extra
+        ens = ens - extra
+    return {"pv": pv_g, "hydro": hy_g, "thermal": th_g, "ens": ens}
+
+
+def daily_cost(hz: dict, disp: dict, voll: float) -> np.ndarray:
+    c_pv, c_hy, c_th = hz["costs"]
+    return (c_pv * disp["pv"] + c_hy * disp["hydro"] + c_th * disp["thermal"] + voll * disp["ens"]).sum(axis=1)
+
+
+def ramp_violations(hz: dict, disp: dict) -> int:
+    n = 0
+    for key, ramp in (("thermal", hz["ramp_th"]), ("hydro", hz["ramp_hy"])):
+        if ramp is not None and ramp >= 0:
+            n += int((np.abs(np.diff(disp[key], axis=1)) > ramp + TOL_RAMPA).sum())
+    return n
+
+
+def _as_series(arr: np.ndarray) -> dict:
+    return {"pv": arr[:, 0, :], "hydro": arr[:, 1, :], "thermal": arr[:, 2, :], "ens": arr[:, 3, :]}
+
+
+# =========================
+# Salidas
+# =========================
+
+def write_outputs(results_dir: Path, hz: dict, agg: dict, cal: dict, summary: dict) -> None:
+    results_dir.mkdir(parents=True, exist_ok=True)
+    with (results_dir / "dias_representativos.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(["representante", "dia", "peso", "dias"])
+        for r, (d, wt) in enumerate(zip(agg["reps"], agg["weights"])):
+            dias = np.flatnonzero(agg["assign"] == r)
+            w.writerow([r, int(d), int(wt), " ".join(str(x) for x in dias)])
+    with (results_dir / "dias_mapeo.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(["day", "representante", "dia_representante", "distancia"])
+        for d, r in enumerate(agg["assign"]):
+            w.writerow([d, int(r), int(agg["reps"][r]), f"{agg['dist'][d]:.6g}"])
+    with (results_dir / "dias_dispatch.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(DISPATCH_COLUMNS)
+        dem = np.asarray(hz["demand"], dtype=float)
+        for d in range(hz["days"]):
+            r = int(agg["assign"][d])
+            for i, h in enumerate(hz["hours"]):
+                w.writerow([d, h, r, cal["pv"][d, i], cal["hydro"][d, i], cal["thermal"][d, i], cal["ens"][d, i],
+                            dem[d, i]])
+    with (results_dir / "dias_resumen.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(summary), lineterminator="\n")
+        w.writeheader()
+        w.writerow(summary)
+
+
+def export_long(path: Path, hz: dict, agg: dict) -> None:
+    """Representantes como escenarios del formato largo (escenarios.write_long), uno por día."""
+    from escenarios import ScenarioBatch, write_long
+
+    reps = agg["reps"]
+    n = len(reps)
+    batch = ScenarioBatch(
+        names=np.array([f"dia_{int(d)}_peso_{int(w)}" for d, w in zip(reps, agg["weights"])]),
+        demand=np.asarray(hz["demand"], dtype=float)[reps], pv_avail=np.asarray(hz["pv"], dtype=float)[reps],
+        hydro_max=np.asarray(hz["hydro"], dtype=float)[reps], thermal_max=np.asarray(hz["thermal"], dtype=float)[reps],
+        costs=np.tile(np.asarray(hz["costs"], dtype=float), (n, 1)),
+        hydro_budget=np.full(n, np.nan),
+        ramp_thermal=np.full(n, np.nan if hz["ramp_th"] is None else float(hz["ramp_th"])),
+        ramp_hydro=np.full(n, np.nan if hz["ramp_hy"] is None else float(hz["ramp_hy"])),
+    )
+    write_long(batch, path)
+
+
+# =========================
+# CLI
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Días representativos ponderados para horizontes largos (MILP)")
+    parser.add_argument("--data-dir", type=str, required=True, help="Carpeta data_* (día tipo, costes y rampas)")
+    parser.add_argument("--results-dir", type=str, default=None, help="Salida (por defecto, results/ junto a data)")
+    parser.add_argument("--days", type=int, default=365, help="Días del horizonte (si no se da --profiles)")
+    parser.add_argument("--profiles", type=str, default=None, help="CSV day,hour,demand_MW,pv_avail_MW[,hydro_max_MW,thermal_max_MW]")
+    parser.add_argument("--perturb", type=float, default=0.1, help="Ruido relativo diario de demanda/PV al repetir el día tipo")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--k", type=int, default=12, help="Días representativos (0 = solo fundir días idénticos)")
+    parser.add_argument("--tol", type=float, default=0.0, help="Tolerancia [MW] para considerar dos días idénticos")
+    parser.add_argument("--budget", type=float, default=None, help="Presupuesto hídrico total del horizonte [MWh]")
+    parser.add_argument("--budget-factor", type=float, default=0.8,
+                        help="Si no hay --budget: fracción de la capacidad hidro total del horizonte")
+    parser.add_argument("--solver", type=str, default="glpk", help="Nombre de solver Pyomo")
+    parser.add_argument("--glpk-exe", type=str, default=None, help="Ruta a glpsol (por defecto, el del PATH)")
+    parser.add_argument("--voll", type=float, default=1000.0, help="VoLL de la ENS [USD/MWh]")
+    parser.add_argument("--sin-referencia", action="store_true", help="No resolver el horizonte completo")
+    parser.add_argument("--exportar", type=str, default=None, help="Escribir los representantes en formato largo (CSV/Parquet)")
+    args = parser.parse_args()
+
+    here = Path(__file__).resolve()
+    results_dir = Path(args.results_dir) if args.results_dir else (here.parent.parent / "results")
+    hz = load_horizon(Path(args.data_dir), args.days, Path(args.profiles) if args.profiles else None,
+                      args.perturb, args.seed)
+    budget = args.budget if args.budget is not None else args.budget_factor * float(np.asarray(hz["hydro"]).sum())
+    print(f"=== Días representativos: {hz['days']} días, k={args.k}, presupuesto {budget:,.0f} MWh ===")
+
+    t0 = time.perf_counter()
+    agg = aggregate(hz, args.k, args.tol, args.seed)
+    agg_s = time.perf_counter() - t0
+    print(f"Días distintos: {agg['unique_days']}  | representantes: {len(agg['reps'])}  "
+          f"| distancia media al representante: {agg['dist'].mean():.4f}")
+
+    res = solve_weighted(hz, agg["reps"], agg["weights"], budget, args.solver, args.glpk_exe, args.voll)
+    t0 = time.perf_counter()
+    cal = map_to_calendar(hz, agg["assign"], res["dispatch"], budget)
+    cal_cost = daily_cost(hz, cal, args.voll)
+    map_s = time.perf_counter() - t0
+    t_agg = agg_s + res["build_s"] + res["solve_s"] + map_s
+
+    summary = {
+        "days": hz["days"], "unique_days": agg["unique_days"], "representantes": len(agg["reps"]),
+        "budget_mwh": budget, "coste_agregado_usd": res["total_cost_usd"], "coste_calendario_usd": float(cal_cost.sum()),
+        "hidro_agregado_mwh": float((agg["weights"] * res["dispatch"][:, 1, :].sum(axis=1)).sum()),
+        "hidro_calendario_mwh": float(cal["hydro"].sum()), "ens_calendario_mwh": float(cal["ens"].sum()),
+        "violaciones_rampa": ramp_violations(hz, cal),
+        "t_agregacion_s": agg_s, "t_build_s": res["build_s"], "t_solve_s": res["solve_s"], "t_mapeo_s": map_s,
+        "t_total_s": t_agg,
+    }
+    if not args.sin_referencia:
+        ref = solve_weighted(hz, np.arange(hz["days"]), np.ones(hz["days"]), budget, args.solver, args.glpk_exe, args.voll)
+        ref_cost = ref["total_cost_usd"]
+        ref_daily = daily_cost(hz, _as_series(ref["dispatch"]), args.voll)
+        t_ref = ref["build_s"] + ref["solve_s"]
+        summary.update(
+            coste_completo_usd=ref_cost,
+            error_agregado=(res["total_cost_usd"] - ref_cost) / abs(ref_cost) if ref_cost else 0.0,
+            error_calendario=(cal_cost.sum() - ref_cost) / abs(ref_cost) if ref_cost else 0.0,
+            error_diario_medio_usd=float(np.abs(cal_cost - ref_daily).mean()),
+            error_diario_max_usd=float(np.abs(cal_cost - ref_daily).max()),
+            hidro_completo_mwh=float(ref["dispatch"][:, 1, :].sum()),
+            t_completo_s=t_ref, speedup=t_ref / t_agg if t_agg > 0 else None,
+        )
+
+    write_outputs(results_dir, hz, agg, cal, summary)
+    if args.exportar:
+        export_long(Path(args.exportar), hz, agg)
+        print(f"[OK] {args.exportar}")
+    _register_run(args, summary)
+
+    print(f"Coste agregado: {summary['coste_agregado_usd']:,.2f}  | en el calendario: {summary['coste_calendario_usd']:,.2f}"
+          f"  (ENS {summary['ens_calendario_mwh']:,.1f} MWh, {summary['violaciones_rampa']} horas fuera de rampa)")
+    print(f"Tiempo agregado: {t_agg:.2f} s (agregación {agg_s:.3f} s, build {res['build_s']:.2f} s, "
+          f"solve {res['solve_s']:.2f} s, mapeo {map_s:.3f} s)")
+    if not args.sin_referencia:
+        print(f"Completo: {summary['coste_completo_usd']:,.2f} en {summary['t_completo_s']:.2f} s  | "
+              f"error agregado {summary['error_agregado']:+.4%}  | error calendario {summary['error_calendario']:+.4%}  | "
+              f"speedup x{summary['speedup']:.1f}")
+    print(f"Resultados: {results_dir / 'dias_resumen.csv'}")
+
+
+def _register_run(args, summary: dict) -> None:
+    from registro_ejecuciones import record_run, scenario_name
+
+    record_run(
+        "dias_representativos.py", "milp", escenario=scenario_name(args.data_dir), estado="ok",
+        opciones={"days": summary["days"], "k": args.k, "tol": args.tol, "solver": args.solver,
+                  "profiles": args.profiles, "perturb": args.perturb, "seed": args.seed},
+        etapas={"agregacion": summary["t_agregacion_s"], "construccion": summary["t_build_s"],
+                "resolucion": summary["t_solve_s"], "mapeo": summary["t_mapeo_s"]},
+        coste=summary["coste_calendario_usd"], t_total_s=summary["t_total_s"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+"""
+emular_priorizado.py
+
+Emulador en forma cerrada de los dominios `despacho_priorizado`. El orden de mérito está
+codificado en las precondiciones, así que en cada hora el plan está forzado:
+
+  - con demanda >= unidad y PV >= unidad, la única acción aplicable es despachar_pv;
+  - la compuerta de PV (marcar_pv_agotado / activar_flag_pv_agotado) solo se abre con el PV o la
+    demanda por debajo de la unidad, y sin ella no hay hidro ni térmica;
+  - igual con la hidro (horaria o presupuesto diario) antes de la térmica;
+  - avanzar_hora exige demanda < unidad o las dos compuertas y térmica < unidad.
+
+Por eso el número de despachos de cada fuente en cada hora sale en O(horas × fuentes):
+  n_pv = min(⌊d/u⌋, ⌊pv/u⌋), n_hidro = min(⌊d'/u⌋, ⌊hidro/u⌋, ⌊presupuesto/u⌋), n_term = min(⌊d''/u⌋, ⌊term/u⌋)
+con aritmética exacta (Fraction) y el presupuesto hídrico arrastrado en orden cronológico.
+La búsqueda solo puede elegir distinto en lo que se marca como aviso:
+
+  compuerta_opcional (texto)   compuertas con precondición cierta que no hacen falta (demanda ya
+                               cubierta) o que pueden ir antes: cambian el texto del plan, no el despacho
+  goal_sin_demanda (numérico)  el goal solo pide (hora_actual hN): la búsqueda para al llegar y la
+                               última hora queda sin despachar (como el plan priorizado v1)
+  goal_inalcanzable (numérico) la última hora no puede quedar con demanda < unidad: no hay plan
+  frontera_double (numérico)   valores no representables en binario justo en un múltiplo de la
+                               unidad: ENHSP (double) puede despachar una unidad menos
+
+Salidas: el plan en el formato de log de ENHSP (lo leen parse_priorizado_plan_sim.py,
+resumir_plan_priorizado.py y verificar_y_visualizar_plan_priorizado.py), en longitud de recorrido
+para horizontes enormes ('(despachar_pv h12) x37', ver leer_rle) y el despacho por hora con las
+columnas de pddl_dispatch_priorizado_sim.csv. Con --comparar se contrasta con un plan de ENHSP:
+idéntico, equivalente (mismo despacho por hora; solo cambian las compuertas) o distinto.
+
+Uso:
+  python scripts/emular_priorizado.py models/pddl_escenario3/domain_escenario3.pddl \\
+      models/pddl_escenario3/problem_escenario3.pddl --comparar results_escenario3/plan_enhsp_escenario3.txt
+  python scripts/emular_priorizado.py <domain.pddl> <problem.pddl> --out plan_emulado.txt --csv despacho.csv
+  python scripts/emular_priorizado.py <domain.pddl> <problem.pddl> --benchmark 8760 --rle /tmp/plan_8760.rle
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from dataclasses import dataclass, field, replace
+from fractions import Fraction
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import parse_priorizado_plan_sim as sim
+from planificar_por_horas import domain_has_budget
+
+INF = float("inf")
+# Familia de dominio -> (compuerta PV, compuerta hidro); las demás acciones son comunes
+FAMILIAS = {
+    "marcar": ("marcar_pv_agotado", "marcar_hidro_agotado"),
+    "activar_flag": ("activar_flag_pv_agotado", "activar_flag_hidro_agotado"),
+}
+ACCIONES_COMUNES = {"despachar_pv", "despachar_hidro", "despachar_termica", "avanzar_hora"}
+NUMERICOS = {"goal_sin_demanda", "goal_inalcanzable", "frontera_double"}
+RGX_RLE = re.compile(r"^\s*\(([A-Za-z0-9_\-]+)\s+h(\d+)(?:\s+h(\d+))?\)\s*(?:x(\d+))?\s*$")
+
+
+# =========================
+# Datos
+# =========================
+
+@dataclass
+class DatosPriorizado:
+    """Entradas del emulador: perfiles por hora (Fraction), escalares y forma del goal."""
+    familia: str
+    hours: List[int]
+    demanda: List[Fraction]
+    pv: List[Fraction]
+    hidro: List[Fraction]
+    termica: List[Fraction]
+    unidad: Fraction
+    costos: tuple                      # (pv, hidro, térmica)
+    presupuesto: Optional[Fraction]    # None = el dominio no tiene tope diario
+    goal_hora: int
+    goal_demanda: bool
+    representable: bool = True         # todos los valores son exactos en double
+
+
+def _exacto(x: float) -> Fraction:
+    # repr devuelve el decimal más corto que reproduce el double, es decir, el valor del problema
+    return Fraction(repr(x))
+
+
+def familia_dominio(domain_text: str) -> str:
+    """'marcar' o 'activar_flag' según las acciones del dominio; ValueError si no es un dominio priorizado."""
+    acciones = {a.lower() for a in re.findall(r"\(:action\s+([A-Za-z0-9_\-]+)", sim.strip_comments(domain_text))}
+    for familia, gates in FAMILIAS.items():
+        if acciones == ACCIONES_COMUNES | set(gates):
+            return familia
+    raise ValueError(f"dominio no reconocido como despacho_priorizado (acciones: {sorted(acciones)})")
+
+
+def leer(domain_path: Path, problem_path: Path) -> DatosPriorizado:
+    domain_text = domain_path.read_text(encoding="utf-8", errors="ignore")
+    raw = problem_path.read_text(encoding="utf-8", errors="ignore")
+    hours, scalars, per_h = sim.parse_problem_text(raw, verbose=False)
+    goal = sim.extract_paren_block(sim.strip_comments(raw), "(:goal")
+    m = re.search(r"\(\s*hora_actual\s+h(\d+)\s*\)", goal)
+    presupuesto = None
+    if domain_has_budget(domain_text):
+        if "presupuesto_hidro_diario" not in scalars:
+            raise ValueError(f"{problem_path.name}: el dominio usa (presupuesto_hidro_diario) y el problema no lo inicializa")
+        presupuesto = _exacto(scalars["presupuesto_hidro_diario"])
+    if "unidad_despacho" not in scalars:
+        raise ValueError(f"{problem_path.name}: falta (= (unidad_despacho) ...)")
+    col = lambda fn: [_exacto(per_h[fn].get(h, 0.0)) for h in hours]
+    datos = DatosPriorizado(
+        familia=familia_dominio(domain_text), hours=list(hours), demanda=col("demanda"), pv=col("pv_disponible"),
+        hidro=col("hidro_disponible_hora"), termica=col("termica_disponible_hora"),
+        unidad=_exacto(scalars["unidad_despacho"]),
+        costos=tuple(_exacto(scalars.get(k, 0.0)) for k in ("costo_pv", "costo_hidro", "costo_termica")),
+        presupuesto=presupuesto, goal_hora=int(m.group(1)) if m else hours[-1],
+        goal_demanda=re.search(r"\(\s*demanda\s+h\d+\s*\)", goal) is not None,
+    )
+    valores = [datos.unidad, *datos.demanda, *datos.pv, *datos.hidro, *datos.termica]
+    if presupuesto is not None:
+        valores.append(presupuesto)
+    datos.representable = all(Fraction(float(v)) == v for v in valores)
+    return datos
+
+
+def replicar(datos: DatosPriorizado, n_horas: int) -> DatosPriorizado:
+    """El mismo perfil repetido hasta n_horas (goal en la última); el presupuesto escala con los días."""
+    H = len(datos.hours)
+    rep = lambda a: [a[t % H] for t in range(n_horas)]
+    presupuesto = None if datos.presupuesto is None else datos.presupuesto * Fraction(n_horas, H)
+    return replace(datos, hours=list(range(n_horas)), demanda=rep(datos.demanda), pv=rep(datos.pv),
+                   hidro=rep(datos.hidro), termica=rep(datos.termica), presupuesto=presupuesto,
+                   goal_hora=n_horas - 1)
+
+
+# =========================
+# Emulación
+# =========================
+
+@dataclass
+class HoraEmulada:
+    hora: int
+    pv: int = 0                 # unidades despachadas de cada fuente
+    hidro: int = 0
+    termica: int = 0
+    compuerta_pv: bool = False
+    compuerta_hidro: bool = False
+    avanza: bool = True
+    restante: Fraction = Fraction(0)
+
+
+@dataclass
+class Aviso:
+    tipo: str
+    horas: List[int]
+    detalle: str
+
+    @property
+    def numerico(self) -> bool:
+        return self.tipo in NUMERICOS
+
+    def __str__(self) -> str:
+        horas = ", ".join(f"h{h}" for h in self.horas[:8]) + (" ..." if len(self.horas) > 8 else "")
+        clase = "numérico" if self.numerico else "texto"
+        return f"{self.tipo} ({clase}, {len(self.horas)} h: {horas}): {self.detalle}"
+
+
+@dataclass
+class Emulacion:
+    datos: DatosPriorizado
+    horas: List[HoraEmulada]
+    avisos: List[Aviso] = field(default_factory=list)
+
+    @property
+    def n_acciones(self) -> int:
+        return sum(h.pv + h.hidro + h.termica + h.compuerta_pv + h.compuerta_hidro + h.avanza for h in self.horas)
+
+    @property
+    def coste(self) -> Fraction:
+        u, (c_pv, c_hy, c_th) = self.datos.unidad, self.datos.costos
+        return u * sum(h.pv * c_pv + h.hidro * c_hy + h.termica * c_th for h in self.horas)
+
+    @property
+    def demanda_restante(self) -> Fraction:
+        """Demanda sin servir en las horas alcanzadas (las posteriores al goal no cuentan)."""
+        return sum((h.restante for h in self.horas), Fraction(0))
+
+    @property
+    def plan_existe(self) -> bool:
+        return not any(a.tipo == "goal_inalcanzable" for a in self.avisos)
+
+
+def _unidades(u: Fraction, *limites) -> int:
+    return int(min(x // u for x in limites))
+
+
+def emular(datos: DatosPriorizado) -> Emulacion:
+    """Despacho forzado hora a hora hasta la hora del goal (inclusive) y avisos de posibles elecciones."""
+    u = datos.unidad
+    budget = datos.presupuesto
+    horas, opcionales, frontera = [], [], []
+    idx_goal = datos.hours.index(datos.goal_hora)
+    for i in range(idx_goal + 1):
+        h = datos.hours[i]
+        d, pv, hy, th = datos.demanda[i], datos.pv[i], datos.hidro[i], datos.termica[i]
+        e = HoraEmulada(h, avanza=i < idx_goal)
+        if i == idx_goal and not datos.goal_demanda:
+            # El goal ya se cumple al llegar: la búsqueda termina sin despachar esta hora
+            e.restante = d
+            horas.append(e)
+            break
+        pares = []
+        e.pv = _unidades(u, d, pv)
+        pares.append((d, pv))
+        d, pv = d - e.pv * u, pv - e.pv * u
+        if d >= u:
+            e.compuerta_pv = True
+            lim_hy = (hy,) if budget is None else (hy, budget)
+            e.hidro = _unidades(u, d, *lim_hy)
+            pares.append((d, *lim_hy))
+            d, hy = d - e.hidro * u, hy - e.hidro * u
+            if budget is not None:
+                budget -= e.hidro * u
+            if d >= u:
+                e.compuerta_hidro = True
+                e.termica = _unidades(u, d, th)
+                pares.append((d, th))
+                d, th = d - e.termica * u, th - e.termica * u
+        e.restante = d
+        # Compuertas aplicables que el plan no necesita (la búsqueda puede insertarlas sin coste)
+        if datos.familia == "marcar":
+            pv_libre = not e.compuerta_pv
+            hy_libre = not e.compuerta_hidro
+        else:
+            pv_libre = not e.compuerta_pv and pv < u
+            hy_libre = not e.compuerta_hidro and (hy < u or (budget is not None and budget < u))
+        if (pv_libre or hy_libre or (datos.familia == "activar_flag" and e.compuerta_hidro)) and e.avanza:
+            opcionales.append(h)
+        if not datos.representable and any(min(p) % u == 0 and min(p) > 0 for p in pares):
+            frontera.append(h)
+        horas.append(e)
+
+    em = Emulacion(datos, horas)
+    if opcionales:
+        em.avisos.append(Aviso("compuerta_opcional", opcionales,
+                               "la búsqueda puede añadir o adelantar compuertas de agotado; el despacho no cambia"))
+    if not datos.goal_demanda:
+        em.avisos.append(Aviso("goal_sin_demanda", [datos.goal_hora],
+                               "el goal no exige cubrir la demanda de la última hora; se emula que la búsqueda "
+                               "para al llegar (un planificador podría despacharla igualmente)"))
+    elif horas and horas[-1].restante >= u:
+        em.avisos.append(Aviso("goal_inalcanzable", [datos.goal_hora],
+                               f"quedan {float(horas[-1].restante):g} MW >= unidad sin energía para cubrirlos"))
+    if frontera:
+        em.avisos.append(Aviso("frontera_double", frontera,
+                               "valores no exactos en binario justo en un múltiplo de la unidad"))
+    return em
+
+
+# =========================
+# Planes
+# =========================
+
+def acciones(em: Emulacion) -> Iterator[tuple]:
+    """Acciones (nombre, hora, hora_siguiente|None) en el orden en que ENHSP las imprime."""
+    gate_pv, gate_hy = FAMILIAS[em.datos.familia]
+    hours = em.datos.hours
+    for i, e in enumerate(em.horas):
+        h = e.hora
+        yield from (("despachar_pv", h, None) for _ in range(e.pv))
+        if e.compuerta_pv:
+            yield gate_pv, h, None
+        yield from (("despachar_hidro", h, None) for _ in range(e.hidro))
+        if e.compuerta_hidro:
+            yield gate_hy, h, None
+        yield from (("despachar_termica", h, None) for _ in range(e.termica))
+        if e.avanza:
+            yield "avanzar_hora", h, hours[i + 1]
+
+
+def _accion(act: str, h: int, h2: Optional[int]) -> str:
+    return f"({act} h{h})" if h2 is None else f"({act} h{h} h{h2})"
+
+
+def escribir_enhsp(em: Emulacion, path: Path) -> None:
+    """Plan con el formato de log de ENHSP ('Found Plan:', 'i.0: (acción)', Plan-Length, Metric)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8", newline="\n") as f:
+        f.write("Plan emulado en forma cerrada (emular_priorizado.py)\n")
+        f.write("Found Plan:\n")
+        n = 0
+        for n, a in enumerate(acciones(em), start=1):
+            f.write(f"{n - 1}.0: {_accion(*a)}\n")
+        f.write("\n")
+        f.write(f"Plan-Length:{n}\n")
+        f.write(f"Metric (Search):{float(em.coste)}\n")
+
+
+def escribir_rle(em: Emulacion, path: Path) -> None:
+    """Plan en longitud de recorrido: una línea por tramo de acciones iguales, '(acción hN) xK' si K > 1."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    gate_pv, gate_hy = FAMILIAS[em.datos.familia]
+    hours = em.datos.hours
+    with path.open("w", encoding="utf-8", newline="\n") as f:
+        f.write("; Plan emulado en longitud de recorrido (emular_priorizado.py): '(acción hN) xK' = K veces seguidas\n")
+        for i, e in enumerate(em.horas):
+            h = e.hora
+            for act, k in (("despachar_pv", e.pv), (gate_pv, e.compuerta_pv), ("despachar_hidro", e.hidro),
+                           (gate_hy, e.compuerta_hidro), ("despachar_termica", e.termica)):
+                if k:
+                    f.write(f"({act} h{h})" + (f" x{int(k)}" if k > 1 else "") + "\n")
+            if e.avanza:
+                f.write(f"(avanzar_hora h{h} h{hours[i + 1]})\n")
+        f.write(f"; Plan-Length:{em.n_acciones}\n")
+        f.write(f"; Metric (Search):{float(em.coste)}\n")
+
+
+def leer_rle(path: Path) -> List[tuple]:
+    """Acciones expandidas (nombre, hora, hora_siguiente|None) de un plan en longitud de recorrido."""
+    out = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        m = RGX_RLE.match(line)
+        if m:
+            a = (m.group(1).lower(), int(m.group(2)), int(m.group(3)) if m.group(3) else None)
+            out.extend([a] * int(m.group(4) or 1))
+    return out
+
+
+def escribir_despacho(em: Emulacion, path: Path) -> None:
+    """Despacho por hora con las columnas de pddl_dispatch_priorizado_sim.csv (horas no alcanzadas a 0)."""
+    import csv
+
+    u = em.datos.unidad
+    por_hora = {e.hora: e for e in em.horas}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["hour", "pv_mwh", "hidro_mwh", "termica_mwh"])
+        for h in em.datos.hours:
+            e = por_hora.get(h, HoraEmulada(h))
+            w.writerow([h, float(e.pv * u), float(e.hidro * u), float(e.termica * u)])
+
+
+# =========================
+# Comparación con ENHSP
+# =========================
+
+def _por_hora(seq) -> dict:
+    out = {}
+    for act, h, _h2 in seq:
+        if act.startswith("despachar_"):
+            c = out.setdefault(h, [0, 0, 0])
+            c[("despachar_pv", "despachar_hidro", "despachar_termica").index(act)] += 1
+    return out
+
+
+def comparar(em: Emulacion, plan: List[tuple]) -> tuple:
+    """('identico' | 'equivalente' | 'distinto', detalle) frente a las acciones de un plan real."""
+    emulado = list(acciones(em))
+    if emulado == plan:
+        return "identico", f"{len(plan)} acciones iguales"
+    a, b = _por_hora(emulado), _por_hora(plan)
+    if a == b:
+        avance = lambda s: [x for x in s if x[0] == "avanzar_hora"]
+        if avance(emulado) == avance(plan):
+            return "equivalente", (f"mismo despacho por hora; {len(emulado)} frente a {len(plan)} acciones "
+                                   f"(solo cambian las compuertas)")
+    diff = sorted(h for h in set(a) | set(b) if a.get(h) != b.get(h))
+    if diff:
+        h = diff[0]
+        return "distinto", (f"{len(diff)} horas con otro despacho; primera h{h}: emulado (pv, hidro, térmica) = "
+                            f"{tuple(a.get(h, [0, 0, 0]))} frente a {tuple(b.get(h, [0, 0, 0]))} unidades")
+    return "distinto", "mismo despacho pero otra secuencia de horas"
+
+
+# =========================
+# Main
+# =========================
+
+def _resumen(em: Emulacion, segundos: float) -> None:
+    d = em.datos
+    print(f"=== Emulación ({d.familia}, {len(d.hours)} h, unidad {float(d.unidad):g}) en {segundos * 1000:.1f} ms ===")
+    print(f"Acciones: {em.n_acciones:,}  Coste: {float(em.coste):,.2f}  "
+          f"Demanda sin servir: {float(em.demanda_restante):,.0f} MWh")
+    if not em.plan_existe:
+        print("[AVISO] No existe plan: el goal no se puede alcanzar")
+    for a in em.avisos:
+        print(f"[AVISO] {a}" if a.numerico else f"  {a}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan de los dominios priorizados en forma cerrada (sin planificador)")
+    parser.add_argument("domain", help="domain.pddl (familia marcar_* o activar_flag_*)")
+    parser.add_argument("problem", help="problem.pddl")
+    parser.add_argument("--out", type=str, default=None, help="Plan con formato de log de ENHSP")
+    parser.add_argument("--rle", type=str, default=None, help="Plan en longitud de recorrido")
+    parser.add_argument("--csv", type=str, default=None, help="Despacho por hora (columnas de pddl_dispatch_priorizado_sim.csv)")
+    parser.add_argument("--comparar", type=str, default=None, metavar="PLAN",
+                        help="Plan de ENHSP (o .rle) con el que contrastar la emulación")
+    parser.add_argument("--benchmark", type=int, default=None, metavar="HORAS",
+                        help="Replica el perfil del problema hasta HORAS y emula ese horizonte")
+    args = parser.parse_args()
+
+    try:
+        datos = leer(Path(args.domain), Path(args.problem))
+    except ValueError as ex:
+        sys.exit(f"[ERROR] {ex}")
+    if args.benchmark:
+        datos = replicar(datos, args.benchmark)
+    t0 = time.perf_counter()
+    em = emular(datos)
+    _resumen(em, time.perf_counter() - t0)
+
+    for opt, fn in ((args.out, escribir_enhsp), (args.rle, escribir_rle), (args.csv, escribir_despacho)):
+        if opt:
+            t0 = time.perf_counter()
+            fn(em, Path(opt))
+            print(f"-> {opt} ({time.perf_counter() - t0:.2f} s)")
+
+    if args.comparar:
+        path = Path(args.comparar)
+        if path.suffix == ".rle":
+            plan = leer_rle(path)
+        else:
+            plan, _metric = sim.parse_plan(path, verbose=False)
+        estado, detalle = comparar(em, plan)
+        print(f"{'[OK]' if estado != 'distinto' else '[AVISO]'} Frente a {path.name}: {estado} ({detalle})")
+        if estado == "distinto":
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
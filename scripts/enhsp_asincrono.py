@@ -0,0 +1,373 @@
+"""
+enhsp_asincrono.py
+
+Ejecución de ENHSP en streaming con asyncio: el planificador se lanza como subproceso y su salida
+se lee línea a línea mientras busca. La traza de búsqueda (g(n)/h(n)) se sigue en vivo, y cada
+acción del plan se pasa a un verificador incremental en cuanto llega. No hace falta esperar a que
+el log esté completo en disco para ejecutar parse_priorizado_plan_sim.py.
+
+  - VerificadorPlan aplica las acciones una a una con la misma semántica de clamp que
+    parse_priorizado_plan_sim.simulate, así que coste y energía coinciden con la simulación de
+    siempre. Además comprueba lo que la simulación por lotes no mira: la secuencia de horas
+    (hora_actual/siguiente), las precondiciones numéricas de cada despacho, las compuertas de
+    prioridad (hidro requiere pv_agotado; térmica, ambas) y el goal final.
+  - Se aborta el planificador (kill) al vencer --timeout o, salvo con --no-abortar, en la primera
+    acción inválida.
+  - Varios escenarios comparten un único bucle de eventos (--max-concurrentes los limita): la
+    verificación de uno se solapa con la búsqueda de los demás en lugar de sumarse después.
+
+El log de cada escenario se escribe en results_<escenario>/enhsp_stream/plan_enhsp_<nombre>.txt (o
+en --out-dir) a medida que llega; los planes versionados de results_<escenario>/ no se tocan, y un log
+que ya existe no se sobrescribe sin --force. Cada ejecución queda en el registro de ejecuciones
+(enfoque pddl).
+
+Uso:
+  python scripts/enhsp_asincrono.py --enhsp enhsp.jar --timeout 120 \\
+      --caso models/pddl_escenario1/domain_escenario1.pddl models/pddl_escenario1/problem_escenario1.pddl \\
+      --caso models/pddl_escenario3/domain_escenario3.pddl models/pddl_escenario3/problem_escenario3.pddl
+  (Opcional) --planner-cmd "java -Xmx4g -jar {enhsp} -o {domain} -f {problem} -planner sat-hadd"
+             --out-dir /tmp/planes --max-concurrentes 2 --no-abortar --force
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import os
+import re
+import shlex
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import parse_priorizado_plan_sim as sim
+from planificar_por_horas import DEFAULT_PLANNER_CMD
+
+TOL = 1e-9
+GATES = {
+    "marcar_pv_agotado": "pv", "activar_flag_pv_agotado": "pv",
+    "marcar_hidro_agotado": "hidro", "activar_flag_hidro_agotado": "hidro",
+}
+SUMMARY_COLUMNS = ["escenario", "problema", "estado", "acciones", "coste", "metric_enhsp", "demanda_restante",
+                   "goal_ok", "mejoras_h", "h_final", "t_plan_s", "t_total_s", "t_verificacion_s", "violacion"]
+
+
+# =========================
+# Verificador incremental
+# =========================
+
+class VerificadorPlan:
+    """
+    Estado del dominio priorizado acción a acción. feed() devuelve None si la acción es válida o
+    el motivo si viola una precondición; el efecto numérico se aplica igual (clamp, como simulate).
+    """
+
+    def __init__(self, hours, scalars, per_h, goal: str = ""):
+        self.hours = list(hours)
+        self.next_hour = dict(zip(self.hours, self.hours[1:]))
+        self.demanda = {h: per_h["demanda"].get(h, 0.0) for h in self.hours}
+        self.disp = {
+            "pv": {h: per_h["pv_disponible"].get(h, 0.0) for h in self.hours},
+            "hidro": {h: per_h["hidro_disponible_hora"].get(h, 0.0) for h in self.hours},
+            "termica": {h: per_h["termica_disponible_hora"].get(h, 0.0) for h in self.hours},
+        }
+        self.presupuesto = scalars.get("presupuesto_hidro_diario", float("inf"))
+        self.unidad = scalars.get("unidad_despacho", 10.0)
+        self.costos = {"pv": scalars.get("costo_pv", 0.0), "hidro": scalars.get("costo_hidro", 0.0),
+                       "termica": scalars.get("costo_termica", 0.0)}
+        self.servido = {"pv": 0.0, "hidro": 0.0, "termica": 0.0}
+        self.compuertas = set()
+        self.hora = self.hours[0] if self.hours else None
+        self.n = 0
+        self.coste = 0.0
+        self.violaciones = []
+        # Goal: (hora_actual hN) y, en los dominios que lo piden, (< (demanda hN) (unidad_despacho))
+        m = re.search(r"\(\s*hora_actual\s+h(\d+)\s*\)", goal)
+        self.goal_hora = int(m.group(1)) if m else (self.hours[-1] if self.hours else None)
+        self.goal_demanda = re.search(r"\(\s*demanda\s+h\d+\s*\)", goal) is not None
+
+    def _fail(self, motivo: str) -> str:
+        msg = f"acción {self.n}: {motivo}"
+        self.violaciones.append(msg)
+        return msg
+
+    def feed(self, act: str, h: int, h2: int | None = None) -> str | None:
+        self.n += 1
+        u = self.unidad
+        if h not in self.demanda:
+            return self._fail(f"({act} h{h}): hora fuera del problema")
+        motivo = None
+        if h != self.hora:
+            motivo = f"({act} h{h}) con hora_actual h{self.hora}"
+
+        if act.startswith("despachar_"):
+            fuente = act[len("despachar_"):]
+            if fuente not in self.disp:
+                return self._fail(f"acción desconocida {act}")
+            dem, cap = self.demanda[h], self.disp[fuente][h]
+            limite = min(dem, cap, self.presupuesto) if fuente == "hidro" else min(dem, cap)
+            if motivo is None:
+                if dem < u - TOL:
+                    motivo = f"({act} h{h}) con demanda {dem:g} < unidad {u:g}"
+                elif cap < u - TOL:
+                    motivo = f"({act} h{h}) con disponible {cap:g} < unidad {u:g}"
+                elif fuente == "hidro" and self.presupuesto < u - TOL:
+                    motivo = f"({act} h{h}) con presupuesto hidro {self.presupuesto:g} < unidad {u:g}"
+                elif fuente in ("hidro", "termica") and (h, "pv") not in self.compuertas:
+                    motivo = f"({act} h{h}) sin pv_agotado"
+                elif fuente == "termica" and (h, "hidro") not in self.compuertas:
+                    motivo = f"({act} h{h}) sin hidro_agotado"
+            # Efecto con la semántica de clamp de parse_priorizado_plan_sim.simulate
+            x = min(max(0.0, u), max(0.0, limite))
+            self.demanda[h] -= x
+            self.disp[fuente][h] -= x
+            if fuente == "hidro":
+                self.presupuesto -= x
+            self.servido[fuente] += x
+            self.coste += x * self.costos[fuente]
+            if abs(self.demanda[h]) < TOL:
+                self.demanda[h] = 0.0
+            if abs(self.disp[fuente][h]) < TOL:
+                self.disp[fuente][h] = 0.0
+
+        elif act in GATES:
+            fuente = GATES[act]
+            agotado = self.demanda[h] < u or self.disp[fuente][h] < u or (fuente == "hidro" and self.presupuesto < u)
+            if motivo is None and (h, fuente) in self.compuertas:
+                motivo = f"({act} h{h}) repetida"
+            elif motivo is None and not agotado:
+                motivo = f"({act} h{h}) con {fuente} aún disponible"
+            self.compuertas.add((h, fuente))
+
+        elif act == "avanzar_hora":
+            if motivo is None and h2 != self.next_hour.get(h):
+                motivo = f"(avanzar_hora h{h} h{h2}): la siguiente hora es h{self.next_hour.get(h)}"
+            elif motivo is None:
+                cubierta = self.demanda[h] < u
+                sin_energia = {(h, "pv"), (h, "hidro")} <= self.compuertas and self.disp["termica"][h] < u
+                if not (cubierta or sin_energia):
+                    motivo = f"(avanzar_hora h{h} h{h2}) con demanda {self.demanda[h]:g} sin cubrir"
+            if h2 in self.demanda:
+                self.hora = h2
+        else:
+            motivo = f"acción desconocida {act}"
+
+        return self._fail(motivo) if motivo else None
+
+    def goal_ok(self) -> bool:
+        if self.hora != self.goal_hora:
+            return False
+        return not self.goal_demanda or self.demanda.get(self.goal_hora, 0.0) < self.unidad
+
+    def resumen(self) -> dict:
+        return {"acciones": self.n, "coste": self.coste, "servido": dict(self.servido),
+                "demanda_restante": sum(self.demanda.values()), "goal_ok": self.goal_ok(),
+                "violaciones": list(self.violaciones)}
+
+
+# =========================
+# Ejecución en streaming
+# =========================
+
+@dataclass
+class Caso:
+    domain: Path
+    problem: Path
+    out: Path
+    name: str = ""
+    estado: str = "pendiente"
+    mejoras_h: int = 0
+    h_final: float | None = None
+    metric: float | None = None
+    t_plan_s: float | None = None
+    t_total_s: float | None = None
+    t_verif_s: float = 0.0
+    verificador: VerificadorPlan | None = None
+    violacion: str = ""
+    stats: dict = field(default_factory=dict)
+
+
+def _parse_trace(line: str):
+    from analizar_traza_enhsp import RGX_TRACE
+
+    m = RGX_TRACE.match(line)
+    return (float(m.group(1)), float(m.group(2))) if m else None
+
+
+async def run_case(caso: Caso, planner_cmd: str, enhsp: str, timeout: float | None, abortar: bool,
+                   limit: asyncio.Semaphore) -> Caso:
+    """Lanza el planificador para un caso y verifica su plan mientras se imprime."""
+    async with limit:
+        raw = caso.problem.read_text(encoding="utf-8", errors="ignore")
+        hours, scalars, per_h = sim.parse_problem_text(raw, verbose=False)
+        goal = sim.extract_paren_block(sim.strip_comments(raw), "(:goal")
+        caso.verificador = ver = VerificadorPlan(hours, scalars, per_h, goal)
+        cmd = planner_cmd.format(enhsp=enhsp, domain=str(caso.domain), problem=str(caso.problem))
+        t0 = time.perf_counter()
+        proc = await asyncio.create_subprocess_exec(
+            *shlex.split(cmd, posix=(sys.platform != "win32")),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        caso.out.parent.mkdir(parents=True, exist_ok=True)
+        in_plan = False
+        caso.estado = "sin_plan"
+        try:
+            with caso.out.open("w", encoding="utf-8", newline="\n") as log:
+                while True:
+                    remaining = None if timeout is None else timeout - (time.perf_counter() - t0)
+                    if remaining is not None and remaining <= 0:
+                        raise asyncio.TimeoutError
+                    raw = await asyncio.wait_for(proc.stdout.readline(), remaining)
+                    if not raw:
+                        break
+                    line = raw.decode("utf-8", errors="replace")
+                    log.write(line)
+                    if not in_plan:
+                        if "Found Plan" in line:
+                            in_plan = True
+                            caso.t_plan_s = time.perf_counter() - t0
+                            continue
+                        gh = _parse_trace(line)
+                        if gh is not None:
+                            caso.mejoras_h += 1
+                            caso.h_final = gh[1]
+                        continue
+                    if "Plan-Length" in line:
+                        in_plan = False
+                        caso.estado = "ok"
+                        continue
+                    m = sim.RE_ACT_TS.match(line) or sim.RE_ACT_NOTS.match(line)
+                    if m is None:
+                        continue
+                    tv = time.perf_counter()
+                    motivo = ver.feed(m.group(1).lower(), int(m.group(2)[1:]),
+                                      int(m.group(3)[1:]) if m.group(3) else None)
+                    caso.t_verif_s += time.perf_counter() - tv
+                    if motivo and abortar:
+                        caso.estado, caso.violacion = "invalido", motivo
+                        break
+            # Métrica de ENHSP (si llegó a imprimirla) para contrastarla con el coste verificado
+            text = caso.out.read_text(encoding="utf-8", errors="replace")
+            mm = sim.RE_METRIC.search(text)
+            caso.metric = float(mm.group(1)) if mm else None
+        except asyncio.TimeoutError:
+            caso.estado = "timeout"
+        finally:
+            if proc.returncode is None:
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    pass
+            await proc.wait()
+            caso.t_total_s = time.perf_counter() - t0
+        if caso.estado == "ok":
+            if ver.violaciones:
+                caso.estado, caso.violacion = "invalido", ver.violaciones[0]
+            elif not ver.goal_ok():
+                caso.estado, caso.violacion = "goal_no_alcanzado", f"hora final h{ver.hora}"
+        return caso
+
+
+async def run_all(casos: list, planner_cmd: str, enhsp: str, timeout: float | None = None,
+                  abortar: bool = True, max_concurrentes: int | None = None) -> list:
+    limit = asyncio.Semaphore(max_concurrentes or len(casos) or 1)
+    return await asyncio.gather(*(run_case(c, planner_cmd, enhsp, timeout, abortar, limit) for c in casos))
+
+
+# =========================
+# Salida
+# =========================
+
+def logs_existentes(casos: list) -> list:
+    """Logs de salida que ya están en disco: main() no los sobrescribe sin --force."""
+    return [c.out for c in casos if c.out.exists()]
+
+
+def summary_row(caso: Caso) -> dict:
+    r = caso.verificador.resumen() if caso.verificador else {}
+    return {
+        "escenario": caso.name, "problema": caso.problem.name, "estado": caso.estado,
+        "acciones": r.get("acciones"), "coste": r.get("coste"), "metric_enhsp": caso.metric,
+        "demanda_restante": r.get("demanda_restante"), "goal_ok": r.get("goal_ok"),
+        "mejoras_h": caso.mejoras_h, "h_final": caso.h_final, "t_plan_s": caso.t_plan_s,
+        "t_total_s": caso.t_total_s, "t_verificacion_s": caso.t_verif_s, "violacion": caso.violacion,
+    }
+
+
+def write_summary(rows: list, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, lineterminator="\n")
+        w.writeheader()
+        w.writerows(rows)
+
+
+def register(caso: Caso, planner_cmd: str) -> None:
+    import registro_ejecuciones as registro
+
+    r = caso.verificador.resumen() if caso.verificador else {}
+    demanda0 = sum(caso.verificador.servido.values()) + r["demanda_restante"] if caso.verificador else 0.0
+    etapas = {"busqueda": caso.t_plan_s, "verificacion": caso.t_verif_s}
+    registro.record_run(
+        "enhsp_asincrono.py", "pddl", escenario=caso.name, estado=caso.estado,
+        input_hash=registro.hash_files(caso.domain, caso.problem),
+        opciones={"planner_cmd": planner_cmd, "problem": caso.problem.name, "metric_enhsp": caso.metric,
+                  "violacion": caso.violacion or None},
+        etapas={k: v for k, v in etapas.items() if v is not None}, coste=r.get("coste"), plan_len=r.get("acciones"),
+        cobertura=1.0 - r["demanda_restante"] / demanda0 if demanda0 else None, t_total_s=caso.t_total_s)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ENHSP en streaming con verificación incremental del plan")
+    parser.add_argument("--caso", nargs=2, action="append", required=True, metavar=("DOMINIO", "PROBLEMA"),
+                        help="Par domain.pddl problem.pddl (repetible: todos comparten el bucle de eventos)")
+    parser.add_argument("--enhsp", type=str, default="enhsp.jar", help="Ruta a enhsp.jar")
+    parser.add_argument("--planner-cmd", type=str, default=DEFAULT_PLANNER_CMD,
+                        help="Plantilla del comando del planificador ({enhsp}, {domain}, {problem})")
+    parser.add_argument("--timeout", type=float, default=None, help="Tiempo máximo por caso [s]")
+    parser.add_argument("--no-abortar", action="store_true", help="No matar al planificador ante una acción inválida")
+    parser.add_argument("--max-concurrentes", type=int, default=os.cpu_count() or 1,
+                        help="Planificadores a la vez (cada ENHSP es una JVM)")
+    parser.add_argument("--out-dir", type=str, default=None,
+                        help="Carpeta de los logs y de enhsp_stream_resumen.csv (por defecto, results_<escenario>/enhsp_stream/)")
+    parser.add_argument("--force", action="store_true", help="Sobrescribe los logs que ya existan")
+    args = parser.parse_args()
+
+    import registro_ejecuciones as registro
+
+    repo = Path(__file__).resolve().parent.parent
+    casos = []
+    for domain, problem in args.caso:
+        problem = Path(problem)
+        name = registro.scenario_name(problem)
+        out_dir = Path(args.out_dir) if args.out_dir else repo / f"results_{name}" / "enhsp_stream"
+        plan_name = problem.stem.replace("problem_", "", 1)
+        casos.append(Caso(Path(domain), problem, out_dir / f"plan_enhsp_{plan_name}.txt", name=name))
+    existentes = logs_existentes(casos)
+    if existentes and not args.force:
+        sys.exit("[ERROR] Ya existen " + ", ".join(str(p) for p in existentes)
+                 + "; usa --force para sobrescribirlos u otra --out-dir")
+
+    t0 = time.perf_counter()
+    casos = asyncio.run(run_all(casos, args.planner_cmd, args.enhsp, args.timeout,
+                                abortar=not args.no_abortar, max_concurrentes=args.max_concurrentes))
+    wall = time.perf_counter() - t0
+
+    rows = [summary_row(c) for c in casos]
+    print(f"=== ENHSP en streaming: {len(casos)} casos en {wall:.2f} s "
+          f"(suma de casos {sum(c.t_total_s or 0.0 for c in casos):.2f} s) ===")
+    for c, r in zip(casos, rows):
+        coste = f"{r['coste']:,.2f}" if r["coste"] is not None else "-"
+        print(f"{c.name:<12} {c.estado:<18} acciones={r['acciones'] or 0:<6} coste={coste:>14}  "
+              f"plan a los {c.t_plan_s or 0.0:.2f} s, fin {c.t_total_s:.2f} s, verificación {c.t_verif_s * 1000:.1f} ms")
+        if c.violacion:
+            print(f"    {c.violacion}")
+        register(c, args.planner_cmd)
+    if args.out_dir:
+        write_summary(rows, Path(args.out_dir) / "enhsp_stream_resumen.csv")
+    if any(c.estado != "ok" for c in casos):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+escenarios.py
+
+Carga columnar y tipada de escenarios: los perfiles horarios quedan en arrays NumPy contiguos en
+lugar de dicts por hora.
+
+  - load_scenario_dir(data_dir): una carpeta data_* (los seis CSV de siempre) -> ScenarioData.
+    Solo usa csv + NumPy (no importa pandas). milp_model._read_csvs la usa por debajo.
+  - load_long(path): un archivo largo con muchos escenarios, columnas (scenario, hour, series, value),
+    en CSV o Parquet -> ScenarioBatch con arrays (escenarios × horas). Los perfiles usan las series
+    demand_MW, pv_avail_MW, hydro_max_MW y thermal_max_MW. Los escalares van con la hora vacía:
+    cost_pv, cost_hydro y cost_thermal (costs.csv), y hydro_energy_budget_MWh,
+    thermal_ramp_MW_per_h y hydro_ramp_MW_per_h (system_constraints.csv).
+  - La validación es vectorizada: faltantes, duplicados, valores negativos, horas fuera de rango y
+    horas con demanda mayor que la capacidad total (aviso).
+
+Uso:
+  python scripts/escenarios.py --to-long escenarios.csv data_caso_base data_escenario1 data_escenario2 data_escenario3
+  python scripts/escenarios.py --check escenarios.csv
+  python scripts/escenarios.py --benchmark 10000
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Serie del formato largo -> (archivo de la carpeta data_*, columna)
+PROFILE_SERIES = {
+    "demand_MW": ("demand_profile.csv", "demand_MW"),
+    "pv_avail_MW": ("pv_profile.csv", "pv_avail_MW"),
+    "hydro_max_MW": ("hydro_profile.csv", "hydro_max_MW"),
+    "thermal_max_MW": ("thermal_profile.csv", "thermal_max_MW"),
+}
+COST_SERIES = {"cost_pv": "pv", "cost_hydro": "hydro", "cost_thermal": "thermal"}
+COST_DEFAULTS = (5.0, 10.0, 90.0)
+CONSTRAINT_SERIES = ("hydro_energy_budget_MWh", "thermal_ramp_MW_per_h", "hydro_ramp_MW_per_h")
+SCALAR_SERIES = tuple(COST_SERIES) + CONSTRAINT_SERIES
+LONG_COLUMNS = ["scenario", "hour", "series", "value"]
+
+
+# =========================
+# Tipos
+# =========================
+
+@dataclass
+class ScenarioData:
+    """Entradas de un escenario; los perfiles son arrays indexados por hora (0..H-1)."""
+    name: str
+    hours: List[int]
+    demand: np.ndarray
+    pv_avail: np.ndarray
+    hydro_max: np.ndarray
+    thermal_max: np.ndarray
+    costs: Tuple[float, float, float]
+    hydro_budget: Optional[float] = None
+    ramp_thermal: Optional[float] = None
+    ramp_hydro: Optional[float] = None
+
+    def model_inputs(self) -> tuple:
+        """Argumentos posicionales de milp_model.build_model (la tupla de _read_csvs)."""
+        def as_map(a):
+            return dict(zip(self.hours, a.tolist()))
+        return (list(self.hours), as_map(self.demand), as_map(self.pv_avail), as_map(self.hydro_max),
+                as_map(self.thermal_max), tuple(self.costs), (self.hydro_budget, self.ramp_thermal, self.ramp_hydro))
+
+
+@dataclass
+class ScenarioBatch:
+    """
+    Muchos escenarios en columnas: perfiles (n × H) y escalares (n,). En hydro_budget y las rampas,
+    NaN significa 'sin límite' (None en ScenarioData).
+    """
+    names: np.ndarray
+    demand: np.ndarray
+    pv_avail: np.ndarray
+    hydro_max: np.ndarray
+    thermal_max: np.ndarray
+    costs: np.ndarray
+    hydro_budget: np.ndarray
+    ramp_thermal: np.ndarray
+    ramp_hydro: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def n_hours(self) -> int:
+        return self.demand.shape[1]
+
+    def scenario(self, i: int) -> ScenarioData:
+        def opt(x):
+            return None if np.isnan(x) else float(x)
+        return ScenarioData(str(self.names[i]), list(range(self.n_hours)), self.demand[i], self.pv_avail[i],
+                            self.hydro_max[i], self.thermal_max[i], tuple(float(c) for c in self.costs[i]),
+                            opt(self.hydro_budget[i]), opt(self.ramp_thermal[i]), opt(self.ramp_hydro[i]))
+
+    def __iter__(self):
+        return (self.scenario(i) for i in range(len(self)))
+
+    @classmethod
+    def from_scenarios(cls, scenarios: List[ScenarioData]) -> "ScenarioBatch":
+        def nan(x):
+            return np.nan if x is None else x
+        return cls(
+            names=np.array([s.name for s in scenarios], dtype=object),
+            demand=np.vstack([s.demand for s in scenarios]),
+            pv_avail=np.vstack([s.pv_avail for s in scenarios]),
+            hydro_max=np.vstack([s.hydro_max for s in scenarios]),
+            thermal_max=np.vstack([s.thermal_max for s in scenarios]),
+            costs=np.array([s.costs for s in scenarios], dtype=float),
+            hydro_budget=np.array([nan(s.hydro_budget) for s in scenarios], dtype=float),
+            ramp_thermal=np.array([nan(s.ramp_thermal) for s in scenarios], dtype=float),
+            ramp_hydro=np.array([nan(s.ramp_hydro) for s in scenarios], dtype=float),
+        )
+
+
+# =========================
+# Validación vectorizada
+# =========================
+
+def validate(batch: ScenarioBatch) -> List[str]:
+    """Errores (lanza ValueError) y avisos (se devuelven) sobre todo el lote a la vez."""
+    errors = []
+    profiles = {"demand_MW": batch.demand, "pv_avail_MW": batch.pv_avail,
+                "hydro_max_MW": batch.hydro_max, "thermal_max_MW": batch.thermal_max}
+    for series, a in profiles.items():
+        bad = ~np.isfinite(a)
+        if bad.any():
+            s, h = np.argwhere(bad)[0]
+            errors.append(f"{series}: {int(bad.sum())} valores faltantes o no finitos (p.ej. {batch.names[s]}, hora {h})")
+        neg = a < 0
+        if neg.any():
+            s, h = np.argwhere(neg)[0]
+            errors.append(f"{series}: {int(neg.sum())} valores negativos (p.ej. {batch.names[s]}, hora {h}: {a[s, h]:g})")
+    for label, a in (("costes", batch.costs), ("hydro_energy_budget_MWh", batch.hydro_budget),
+                     ("thermal_ramp_MW_per_h", batch.ramp_thermal), ("hydro_ramp_MW_per_h", batch.ramp_hydro)):
+        if (a < 0).any():
+            errors.append(f"{label}: {int((a < 0).sum())} valores negativos")
+    if errors:
+        raise ValueError("Escenarios no válidos:\n  " + "\n  ".join(errors))
+
+    warnings = []
+    short = batch.demand > batch.pv_avail + batch.hydro_max + batch.thermal_max + 1e-9
+    if short.any():
+        per_scen = short.sum(axis=1)
+        idx = np.flatnonzero(per_scen)
+        warnings.append(f"{len(idx)} escenarios con horas de demanda mayor que la capacidad total "
+                        f"(p.ej. {batch.names[idx[0]]}: {int(per_scen[idx[0]])} h); sin VoLL el MILP es infactible")
+    return warnings
+
+
+# =========================
+# Carpeta data_*
+# =========================
+
+def _read_table(path: Path) -> tuple:
+    with path.open(newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.reader(f))
+    header = [c.strip() for c in rows[0]]
+    return header, [r for r in rows[1:] if r and any(c.strip() for c in r)]
+
+
+def _read_profile(path: Path, column: str, n_hours: int | None) -> np.ndarray:
+    header, rows = _read_table(path)
+    miss = {"hour", column} - set(header)
+    if miss:
+        raise ValueError(f"CSV columns missing in {path.name}: {miss}")
+    ih, iv = header.index("hour"), header.index(column)
+    hours = np.array([int(float(r[ih])) for r in rows], dtype=np.int64)
+    values = np.array([float(r[iv]) for r in rows], dtype=float)
+    n = n_hours if n_hours is not None else len(hours)
+    if len(hours) != n or not np.array_equal(np.sort(hours), np.arange(n)):
+        raise ValueError(f"Se esperan horas 0..{n - 1} sin repetir en {path.name}")
+    out = np.empty(n, dtype=float)
+    out[hours] = values
+    return out
+
+
+def load_scenario_dir(data_dir, n_hours: int | None = 24) -> ScenarioData:
+    """Lee una carpeta data_* con los seis CSV (mismos nombres, columnas y valores por defecto que _read_csvs)."""
+    data_dir = Path(data_dir)
+    arrays = {series: _read_profile(data_dir / fname, col, n_hours) for series, (fname, col) in PROFILE_SERIES.items()}
+    n = len(arrays["demand_MW"])
+    if any(len(a) != n for a in arrays.values()):
+        raise ValueError(f"Los perfiles de {data_dir.name} no tienen el mismo número de horas")
+
+    header, rows = _read_table(data_dir / "costs.csv")
+    it, ic = header.index("technology"), header.index("cost_usd_per_mwh")
+    cost_map = {r[it].strip().lower(): float(r[ic]) for r in rows}
+    costs = tuple(cost_map.get(tech, default) for tech, default in zip(COST_SERIES.values(), COST_DEFAULTS))
+
+    header, rows = _read_table(data_dir / "system_constraints.csv")
+    ik, iv = header.index("key"), header.index("value")
+    constraint_map = {r[ik].strip(): float(r[iv]) for r in rows}
+    budget, ramp_th, ramp_hy = (constraint_map.get(k) for k in CONSTRAINT_SERIES)
+
+    scenario = ScenarioData(data_dir.name, list(range(n)), arrays["demand_MW"], arrays["pv_avail_MW"],
+                            arrays["hydro_max_MW"], arrays["thermal_max_MW"], costs, budget, ramp_th, ramp_hy)
+    validate(ScenarioBatch.from_scenarios([scenario]))
+    return scenario
+
+
+# =========================
+# Formato largo (muchos escenarios)
+# =========================
+
+def _read_long_frame(path: Path):
+    import pandas as pd
+
+    if path.suffix.lower() in (".parquet", ".pq"):
+        try:
+            df = pd.read_parquet(path)
+        except ImportError as ex:
+            raise ImportError("Leer Parquet requiere pyarrow o fastparquet (pip install pyarrow)") from ex
+    else:
+        df = pd.read_csv(path, dtype={"scenario": str, "series": str})
+    df.columns = [str(c).strip() for c in df.columns]
+    miss = set(LONG_COLUMNS) - set(df.columns)
+    if miss:
+        raise ValueError(f"Columnas faltantes en {path.name}: {miss} (se esperan {LONG_COLUMNS})")
+    return df
+
+
+def load_long(path, n_hours: int | None = None) -> ScenarioBatch:
+    """Archivo largo (scenario, hour, series, value) en CSV o Parquet -> ScenarioBatch validado."""
+    import pandas as pd
+
+    path = Path(path)
+    df = _read_long_frame(path)
+    scen_codes, names = pd.factorize(df["scenario"].astype(str), sort=False)
+    series = df["series"].astype(str).str.strip().to_numpy()
+    values = pd.to_numeric(df["value"], errors="coerce").to_numpy(dtype=float)
+    hours = pd.to_numeric(df["hour"], errors="coerce").to_numpy(dtype=float)
+    n_scen = len(names)
+
+    known = list(PROFILE_SERIES) + list(SCALAR_SERIES)
+    series_code = pd.Categorical(series, categories=known).codes
+    if (series_code < 0).any():
+        unknown = sorted(set(series[series_code < 0]))[:5]
+        raise ValueError(f"Series desconocidas en {path.name}: {unknown}")
+
+    # Perfiles: (serie, escenario, hora)
+    is_prof = series_code < len(PROFILE_SERIES)
+    ph = hours[is_prof]
+    if np.isnan(ph).any() or (ph < 0).any() or (ph != np.floor(ph)).any():
+        raise ValueError(f"{path.name}: horas no enteras, negativas o vacías en filas de perfil")
+    ph = ph.astype(np.int64)
+    H = n_hours if n_hours is not None else int(ph.max()) + 1
+    if (ph >= H).any():
+        raise ValueError(f"{path.name}: horas fuera de 0..{H - 1}")
+    flat = (series_code[is_prof].astype(np.int64) * n_scen + scen_codes[is_prof]) * H + ph
+    counts = np.bincount(flat, minlength=len(PROFILE_SERIES) * n_scen * H)
+    if (counts > 1).any():
+        k = int(np.flatnonzero(counts > 1)[0])
+        s, h = divmod(k, H)
+        raise ValueError(f"{path.name}: valores duplicados, p.ej. {known[s // n_scen]} de {names[s % n_scen]} hora {h}")
+    prof = np.full(len(PROFILE_SERIES) * n_scen * H, np.nan)
+    prof[flat] = values[is_prof]
+    prof = prof.reshape(len(PROFILE_SERIES), n_scen, H)
+
+    # Escalares: (serie, escenario); NaN = no indicado
+    sc_code = series_code[~is_prof].astype(np.int64) - len(PROFILE_SERIES)
+    flat_s = sc_code * n_scen + scen_codes[~is_prof]
+    counts_s = np.bincount(flat_s, minlength=len(SCALAR_SERIES) * n_scen)
+    if (counts_s > 1).any():
+        k = int(np.flatnonzero(counts_s > 1)[0])
+        raise ValueError(f"{path.name}: escalar duplicado {SCALAR_SERIES[k // n_scen]} en {names[k % n_scen]}")
+    scal = np.full(len(SCALAR_SERIES) * n_scen, np.nan)
+    scal[flat_s] = values[~is_prof]
+    scal = scal.reshape(len(SCALAR_SERIES), n_scen)
+    costs = scal[:len(COST_SERIES)].T.copy()
+    costs = np.where(np.isnan(costs), np.array(COST_DEFAULTS), costs)
+
+    batch = ScenarioBatch(
+        names=np.asarray(names, dtype=object),
+        demand=np.ascontiguousarray(prof[0]), pv_avail=np.ascontiguousarray(prof[1]),
+        hydro_max=np.ascontiguousarray(prof[2]), thermal_max=np.ascontiguousarray(prof[3]),
+        costs=costs, hydro_budget=scal[3].copy(), ramp_thermal=scal[4].copy(), ramp_hydro=scal[5].copy(),
+    )
+    for msg in validate(batch):
+        print(f"[AVISO] {msg}")
+    return batch
+
+
+def write_long(batch: ScenarioBatch, path) -> None:
+    """Escribe el lote en formato largo (CSV o Parquet según la extensión)."""
+    import pandas as pd
+
+    path = Path(path)
+    n, H = len(batch), batch.n_hours
+    profiles = [batch.demand, batch.pv_avail, batch.hydro_max, batch.thermal_max]
+    frames = [pd.DataFrame({
+        "scenario": np.repeat(batch.names, H),
+        "hour": np.tile(np.arange(H), n),
+        "series": series,
+        "value": a.ravel(),
+    }) for series, a in zip(PROFILE_SERIES, profiles)]
+    scalars = [batch.costs[:, 0], batch.costs[:, 1], batch.costs[:, 2],
+               batch.hydro_budget, batch.ramp_thermal, batch.ramp_hydro]
+    for series, a in zip(SCALAR_SERIES, scalars):
+        keep = ~np.isnan(a)
+        frames.append(pd.DataFrame({"scenario": batch.names[keep], "hour": pd.NA, "series": series, "value": a[keep]}))
+    df = pd.concat(frames, ignore_index=True)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() in (".parquet", ".pq"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def synthetic_batch(base: ScenarioData, n: int, seed: int = 0, sigma: float = 0.1) -> ScenarioBatch:
+    """n escenarios con ruido multiplicativo en demanda y PV (para pruebas de carga)."""
+    rng = np.random.default_rng(seed)
+    batch = ScenarioBatch.from_scenarios([base])
+    rep = lambda a: np.repeat(a, n, axis=0)
+    return ScenarioBatch(
+        names=np.array([f"{base.name}_{i}" for i in range(n)], dtype=object),
+        demand=np.round(rep(batch.demand) * (1 + sigma * rng.standard_normal((n, batch.n_hours))).clip(0.5), 3),
+        pv_avail=np.round(rep(batch.pv_avail) * (1 + sigma * rng.standard_normal((n, batch.n_hours))).clip(0), 3),
+        hydro_max=rep(batch.hydro_max), thermal_max=rep(batch.thermal_max), costs=rep(batch.costs),
+        hydro_budget=rep(batch.hydro_budget), ramp_thermal=rep(batch.ramp_thermal), ramp_hydro=rep(batch.ramp_hydro),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga columnar de escenarios (carpetas data_* o formato largo)")
+    parser.add_argument("--to-long", type=str, default=None, metavar="SALIDA",
+                        help="Convierte las carpetas data_* indicadas a un archivo largo (.csv o .parquet)")
+    parser.add_argument("--check", type=str, default=None, metavar="ARCHIVO", help="Carga y valida un archivo largo")
+    parser.add_argument("--benchmark", type=int, default=None, metavar="N",
+                        help="Genera N escenarios sintéticos, los escribe en formato largo y mide la carga")
+    parser.add_argument("dirs", nargs="*", help="Carpetas data_*")
+    args = parser.parse_args()
+
+    repo = Path(__file__).resolve().parent.parent
+    if args.to_long:
+        batch = ScenarioBatch.from_scenarios([load_scenario_dir(d) for d in args.dirs])
+        write_long(batch, args.to_long)
+        print(f"{len(batch)} escenarios -> {args.to_long}")
+    if args.check:
+        t0 = time.perf_counter()
+        batch = load_long(args.check)
+        print(f"{len(batch)} escenarios × {batch.n_hours} h válidos en {time.perf_counter() - t0:.2f} s")
+    if args.benchmark:
+        import tempfile
+
+        base = load_scenario_dir(Path(args.dirs[0]) if args.dirs else repo / "data_caso_base")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "escenarios.csv"
+            t0 = time.perf_counter()
+            write_long(synthetic_batch(base, args.benchmark), path)
+            t_write = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            batch = load_long(path)
+            t_load = time.perf_counter() - t0
+            size_mb = path.stat().st_size / 1e6
+        print(f"{len(batch)} escenarios ({size_mb:.1f} MB): escritura {t_write:.2f} s, carga + validación {t_load:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+flota_milp.py
+
+Despacho MILP a nivel de unidad: cada central tiene su tecnología, perfil de disponibilidad,
+coste y rampa, y el modelo se indexa por (unidad, hora). Las variables y los coeficientes
+de cada familia de restricciones salen de operaciones NumPy sobre la matriz de índices
+(unidad × hora), y cada fila se crea directamente como LinearExpression, sin expresiones de
+Pyomo término a término. Las capacidades horarias son cotas de las variables, no restricciones.
+Pyomo sigue creando un objeto por fila (MatrixConstraint, su API por matriz CSR, no funciona con
+el escritor LP ni con appsi en Pyomo 6.x): la construcción es ~2× más rápida que con reglas por
+índice, no de otro orden (ver benchmark_flota.py).
+
+Entradas en la carpeta de datos (además de demand_profile.csv y system_constraints.csv):
+  units.csv          unit_id, technology, capacity_MW, cost_usd_per_mwh, ramp_MW_per_h, profile
+                     (ramp_MW_per_h y profile pueden ir vacíos: sin rampa / disponibilidad plana)
+  unit_profiles.csv  hour + una columna por perfil con el factor de disponibilidad [0, 1]
+Si no existe units.csv se usan los perfiles agregados de siempre como tres unidades
+(pv, hydro, thermal), con el mismo resultado que milp_model.py.
+
+El presupuesto hydro_energy_budget_MWh limita la suma de todas las unidades 'hydro'.
+
+Uso:
+  python scripts/flota_milp.py --data-dir data_caso_base --results-dir results_caso_base --solver appsi_highs
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+import milp_model
+
+# Columna de milp_dispatch.csv por tecnología (las demás se exportan como <tech>_gen_MW)
+TECH_COLUMNS = {"pv": "PV_gen_MW", "hydro": "Hydro_gen_MW", "thermal": "Thermal_gen_MW"}
+
+
+# =========================
+# Datos de la flota
+# =========================
+
+@dataclass
+class Fleet:
+    """Flota de U unidades sobre T horas; `avail` es la potencia disponible (U × T, MW)."""
+    unit_ids: List[str]
+    technology: List[str]
+    avail: np.ndarray
+    cost: np.ndarray
+    ramp: np.ndarray                 # NaN = sin límite de rampa
+    hours: List[int]
+    demand: np.ndarray
+    hydro_budget: Optional[float] = None
+
+    @property
+    def n_units(self) -> int:
+        return len(self.unit_ids)
+
+    @property
+    def n_hours(self) -> int:
+        return len(self.hours)
+
+
+def _read_rows(path: Path) -> list:
+    with path.open(newline="", encoding="utf-8-sig") as f:
+        return [{k.strip(): (v or "").strip() for k, v in r.items()} for r in csv.DictReader(f)]
+
+
+def _read_system_constraints(data_dir: Path) -> dict:
+    path = data_dir / "system_constraints.csv"
+    if not path.exists():
+        return {}
+    return {r["key"]: float(r["value"]) for r in _read_rows(path)}
+
+
+def read_fleet(data_dir: Path) -> Fleet:
+    units_path = data_dir / "units.csv"
+    if not units_path.exists():
+        return fleet_from_aggregate(data_dir)
+
+    demand_rows = _read_rows(data_dir / "demand_profile.csv")
+    hours = [int(r["hour"]) for r in demand_rows]
+    demand = np.array([float(r["demand_MW"]) for r in demand_rows])
+
+    units = _read_rows(units_path)
+    if not units:
+        raise ValueError(f"{units_path} no tiene unidades")
+    missing = {"unit_id", "technology", "capacity_MW", "cost_usd_per_mwh"} - set(units[0])
+    if missing:
+        raise ValueError(f"Faltan columnas en units.csv: {missing}")
+
+    profiles = {}
+    profiles_path = data_dir / "unit_profiles.csv"
+    if profiles_path.exists():
+        rows = _read_rows(profiles_path)
+        by_hour = {int(r["hour"]): r for r in rows}
+        if sorted(by_hour) != sorted(hours):
+            raise ValueError("unit_profiles.csv debe cubrir las mismas horas que demand_profile.csv")
+        for name in rows[0]:
+            if name != "hour":
+                profiles[name] = np.array([float(by_hour[h][name]) for h in hours])
+
+    capacity = np.array([float(u["capacity_MW"]) for u in units])
+    factors = np.ones((len(units), len(hours)))
+    for i, u in enumerate(units):
+        name = u.get("profile", "")
+        if name:
+            if name not in profiles:
+                raise ValueError(f"Unidad {u['unit_id']}: perfil '{name}' no está en unit_profiles.csv")
+            factors[i] = profiles[name]
+    if (factors < 0).any() or (factors > 1).any():
+        raise ValueError("Los factores de unit_profiles.csv deben estar en [0, 1]")
+
+    ramp = np.array([float(u["ramp_MW_per_h"]) if u.get("ramp_MW_per_h") else np.nan for u in units])
+    return Fleet(
+        unit_ids=[u["unit_id"] for u in units],
+        technology=[u["technology"].lower() for u in units],
+        avail=capacity[:, None] * factors,
+        cost=np.array([float(u["cost_usd_per_mwh"]) for u in units]),
+        ramp=ramp,
+        hours=hours,
+        demand=demand,
+        hydro_budget=_read_system_constraints(data_dir).get("hydro_energy_budget_MWh"),
+    )
+
+
+def fleet_from_aggregate(data_dir: Path) -> Fleet:
+    """Las tres tecnologías agregadas de milp_model._read_csvs como tres unidades."""
+    hours, demand_map, pv_map, hydro_map, thermal_map, costs, (budget, ramp_th, ramp_hy) = milp_model._read_csvs(data_dir)
+    return Fleet(
+        unit_ids=["pv", "hydro", "thermal"],
+        technology=["pv", "hydro", "thermal"],
+        avail=np.array([[m[h] for h in hours] for m in (pv_map, hydro_map, thermal_map)]),
+        cost=np.array(costs, dtype=float),
+        ramp=np.array([np.nan,
+                       ramp_hy if ramp_hy is not None and ramp_hy >= 0 else np.nan,
+                       ramp_th if ramp_th is not None and ramp_th >= 0 else np.nan]),
+        hours=list(hours),
+        demand=np.array([demand_map[h] for h in hours]),
+        hydro_budget=budget,
+    )
+
+
+def synthetic_fleet(n_units: int, n_hours: int = 24, seed: int = 0, base: Fleet | None = None) -> Fleet:
+    """
+    Flota sintética de n_units centrales (≈30 % PV, 20 % hidro, 50 % térmica) sobre n_hours,
+    con la forma de demanda y PV del caso base repetida y escalada para que sea factible.
+    """
+    rng = np.random.default_rng(seed)
+    if base is None:
+        base = fleet_from_aggregate(Path(__file__).resolve().parent.parent / "data_caso_base")
+    reps = -(-n_hours // base.n_hours)
+    demand_shape = np.tile(base.demand, reps)[:n_hours]
+    pv_shape = np.tile(base.avail[0] / max(base.avail[0].max(), 1.0), reps)[:n_hours]
+
+    n_pv = max(1, int(round(0.3 * n_units))) if n_units >= 3 else 1
+    n_hy = max(1, int(round(0.2 * n_units))) if n_units >= 3 else 1
+    n_th = max(1, n_units - n_pv - n_hy)
+    tech = ["pv"] * n_pv + ["hydro"] * n_hy + ["thermal"] * n_th
+
+    scale = n_units / 3.0
+    demand = demand_shape * scale
+    peak = demand.max()
+    cap = np.empty(len(tech))
+    cap[:n_pv] = rng.uniform(0.5, 1.5, n_pv) * (0.5 * peak / n_pv)
+    cap[n_pv:n_pv + n_hy] = rng.uniform(0.5, 1.5, n_hy) * (0.5 * peak / n_hy)
+    cap[n_pv + n_hy:] = rng.uniform(0.5, 1.5, n_th) * (0.9 * peak / n_th)
+
+    factors = np.ones((len(tech), n_hours))
+    factors[:n_pv] = np.clip(pv_shape * rng.uniform(0.8, 1.0, (n_pv, 1)), 0.0, 1.0)
+    cost = np.concatenate([rng.uniform(3, 8, n_pv), rng.uniform(8, 15, n_hy), rng.uniform(40, 150, n_th)])
+    ramp = np.full(len(tech), np.nan)
+    ramp[n_pv:] = cap[n_pv:] * rng.uniform(0.2, 0.5, n_hy + n_th)
+
+    return Fleet(
+        unit_ids=[f"{t}_{i:03d}" for i, t in enumerate(tech)],
+        technology=tech,
+        avail=cap[:, None] * factors,
+        cost=cost,
+        ramp=ramp,
+        hours=list(range(n_hours)),
+        demand=demand,
+        hydro_budget=0.6 * float(cap[n_pv:n_pv + n_hy].sum()) * n_hours,
+    )
+
+
+# =========================
+# Modelo
+# =========================
+
+def _add_rows(m, name: str, rows: list) -> None:
+    """Añade un bloque de filas (lb, expr, ub) ya construidas como una Constraint indexada por posición."""
+    import pyomo.environ as pyo
+
+    setattr(m, name, pyo.Constraint(range(len(rows)), rule=rows))
+
+
+def build_fleet_model(fleet: Fleet, voll: float | None = None):
+    """
+    Modelo (unidad, hora) con filas precalculadas: la variable P[k] corresponde a
+    k = unidad·T + hora; las variables y coeficientes de cada familia de filas se toman con
+    índices NumPy sobre la matriz (U × T) de variables.
+    """
+    import pyomo.environ as pyo
+    from pyomo.core.expr.numeric_expr import LinearExpression
+
+    U, T = fleet.n_units, fleet.n_hours
+    idx = np.arange(U * T).reshape(U, T)
+    ub = fleet.avail.ravel().tolist()
+
+    m = pyo.ConcreteModel()
+    m.P = pyo.Var(range(U * T), domain=pyo.NonNegativeReals, bounds=lambda m, k: (0.0, ub[k]))
+    x = list(m.P.values())
+    xv = np.empty(U * T, dtype=object)
+    xv[:] = x
+
+    # Balance por hora: Σ_u P[u,t] (+ ENS[t]) = demanda[t]; fila t = columna t de la matriz de variables
+    cols = xv[idx.T]
+    if voll is not None:
+        m.ENS = pyo.Var(range(T), domain=pyo.NonNegativeReals)
+        ens = list(m.ENS.values())
+        ens_col = np.empty((T, 1), dtype=object)
+        ens_col[:, 0] = ens
+        cols = np.hstack([cols, ens_col])
+    ones = [1.0] * cols.shape[1]
+    _add_rows(m, "balance", [
+        (d, LinearExpression(constant=0.0, linear_coefs=ones, linear_vars=vs), d)
+        for d, vs in zip(fleet.demand.tolist(), cols.tolist())
+    ])
+
+    # Rampas: -r_u <= P[u,t] - P[u,t-1] <= r_u para las unidades con rampa finita
+    has_ramp = np.flatnonzero(np.isfinite(fleet.ramp))
+    if has_ramp.size and T > 1:
+        pares = np.stack([xv[idx[has_ramp, 1:].ravel()], xv[idx[has_ramp, :-1].ravel()]], axis=1)
+        r = np.repeat(fleet.ramp[has_ramp], T - 1)
+        _add_rows(m, "ramp", [
+            (-ri, LinearExpression(constant=0.0, linear_coefs=[1.0, -1.0], linear_vars=vs), ri)
+            for vs, ri in zip(pares.tolist(), r.tolist())
+        ])
+
+    # Presupuesto hídrico diario sobre todas las unidades 'hydro'
+    hydro = np.flatnonzero(np.array(fleet.technology) == "hydro")
+    if fleet.hydro_budget is not None and hydro.size:
+        vs = xv[idx[hydro].ravel()].tolist()
+        m.hydro_budget = pyo.Constraint(
+            expr=LinearExpression(constant=0.0, linear_coefs=[1.0] * len(vs), linear_vars=vs)
+            <= float(fleet.hydro_budget))
+
+    coefs = np.repeat(fleet.cost, T).tolist()
+    vars_ = x
+    if voll is not None:
+        coefs = coefs + [float(voll)] * T
+        vars_ = x + ens
+    m.total_cost = pyo.Objective(expr=LinearExpression(constant=0.0, linear_coefs=coefs, linear_vars=vars_),
+                                 sense=pyo.minimize)
+    return m
+
+
+def build_fleet_model_rules(fleet: Fleet, voll: float | None = None):
+    """Mismo modelo con Var/Constraint indexadas por (unidad, hora) y reglas Python (referencia para benchmarks)."""
+    import pyomo.environ as pyo
+
+    U, T = fleet.n_units, fleet.n_hours
+    m = pyo.ConcreteModel()
+    m.U = pyo.RangeSet(0, U - 1)
+    m.T = pyo.RangeSet(0, T - 1)
+    m.P = pyo.Var(m.U, m.T, domain=pyo.NonNegativeReals)
+
+    def cap_rule(m, u, t): return m.P[u, t] <= float(fleet.avail[u, t])
+    m.cap = pyo.Constraint(m.U, m.T, rule=cap_rule)
+
+    if voll is not None:
+        m.ENS = pyo.Var(m.T, domain=pyo.NonNegativeReals)
+
+    def balance_rule(m, t):
+        gen = sum(m.P[u, t] for u in m.U)
+        if voll is not None:
+            gen += m.ENS[t]
+        return gen == float(fleet.demand[t])
+    m.balance = pyo.Constraint(m.T, rule=balance_rule)
+
+    def ramp_up(m, u, t):
+        if t == 0 or not np.isfinite(fleet.ramp[u]): return pyo.Constraint.Skip
+        return m.P[u, t] - m.P[u, t-1] <= float(fleet.ramp[u])
+    def ramp_down(m, u, t):
+        if t == 0 or not np.isfinite(fleet.ramp[u]): return pyo.Constraint.Skip
+        return m.P[u, t-1] - m.P[u, t] <= float(fleet.ramp[u])
+    m.ramp_up = pyo.Constraint(m.U, m.T, rule=ramp_up)
+    m.ramp_down = pyo.Constraint(m.U, m.T, rule=ramp_down)
+
+    hydro = [u for u in range(U) if fleet.technology[u] == "hydro"]
+    if fleet.hydro_budget is not None and hydro:
+        m.hydro_budget = pyo.Constraint(expr=sum(m.P[u, t] for u in hydro for t in m.T) <= float(fleet.hydro_budget))
+
+    def total_cost_rule(m):
+        cost = sum(float(fleet.cost[u]) * m.P[u, t] for u in m.U for t in m.T)
+        if voll is not None:
+            cost += voll * sum(m.ENS[t] for t in m.T)
+        return cost
+    m.total_cost = pyo.Objective(rule=total_cost_rule, sense=pyo.minimize)
+    return m
+
+
+def dispatch_matrix(model, fleet: Fleet) -> np.ndarray:
+    """Potencia despachada (U × T) del modelo de build_fleet_model."""
+    return np.array([v.value or 0.0 for v in model.P.values()]).reshape(fleet.n_units, fleet.n_hours)
+
+
+# =========================
+# Exportación
+# =========================
+
+def export_dispatch(P: np.ndarray, fleet: Fleet, summary: dict, results_dir: Path) -> None:
+    results_dir.mkdir(parents=True, exist_ok=True)
+    tech = np.array(fleet.technology)
+    extra = sorted(set(fleet.technology) - set(TECH_COLUMNS))
+    columns = ["hour"] + list(TECH_COLUMNS.values()) + [f"{t}_gen_MW" for t in extra] + ["Demand_MW"]
+    by_tech = {t: P[tech == t].sum(axis=0) for t in set(fleet.technology)}
+
+    with (results_dir / "milp_dispatch.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(columns)
+        for k, h in enumerate(fleet.hours):
+            row = [h] + [float(by_tech[t][k]) if t in by_tech else 0.0 for t in TECH_COLUMNS]
+            row += [float(by_tech[t][k]) for t in extra] + [float(fleet.demand[k])]
+            w.writerow(row)
+
+    with (results_dir / "milp_dispatch_unidades.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(["unit_id", "technology", "hour", "gen_MW", "avail_MW"])
+        for u, uid in enumerate(fleet.unit_ids):
+            for k, h in enumerate(fleet.hours):
+                w.writerow([uid, fleet.technology[u], h, float(P[u, k]), float(fleet.avail[u, k])])
+
+    with (results_dir / "milp_summary.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(summary), lineterminator="\n")
+        w.writeheader()
+        w.writerow(summary)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Despacho MILP por unidad (unidad × hora) con filas precalculadas")
+    parser.add_argument("--data-dir", type=str, required=True, help="Carpeta data_* (con units.csv opcional)")
+    parser.add_argument("--results-dir", type=str, default=None, help="Salida (por defecto, results/ junto a data)")
+    parser.add_argument("--solver", type=str, default="glpk", help="Nombre de solver Pyomo (glpk, cbc, appsi_highs, etc.)")
+    parser.add_argument("--glpk-exe", type=str, default=None, help="Ruta a glpsol (por defecto, el del PATH)")
+    parser.add_argument("--voll", type=float, default=None, help="Si se indica, permite ENS penalizada con este VoLL [USD/MWh]")
+    args = parser.parse_args()
+
+    here = Path(__file__).resolve()
+    data_dir = Path(args.data_dir)
+    results_dir = Path(args.results_dir) if args.results_dir else (here.parent.parent / "results")
+
+    fleet = read_fleet(data_dir)
+    model = build_fleet_model(fleet, voll=args.voll)
+    summary = milp_model.solve_model(model, solver_name=args.solver, glpk_executable=args.glpk_exe)
+    P = dispatch_matrix(model, fleet)
+    export_dispatch(P, fleet, summary, results_dir)
+
+    print(f"=== MILP por unidad ({fleet.n_units} unidades × {fleet.n_hours} h) ===")
+    print(f"Total cost [USD]: {summary['total_cost_usd']:.2f}")
+    print(f"Solver status: {summary['solver_status']} | Termination: {summary['termination_condition']}")
+    print(f"Results: {results_dir / 'milp_dispatch.csv'}  |  {results_dir / 'milp_dispatch_unidades.csv'}")
+
+
+if __name__ == "__main__":
+    main()
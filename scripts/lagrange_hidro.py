@@ -0,0 +1,320 @@
+"""
+lagrange_hidro.py
+
+Descomposición lagrangiana del presupuesto hídrico para horizontes de varios días/semanas.
+
+El horizonte son D días de despacho diario (milp_model.build_model, rampas dentro de cada día)
+acoplados solo por un presupuesto hídrico total B. Se relaja Σ_d hidro_d ≤ B con un
+multiplicador λ ≥ 0 (valor del agua, USD/MWh):
+
+  L(λ) = Σ_d min_x [coste_d(x) + λ·hidro_d(x)] − λ·B
+
+- Los subproblemas diarios se resuelven en paralelo en un pool de procesos; cada worker
+  construye sus modelos una vez y en cada iteración solo cambia el coste hídrico (c_hidro + λ).
+- λ se actualiza por subgradiente (g = Σ hidro_d − B) con paso de Polyak y θ decreciente.
+- Recuperación primal: con el mejor λ, el presupuesto se reparte entre días en proporción al
+  uso hídrico de cada día y se resuelve cada día con su cuota (solución factible = cota superior).
+
+Se reportan cota dual (inferior), cota primal (superior), gap y tiempos por iteración; cada
+iteración cuesta O(D), así que el tiempo total crece linealmente con el horizonte.
+
+Uso:
+  python scripts/lagrange_hidro.py --data-dir data_caso_base --days 364 --budget-factor 0.8 \\
+      --workers 8 --solver appsi_highs --results-dir results_caso_base
+  (Opcional) --profiles horizonte.csv   (day,hour,demand_MW,pv_avail_MW[,hydro_max_MW,thermal_max_MW])
+  (Opcional) --reference                 (resuelve también el modelo monolítico para comparar)
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import time
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+import milp_model
+
+ITER_COLUMNS = ["iter", "lambda", "dual_bound", "primal_bound", "gap", "subgradient", "step", "wall_s", "subproblems_s"]
+
+
+# =========================
+# Horizonte
+# =========================
+
+def load_horizon(data_dir: Path, days: int, profiles: Path | None = None, perturb: float = 0.0, seed: int = 0) -> dict:
+    """Perfiles (D × 24) del horizonte: desde --profiles o repitiendo el día de data_dir (con ruido opcional)."""
+    hours, demand_map, pv_map, hydro_map, thermal_map, costs, (budget, ramp_th, ramp_hy) = milp_model._read_csvs(data_dir)
+    base = {
+        "demand": np.array([demand_map[h] for h in hours]),
+        "pv": np.array([pv_map[h] for h in hours]),
+        "hydro": np.array([hydro_map[h] for h in hours]),
+        "thermal": np.array([thermal_map[h] for h in hours]),
+    }
+    if profiles is not None:
+        cols = {"demand": "demand_MW", "pv": "pv_avail_MW", "hydro": "hydro_max_MW", "thermal": "thermal_max_MW"}
+        with profiles.open(newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.DictReader(f))
+        days = max(int(r["day"]) for r in rows) + 1
+        arr = {k: np.tile(v, (days, 1)).astype(float) for k, v in base.items()}
+        for r in rows:
+            d, h = int(r["day"]), int(r["hour"])
+            for k, c in cols.items():
+                if r.get(c):
+                    arr[k][d, h] = float(r[c])
+    else:
+        arr = {k: np.tile(v, (days, 1)).astype(float) for k, v in base.items()}
+        if perturb > 0:
+            rng = np.random.default_rng(seed)
+            arr["demand"] *= rng.normal(1.0, perturb, (days, 1)).clip(0.5, 1.5)
+            arr["pv"] *= rng.uniform(1.0 - 2 * perturb, 1.0, (days, 1)).clip(0.0, 1.0)
+    return {
+        "hours": list(hours), "days": days, "costs": costs,
+        "daily_budget": budget, "ramp_th": ramp_th, "ramp_hy": ramp_hy, **arr,
+    }
+
+
+def _day_inputs(hz: dict, d: int, cost_hydro: float | None = None):
+    hours = hz["hours"]
+    maps = [dict(zip(hours, hz[k][d].tolist())) for k in ("demand", "pv", "hydro", "thermal")]
+    c_pv, c_hy, c_th = hz["costs"]
+    # Presupuesto del día: no vinculante (suma de capacidad hidro); la recuperación primal lo fija
+    return (hours, *maps, (c_pv, c_hy if cost_hydro is None else cost_hydro, c_th),
+            (float(hz["hydro"][d].sum()), hz["ramp_th"], hz["ramp_hy"]))
+
+
+# =========================
+# Workers
+# =========================
+
+_W = {}
+
+
+def _init_worker(hz: dict, solver_name: str, glpk_executable, voll: float):
+    _W.update(hz=hz, models={}, solver_name=solver_name, glpk_executable=glpk_executable, voll=voll)
+
+
+def _day_model(d: int):
+    if d not in _W["models"]:
+        model = milp_model.build_model(*_day_inputs(_W["hz"], d), voll=_W["voll"])
+        solver = milp_model.make_solver(_W["solver_name"], _W["glpk_executable"])
+        _W["models"][d] = (model, solver)
+    return _W["models"][d]
+
+
+def _solve_days(task):
+    """Resuelve un bloque de días con precio del agua λ (y cuota hídrica por día, si se da)."""
+    import pyomo.environ as pyo
+
+    lam, days, quotas, want_dispatch = task
+    c_hy = _W["hz"]["costs"][1]
+    out = []
+    for d in days:
+        model, solver = _day_model(d)
+        model.cost_hydro = c_hy + lam
+        model.hydro_budget = float(quotas[d]) if quotas is not None else float(_W["hz"]["hydro"][d].sum())
+        t0 = time.perf_counter()
+        summary = milp_model.solve_model(model, solver=solver)
+        elapsed = time.perf_counter() - t0
+        hydro = sum(pyo.value(model.P_hydro[t]) for t in model.T)
+        row = {
+            "day": d,
+            "objective": summary["total_cost_usd"],
+            "hydro_mwh": hydro,
+            "cost_usd": summary["total_cost_usd"] - lam * hydro,
+            "ens_mwh": sum(pyo.value(model.ENS[t]) for t in model.T),
+            "solve_s": elapsed,
+        }
+        if want_dispatch:
+            row["dispatch"] = milp_model.extract_dispatch(model)
+        out.append(row)
+    return out
+
+
+# =========================
+# Subgradiente y recuperación primal
+# =========================
+
+def _chunks(days: int, n: int):
+    size = max(1, -(-days // n))
+    return [list(range(i, min(days, i + size))) for i in range(0, days, size)]
+
+
+def _map_days(pool, chunks, lam, quotas=None, want_dispatch=False):
+    rows = []
+    for part in pool.imap_unordered(_solve_days, [(lam, c, quotas, want_dispatch) for c in chunks]):
+        rows.extend(part)
+    return sorted(rows, key=lambda r: r["day"])
+
+
+def _recover(pool, chunks, rows, budget: float, want_dispatch: bool = False):
+    """Recuperación primal: cuotas diarias proporcionales al uso hídrico de `rows`, a coste real."""
+    use = np.array([r["hydro_mwh"] for r in rows])
+    scale = min(1.0, budget / use.sum()) if use.sum() > 0 else 1.0
+    return _map_days(pool, chunks, 0.0, quotas=(use * scale).tolist(), want_dispatch=want_dispatch)
+
+
+def solve_lagrangian(hz: dict, budget: float, workers: int, solver_name: str = "glpk", glpk_executable=None,
+                     voll: float = 1000.0, max_iter: int = 50, tol: float = 1e-4, lam0: float = 0.0,
+                     verbose: bool = True) -> dict:
+    c_pv, c_hy, c_th = hz["costs"]
+    ctx = get_context("spawn")
+    chunks = _chunks(hz["days"], workers * 4)
+    history = []
+    lam, theta, stall = lam0, 1.0, 0
+    lb, ub = -np.inf, np.inf
+    best_lam, best_rows, best_primal = lam0, None, None
+    t_start = time.perf_counter()
+
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(hz, solver_name, glpk_executable, voll)) as pool:
+        for k in range(1, max_iter + 1):
+            t0 = time.perf_counter()
+            rows = _map_days(pool, chunks, lam)
+            hydro = sum(r["hydro_mwh"] for r in rows)
+            dual = sum(r["objective"] for r in rows) - lam * budget
+            g = hydro - budget
+
+            if g <= 1e-6:
+                cost = sum(r["cost_usd"] for r in rows)
+                if cost < ub:
+                    ub, best_primal = cost, rows
+            if best_rows is None or dual > lb + 1e-9 * max(1.0, abs(lb)):
+                lb, best_lam, best_rows, stall = dual, lam, rows, 0
+                if g > 1e-6:
+                    rec = _recover(pool, chunks, rows, budget)
+                    cost = sum(r["cost_usd"] for r in rec)
+                    if cost < ub:
+                        ub, best_primal = cost, rec
+            else:
+                stall += 1
+                if stall >= 3:
+                    theta, stall = theta / 2.0, 0
+
+            gap = max(0.0, (ub - lb) / abs(ub)) if np.isfinite(ub) and ub else np.inf
+            # Objetivo de Polyak: la cota primal si existe; si no, estimación pesimista del coste de
+            # sustituir el exceso de agua por térmica.
+            target = ub if np.isfinite(ub) else dual + abs(g) * max(c_th - c_hy, 1.0)
+            step = theta * (target - dual) / (g * g) if abs(g) > 1e-9 else 0.0
+            history.append({
+                "iter": k, "lambda": lam, "dual_bound": dual, "primal_bound": ub if np.isfinite(ub) else None,
+                "gap": gap if np.isfinite(gap) else None, "subgradient": g, "step": step,
+                "wall_s": time.perf_counter() - t0, "subproblems_s": sum(r["solve_s"] for r in rows),
+            })
+            if verbose:
+                print(f"[it {k:>3}] λ={lam:9.4f}  L(λ)={dual:,.2f}  UB={ub:,.2f}  g={g:,.1f}  "
+                      f"gap={gap:.3%}  ({history[-1]['wall_s']:.2f} s)")
+            if gap <= tol or (abs(g) <= 1e-6) or (lam == 0.0 and g <= 0):
+                break
+            lam = max(0.0, lam + step * g)
+
+        # Despacho horario de la mejor solución factible (cuotas = su uso hídrico por día)
+        t0 = time.perf_counter()
+        if best_primal is None:
+            best_primal = _recover(pool, chunks, best_rows, budget)
+        quotas = [r["hydro_mwh"] + 1e-6 for r in best_primal]
+        best_primal = _map_days(pool, chunks, 0.0, quotas=quotas, want_dispatch=True)
+        ub = min(ub, sum(r["cost_usd"] for r in best_primal))
+        recovery_s = time.perf_counter() - t0
+        pool.close()
+        pool.join()
+
+    gap = max(0.0, (ub - lb) / abs(ub)) if ub else 0.0
+    return {
+        "history": history, "lambda": best_lam, "dual_bound": lb, "primal_bound": ub, "gap": gap,
+        "days": best_primal, "recovery_s": recovery_s, "wall_s": time.perf_counter() - t_start,
+    }
+
+
+def solve_reference(hz: dict, budget: float, solver_name: str, glpk_executable, voll: float) -> dict:
+    """Modelo monolítico (un bloque por día + presupuesto total) para validar la descomposición."""
+    import pyomo.environ as pyo
+
+    t0 = time.perf_counter()
+    ref = pyo.ConcreteModel()
+    objs = []
+    for d in range(hz["days"]):
+        blk = milp_model.build_model(*_day_inputs(hz, d), voll=voll)
+        blk.total_cost.deactivate()
+        ref.add_component(f"dia{d}", blk)
+        objs.append(blk.total_cost.expr)
+    ref.budget = pyo.Constraint(expr=sum(ref.component(f"dia{d}").P_hydro[t]
+                                         for d in range(hz["days"]) for t in hz["hours"]) <= budget)
+    ref.total_cost = pyo.Objective(expr=sum(objs), sense=pyo.minimize)
+    build_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    summary = milp_model.solve_model(ref, solver_name=solver_name, glpk_executable=glpk_executable)
+    return {"total_cost_usd": summary["total_cost_usd"], "build_s": build_s, "solve_s": time.perf_counter() - t0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Descomposición lagrangiana del presupuesto hídrico (horizonte multi-día)")
+    parser.add_argument("--data-dir", type=str, required=True, help="Carpeta data_* (día tipo, costes y rampas)")
+    parser.add_argument("--results-dir", type=str, default=None, help="Salida (por defecto, results/ junto a data)")
+    parser.add_argument("--days", type=int, default=28, help="Días del horizonte (si no se da --profiles)")
+    parser.add_argument("--profiles", type=str, default=None, help="CSV day,hour,demand_MW,pv_avail_MW[,hydro_max_MW,thermal_max_MW]")
+    parser.add_argument("--perturb", type=float, default=0.1, help="Ruido relativo diario de demanda/PV al repetir el día tipo")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--budget", type=float, default=None, help="Presupuesto hídrico total del horizonte [MWh]")
+    parser.add_argument("--budget-factor", type=float, default=0.8,
+                        help="Si no hay --budget: fracción de la capacidad hidro total del horizonte")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--solver", type=str, default="glpk", help="Nombre de solver Pyomo (appsi_highs recomendado: persistente)")
+    parser.add_argument("--glpk-exe", type=str, default=None, help="Ruta a glpsol (por defecto, el del PATH)")
+    parser.add_argument("--voll", type=float, default=1000.0, help="VoLL de la ENS (mantiene factibles los subproblemas)")
+    parser.add_argument("--max-iter", type=int, default=50)
+    parser.add_argument("--tol", type=float, default=1e-4, help="Gap relativo de parada")
+    parser.add_argument("--reference", action="store_true", help="Resuelve también el modelo monolítico")
+    args = parser.parse_args()
+
+    here = Path(__file__).resolve()
+    results_dir = Path(args.results_dir) if args.results_dir else (here.parent.parent / "results")
+    results_dir.mkdir(parents=True, exist_ok=True)
+
+    hz = load_horizon(Path(args.data_dir), args.days, Path(args.profiles) if args.profiles else None,
+                      args.perturb, args.seed)
+    budget = args.budget if args.budget is not None else args.budget_factor * float(hz["hydro"].sum())
+    print(f"=== Lagrange hidro: {hz['days']} días, presupuesto {budget:,.0f} MWh, workers={args.workers} ===")
+
+    res = solve_lagrangian(hz, budget, args.workers, args.solver, args.glpk_exe, args.voll, args.max_iter, args.tol)
+
+    with (results_dir / "lagrange_iteraciones.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=ITER_COLUMNS, lineterminator="\n")
+        w.writeheader()
+        w.writerows(res["history"])
+    with (results_dir / "lagrange_dispatch.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(["day", "hour", "PV_gen_MW", "Hydro_gen_MW", "Thermal_gen_MW", "Demand_MW"])
+        for r in res["days"]:
+            for row in r["dispatch"]:
+                w.writerow([r["day"], row["hour"], row["PV_gen_MW"], row["Hydro_gen_MW"], row["Thermal_gen_MW"], row["Demand_MW"]])
+
+    summary = {
+        "days": hz["days"], "budget_mwh": budget, "lambda_usd_per_mwh": res["lambda"],
+        "dual_bound_usd": res["dual_bound"], "primal_bound_usd": res["primal_bound"], "gap": res["gap"],
+        "iterations": len(res["history"]), "hydro_used_mwh": sum(r["hydro_mwh"] for r in res["days"]),
+        "ens_mwh": sum(r["ens_mwh"] for r in res["days"]),
+        "recovery_s": res["recovery_s"], "wall_s": res["wall_s"],
+    }
+    if args.reference:
+        ref = solve_reference(hz, budget, args.solver, args.glpk_exe, args.voll)
+        summary.update(reference_cost_usd=ref["total_cost_usd"], reference_build_s=ref["build_s"],
+                       reference_solve_s=ref["solve_s"],
+                       reference_gap=(res["primal_bound"] - ref["total_cost_usd"]) / abs(ref["total_cost_usd"]))
+    with (results_dir / "lagrange_resumen.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(summary), lineterminator="\n")
+        w.writeheader()
+        w.writerow(summary)
+
+    print(f"Valor del agua λ*: {res['lambda']:.4f} USD/MWh")
+    print(f"Cota dual: {res['dual_bound']:,.2f}  | cota primal: {res['primal_bound']:,.2f}  | gap: {res['gap']:.4%}")
+    print(f"Iteraciones: {len(res['history'])}  | recuperación primal: {res['recovery_s']:.2f} s  | total: {res['wall_s']:.2f} s")
+    if args.reference:
+        print(f"Monolítico: {summary['reference_cost_usd']:,.2f} (build {summary['reference_build_s']:.2f} s, "
+              f"solve {summary['reference_solve_s']:.2f} s)  | gap primal vs monolítico: {summary['reference_gap']:.4%}")
+    print(f"Resultados: {results_dir / 'lagrange_resumen.csv'}")
+
+
+if __name__ == "__main__":
+    main()
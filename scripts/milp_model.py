@@ -2,81 +2,75 @@
 Uso:
   python scripts/milp_model.py
   (Opcional) python scripts/milp_model.py --data-dir data --results-dir results --solver glpk
+  (UC)       python scripts/milp_model.py --data-dir data_caso_base --uc --mip-gap 0.001 --time-limit 60 \
+                 --mip-start results_caso_base/pddl_dispatch_priorizado_sim.csv
+  (Perfilado) python scripts/milp_model.py --data-dir data_caso_base --solver appsi_highs --profile
 
 """
 from __future__ import annotations
 import argparse
 import os
 from pathlib import Path
-import pandas as pd
-import pyomo.environ as pyo
+
+import perfilado
+
+# pandas y Pyomo se importan dentro de cada función: `--help` y los caminos que
+# no construyen el modelo no pagan su tiempo de importación.
 
 
 def _read_csvs(data_dir: Path):
-    demand = pd.read_csv(data_dir / "demand_profile.csv")
-    pv = pd.read_csv(data_dir / "pv_profile.csv")
-    hydro = pd.read_csv(data_dir / "hydro_profile.csv")
-    thermal = pd.read_csv(data_dir / "thermal_profile.csv")
-    costs = pd.read_csv(data_dir / "costs.csv")
-    constraints = pd.read_csv(data_dir / "system_constraints.csv")
-
-    # Normalizar columnas esperadas
-    demand = demand.rename(columns={
-        **{c: c.strip() for c in demand.columns}
-    })
-    pv = pv.rename(columns={
-        **{c: c.strip() for c in pv.columns}
-    })
-    hydro = hydro.rename(columns={
-        **{c: c.strip() for c in hydro.columns}
-    })
-    thermal = thermal.rename(columns={
-        **{c: c.strip() for c in thermal.columns}
-    })
-    costs = costs.rename(columns={
-        **{c: c.strip() for c in costs.columns}
-    })
-    constraints = constraints.rename(columns={
-        **{c: c.strip() for c in constraints.columns}
-    })
-
-    # Validaciones básicas
-    for df, req_cols in [
-        (demand, {"hour", "demand_MW"}),
-        (pv, {"hour", "pv_avail_MW"}),
-        (hydro, {"hour", "hydro_max_MW"}),
-        (thermal, {"hour", "thermal_max_MW"}),
-    ]:
-        miss = req_cols - set(df.columns)
-        if miss:
-            raise ValueError(f"CSV columns missing in {df}: {miss}")
-
-    # Mapas por hora
-    hours = sorted(demand["hour"].astype(int).tolist())
-    if hours != list(range(24)):
-        raise ValueError("Se esperan horas 0..23 en demand_profile.csv")
-
-    demand_map = dict(zip(demand["hour"].astype(int), demand["demand_MW"].astype(float)))
-    pv_map = dict(zip(pv["hour"].astype(int), pv["pv_avail_MW"].astype(float)))
-    hydro_map = dict(zip(hydro["hour"].astype(int), hydro["hydro_max_MW"].astype(float)))
-    thermal_map = dict(zip(thermal["hour"].astype(int), thermal["thermal_max_MW"].astype(float)))
-
-    # Costos
-    cost_map = {row["technology"].strip().lower(): float(row["cost_usd_per_mwh"]) for _, row in costs.iterrows()}
-    cost_pv = cost_map.get("pv", 5.0)
-    cost_hydro = cost_map.get("hydro", 10.0)
-    cost_thermal = cost_map.get("thermal", 90.0)
-
-    # Restricciones del sistema (clave/valor)
-    constraint_map = {str(row["key"]).strip(): float(row["value"]) for _, row in constraints.iterrows()}
-    hydro_budget = constraint_map.get("hydro_energy_budget_MWh", None)  # None => sin tope energético
-    ramp_th = constraint_map.get("thermal_ramp_MW_per_h", None)
-    ramp_hy = constraint_map.get("hydro_ramp_MW_per_h", None)
-
-    return hours, demand_map, pv_map, hydro_map, thermal_map, (cost_pv, cost_hydro, cost_thermal), (hydro_budget, ramp_th, ramp_hy)
-
-
-def build_model(hours, demand_map, pv_map, hydro_map, thermal_map, costs, sys_constraints):
+    """
+    Entradas del modelo como tupla (horas, mapas por hora, costes, restricciones). La lectura y la
+    validación viven en escenarios.load_scenario_dir (csv + NumPy, sin pandas).
+    """
+    from escenarios import load_scenario_dir
+
+    return load_scenario_dir(data_dir).model_inputs()
+
+
+# Parámetros de unit commitment térmico (claves opcionales en system_constraints.csv)
+UC_KEYS = {
+    "p_min": "thermal_min_MW",
+    "startup_cost": "thermal_startup_cost_usd",
+    "min_up": "thermal_min_up_h",
+    "min_down": "thermal_min_down_h",
+    "initial_on": "thermal_initial_on",
+}
+UC_DEFAULTS = {"p_min": 0.0, "startup_cost": 0.0, "min_up": 1, "min_down": 1, "initial_on": 1}
+
+
+def read_uc_params(data_dir: Path, overrides: dict | None = None) -> dict:
+    """Parámetros UC: defaults < system_constraints.csv < overrides (valores None se ignoran)."""
+    import csv
+
+    uc = dict(UC_DEFAULTS)
+    path = data_dir / "system_constraints.csv"
+    if path.exists():
+        with path.open(newline="", encoding="utf-8-sig") as f:
+            values = {str(r["key"]).strip(): r["value"] for r in csv.DictReader(f)}
+        for k, key in UC_KEYS.items():
+            if key in values:
+                uc[k] = float(values[key])
+    for k, v in (overrides or {}).items():
+        if v is not None:
+            uc[k] = v
+    for k in ("min_up", "min_down", "initial_on"):
+        uc[k] = int(uc[k])
+    return uc
+
+
+def build_model(hours, demand_map, pv_map, hydro_map, thermal_map, costs, sys_constraints, voll=None, uc=None):
+    """
+    Modelo de despacho económico diario. Con `voll` (USD/MWh) se añade energía no servida
+    (ENS) penalizada en la función objetivo, de modo que el balance nunca es infactible.
+
+    Con `uc` (ver read_uc_params) la térmica pasa a unit commitment: estado binario u[t],
+    arranque/parada v[t]/w[t] (continuas en [0,1]; son enteras cuando u lo es), mínimo
+    técnico, coste de arranque, tiempos mínimos de marcha/parada en la formulación ajustada
+    de Rajan-Takriti y rampas con límite de arranque/parada.
+    """
+    import pyomo.environ as pyo
+
     cost_pv, cost_hydro, cost_thermal = costs
     hydro_budget, ramp_th, ramp_hy = sys_constraints
 
@@ -85,15 +79,15 @@ def build_model(hours, demand_map, pv_map, hydro_map, thermal_map, costs, sys_co
     # Sets
     m.T = pyo.Set(initialize=hours, ordered=True)
 
-    # Params
-    m.demand = pyo.Param(m.T, initialize=demand_map, within=pyo.NonNegativeReals)
-    m.pv_avail = pyo.Param(m.T, initialize=pv_map, within=pyo.NonNegativeReals)
-    m.hydro_max = pyo.Param(m.T, initialize=hydro_map, within=pyo.NonNegativeReals)
-    m.thermal_max = pyo.Param(m.T, initialize=thermal_map, within=pyo.NonNegativeReals)
+    # Params (mutables: un re-despacho cambia los perfiles sin reconstruir el modelo)
+    m.demand = pyo.Param(m.T, initialize=demand_map, within=pyo.NonNegativeReals, mutable=True)
+    m.pv_avail = pyo.Param(m.T, initialize=pv_map, within=pyo.NonNegativeReals, mutable=True)
+    m.hydro_max = pyo.Param(m.T, initialize=hydro_map, within=pyo.NonNegativeReals, mutable=True)
+    m.thermal_max = pyo.Param(m.T, initialize=thermal_map, within=pyo.NonNegativeReals, mutable=True)
 
-    m.cost_pv = pyo.Param(initialize=float(cost_pv))
-    m.cost_hydro = pyo.Param(initialize=float(cost_hydro))
-    m.cost_thermal = pyo.Param(initialize=float(cost_thermal))
+    m.cost_pv = pyo.Param(initialize=float(cost_pv), mutable=True)
+    m.cost_hydro = pyo.Param(initialize=float(cost_hydro), mutable=True)
+    m.cost_thermal = pyo.Param(initialize=float(cost_thermal), mutable=True)
 
     # Vars (MW)
     m.P_pv = pyo.Var(m.T, domain=pyo.NonNegativeReals)
@@ -106,25 +100,42 @@ def build_model(hours, demand_map, pv_map, hydro_map, thermal_map, costs, sys_co
     def thermal_cap_rule(m, t): return m.P_thermal[t] <= m.thermal_max[t]
     m.pv_cap = pyo.Constraint(m.T, rule=pv_cap_rule)
     m.hydro_cap = pyo.Constraint(m.T, rule=hydro_cap_rule)
-    m.thermal_cap = pyo.Constraint(m.T, rule=thermal_cap_rule)
+    if uc is None:
+        m.thermal_cap = pyo.Constraint(m.T, rule=thermal_cap_rule)
+    else:
+        _add_unit_commitment(m, hours, uc)
+
+    # Energía no servida (opcional, penalizada con VoLL)
+    if voll is not None:
+        m.voll = pyo.Param(initialize=float(voll))
+        m.ENS = pyo.Var(m.T, domain=pyo.NonNegativeReals)
 
     # Power balance (>= to allow curtailment? Here we enforce equality to meet demand exactly)
     def balance_rule(m, t):
-        return m.P_pv[t] + m.P_hydro[t] + m.P_thermal[t] == m.demand[t]
+        ens = m.ENS[t] if voll is not None else 0.0
+        return m.P_pv[t] + m.P_hydro[t] + m.P_thermal[t] + ens == m.demand[t]
     m.balance = pyo.Constraint(m.T, rule=balance_rule)
 
     # Hydro daily energy budget (MWh over 24h). With 1h steps, sum MW == MWh.
     if hydro_budget is not None:
-        m.hydro_energy_budget = pyo.Constraint(expr=sum(m.P_hydro[t] for t in m.T) <= hydro_budget)
+        m.hydro_budget = pyo.Param(initialize=float(hydro_budget), mutable=True)
+        m.hydro_energy_budget = pyo.Constraint(expr=sum(m.P_hydro[t] for t in m.T) <= m.hydro_budget)
 
     # Ramps (MW/h) for thermal and hydro (symmetric up/down)
     # Note: For t0 we skip since no previous hour in horizon. If initial condition known, add it as a Param.
     if ramp_th is not None and ramp_th >= 0:
+        # Con UC: la rampa solo aplica con la unidad en marcha; al arrancar/parar se permite
+        # saltar hasta max(rampa, mínimo técnico).
+        su_sd = max(ramp_th, uc["p_min"]) if uc is not None else 0.0
         def th_ramp_up(m, t):
             if t == hours[0]: return pyo.Constraint.Skip
+            if uc is not None:
+                return m.P_thermal[t] - m.P_thermal[t-1] <= ramp_th * m.u[t-1] + su_sd * m.v[t]
             return m.P_thermal[t] - m.P_thermal[t-1] <= ramp_th
         def th_ramp_down(m, t):
             if t == hours[0]: return pyo.Constraint.Skip
+            if uc is not None:
+                return m.P_thermal[t-1] - m.P_thermal[t] <= ramp_th * m.u[t] + su_sd * m.w[t]
             return m.P_thermal[t-1] - m.P_thermal[t] <= ramp_th
         m.th_ramp_up = pyo.Constraint(m.T, rule=th_ramp_up)
         m.th_ramp_down = pyo.Constraint(m.T, rule=th_ramp_down)
@@ -141,63 +152,601 @@ def build_model(hours, demand_map, pv_map, hydro_map, thermal_map, costs, sys_co
 
     # Objective (min total cost)
     def total_cost_rule(m):
-        return sum(m.P_pv[t]*m.cost_pv + m.P_hydro[t]*m.cost_hydro + m.P_thermal[t]*m.cost_thermal for t in m.T)
+        cost = sum(m.P_pv[t]*m.cost_pv + m.P_hydro[t]*m.cost_hydro + m.P_thermal[t]*m.cost_thermal for t in m.T)
+        if voll is not None:
+            cost += m.voll * sum(m.ENS[t] for t in m.T)
+        if uc is not None:
+            cost += m.startup_cost * sum(m.v[t] for t in m.T)
+        return cost
     m.total_cost = pyo.Objective(rule=total_cost_rule, sense=pyo.minimize)
 
     return m
 
 
-def solve_and_export(model: pyo.ConcreteModel, results_dir: Path, solver_name: str = "glpk", glpk_executable: str | None = None) -> dict:
-    results_dir.mkdir(parents=True, exist_ok=True)
-    if solver_name.lower() == 'glpk':
-        solver = pyo.SolverFactory('glpk', executable=glpk_executable)
-    else:
-        solver = pyo.SolverFactory(solver_name)
-    res = solver.solve(model, tee=False)
+def _add_unit_commitment(m, hours, uc: dict) -> None:
+    import pyomo.environ as pyo
+
+    t0 = hours[0]
+    m.p_min = pyo.Param(initialize=float(uc["p_min"]))
+    m.startup_cost = pyo.Param(initialize=float(uc["startup_cost"]))
+    m.u = pyo.Var(m.T, domain=pyo.Binary)
+    m.v = pyo.Var(m.T, bounds=(0, 1))
+    m.w = pyo.Var(m.T, bounds=(0, 1))
+
+    def prev_u(m, t):
+        return int(uc["initial_on"]) if t == t0 else m.u[t-1]
+
+    def logic_rule(m, t):
+        return m.u[t] - prev_u(m, t) == m.v[t] - m.w[t]
+    m.uc_logic = pyo.Constraint(m.T, rule=logic_rule)
+
+    # Solo se arranca con la unidad en marcha y solo se para con la unidad parada: sin esto v = w = 1
+    # en horas sin cambio de estado cumple uc_logic y abre el margen su_sd de las rampas
+    def start_rule(m, t): return m.v[t] <= m.u[t]
+    def stop_rule(m, t):  return m.w[t] <= 1 - m.u[t]
+    m.uc_start = pyo.Constraint(m.T, rule=start_rule)
+    m.uc_stop = pyo.Constraint(m.T, rule=stop_rule)
+
+    def cap_max_rule(m, t): return m.P_thermal[t] <= m.thermal_max[t] * m.u[t]
+    def cap_min_rule(m, t): return m.P_thermal[t] >= m.p_min * m.u[t]
+    m.thermal_cap = pyo.Constraint(m.T, rule=cap_max_rule)
+    m.thermal_min = pyo.Constraint(m.T, rule=cap_min_rule)
+
+    up, down = int(uc["min_up"]), int(uc["min_down"])
+    if up > 1:
+        def min_up_rule(m, t):
+            return sum(m.v[i] for i in hours if t - up < i <= t) <= m.u[t]
+        m.min_up = pyo.Constraint(m.T, rule=min_up_rule)
+    if down > 1:
+        def min_down_rule(m, t):
+            return sum(m.w[i] for i in hours if t - down < i <= t) <= 1 - m.u[t]
+        m.min_down = pyo.Constraint(m.T, rule=min_down_rule)
+
+
+# Nombres de opciones de límite por familia de solver
+SOLVER_LIMIT_OPTIONS = {
+    "glpk": {"mip_gap": "mipgap", "time_limit": "tmlim"},
+    "cbc": {"mip_gap": "ratioGap", "time_limit": "seconds", "cutoff": "cutoff"},
+    "gurobi": {"mip_gap": "MIPGap", "time_limit": "TimeLimit", "cutoff": "Cutoff"},
+    "cplex": {"mip_gap": "mipgap", "time_limit": "timelimit", "cutoff": "mip_tolerances_uppercutoff"},
+    "highs": {"mip_gap": "mip_rel_gap", "time_limit": "time_limit", "cutoff": "objective_bound"},
+}
+
+
+def solver_family(solver_name: str) -> str:
+    name = solver_name.lower()
+    for prefix in ("appsi_",):
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+    return name.split("_")[0]
+
+
+def solver_limit_options(solver_name: str, mip_gap=None, time_limit=None, cutoff=None) -> dict:
+    """Traduce gap/tiempo/cutoff a las opciones del solver (las no soportadas se omiten con aviso)."""
+    names = SOLVER_LIMIT_OPTIONS.get(solver_family(solver_name), {})
+    options = {}
+    for key, value in (("mip_gap", mip_gap), ("time_limit", time_limit), ("cutoff", cutoff)):
+        if value is None:
+            continue
+        if key not in names:
+            print(f"[AVISO] El solver '{solver_name}' no admite '{key}' desde este script; se ignora.")
+            continue
+        options[names[key]] = value
+    return options
+
+
+def read_dispatch_csv(path: Path) -> dict:
+    """
+    Despacho horario {hora: (pv, hidro, térmica)} desde un CSV de despacho: el de la simulación
+    PDDL (pddl_dispatch_priorizado_sim.csv), el resumen del plan (resumen_*.csv) o milp_dispatch.csv.
+    """
+    import csv
+
+    aliases = {
+        "hour": ("hour", "hora"),
+        "pv": ("pv_mwh", "pv_mw", "PV_gen_MW"),
+        "hydro": ("hidro_mwh", "hidro_mw", "Hydro_gen_MW"),
+        "thermal": ("termica_mwh", "termica_mw", "Thermal_gen_MW"),
+    }
+    with path.open(newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        cols = {}
+        for k, names in aliases.items():
+            cols[k] = next((c for c in names if c in (reader.fieldnames or [])), None)
+            if cols[k] is None:
+                raise ValueError(f"No se encontró columna para '{k}' en {path.name}")
+        out = {}
+        for r in reader:
+            h = int(str(r[cols["hour"]]).lower().lstrip("h"))
+            out[h] = tuple(float(r[cols[k]] or 0.0) for k in ("pv", "hydro", "thermal"))
+    return out
+
+
+def apply_mip_start(model, dispatch: dict, solver=None, solver_name: str = "glpk",
+                    glpk_executable: str | None = None) -> float | None:
+    """
+    Convierte un despacho (p.ej. el plan PDDL verificado) en MIP start: fija el estado u[t]
+    que implica la térmica del plan, resuelve el LP resultante para reparar el despacho
+    (rampas, balance exacto) y deja esa solución factible cargada en el modelo.
+    Devuelve su coste (cota superior / cutoff) o None si el compromiso del plan es infactible.
+    """
+    import pyomo.environ as pyo
 
-    # Extract solution
     hours = list(model.T.data())
+    on = {t: dispatch.get(t, (0.0, 0.0, 0.0))[2] > 1e-6 for t in hours}
+    # 1) compromiso exacto del plan; 2) si es infactible (el dominio PDDL no modela rampas
+    # ni tiempos mínimos), solo se fijan las horas en marcha y el resto queda libre.
+    ok = False
+    for fix_off in (True, False):
+        for t in hours:
+            if on[t]:
+                model.u[t].fix(1)
+            elif fix_off:
+                model.u[t].fix(0)
+        try:
+            summary = solve_model(model, solver=solver, solver_name=solver_name, glpk_executable=glpk_executable)
+            ok = summary["termination_condition"] == "optimal"
+        except Exception:
+            ok = False
+        for t in hours:
+            model.u[t].unfix()
+        if ok:
+            break
+    if not ok:
+        print("[AVISO] El compromiso del plan no es factible para el MILP: se usa como inicio sin cutoff.")
+        for t in hours:
+            pv, hy, th = dispatch.get(t, (0.0, 0.0, 0.0))
+            model.P_pv[t].set_value(pv)
+            model.P_hydro[t].set_value(hy)
+            model.P_thermal[t].set_value(th)
+        return None
+    return float(pyo.value(model.total_cost))
+
+
+# glpsol del entorno Windows original; solo se usa si existe en esta máquina
+DEFAULT_GLPK_EXE = r"C:\Anaconda3\envs\tfm_env\Library\bin\glpsol.exe"
+
+
+def default_glpk_executable() -> str | None:
+    """Ruta a glpsol por defecto: la de DEFAULT_GLPK_EXE si existe; si no, None (el del PATH)."""
+    return DEFAULT_GLPK_EXE if os.path.isfile(DEFAULT_GLPK_EXE) else None
+
+
+def make_solver(solver_name: str = "glpk", glpk_executable: str | None = None):
+    import pyomo.environ as pyo
+
+    if solver_name.lower() == 'glpk':
+        return pyo.SolverFactory('glpk', executable=glpk_executable)
+    return pyo.SolverFactory(solver_name)
+
+
+def extract_dispatch(model: pyo.ConcreteModel) -> list:
+    """Filas por hora (mismas columnas que milp_dispatch.csv) con la solución cargada en el modelo."""
+    import pyomo.environ as pyo
+
     rows = []
-    for t in hours:
-        rows.append({
+    for t in sorted(model.T.data()):
+        row = {
             "hour": t,
             "PV_gen_MW": pyo.value(model.P_pv[t]),
             "Hydro_gen_MW": pyo.value(model.P_hydro[t]),
             "Thermal_gen_MW": pyo.value(model.P_thermal[t]),
             "Demand_MW": pyo.value(model.demand[t])
-        })
-    df = pd.DataFrame(rows).sort_values("hour")
-    df.to_csv(results_dir / "milp_dispatch.csv", index=False)
+        }
+        if hasattr(model, "u"):
+            row["Thermal_on"] = int(round(pyo.value(model.u[t])))
+        rows.append(row)
+    return rows
+
+
+def variable_values(model) -> dict:
+    """{nombre: valor} de todas las variables (para mover una solución entre procesos)."""
+    import pyomo.environ as pyo
+
+    return {v.name: v.value for v in model.component_data_objects(pyo.Var)}
+
+
+def load_variable_values(model, values: dict) -> None:
+    import pyomo.environ as pyo
+
+    for v in model.component_data_objects(pyo.Var):
+        if v.name in values and values[v.name] is not None:
+            v.set_value(values[v.name], skip_validation=True)
+
+
+def solve_model(model: pyo.ConcreteModel, solver=None, solver_name: str = "glpk", glpk_executable: str | None = None,
+                options: dict | None = None, warmstart: bool = False, load_solutions: bool = True) -> dict:
+    """
+    Resuelve el modelo sin escribir archivos. `solver` permite reutilizar una instancia (p.ej. persistente);
+    `options` son opciones nativas del solver (ver solver_limit_options) y `warmstart` usa los valores
+    cargados en las variables como solución inicial si el solver lo admite. Con load_solutions=False un
+    modelo sin solución (infactible, no acotado) no lanza excepción: se devuelve su termination_condition
+    con total_cost_usd = None y las variables conservan sus valores anteriores.
+    """
+    import pyomo.environ as pyo
+
+    if solver is None:
+        solver = make_solver(solver_name, glpk_executable)
+    kwargs = {"tee": False}
+    if options:
+        kwargs["options"] = dict(options)
+    if warmstart and solver.warm_start_capable():
+        kwargs["warmstart"] = True
+    if not load_solutions:
+        kwargs["load_solutions"] = False
+    res = solver.solve(model, **kwargs)
+    loaded = load_solutions
+    if not load_solutions and len(getattr(res, "solution", ())) > 0:
+        model.solutions.load_from(res)
+        loaded = True
 
     summary = {
         "solver_status": str(res.solver.status) if hasattr(res, "solver") else "unknown",
         "termination_condition": str(res.solver.termination_condition) if hasattr(res, "solver") else "unknown",
-        "total_cost_usd": float(pyo.value(model.total_cost))
+        "total_cost_usd": float(pyo.value(model.total_cost)) if loaded else None,
     }
+    if hasattr(model, "u"):
+        lb = getattr(getattr(res, "problem", None), "lower_bound", None)
+        summary["best_bound_usd"] = float(lb) if lb is not None else None
+    return summary
+
+
+# =========================
+# Sensibilidad: duales, costes reducidos y rangos
+# =========================
+
+# Restricciones horarias cuyo dual se exporta (columna -> componente del modelo)
+HOURLY_DUALS = {
+    "smp_usd_per_mwh": "balance",
+    "pv_cap_dual": "pv_cap",
+    "hydro_cap_dual": "hydro_cap",
+    "thermal_cap_dual": "thermal_cap",
+    "thermal_min_dual": "thermal_min",
+    "th_ramp_up_dual": "th_ramp_up",
+    "th_ramp_down_dual": "th_ramp_down",
+    "hy_ramp_up_dual": "hy_ramp_up",
+    "hy_ramp_down_dual": "hy_ramp_down",
+}
+HOURLY_RC = {"rc_pv": "P_pv", "rc_hydro": "P_hydro", "rc_thermal": "P_thermal", "rc_ens": "ENS"}
+
+
+def attach_dual_suffixes(model) -> None:
+    """Pide al solver duales y costes reducidos (se cargan en model.dual / model.rc tras resolver)."""
+    import pyomo.environ as pyo
+
+    if not hasattr(model, "dual"):
+        model.dual = pyo.Suffix(direction=pyo.Suffix.IMPORT)
+    if not hasattr(model, "rc"):
+        model.rc = pyo.Suffix(direction=pyo.Suffix.IMPORT)
+
+
+def extract_duals(model) -> tuple:
+    """
+    Duales por hora (misma convención que el solver: variación del coste por unidad de lado derecho;
+    el de `balance` es el precio marginal del sistema) y escalares (valor del agua del presupuesto hídrico).
+    """
+    rows = []
+    for t in sorted(model.T.data()):
+        row = {"hour": t}
+        for col, name in HOURLY_DUALS.items():
+            comp = getattr(model, name, None)
+            if comp is not None:
+                row[col] = model.dual.get(comp[t]) if t in comp else None
+        for col, name in HOURLY_RC.items():
+            comp = getattr(model, name, None)
+            if comp is not None:
+                row[col] = model.rc.get(comp[t])
+        rows.append(row)
+    scalars = {}
+    if hasattr(model, "hydro_energy_budget"):
+        scalars["hydro_water_value_usd_per_mwh"] = model.dual.get(model.hydro_energy_budget)
+    return rows, scalars
+
+
+def lp_ranging(model, work_dir: Path) -> list:
+    """
+    Rangos de coste (variables) y de lado derecho (restricciones) del LP con HiGHS: se escribe el
+    modelo en formato LP con nombres simbólicos y se resuelve una vez con highspy.
+    """
+    import highspy
+
+    lp_path = work_dir / "milp_model_ranging.lp"
+    _, smap_id = model.write(str(lp_path), io_options={"symbolic_solver_labels": True})
+    try:
+        h = highspy.Highs()
+        h.setOptionValue("output_flag", False)
+        h.readModel(str(lp_path))
+        h.run()
+        status, rg = h.getRanging()
+        lp = h.getLp()
+    finally:
+        lp_path.unlink(missing_ok=True)
+    if status != highspy.HighsStatus.kOk or not rg.valid:
+        raise RuntimeError("HiGHS no devolvió información de rangos")
+
+    def label(name: str) -> str:
+        # Filas del escritor LP: c_e_/c_u_/c_l_<nombre>_
+        return name[4:-1] if name[:4] in ("c_e_", "c_u_", "c_l_") and name.endswith("_") else name
+
+    rows = []
+    for j, name in enumerate(lp.col_names_):
+        if name.startswith("ONE_VAR_CONSTANT"):
+            continue
+        rows.append({
+            "tipo": "costo", "elemento": name, "valor_actual": lp.col_cost_[j],
+            "limite_inf": rg.col_cost_dn.value_[j], "limite_sup": rg.col_cost_up.value_[j],
+            "objetivo_en_inf": rg.col_cost_dn.objective_[j], "objetivo_en_sup": rg.col_cost_up.objective_[j],
+        })
+    for i, name in enumerate(lp.row_names_):
+        lo, up = lp.row_lower_[i], lp.row_upper_[i]
+        rows.append({
+            "tipo": "rhs", "elemento": label(name), "valor_actual": lo if abs(lo) < highspy.kHighsInf else up,
+            "limite_inf": rg.row_bound_dn.value_[i], "limite_sup": rg.row_bound_up.value_[i],
+            "objetivo_en_inf": rg.row_bound_dn.objective_[i], "objetivo_en_sup": rg.row_bound_up.objective_[i],
+        })
+    model.solutions.symbol_map.pop(smap_id, None)
+    return rows
+
+
+def export_sensitivity(model, results_dir: Path, solver_name: str = "glpk", glpk_executable: str | None = None,
+                       resolve: bool = False) -> None:
+    """
+    Escribe milp_duals.csv (precio marginal, duales de capacidad/rampa y costes reducidos por hora),
+    milp_duals_resumen.csv (valor del agua) y milp_ranging.csv (si highspy está instalado).
+    Con unit commitment los duales son los del LP con el compromiso fijado. `resolve` vuelve a
+    resolver el LP para cargar los duales cuando la solución vino de otro proceso (portafolio).
+    """
+    import pandas as pd
+    import pyomo.environ as pyo
+
+    if hasattr(model, "u"):
+        # Compromiso fijado y relajado a [0,1]: el solver lo trata como LP y devuelve duales
+        for t in model.T:
+            model.u[t].fix(round(model.u[t].value or 0))
+            model.u[t].domain = pyo.UnitInterval
+        attach_dual_suffixes(model)
+        solve_model(model, solver_name=solver_name, glpk_executable=glpk_executable)
+    elif resolve:
+        attach_dual_suffixes(model)
+        solve_model(model, solver_name=solver_name, glpk_executable=glpk_executable)
+    try:
+        rows, scalars = extract_duals(model)
+        pd.DataFrame(rows).to_csv(results_dir / "milp_duals.csv", index=False)
+        pd.DataFrame([{"key": k, "value": v} for k, v in scalars.items()]).to_csv(
+            results_dir / "milp_duals_resumen.csv", index=False)
+        try:
+            pd.DataFrame(lp_ranging(model, results_dir)).to_csv(results_dir / "milp_ranging.csv", index=False)
+        except ImportError:
+            print("[AVISO] highspy no está instalado: se omite milp_ranging.csv")
+    finally:
+        if hasattr(model, "u"):
+            for t in model.T:
+                model.u[t].domain = pyo.Binary
+                model.u[t].unfix()
+
+
+def solve_and_export(model: pyo.ConcreteModel, results_dir: Path, solver_name: str = "glpk", glpk_executable: str | None = None,
+                     options: dict | None = None, warmstart: bool = False, duals: bool = True,
+                     summary: dict | None = None) -> dict:
+    """
+    Resuelve y escribe milp_dispatch.csv / milp_summary.csv (y los duales). Si se pasa `summary`, la
+    solución ya está cargada en el modelo (p.ej. la ganadora del portafolio) y no se vuelve a resolver.
+    """
+    import pandas as pd
+
+    results_dir.mkdir(parents=True, exist_ok=True)
+    presolved = summary is not None
+    if not presolved:
+        if duals and not hasattr(model, "u"):
+            attach_dual_suffixes(model)
+        summary = solve_model(model, solver_name=solver_name, glpk_executable=glpk_executable,
+                              options=options, warmstart=warmstart)
+
+    df = pd.DataFrame(extract_dispatch(model)).sort_values("hour")
+    df.to_csv(results_dir / "milp_dispatch.csv", index=False)
+
     pd.DataFrame([summary]).to_csv(results_dir / "milp_summary.csv", index=False)
+
+    if duals:
+        try:
+            export_sensitivity(model, results_dir, solver_name, glpk_executable, resolve=presolved)
+        except Exception as ex:
+            print(f"[AVISO] No se pudieron exportar duales/rangos: {ex!r}")
     return summary
 
 
+def options_cutoff(cutoff: float | None) -> float | None:
+    """Holgura mínima en el cutoff para no descartar la propia solución inicial por redondeo."""
+    return cutoff + 1e-6 * max(1.0, abs(cutoff)) if cutoff is not None else None
+
+
+@perfilado.perfilable("milp_model")
 def main():
     parser = argparse.ArgumentParser(description="Daily Economic Dispatch MILP (Pyomo+GLPK)")
     parser.add_argument("--data-dir", type=str, default=None, help="Ruta a la carpeta data/")
     parser.add_argument("--results-dir", type=str, default=None, help="Ruta a la carpeta results/")
-    parser.add_argument("--solver", type=str, default="glpk", help="Nombre de solver Pyomo (glpk, cbc, gurobi, etc.)")
-    parser.add_argument("--glpk-exe", type=str, default=r"C:\Anaconda3\envs\tfm_env\Library\bin\glpsol.exe", help="Ruta a glpsol.exe en Windows (GLPK)")
+    parser.add_argument("--solver", type=str, default="glpk",
+                        help="Nombre de solver Pyomo (glpk, cbc, gurobi, etc.); 'auto' = el mejor según el historial del portafolio")
+    parser.add_argument("--glpk-exe", type=str, default=None,
+                        help="Ruta a glpsol (por defecto, la del entorno Windows original si existe; si no, el del PATH)")
+    parser.add_argument("--portfolio", type=str, nargs="*", default=None,
+                        help="Carrera de solvers en paralelo (p.ej. glpk cbc appsi_highs; sin nombres, los disponibles): "
+                             "gana el primer óptimo y se registra en el historial")
+    # Unit commitment térmico (los valores no indicados salen de system_constraints.csv)
+    parser.add_argument("--uc", action="store_true", help="Activa el unit commitment térmico (variables binarias)")
+    parser.add_argument("--thermal-min", type=float, default=None, help="Mínimo técnico térmico [MW]")
+    parser.add_argument("--startup-cost", type=float, default=None, help="Coste de arranque térmico [USD]")
+    parser.add_argument("--min-up", type=int, default=None, help="Tiempo mínimo en marcha [h]")
+    parser.add_argument("--min-down", type=int, default=None, help="Tiempo mínimo parada [h]")
+    parser.add_argument("--initial-on", type=int, default=None, choices=[0, 1], help="Estado térmico antes de la hora 0")
+    parser.add_argument("--mip-gap", type=float, default=None, help="Gap relativo de parada del MIP")
+    parser.add_argument("--time-limit", type=float, default=None, help="Tiempo máximo del solver [s]")
+    parser.add_argument("--no-duals", action="store_true",
+                        help="No exportar milp_duals*.csv ni milp_ranging.csv")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reutilizar soluciones guardadas (clave = datos parseados + opciones); ver cache_milp.py")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Carpeta de la caché (por defecto .cache_milp/)")
+    parser.add_argument("--cache-max-mb", type=float, default=200.0, help="Tamaño máximo de la caché en disco [MB]")
+    parser.add_argument("--cache-export", type=str, default=None, choices=["lp", "mps"],
+                        help="Guardar también el modelo en LP/MPS en la entrada de la caché")
+    parser.add_argument("--mip-start", type=str, default=None,
+                        help="CSV de despacho (p.ej. pddl_dispatch_priorizado_sim.csv) a usar como MIP start y cutoff")
+    perfilado.add_profile_args(parser)
     args = parser.parse_args()
+    if args.glpk_exe is None:
+        args.glpk_exe = default_glpk_executable()
 
     # Resolve default paths relative to repo root (scripts/..)
     here = Path(__file__).resolve()
     repo_root = here.parent.parent
     data_dir = Path(args.data_dir) if args.data_dir else (repo_root / "data")
     results_dir = Path(args.results_dir) if args.results_dir else (repo_root / "results")
+    perfilado.salida(results_dir)
 
-    hours, demand_map, pv_map, hydro_map, thermal_map, costs, sys_constraints = _read_csvs(data_dir)
-    model = build_model(hours, demand_map, pv_map, hydro_map, thermal_map, costs, sys_constraints)
-    summary = solve_and_export(model, results_dir, solver_name=args.solver, glpk_executable=args.glpk_exe)
+    uc = None
+    if args.uc:
+        uc = read_uc_params(data_dir, {
+            "p_min": args.thermal_min, "startup_cost": args.startup_cost,
+            "min_up": args.min_up, "min_down": args.min_down, "initial_on": args.initial_on,
+        })
 
+    from registro_ejecuciones import Etapas
+
+    etapas = Etapas()
+    with etapas.medir("lectura"):
+        inputs = _read_csvs(data_dir)
+
+    cache = None
+    if args.cache:
+        import cache_milp
+
+        cache = cache_milp.ModelCache(Path(args.cache_dir) if args.cache_dir else cache_milp.CACHE_DIR, args.cache_max_mb)
+        key_options = {
+            "solver": args.solver, "portfolio": args.portfolio, "uc": uc, "mip_gap": args.mip_gap,
+            "time_limit": args.time_limit, "duals": not args.no_duals,
+            "mip_start": cache_milp.file_digest(Path(args.mip_start)) if args.mip_start else None,
+        }
+        cache_key = cache_milp.input_key(inputs, key_options)
+        cached = cache.restore(cache_key, results_dir)
+        if cached is not None:
+            print(f"Caché: misma petición ya resuelta ({cache_key[:12]}), no se vuelve a resolver")
+            _print_summary(cached, results_dir)
+            _check_constraints(inputs, results_dir, uc)
+            _register_run(args, data_dir, inputs, uc, cached, etapas, estado="cache")
+            return
+
+    with etapas.medir("construccion"):
+        model = build_model(*inputs, uc=uc)
+
+    if args.solver == "auto" or args.portfolio is not None:
+        import portafolio_solvers as portfolio
+
+        clase = portfolio.problem_class(inputs[0], uc)
+        if args.solver == "auto":
+            args.solver = portfolio.recommend(clase, args.portfolio or None, args.glpk_exe)
+            print(f"Solver elegido por el historial para '{clase}': {args.solver}")
+
+    cutoff = None
+    if args.mip_start:
+        if uc is None:
+            parser.error("--mip-start requiere --uc")
+        cutoff = apply_mip_start(model, read_dispatch_csv(Path(args.mip_start)),
+                                 solver_name=args.solver, glpk_executable=args.glpk_exe)
+        if cutoff is not None:
+            print(f"MIP start desde {args.mip_start}: coste {cutoff:,.2f} USD (cutoff)")
+    options = solver_limit_options(args.solver, args.mip_gap, args.time_limit, options_cutoff(cutoff)) \
+        if args.portfolio is None else None
+
+    warm = args.mip_start is not None
+    if cache is not None and not warm:
+        previous = cache.warm_start(cache_milp.structure_key(inputs, key_options))
+        if previous:
+            load_variable_values(model, previous)
+            warm = True
+            print("Caché: warm start desde la solución guardada más reciente con la misma estructura")
+
+    raced = None
+    with etapas.medir("resolucion"):
+        if args.portfolio is not None:
+            solvers = portfolio.usable_solvers(args.portfolio, args.glpk_exe)
+            initial = variable_values(model) if warm else None
+            winner, raced, values, rows = portfolio.race(
+                inputs, {"uc": uc}, solvers, glpk_executable=args.glpk_exe,
+                limits=(args.mip_gap, args.time_limit, options_cutoff(cutoff)), initial=initial)
+            portfolio.append_history(rows, clase)
+            portfolio.print_race(rows)
+            if winner is None:
+                raise SystemExit("Ningún solver del portafolio devolvió solución")
+            load_variable_values(model, values)
+            args.solver = winner
+        summary = solve_and_export(model, results_dir, solver_name=args.solver, glpk_executable=args.glpk_exe,
+                                   options=options, warmstart=warm, duals=not args.no_duals,
+                                   summary=raced)
+    if cache is not None:
+        cache.store(cache_key, cache_milp.structure_key(inputs, key_options), summary, variable_values(model),
+                    results_dir, model=model, export=args.cache_export)
+    _print_summary(summary, results_dir)
+    _check_constraints(inputs, results_dir, uc)
+    _register_run(args, data_dir, inputs, uc, summary, etapas)
+
+
+def _register_run(args, data_dir: Path, inputs: tuple, uc: dict | None, summary: dict, etapas: dict,
+                  estado: str | None = None) -> None:
+    """Una fila en el registro de ejecuciones (ver registro_ejecuciones.py)."""
+    import registro_ejecuciones as registro
+
+    optimal = summary.get("termination_condition") == "optimal"
+    registro.record_run(
+        "milp_model.py", "milp_uc" if uc else "milp", escenario=registro.scenario_name(data_dir),
+        estado=estado or summary.get("termination_condition"), input_hash=registro.hash_inputs(inputs),
+        opciones={"solver": args.solver, "portfolio": args.portfolio, "uc": uc, "mip_gap": args.mip_gap,
+                  "time_limit": args.time_limit, "mip_start": args.mip_start, "cache": args.cache},
+        etapas=etapas, coste=summary.get("total_cost_usd"), cobertura=1.0 if optimal else None)
+
+
+def _check_constraints(inputs: tuple, results_dir: Path, uc: dict | None) -> None:
+    """Revisa milp_dispatch.csv con el verificador vectorizado (ver verificar_restricciones.py)."""
+    import verificar_restricciones as vr
+
+    path = results_dir / "milp_dispatch.csv"
+    if not path.exists():
+        return
+    lim = vr.Limites.de_entradas(inputs)
+    hours, pv, hydro, thermal = vr.leer_despacho(path)
+    ver = vr.check(pv, hydro, thermal, lim)
+    if uc is not None:
+        _relax_startup_ramps(ver, path, hours, thermal, lim.ramp_thermal, uc)
+    vr.imprimir(ver, path.name, horas=[f"h{h}" for h in hours])
+
+
+def _relax_startup_ramps(ver, path: Path, hours: list, thermal: list, ramp_th: float, uc: dict) -> None:
+    """
+    Con UC la rampa térmica admite saltos de hasta max(rampa, mínimo técnico) solo en las horas en
+    que la solución arranca o para la unidad (columna Thermal_on). El resto de horas se revisa con la
+    rampa normal; sin la columna no se relaja ninguna.
+    """
+    import csv
+    import math
+
+    if math.isnan(ramp_th):
+        return
+    with path.open(newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+    if not rows or "Thermal_on" not in rows[0]:
+        return
+    on = {int(r["hour"]): int(float(r["Thermal_on"] or 0)) for r in rows}
+    su_sd = max(ramp_th, uc["p_min"])
+    mag = ver.magnitudes["rampa_termica"]
+    for t in range(len(hours) - 1):
+        if on.get(hours[t]) != on.get(hours[t + 1]):
+            mag[0, t] = max(abs(thermal[t + 1] - thermal[t]) - su_sd, 0.0)
+
+
+def _print_summary(summary: dict, results_dir: Path) -> None:
     print("=== MILP solved ===")
     print(f"Total cost [USD]: {summary['total_cost_usd']:.2f}")
+    if summary.get("best_bound_usd") is not None:
+        print(f"Best bound [USD]: {summary['best_bound_usd']:.2f}")
     print(f"Solver status: {summary['solver_status']} | Termination: {summary['termination_condition']}")
     print(f"Results: {results_dir/'milp_dispatch.csv'}")
 
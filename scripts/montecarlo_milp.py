@@ -0,0 +1,237 @@
+"""
+montecarlo_milp.py
+
+Monte Carlo del despacho MILP bajo error de pronóstico de PV y demanda.
+
+Se muestrean N perfiles perturbados alrededor de pv_profile.csv y demand_profile.csv con un
+modelo de error configurable (normal/lognormal relativo, correlación horaria AR(1)) y se
+resuelven por lotes en un pool de procesos. Cada worker construye el modelo UNA vez
+(build_model con parámetros mutables y ENS penalizada con VoLL) y solo actualiza los
+perfiles entre muestras. Los resultados se escriben en CSV a medida que llegan y al final
+se reportan cuantiles de coste diario y energía no servida.
+
+Uso:
+  python scripts/montecarlo_milp.py --data-dir data_caso_base --results-dir results_caso_base \\
+      --samples 10000 --workers 8 --solver appsi_highs \\
+      --pv-sigma 0.25 --pv-rho 0.8 --demand-sigma 0.05 --demand-rho 0.9
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import time
+from dataclasses import dataclass
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+import milp_model
+from escenarios import load_scenario_dir
+
+OUT_COLUMNS = ["sample", "demand_mwh", "pv_avail_mwh", "pv_mwh", "hydro_mwh", "thermal_mwh",
+               "ens_mwh", "cost_usd", "status"]
+
+
+# =========================
+# Modelos de error
+# =========================
+
+@dataclass
+class ErrorModel:
+    """Error relativo por hora: dist 'normal' (x·(1+e)) o 'lognormal' (x·exp(e-σ²/2)), e ~ AR(1)."""
+    sigma: float = 0.0
+    rho: float = 0.0
+    dist: str = "normal"
+
+    def __post_init__(self):
+        # Con |ρ| >= 1 la innovación sqrt(1 - ρ²) es NaN (o el proceso no es estacionario)
+        if not -1.0 < self.rho < 1.0:
+            raise ValueError(f"La autocorrelación AR(1) debe estar en (-1, 1), no {self.rho}")
+
+    def sample(self, rng: np.random.Generator, base: np.ndarray, n: int) -> np.ndarray:
+        if self.sigma <= 0:
+            return np.broadcast_to(base, (n, base.size)).copy()
+        z = rng.standard_normal((n, base.size))
+        e = np.empty_like(z)
+        e[:, 0] = z[:, 0]
+        innov = np.sqrt(1.0 - self.rho ** 2)
+        for t in range(1, base.size):
+            e[:, t] = self.rho * e[:, t - 1] + innov * z[:, t]
+        e *= self.sigma
+        if self.dist == "lognormal":
+            out = base * np.exp(e - 0.5 * self.sigma ** 2)
+        elif self.dist == "normal":
+            out = base * (1.0 + e)
+        else:
+            raise ValueError(f"Distribución de error no soportada: {self.dist}")
+        return np.maximum(out, 0.0)
+
+
+def ar1_rho(text: str) -> float:
+    """Tipo de argparse para --*-rho: autocorrelación AR(1) en (-1, 1)."""
+    rho = float(text)
+    if not -1.0 < rho < 1.0:
+        raise argparse.ArgumentTypeError(f"debe estar en (-1, 1), no {text}")
+    return rho
+
+
+def sample_batch(seed: int, batch: int, n: int, base_demand, base_pv, demand_err: ErrorModel, pv_err: ErrorModel):
+    """Perfiles (n × horas) reproducibles por (seed, lote), independientes del nº de workers."""
+    rng = np.random.default_rng([seed, batch])
+    return demand_err.sample(rng, base_demand, n), pv_err.sample(rng, base_pv, n)
+
+
+# =========================
+# Workers
+# =========================
+
+_W = {}
+
+
+def _init_worker(data_dir: str, solver_name: str, glpk_executable, voll: float,
+                 seed: int, demand_err: ErrorModel, pv_err: ErrorModel):
+    scenario = load_scenario_dir(Path(data_dir))
+    model = milp_model.build_model(*scenario.model_inputs(), voll=voll)
+    _W.update(
+        hours=scenario.hours,
+        model=model,
+        solver=milp_model.make_solver(solver_name, glpk_executable),
+        base_demand=scenario.demand,
+        base_pv=scenario.pv_avail,
+        seed=seed, demand_err=demand_err, pv_err=pv_err,
+    )
+
+
+def _solve_batch(task):
+    import pyomo.environ as pyo
+
+    batch, start, n = task
+    hours, model, solver = _W["hours"], _W["model"], _W["solver"]
+    demand, pv = sample_batch(_W["seed"], batch, n, _W["base_demand"], _W["base_pv"], _W["demand_err"], _W["pv_err"])
+
+    rows = []
+    for i in range(n):
+        for k, h in enumerate(hours):
+            model.demand[h] = float(demand[i, k])
+            model.pv_avail[h] = float(pv[i, k])
+        row = {"sample": start + i, "demand_mwh": float(demand[i].sum()), "pv_avail_mwh": float(pv[i].sum())}
+        try:
+            summary = milp_model.solve_model(model, solver=solver)
+            ens = sum(pyo.value(model.ENS[h]) for h in hours)
+            row.update(
+                pv_mwh=sum(pyo.value(model.P_pv[h]) for h in hours),
+                hydro_mwh=sum(pyo.value(model.P_hydro[h]) for h in hours),
+                thermal_mwh=sum(pyo.value(model.P_thermal[h]) for h in hours),
+                ens_mwh=ens,
+                cost_usd=summary["total_cost_usd"] - pyo.value(model.voll) * ens,
+                status=summary["termination_condition"],
+            )
+        except Exception as ex:
+            row.update(pv_mwh="", hydro_mwh="", thermal_mwh="", ens_mwh="", cost_usd="", status=f"error: {ex!r}"[:200])
+        rows.append(row)
+    return rows
+
+
+# =========================
+# Resumen
+# =========================
+
+def summarize(values: np.ndarray, quantiles) -> dict:
+    if values.size == 0:
+        return {}
+    out = {"mean": float(values.mean()), "std": float(values.std())}
+    for q in quantiles:
+        out[f"q{q:g}"] = float(np.quantile(values, q))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo del despacho MILP con error de PV y demanda")
+    parser.add_argument("--data-dir", type=str, required=True, help="Carpeta data_* del escenario")
+    parser.add_argument("--results-dir", type=str, default=None, help="Salida (por defecto, results/ junto a data)")
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=200, help="Muestras por tarea enviada a un worker")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=12345)
+    parser.add_argument("--solver", type=str, default="glpk", help="Nombre de solver Pyomo (appsi_highs recomendado: persistente)")
+    parser.add_argument("--glpk-exe", type=str, default=None, help="Ruta a glpsol (por defecto, el del PATH)")
+    parser.add_argument("--voll", type=float, default=1000.0, help="Valor de la energía no servida [USD/MWh]")
+    parser.add_argument("--pv-sigma", type=float, default=0.2, help="Desvío relativo del error de PV")
+    parser.add_argument("--pv-rho", type=ar1_rho, default=0.8, help="Autocorrelación horaria AR(1) del error de PV")
+    parser.add_argument("--pv-dist", type=str, default="lognormal", choices=["normal", "lognormal"])
+    parser.add_argument("--demand-sigma", type=float, default=0.05, help="Desvío relativo del error de demanda")
+    parser.add_argument("--demand-rho", type=ar1_rho, default=0.9, help="Autocorrelación horaria AR(1) del error de demanda")
+    parser.add_argument("--demand-dist", type=str, default="normal", choices=["normal", "lognormal"])
+    parser.add_argument("--quantiles", type=str, default="0.05,0.5,0.95,0.99")
+    args = parser.parse_args()
+    for name in ("samples", "batch_size", "workers"):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} debe ser >= 1")
+
+    here = Path(__file__).resolve()
+    data_dir = Path(args.data_dir)
+    results_dir = Path(args.results_dir) if args.results_dir else (here.parent.parent / "results")
+    results_dir.mkdir(parents=True, exist_ok=True)
+    quantiles = [float(q) for q in args.quantiles.split(",") if q.strip()]
+
+    demand_err = ErrorModel(args.demand_sigma, args.demand_rho, args.demand_dist)
+    pv_err = ErrorModel(args.pv_sigma, args.pv_rho, args.pv_dist)
+    tasks = []
+    for b, start in enumerate(range(0, args.samples, args.batch_size)):
+        tasks.append((b, start, min(args.batch_size, args.samples - start)))
+
+    out_csv = results_dir / "montecarlo_samples.csv"
+    costs, ens, n_err = [], [], 0
+    t0 = time.perf_counter()
+    ctx = get_context("spawn")
+    initargs = (str(data_dir), args.solver, args.glpk_exe, args.voll, args.seed, demand_err, pv_err)
+    with ctx.Pool(args.workers, initializer=_init_worker, initargs=initargs) as pool, \
+            out_csv.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=OUT_COLUMNS, lineterminator="\n")
+        w.writeheader()
+        done = 0
+        for rows in pool.imap_unordered(_solve_batch, tasks):
+            w.writerows(rows)
+            f.flush()
+            for r in rows:
+                if r["status"].startswith("error"):
+                    n_err += 1
+                else:
+                    costs.append(r["cost_usd"])
+                    ens.append(r["ens_mwh"])
+            done += len(rows)
+            print(f"[MC] {done}/{args.samples} muestras ({done / (time.perf_counter() - t0):,.0f} muestras/s)")
+    elapsed = time.perf_counter() - t0
+
+    costs = np.array(costs)
+    ens = np.array(ens)
+    cost_stats = summarize(costs, quantiles)
+    ens_stats = summarize(ens, quantiles)
+    p_ens = float((ens > 1e-6).mean()) if ens.size else 0.0
+
+    out_summary = results_dir / "montecarlo_resumen.csv"
+    with out_summary.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(["metric", "statistic", "value"])
+        for name, stats in (("cost_usd", cost_stats), ("ens_mwh", ens_stats)):
+            for k, v in stats.items():
+                w.writerow([name, k, v])
+        w.writerow(["ens_mwh", "prob_positive", p_ens])
+        w.writerow(["run", "samples", args.samples])
+        w.writerow(["run", "errors", n_err])
+        w.writerow(["run", "elapsed_s", elapsed])
+        w.writerow(["run", "samples_per_hour", args.samples / elapsed * 3600.0])
+
+    print("=== Monte Carlo MILP ===")
+    print(f"Muestras: {args.samples}  (errores: {n_err})  en {elapsed:,.1f} s  -> {args.samples / elapsed * 3600.0:,.0f} muestras/h")
+    for name, stats in (("Coste diario [USD]", cost_stats), ("ENS [MWh]", ens_stats)):
+        print(name + ": " + "  ".join(f"{k}={v:,.1f}" for k, v in stats.items()))
+    print(f"P(ENS > 0): {p_ens:.2%}")
+    print(f"Muestras: {out_csv}")
+    print(f"Resumen:  {out_summary}")
+
+
+if __name__ == "__main__":
+    main()
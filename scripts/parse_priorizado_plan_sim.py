@@ -4,11 +4,17 @@
 #           despachar_termica, avanzar_hora
 #
 # Salida: imprime verificación y crea CSV por hora con despacho por fuente.
+# Con --profile escribe además perfil_parse_priorizado_plan_sim.* junto al plan (ver perfilado.py).
 
 import re, sys, csv
 from pathlib import Path
 from collections import defaultdict
 
+import perfilado
+
+REPO = Path(__file__).resolve().parent.parent
+MODELS = REPO / "models"
+
 # --------- Regex generales ----------
 FLOAT = r'[+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?'
 RE_METRIC = re.compile(r'Metric\s*\(Search\)\s*:\s*(' + FLOAT + r')', re.IGNORECASE)
@@ -61,14 +67,17 @@ def slice_found_plan(plan_text: str) -> str:
     return s
 
 # --------- Parse del problema (solo :init) ----------
-def parse_problem(problem_path: Path):
+def parse_problem(problem_path: Path, verbose: bool = True):
     raw = problem_path.read_text(encoding='utf-8', errors='ignore')
+    return parse_problem_text(raw, verbose)
+
+def parse_problem_text(raw: str, verbose: bool = True):
     txt = strip_comments(raw)
 
     hours = parse_hours_from_objects(txt)
 
     init_block = extract_paren_block(txt, '(:init')
-    if not init_block:
+    if not init_block and verbose:
         print("[AVISO] No se pudo aislar el bloque (:init ...). Se intentará parsear todo el archivo.")
     source = init_block if init_block else txt
 
@@ -89,18 +98,28 @@ def parse_problem(problem_path: Path):
         scalars[fn] = val
 
     # Diagnóstico rápido
-    def cnt(name): return len(per_h.get(name, {}))
-    sum_dem = sum(per_h['demanda'].values()) if per_h['demanda'] else 0.0
-    print(f"[DBG] problem(:init) → hours:{len(hours)}  demanda:{cnt('demanda')} (Σ={sum_dem:,.0f})  "
-          f"pv:{cnt('pv_disponible')}  hidro_h:{cnt('hidro_disponible_hora')}  term_h:{cnt('termica_disponible_hora')}")
-    if len(per_h['demanda']) != len(hours):
-        print("[AVISO] Cantidad de (= (demanda hN) ...) distinta del # de horas.")
+    if verbose:
+        def cnt(name): return len(per_h.get(name, {}))
+        sum_dem = sum(per_h['demanda'].values()) if per_h['demanda'] else 0.0
+        print(f"[DBG] problem(:init) → hours:{len(hours)}  demanda:{cnt('demanda')} (Σ={sum_dem:,.0f})  "
+              f"pv:{cnt('pv_disponible')}  hidro_h:{cnt('hidro_disponible_hora')}  term_h:{cnt('termica_disponible_hora')}")
+        if len(per_h['demanda']) != len(hours):
+            print("[AVISO] Cantidad de (= (demanda hN) ...) distinta del # de horas.")
 
     return hours, scalars, per_h
 
+def problem_for_plan(plan_path: Path) -> Path | None:
+    """results_x/plan_enhsp_[sat_hadd_]<nombre>.txt -> models/*/problem_<nombre>.pddl"""
+    name = re.sub(r"^plan_enhsp_(?:sat_hadd_)?", "", plan_path.stem)
+    found = sorted(MODELS.glob(f"*/problem_{name}.pddl"))
+    return found[0] if found else None
+
 # --------- Parse del plan ----------
-def parse_plan(plan_path: Path):
+def parse_plan(plan_path: Path, verbose: bool = True):
     full_txt = plan_path.read_text(encoding='utf-8', errors='ignore')
+    return parse_plan_text(full_txt, verbose)
+
+def parse_plan_text(full_txt: str, verbose: bool = True):
     plan_txt = slice_found_plan(full_txt)
     lines = plan_txt.splitlines()
 
@@ -130,11 +149,12 @@ def parse_plan(plan_path: Path):
         except:
             pass
 
-    print(f"[DBG] Acciones leídas del plan: {len(actions)}")
-    if actions:
-        print("[DBG] Primeras 6:", actions[:6])
-    else:
-        print("[AVISO] No se reconocieron acciones. Revisa el archivo de plan o el regex.")
+    if verbose:
+        print(f"[DBG] Acciones leídas del plan: {len(actions)}")
+        if actions:
+            print("[DBG] Primeras 6:", actions[:6])
+        else:
+            print("[AVISO] No se reconocieron acciones. Revisa el archivo de plan o el regex.")
 
     return actions, metric
 
@@ -157,7 +177,8 @@ def simulate(plan_actions, hours, scalars, per_h):
     served_term  = {h: 0.0 for h in hours}
 
     # Escalares
-    presupuesto = scalars.get('presupuesto_hidro_diario', 0.0)
+    # Sin (presupuesto_hidro_diario) en el problema (p.ej. problem_priorizado2) no hay tope diario
+    presupuesto = scalars.get('presupuesto_hidro_diario', float('inf'))
     unidad      = scalars.get('unidad_despacho', 10.0)
     c_pv        = scalars.get('costo_pv', 0.0)
     c_hidro     = scalars.get('costo_hidro', 0.0)
@@ -237,7 +258,7 @@ def simulate(plan_actions, hours, scalars, per_h):
         'cost_break': cost_break,
         'totals_mwh': {'pv': total_pv, 'hidro': total_hy, 'termica': total_th, 'sum': total_energy},
         'demand': {'initial': total_demanda0, 'remaining': remaining, 'balance': total_energy - total_demanda0},
-        'presupuesto_hidro_restante': presupuesto,
+        'presupuesto_hidro_restante': presupuesto if presupuesto != float('inf') else None,
         'warnings': dict(warnings),
         'per_hour': {'pv': served_pv, 'hidro': served_hidro, 'termica': served_term},
         'params': {'unidad': unidad, 'costo_pv': c_pv, 'costo_hidro': c_hidro, 'costo_termica': c_term}
@@ -255,10 +276,31 @@ def save_csv(report, out_csv: Path, hours):
                         report['per_hour']['hidro'].get(h, 0.0),
                         report['per_hour']['termica'].get(h, 0.0)])
 
+# --------- Restricciones ----------
+def check_constraints(report, hours, scalars, per_h, plan_path: Path, problem_path: Path):
+    """
+    Capacidad, balance, presupuesto y rampas del despacho simulado (verificar_restricciones.py).
+    El dominio no modela las rampas: salen de data_<escenario>/system_constraints.csv si existe.
+    El goal admite dejar sin servir menos de una unidad por hora.
+    """
+    import verificar_restricciones as vr
+
+    lim = vr.Limites.de_problema(hours, scalars, per_h)
+    data_dir = vr.carpeta_datos(plan_path, problem_path)
+    if data_dir is not None:
+        lim = lim.completar(data_dir)
+    served = [[report['per_hour'][k].get(h, 0.0) for h in hours] for k in ('pv', 'hidro', 'termica')]
+    ver = vr.check_tabla(*served, lim, tolerancias={'deficit': report['params']['unidad'] - vr.TOL})
+    print()
+    vr.imprimir(ver, f"rampas de {data_dir.name}" if data_dir else "sin carpeta data_*: rampas no verificadas",
+                horas=[f"h{h}" for h in hours])
+    return ver
+
 # --------- main ----------
+@perfilado.perfilable("parse_priorizado_plan_sim")
 def main():
     if len(sys.argv) < 3:
-        print("Uso: python scripts/parse_priorizado_plan_sim.py <plan.txt> <problem.pddl>")
+        print("Uso: python scripts/parse_priorizado_plan_sim.py <plan.txt> <problem.pddl> [--profile]")
         sys.exit(1)
     plan_path = Path(sys.argv[1]); problem_path = Path(sys.argv[2])
     if not plan_path.exists():
@@ -266,10 +308,14 @@ def main():
     if not problem_path.exists():
         print(f"[ERROR] No existe problema: {problem_path}"); sys.exit(3)
 
-    actions, metric = parse_plan(plan_path)
-    hours, scalars, per_h = parse_problem(problem_path)
+    perfilado.salida(plan_path.parent)
+    with perfilado.etapa("parse_plan"):
+        actions, metric = parse_plan(plan_path)
+    with perfilado.etapa("parse_problem"):
+        hours, scalars, per_h = parse_problem(problem_path)
 
-    report = simulate(actions, hours, scalars, per_h)
+    with perfilado.etapa("simulate"):
+        report = simulate(actions, hours, scalars, per_h)
 
     print("\n=== Verificación por simulación (dominio priorizado) ===")
     if metric is not None:
@@ -292,15 +338,22 @@ def main():
     print("  Hidro   : ${:,.0f}".format(report['cost_break']['hidro']))
     print("  Térmica : ${:,.0f}".format(report['cost_break']['termica']))
 
-    print("\nPresupuesto hidro restante (día): {:,.0f} MWh".format(report['presupuesto_hidro_restante']))
+    if report['presupuesto_hidro_restante'] is not None:
+        print("\nPresupuesto hidro restante (día): {:,.0f} MWh".format(report['presupuesto_hidro_restante']))
+    else:
+        print("\nPresupuesto hidro diario: sin tope en el problema")
 
     if report['warnings']:
         print("\n[AVISOS] Clamps aplicados en simulación (acciones truncadas por límites):")
         for k, v in report['warnings'].items():
             print(f"  {k}: {v}")
 
+    with perfilado.etapa("verificar_restricciones"):
+        check_constraints(report, hours, scalars, per_h, plan_path, problem_path)
+
     out_csv = plan_path.parent / 'pddl_dispatch_priorizado_sim.csv'
-    save_csv(report, out_csv, hours)
+    with perfilado.etapa("save_csv"):
+        save_csv(report, out_csv, hours)
     print(f"\nCSV por hora → {out_csv}")
 
 if __name__ == "__main__":
@@ -0,0 +1,268 @@
+"""
+perfilado.py
+
+Modo --profile común a los scripts (milp_model.py, los tres scripts de plan y
+comparar_resultados_fase5.py). Con --profile, el main del script se ejecuta bajo cProfile y
+tracemalloc, con un muestreador de pilas en un hilo aparte, y al terminar (también con sys.exit o
+error) se escriben junto a las salidas del script:
+
+  perfil_<script>.pstats     estadísticas de cProfile (python -m pstats, snakeviz, ...)
+  perfil_<script>.txt        etapas (tiempo y pico de memoria), funciones más costosas por tiempo
+                             acumulado y propio, y líneas que más memoria reservan (top N)
+  perfil_<script>.collapsed  pilas muestreadas en formato "plegado" (una pila por línea, marcos
+                             separados por ';' y el número de muestras al final), compatible con
+                             flamegraph.pl, speedscope o inferno
+
+Sin --profile el coste es nulo: perfilable() solo mira si el token aparece en sys.argv,
+cProfile/tracemalloc no se importan y etapa() devuelve un contexto vacío compartido.
+
+Uso en un script:
+  import perfilado
+
+  @perfilado.perfilable("milp_model")
+  def main():
+      parser = argparse.ArgumentParser(...)
+      perfilado.add_profile_args(parser)
+      ...
+      perfilado.salida(results_dir)          # dónde escribir los informes
+      with perfilado.etapa("construccion"):
+          ...
+
+  python scripts/milp_model.py --data-dir data_caso_base --solver appsi_highs --profile
+  python scripts/resumir_plan_priorizado.py <problem.pddl> <plan.txt> --profile --profile-top 40
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+PROFILE_FLAG = "--profile"
+TOP_DEFAULT = 25
+SAMPLE_INTERVAL_S = 0.005
+
+_active = None          # Perfil en curso (None = perfilado desactivado)
+_out_dir = None         # Carpeta de informes indicada por el script con salida()
+
+
+class _Nulo:
+    """Contexto vacío (sin importar contextlib: el camino desactivado no debe cargar nada)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _Nulo()
+
+
+# =========================
+# API para los scripts
+# =========================
+
+def add_profile_args(parser) -> None:
+    """Documenta las opciones en --help (perfilable() las consume antes de que el script las vea)."""
+    g = parser.add_argument_group("perfilado")
+    g.add_argument(PROFILE_FLAG, action="store_true",
+                   help="Perfilar la ejecución (cProfile, tracemalloc y pilas muestreadas) y escribir perfil_*")
+    g.add_argument("--profile-dir", type=str, default=None,
+                   help="Carpeta de los informes de perfilado (por defecto, la de salida del script)")
+    g.add_argument("--profile-top", type=int, default=TOP_DEFAULT, help="Filas de los rankings de funciones y memoria")
+    g.add_argument("--profile-no-memory", action="store_true", help="Perfilar sin tracemalloc (menos sobrecoste)")
+
+
+def _parse_profile_args(argv: list) -> tuple:
+    import argparse
+
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    add_profile_args(parser)
+    return parser.parse_known_args(argv)
+
+
+def perfilable(name: str):
+    """Decorador para main(): con --profile en sys.argv lo ejecuta perfilado; si no, lo llama tal cual."""
+    def deco(main):
+        def wrapper(*args, **kwargs):
+            if PROFILE_FLAG not in sys.argv[1:]:
+                return main(*args, **kwargs)
+            opts, rest = _parse_profile_args(sys.argv[1:])
+            # Los scripts que leen sys.argv a mano no deben ver las opciones de perfilado
+            sys.argv[1:] = rest
+            return run_profiled(name, main, args, kwargs, out_dir=opts.profile_dir, top=opts.profile_top,
+                                memory=not opts.profile_no_memory)
+        wrapper.__name__, wrapper.__doc__, wrapper.__wrapped__ = main.__name__, main.__doc__, main
+        return wrapper
+    return deco
+
+
+def run_profiled(name: str, fn, args=(), kwargs=None, out_dir=None, top: int = TOP_DEFAULT, memory: bool = True):
+    global _active, _out_dir
+    profile = Perfil(name, top=top, memory=memory)
+    _active, _out_dir = profile, None
+    profile.start()
+    try:
+        return fn(*args, **(kwargs or {}))
+    finally:
+        profile.stop()
+        _active = None
+        target = Path(out_dir) if out_dir else (_out_dir or Path.cwd())
+        paths = profile.write(target)
+        print(f"[perfil] {', '.join(str(p) for p in paths)}")
+
+
+def salida(path) -> None:
+    """El script indica su carpeta de resultados (destino por defecto de los informes)."""
+    global _out_dir
+    if _active is not None:
+        _out_dir = Path(path)
+
+
+def etapa(nombre: str):
+    """Contexto que mide tiempo y pico de memoria de una etapa; vacío si no se está perfilando."""
+    if _active is None:
+        return _NULL
+    return _active.etapa(nombre)
+
+
+# =========================
+# Perfil
+# =========================
+
+def _frame_label(code) -> str:
+    return f"{Path(code.co_filename).name}:{code.co_name}".replace(";", ",").replace(" ", "_")
+
+
+class Perfil:
+    def __init__(self, name: str, top: int = TOP_DEFAULT, memory: bool = True,
+                 interval_s: float = SAMPLE_INTERVAL_S):
+        self.name = name
+        self.top = top
+        self.memory = memory
+        self.interval_s = interval_s
+        self.stages = []          # (nombre, segundos, pico_MB)
+        self.stacks = {}          # pila plegada -> muestras
+        self.snapshot = None
+        self._snapshot_bytes = 0
+        self._peak_total = 0
+        self.peak_mb = None
+        self.wall_s = 0.0
+
+    def start(self) -> None:
+        import cProfile
+        import threading
+        import time
+
+        self._time = time.perf_counter
+        self._stop = threading.Event()
+        self._main_id = threading.get_ident()
+        self._sampler = threading.Thread(target=self._sample, name="perfilado-muestreo", daemon=True)
+        if self.memory:
+            import tracemalloc
+
+            tracemalloc.start()
+        self._t0 = self._time()
+        self._sampler.start()
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop(self) -> None:
+        self.profiler.disable()
+        self.wall_s = self._time() - self._t0
+        self._stop.set()
+        self._sampler.join()
+        if self.memory:
+            import tracemalloc
+
+            self._keep_snapshot(tracemalloc)
+            self.peak_mb = self._peak_total / 1e6
+            tracemalloc.stop()
+
+    def _keep_snapshot(self, tracemalloc) -> None:
+        """Se conserva la instantánea con más memoria vigente (fin de cada etapa y fin del script)."""
+        current, peak = tracemalloc.get_traced_memory()
+        self._peak_total = max(self._peak_total, peak)
+        if self.snapshot is None or current > self._snapshot_bytes:
+            self.snapshot, self._snapshot_bytes = tracemalloc.take_snapshot(), current
+
+    def _sample(self) -> None:
+        """Muestrea la pila del hilo principal cada interval_s (funciona en Windows y Linux)."""
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self._main_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                key = ";".join(reversed(labels))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def etapa(self, nombre: str) -> "_Etapa":
+        return _Etapa(self, nombre)
+
+    def write(self, out_dir: Path) -> list:
+        import io
+        import pstats
+
+        out_dir.mkdir(parents=True, exist_ok=True)
+        base = out_dir / f"perfil_{self.name}"
+        pstats_path = base.with_suffix(".pstats")
+        self.profiler.dump_stats(str(pstats_path))
+
+        collapsed_path = base.with_suffix(".collapsed")
+        with collapsed_path.open("w", encoding="utf-8", newline="\n") as f:
+            for stack, n in sorted(self.stacks.items(), key=lambda kv: -kv[1]):
+                f.write(f"{stack} {n}\n")
+
+        report = io.StringIO()
+        report.write(f"Perfil de {self.name}: {self.wall_s:.3f} s de reloj, "
+                     f"{sum(self.stacks.values())} muestras de pila cada {self.interval_s * 1000:g} ms\n")
+        if self.peak_mb is not None:
+            report.write(f"Pico de memoria Python (tracemalloc): {self.peak_mb:.1f} MB\n")
+        if self.stages:
+            report.write("\n== Etapas ==\n")
+            for nombre, secs, peak in self.stages:
+                mem = f"  pico {peak:8.1f} MB" if peak is not None else ""
+                report.write(f"  {nombre:<24} {secs:9.3f} s{mem}\n")
+        for sort_key, title in (("cumulative", "tiempo acumulado"), ("tottime", "tiempo propio")):
+            report.write(f"\n== Top {self.top} funciones por {title} ==\n")
+            pstats.Stats(self.profiler, stream=report).strip_dirs().sort_stats(sort_key).print_stats(self.top)
+        if self.snapshot is not None:
+            report.write(f"\n== Top {self.top} líneas por memoria vigente ({self._snapshot_bytes / 1e6:.1f} MB; "
+                         f"instantánea de mayor uso entre los cierres de etapa y el final) ==\n")
+            for stat in self.snapshot.statistics("lineno")[:self.top]:
+                frame = stat.traceback[0]
+                report.write(f"  {stat.size / 1e6:9.3f} MB  {stat.count:9d} bloques  "
+                             f"{Path(frame.filename).name}:{frame.lineno}\n")
+        txt_path = base.with_suffix(".txt")
+        txt_path.write_text(report.getvalue(), encoding="utf-8")
+        return [pstats_path, txt_path, collapsed_path]
+
+
+class _Etapa:
+    """Mide una etapa: tiempo de reloj y pico de memoria desde su inicio."""
+
+    def __init__(self, profile: Perfil, nombre: str):
+        self.profile, self.nombre = profile, nombre
+        self.tracemalloc = None
+
+    def __enter__(self):
+        p = self.profile
+        if p.memory:
+            import tracemalloc
+
+            self.tracemalloc = tracemalloc
+            p._peak_total = max(p._peak_total, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self.t0 = p._time()
+        return self
+
+    def __exit__(self, *exc):
+        p = self.profile
+        secs = p._time() - self.t0
+        peak = None
+        if self.tracemalloc is not None:
+            peak = self.tracemalloc.get_traced_memory()[1] / 1e6
+            p._keep_snapshot(self.tracemalloc)
+        p.stages.append((self.nombre, secs, peak))
+        return False
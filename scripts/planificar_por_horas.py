@@ -0,0 +1,273 @@
+"""
+planificar_por_horas.py
+
+Planificación PDDL descompuesta por horas para los dominios `despacho_priorizado`.
+
+Las horas solo se acoplan por la secuencia hora_actual/siguiente y por el presupuesto hídrico
+diario, así que el problema de 24 h se parte en 24 subproblemas de una hora:
+
+  1. Cada hora recibe un presupuesto hídrico asignado. La compuerta hidro_agotado solo se
+     puede activar con el presupuesto GLOBAL agotado (o sin capacidad hidro en la hora), por lo
+     que la asignación válida es cronológica: cada hora recibe lo que necesita hasta agotar el
+     presupuesto diario.
+  2. Los subproblemas se lanzan en paralelo (cada uno es un proceso ENHSP; el pool solo los
+     coordina) y los perfiles horarios idénticos se planifican una sola vez (memoización por
+     firma del subproblema, válida entre rondas).
+  3. Tras cada ronda se mide el uso hídrico real de cada sub-plan y se reasigna el presupuesto;
+     se itera hasta que la asignación no cambia. Los sub-plans se unen con avanzar_hora en un
+     único plan con formato ENHSP que aceptan parse_priorizado_plan_sim.py,
+     resumir_plan_priorizado.py y verificar_y_visualizar_plan_priorizado.py.
+
+Uso:
+  python scripts/planificar_por_horas.py models/pddl_escenario3/domain_escenario3.pddl \\
+      models/pddl_escenario3/problem_escenario3.pddl --enhsp enhsp.jar --workers 8 \\
+      --out results_escenario3/plan_enhsp_escenario3_por_horas.txt
+  (Opcional) --planner-cmd "java -Xmx2g -jar enhsp.jar -o {domain} -f {problem} -planner sat-hadd"
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import re
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import parse_priorizado_plan_sim as sim
+
+DEFAULT_PLANNER_CMD = "java -jar {enhsp} -o {domain} -f {problem} -planner sat-hadd"
+HOUR_PLACEHOLDER = "__H__"
+
+
+# =========================
+# Subproblemas
+# =========================
+
+def domain_has_budget(domain_text: str) -> bool:
+    """True si el dominio declara (presupuesto_hidro_diario) fuera de comentarios."""
+    return re.search(r'\(\s*presupuesto_hidro_diario\s*\)', sim.strip_comments(domain_text)) is not None
+
+
+def hydro_need(h: int, scalars: dict, per_h: dict) -> float:
+    """Hidro que despacharía la hora h sin límite de presupuesto (misma granularidad que el dominio)."""
+    u = scalars.get("unidad_despacho", 10.0)
+    d = per_h["demanda"].get(h, 0.0)
+    pv = per_h["pv_disponible"].get(h, 0.0)
+    hy = per_h["hidro_disponible_hora"].get(h, 0.0)
+    pv_used = u * min(d // u, pv // u)
+    return u * min((d - pv_used) // u, hy // u)
+
+
+def allocate_budget(hours, needs: dict, budget: float) -> dict:
+    """Asignación cronológica del presupuesto diario según la necesidad hídrica de cada hora."""
+    alloc, remaining = {}, budget
+    for h in hours:
+        alloc[h] = max(0.0, min(needs[h], remaining))
+        remaining -= alloc[h]
+    return alloc
+
+
+def _fmt(v: float) -> str:
+    return f"{v:g}"
+
+
+def subproblem_text(h: int, scalars: dict, per_h: dict, budget_h: float | None, last: bool,
+                    hour_name: str | None = None) -> str:
+    """Problema de una sola hora. Sin `hour_name` se usa el nombre real hN."""
+    hn = hour_name or f"h{h}"
+    init = []
+    for fn, val in sorted(scalars.items()):
+        if fn == "presupuesto_hidro_diario":
+            continue
+        init.append(f"(= ({fn}) {_fmt(0.0 if fn == 'costo_total' else val)})")
+    if budget_h is not None:
+        init.append(f"(= (presupuesto_hidro_diario) {_fmt(budget_h)})")
+    init.append(f"(hora_actual {hn})")
+    for fn in sorted(per_h):
+        if h in per_h[fn]:
+            init.append(f"(= ({fn} {hn}) {_fmt(per_h[fn][h])})")
+
+    served = f"(< (demanda {hn}) (unidad_despacho))"
+    if last:
+        goal = served
+    else:
+        # Misma condición que permite avanzar_hora en el problema completo
+        goal = (f"(or {served} (and (pv_agotado {hn}) (hidro_agotado {hn}) "
+                f"(< (termica_disponible_hora {hn}) (unidad_despacho))))")
+    body = "\n        ".join(init)
+    return (f"(define (problem despacho_{hn})\n"
+            f"    (:domain despacho_priorizado)\n"
+            f"    (:objects {hn} - hour)\n"
+            f"    (:init\n        {body}\n    )\n"
+            f"    (:goal (and {goal}))\n"
+            f"    (:metric minimize (costo_total))\n)\n")
+
+
+def signature(domain_text: str, h: int, scalars: dict, per_h: dict, budget_h, last: bool) -> str:
+    """Firma del subproblema independiente del nombre de la hora (perfiles idénticos → misma firma)."""
+    txt = subproblem_text(h, scalars, per_h, budget_h, last, hour_name=HOUR_PLACEHOLDER)
+    return hashlib.sha1((domain_text + "\n" + txt).encode("utf-8")).hexdigest()
+
+
+# =========================
+# Planificador externo
+# =========================
+
+def run_planner(cmd_template: str, enhsp: str, domain_path: Path, problem_text: str, timeout: float | None) -> dict:
+    """Lanza ENHSP sobre un subproblema y devuelve acciones (con la hora como placeholder), métrica y tiempo."""
+    with tempfile.TemporaryDirectory(prefix="tfm_hora_") as tmp:
+        problem_path = Path(tmp) / "problem.pddl"
+        problem_path.write_text(problem_text, encoding="utf-8")
+        cmd = cmd_template.format(enhsp=enhsp, domain=str(domain_path), problem=str(problem_path))
+        t0 = time.perf_counter()
+        proc = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=timeout)
+        elapsed = time.perf_counter() - t0
+    actions, metric = sim.parse_plan_text(proc.stdout, verbose=False)
+    if "Found Plan" not in proc.stdout or (not actions and metric is None):
+        tail = (proc.stdout + proc.stderr).strip().splitlines()[-5:]
+        raise RuntimeError(f"El planificador no devolvió plan (código {proc.returncode}): " + " | ".join(tail))
+    return {"actions": [act for act, _h1, _h2 in actions], "metric": metric, "elapsed_s": elapsed}
+
+
+# =========================
+# Coordinación por rondas
+# =========================
+
+def plan_by_hours(domain_path: Path, problem_path: Path, cmd_template: str = DEFAULT_PLANNER_CMD,
+                  enhsp: str = "enhsp.jar", workers: int | None = None, timeout: float | None = None,
+                  max_rounds: int = 5, verbose: bool = True) -> dict:
+    domain_text = domain_path.read_text(encoding="utf-8", errors="ignore")
+    hours, scalars, per_h = sim.parse_problem(problem_path, verbose=False)
+    u = scalars.get("unidad_despacho", 10.0)
+    has_budget = domain_has_budget(domain_text) and "presupuesto_hidro_diario" in scalars
+    budget = scalars.get("presupuesto_hidro_diario") if has_budget else None
+
+    needs = {h: hydro_need(h, scalars, per_h) for h in hours}
+    memo = {}
+    stats = {"rounds": 0, "subproblems": 0, "planner_calls": 0, "memo_hits": 0, "planner_s": 0.0}
+    t_start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        alloc = None
+        for rnd in range(1, max_rounds + 1):
+            new_alloc = allocate_budget(hours, needs, budget) if has_budget else {h: None for h in hours}
+            if new_alloc == alloc:
+                break
+            alloc = new_alloc
+            stats["rounds"] = rnd
+
+            sigs = {h: signature(domain_text, h, scalars, per_h, alloc[h], h == hours[-1]) for h in hours}
+            pending = {}
+            for h in hours:
+                stats["subproblems"] += 1
+                if sigs[h] in memo or sigs[h] in pending:
+                    stats["memo_hits"] += 1
+                    continue
+                text = subproblem_text(h, scalars, per_h, alloc[h], h == hours[-1])
+                pending[sigs[h]] = pool.submit(run_planner, cmd_template, enhsp, domain_path, text, timeout)
+            for sig, fut in pending.items():
+                memo[sig] = fut.result()
+                stats["planner_calls"] += 1
+                stats["planner_s"] += memo[sig]["elapsed_s"]
+
+            sub_plans = {h: memo[sigs[h]] for h in hours}
+            if verbose:
+                print(f"[Ronda {rnd}] subproblemas={len(hours)}  planificados={len(pending)}  "
+                      f"memoizados={len(hours) - len(pending)}")
+            if not has_budget:
+                break
+            # Uso hídrico real de cada sub-plan: si una hora usó menos de lo asignado, la diferencia
+            # se reasigna en la ronda siguiente a las horas posteriores limitadas por presupuesto.
+            used = {h: u * sub_plans[h]["actions"].count("despachar_hidro") for h in hours}
+            for h in hours:
+                if used[h] < alloc[h] - 1e-9 or alloc[h] >= needs[h]:
+                    needs[h] = used[h]
+
+    stats["wall_s"] = time.perf_counter() - t_start
+    return {"hours": hours, "sub_plans": sub_plans, "allocation": alloc, "stats": stats}
+
+
+def stitch(hours, sub_plans: dict, advance_action: str = "avanzar_hora") -> tuple:
+    """Plan completo: acciones de cada hora seguidas de (avanzar_hora hN hN+1)."""
+    lines = []
+    metric = 0.0
+    for i, h in enumerate(hours):
+        for act in sub_plans[h]["actions"]:
+            lines.append(f"({act} h{h})")
+        if i + 1 < len(hours):
+            lines.append(f"({advance_action} h{h} h{hours[i + 1]})")
+        metric += sub_plans[h]["metric"] or 0.0
+    return lines, metric
+
+
+def write_plan(lines, metric: float, stats: dict, out_path: Path) -> None:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with out_path.open("w", encoding="utf-8", newline="\n") as f:
+        f.write("Plan por horas (planificar_por_horas.py)\n")
+        f.write("Found Plan:\n")
+        for i, ln in enumerate(lines):
+            f.write(f"{i}.0: {ln}\n")
+        f.write("\n")
+        f.write(f"Plan-Length:{len(lines)}\n")
+        f.write(f"Metric (Search):{metric}\n")
+        f.write(f"Planning Time (msec): {int(stats['wall_s'] * 1000)}\n")
+        f.write(f"Rounds:{stats['rounds']}\n")
+        f.write(f"Subproblems:{stats['subproblems']}  Planner calls:{stats['planner_calls']}  "
+                f"Memo hits:{stats['memo_hits']}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planificación ENHSP descompuesta por horas con coordinación del presupuesto hídrico")
+    parser.add_argument("domain", help="domain.pddl (despacho_priorizado)")
+    parser.add_argument("problem", help="problem.pddl de 24 h")
+    parser.add_argument("--out", required=True, help="Plan unido (formato ENHSP)")
+    parser.add_argument("--enhsp", default="enhsp.jar", help="Ruta a enhsp.jar (sustituye {enhsp} en --planner-cmd)")
+    parser.add_argument("--planner-cmd", default=DEFAULT_PLANNER_CMD,
+                        help="Comando del planificador con {enhsp}, {domain} y {problem}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Subproblemas planificados a la vez")
+    parser.add_argument("--timeout", type=float, default=None, help="Tiempo máximo por subproblema [s]")
+    parser.add_argument("--max-rounds", type=int, default=5, help="Rondas máximas de reasignación del presupuesto")
+    args = parser.parse_args()
+
+    domain_path, problem_path = Path(args.domain), Path(args.problem)
+    res = plan_by_hours(domain_path, problem_path, args.planner_cmd, args.enhsp, args.workers,
+                        args.timeout, args.max_rounds)
+    lines, metric = stitch(res["hours"], res["sub_plans"])
+    out = Path(args.out)
+    write_plan(lines, metric, res["stats"], out)
+
+    # Comprobación del plan unido con la simulación de siempre
+    hours, scalars, per_h = sim.parse_problem(problem_path, verbose=False)
+    actions, _ = sim.parse_plan(out, verbose=False)
+    report = sim.simulate(actions, hours, scalars, per_h)
+
+    st = res["stats"]
+    print("=== Planificación por horas ===")
+    print(f"Rondas: {st['rounds']}  | llamadas al planificador: {st['planner_calls']}  | memoizadas: {st['memo_hits']}")
+    print(f"Tiempo total: {st['wall_s']:.2f} s  | suma de tiempos de subproblemas: {st['planner_s']:.2f} s")
+    print(f"Acciones: {len(lines)}  | Metric: {metric:,.2f}  | coste simulado: {report['total_cost_recalc']:,.2f}")
+    print(f"Demanda restante: {report['demand']['remaining']:,.2f}  | avisos: {report['warnings'] or 'ninguno'}")
+    if res["allocation"] and any(v is not None for v in res["allocation"].values()):
+        print("Presupuesto hídrico asignado: " + " ".join(f"h{h}={v:g}" for h, v in res["allocation"].items()))
+    print(f"Plan: {out}")
+
+    import registro_ejecuciones as registro
+
+    demand = report["demand"]
+    registro.record_run(
+        "planificar_por_horas.py", "pddl_por_horas", escenario=registro.scenario_name(problem_path),
+        estado="ok" if not report["warnings"] else "avisos", input_hash=registro.hash_files(domain_path, problem_path),
+        opciones={"planner_cmd": args.planner_cmd, "workers": args.workers, "timeout": args.timeout,
+                  "max_rounds": args.max_rounds, "rounds": st["rounds"], "planner_calls": st["planner_calls"],
+                  "memo_hits": st["memo_hits"]},
+        etapas={"planificacion": st["wall_s"], "subproblemas": st["planner_s"]},
+        coste=report["total_cost_recalc"], plan_len=len(lines),
+        cobertura=1.0 - demand["remaining"] / demand["initial"] if demand["initial"] else None,
+        t_total_s=st["wall_s"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+portafolio_solvers.py
+
+Carrera de solvers para el MILP de milp_model.py: el mismo modelo se construye y resuelve en
+paralelo con varios solvers locales (un proceso por solver). Gana el primero que demuestra
+optimalidad y el resto se mata (con su grupo de procesos, para no dejar glpsol/cbc huérfanos).
+Cada carrera se añade a results_benchmarks/portafolio_historial.csv con el tiempo y el estado de
+cada solver, y el historial elige el solver por defecto de cada clase de problema (LP / UC y horas):
+el que más carreras ha ganado y, a igualdad, el de menor mediana de tiempo.
+
+Desde milp_model.py:
+  python scripts/milp_model.py --data-dir data_caso_base --results-dir results_caso_base --portfolio glpk cbc appsi_highs
+  python scripts/milp_model.py --data-dir data_caso_base --results-dir results_caso_base --uc --solver auto
+
+Uso directo (carreras sin exportar resultados y recomendación por clase):
+  python scripts/portafolio_solvers.py --data-dir data_escenario2 --uc --repeats 3
+  python scripts/portafolio_solvers.py --recomendar
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import multiprocessing as mp
+import multiprocessing.connection as mp_connection
+import os
+import signal
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+
+import milp_model
+
+REPO = Path(__file__).resolve().parent.parent
+HISTORY = REPO / "results_benchmarks" / "portafolio_historial.csv"
+HISTORY_COLUMNS = ["fecha", "clase", "solver", "estado", "tiempo_s", "total_cost_usd", "ganador"]
+
+# Orden de preferencia cuando no hay historial
+PORTFOLIO_DEFAULT = ["appsi_highs", "cbc", "glpk"]
+
+
+# =========================
+# Solvers y clases de problema
+# =========================
+
+def available_solvers(names, glpk_executable: str | None = None) -> list:
+    out = []
+    for name in names:
+        try:
+            if milp_model.make_solver(name, glpk_executable).available(exception_flag=False):
+                out.append(name)
+        except Exception:
+            pass
+    return out
+
+
+def problem_class(hours, uc: dict | None) -> str:
+    return f"{'uc' if uc else 'lp'}-{len(hours)}h"
+
+
+# =========================
+# Carrera
+# =========================
+
+def _race_worker(name, glpk_executable, inputs, build_kwargs, limits, initial, conn) -> None:
+    # Grupo de procesos propio: así el padre puede matar también al ejecutable del solver
+    if hasattr(os, "setsid"):
+        os.setsid()
+    try:
+        model = milp_model.build_model(*inputs, **build_kwargs)
+        if initial:
+            milp_model.load_variable_values(model, initial)
+        mip_gap, time_limit, cutoff = limits
+        options = milp_model.solver_limit_options(name, mip_gap, time_limit, cutoff)
+        summary = milp_model.solve_model(model, solver_name=name, glpk_executable=glpk_executable,
+                                         options=options, warmstart=bool(initial))
+        conn.send(("ok", summary, milp_model.variable_values(model)))
+    except Exception as ex:
+        conn.send(("error", {"error": repr(ex)}, None))
+    finally:
+        conn.close()
+
+
+def _kill(proc) -> None:
+    if not proc.is_alive():
+        return
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            proc.kill()
+    else:
+        proc.terminate()
+    proc.join()
+
+
+def race(inputs: tuple, build_kwargs: dict, solvers: list, glpk_executable: str | None = None,
+         limits: tuple = (None, None, None), initial: dict | None = None, timeout: float | None = None) -> tuple:
+    """
+    Lanza un proceso por solver sobre el mismo modelo (inputs = salida de milp_model._read_csvs).
+    Devuelve (ganador, resumen, valores, filas): el primer solver con terminación 'optimal' o, si
+    ninguno la demuestra, el de menor coste entre los que terminaron; `valores` son las variables de
+    su solución y `filas` el registro por solver. Los tiempos son de reloj desde el lanzamiento
+    (incluyen construir el modelo en el proceso); el estado es la terminación, 'error' o 'cancelado'.
+    """
+    if not solvers:
+        raise ValueError("No hay solvers disponibles para el portafolio")
+    ctx = mp.get_context("spawn")
+    t0 = time.perf_counter()
+    procs, conns = {}, {}
+    for name in solvers:
+        recv, send = ctx.Pipe(duplex=False)
+        p = ctx.Process(target=_race_worker, daemon=True,
+                        args=(name, glpk_executable, inputs, build_kwargs, limits, initial, send))
+        p.start()
+        send.close()
+        procs[name], conns[recv] = p, name
+
+    done = {}
+    winner = None
+    try:
+        while conns and winner is None:
+            remaining = None if timeout is None else timeout - (time.perf_counter() - t0)
+            if remaining is not None and remaining <= 0:
+                break
+            for conn in mp_connection.wait(list(conns), timeout=remaining):
+                name = conns.pop(conn)
+                try:
+                    status, summary, values = conn.recv()
+                except EOFError:
+                    # El proceso murió sin responder
+                    status, summary, values = "error", {"error": f"exitcode {procs[name].exitcode}"}, None
+                conn.close()
+                done[name] = (status, time.perf_counter() - t0, summary, values)
+                if status == "ok" and summary.get("termination_condition") == "optimal":
+                    winner = name
+                    break
+    finally:
+        for name, p in procs.items():
+            if name in done:
+                p.join(timeout=2.0)
+            _kill(p)
+        for conn in conns:
+            conn.close()
+
+    if winner is None:
+        finished = [(n, d) for n, d in done.items() if d[0] == "ok"]
+        if finished:
+            winner = min(finished, key=lambda nd: nd[1][2]["total_cost_usd"])[0]
+
+    stamp = datetime.now().isoformat(timespec="seconds")
+    rows = []
+    for name in solvers:
+        if name in done:
+            status, elapsed, summary, _ = done[name]
+            estado = summary.get("termination_condition", "unknown") if status == "ok" else "error"
+            cost = summary.get("total_cost_usd")
+        else:
+            estado, elapsed, cost = "cancelado", time.perf_counter() - t0, None
+        rows.append({"fecha": stamp, "solver": name, "estado": estado, "tiempo_s": elapsed,
+                     "total_cost_usd": cost, "ganador": name == winner})
+    if winner is None:
+        return None, None, None, rows
+    return winner, done[winner][2], done[winner][3], rows
+
+
+def usable_solvers(requested: list | None, glpk_executable: str | None = None) -> list:
+    """Los solvers pedidos (o PORTFOLIO_DEFAULT) que están instalados, avisando de los que no."""
+    names = requested or PORTFOLIO_DEFAULT
+    ok = available_solvers(names, glpk_executable)
+    missing = [n for n in names if n not in ok]
+    if missing and requested:
+        print(f"[AVISO] Solvers no disponibles, se excluyen del portafolio: {' '.join(missing)}")
+    return ok
+
+
+def print_race(rows: list) -> None:
+    for r in rows:
+        cost = f"{r['total_cost_usd']:,.2f}" if r["total_cost_usd"] is not None else "-"
+        mark = "  <- ganador" if r["ganador"] else ""
+        print(f"  {r['solver']:<14} {r['estado']:<14} {r['tiempo_s']:8.3f} s  coste={cost}{mark}")
+
+
+# =========================
+# Historial
+# =========================
+
+def append_history(rows: list, clase: str, path: Path = HISTORY) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    new = not path.exists()
+    with path.open("a", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=HISTORY_COLUMNS, lineterminator="\n")
+        if new:
+            w.writeheader()
+        for r in rows:
+            w.writerow({**r, "clase": clase, "tiempo_s": f"{r['tiempo_s']:.4f}"})
+
+
+def read_history(path: Path = HISTORY) -> list:
+    if not path.exists():
+        return []
+    with path.open(encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def ranking(clase: str, path: Path = HISTORY) -> list:
+    """[(solver, victorias, mediana_tiempo_ganando)] de la clase, del mejor al peor."""
+    wins, times = {}, {}
+    for r in read_history(path):
+        if r["clase"] != clase:
+            continue
+        wins.setdefault(r["solver"], 0)
+        if r["ganador"] == "True":
+            wins[r["solver"]] += 1
+            times.setdefault(r["solver"], []).append(float(r["tiempo_s"]))
+    out = [(s, wins[s], statistics.median(times[s]) if s in times else float("inf")) for s in wins]
+    return sorted(out, key=lambda x: (-x[1], x[2]))
+
+
+def recommend(clase: str, candidates: list | None = None, glpk_executable: str | None = None,
+              path: Path = HISTORY) -> str:
+    """Solver por defecto para la clase: el mejor del historial que esté instalado (o el primero disponible)."""
+    available = available_solvers(candidates or PORTFOLIO_DEFAULT, glpk_executable)
+    for solver, n_wins, _t in ranking(clase, path):
+        if n_wins > 0 and solver in available:
+            return solver
+    if not available:
+        raise RuntimeError(f"Ninguno de {candidates or PORTFOLIO_DEFAULT} está instalado")
+    return available[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carrera de solvers MILP con historial por clase de problema")
+    parser.add_argument("--data-dir", type=str, default=None, help="Carpeta data_* del escenario")
+    parser.add_argument("--solvers", type=str, nargs="+", default=None,
+                        help=f"Solvers a enfrentar (por defecto, los instalados de {' '.join(PORTFOLIO_DEFAULT)})")
+    parser.add_argument("--glpk-exe", type=str, default=None, help="Ruta a glpsol (por defecto, el del PATH)")
+    parser.add_argument("--uc", action="store_true", help="Unit commitment térmico (valores de system_constraints.csv)")
+    parser.add_argument("--mip-gap", type=float, default=None)
+    parser.add_argument("--time-limit", type=float, default=None, help="Tiempo máximo de cada solver [s]")
+    parser.add_argument("--repeats", type=int, default=1, help="Carreras a registrar")
+    parser.add_argument("--historial", type=str, default=None, help="CSV de historial (por defecto results_benchmarks/)")
+    parser.add_argument("--recomendar", action="store_true", help="Solo mostrar el ranking del historial por clase")
+    args = parser.parse_args()
+
+    glpk_exe = args.glpk_exe or milp_model.default_glpk_executable()
+    path = Path(args.historial) if args.historial else HISTORY
+
+    if args.recomendar:
+        for clase in sorted({r["clase"] for r in read_history(path)}):
+            print(f"{clase}:")
+            for solver, n_wins, t in ranking(clase, path):
+                print(f"  {solver:<14} victorias={n_wins:<4} mediana={t:.3f} s")
+        return
+    if not args.data_dir:
+        parser.error("--data-dir es obligatorio salvo con --recomendar")
+
+    data_dir = Path(args.data_dir)
+    uc = milp_model.read_uc_params(data_dir, {}) if args.uc else None
+    inputs = milp_model._read_csvs(data_dir)
+    clase = problem_class(inputs[0], uc)
+    solvers = usable_solvers(args.solvers, glpk_exe)
+    print(f"Portafolio {solvers} — {data_dir.name} ({clase})")
+    for i in range(max(1, args.repeats)):
+        winner, summary, _values, rows = race(inputs, {"uc": uc}, solvers, glpk_executable=glpk_exe,
+                                              limits=(args.mip_gap, args.time_limit, None))
+        print(f"Carrera {i + 1}:")
+        print_race(rows)
+        append_history(rows, clase, path)
+    print(f"Solver recomendado para '{clase}': {recommend(clase, solvers, glpk_exe, path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1198 @@
+"""
+preprocesar_pddl.py
+
+Preproceso de pares dominio/problema antes de ENHSP. ENHSP cuenta como variables numéricas
+funciones que nunca cambian (costo_pv, costo_hidro, costo_termica, unidad_despacho), trabaja con
+magnitudes de 1e12 en la heurística y el plan gasta pasos en las acciones de compuerta
+(marcar_*_agotado / activar_flag_*). El preproceso reescribe el par en tres pasadas:
+
+  1. Fluentes estáticos: las funciones sin ningún efecto que las modifique se sustituyen por su
+     valor del :init y se pliegan las operaciones constantes ((* 40 5) -> 200). Desaparecen de
+     :functions y de :init, y el dominio resultante queda ligado a ese problema.
+  2. Compuertas de prioridad: un predicado que solo añade una acción de compuerta, cuya
+     precondición es monótona (comparaciones < / <= sobre fluentes que solo decrecen, y otras
+     compuertas), se sustituye en las precondiciones por esa condición y se eliminan el
+     predicado y la acción. Solo se compila si es seguro: el contexto de la compuerta
+     ((hora_actual ?h)) está en cada acción que la usa y cada (not compuerta) es redundante con
+     el resto de la precondición. Si no, la compuerta se deja como está y se indica el motivo.
+  3. Reescalado: las funciones y constantes se agrupan por dimensión (las que se comparan o se
+     suman entre sí) y cada grupo se divide por el MCD de sus constantes en el dominio. La
+     energía queda en unidades de despacho (unidad = 1) y el coste en múltiplos del despacho más
+     barato. La igualdad en los umbrales (x = k·unidad) se conserva exacta.
+
+Las acciones de despacho y avance no cambian de nombre ni de parámetros, así que un plan del par
+preprocesado es el plan original sin las acciones de compuerta. --restaurar las reinserta (donde
+la precondición original las pide) y valida el plan contra el par original; la métrica que
+imprime ENHSP sobre el par preprocesado se multiplica por la escala del coste, guardada en
+preproceso_<problema>.json.
+
+--benchmark planifica el par original y el preprocesado y compara el tamaño del grounding
+(estático y el que informa ENHSP), h(s_0), tiempos de heurística y búsqueda, longitud del plan y
+coste validado sobre el problema original (preproceso_benchmark.csv).
+
+Uso:
+  python scripts/preprocesar_pddl.py models/pddl_escenario1/domain_escenario1.pddl \\
+      models/pddl_escenario1/problem_escenario1.pddl --out-dir models/pddl_escenario1/preprocesado
+  python scripts/preprocesar_pddl.py <domain> <problem> --restaurar plan_pre.txt --out plan_restaurado.txt
+  python scripts/preprocesar_pddl.py <domain> <problem> --benchmark --enhsp enhsp.jar --out-dir /tmp/pre
+  (Opcional) --sin-estaticos --sin-compuertas --sin-escala
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import re
+import subprocess
+import time
+from dataclasses import dataclass, field
+from fractions import Fraction
+from itertools import product
+from pathlib import Path
+
+import parse_priorizado_plan_sim as sim
+from planificar_por_horas import DEFAULT_PLANNER_CMD
+
+EFECTOS_NUM = ("increase", "decrease", "assign", "scale-up", "scale-down")
+ARITMETICA = ("+", "-", "*", "/")
+COMPARACIONES = ("<", "<=", ">", ">=", "=")
+TOKEN = re.compile(r"\(|\)|[^\s()]+")
+RE_PASO = re.compile(r"^\s*\d+(?:\.\d+)?:\s*\(([^()]+)\)\s*$", re.MULTILINE)
+RGX_GROUNDING = {
+    "grounding_ms": re.compile(r"Grounding Time:\s*(\d+)"),
+    "F": re.compile(r"\|F\|:\s*(\d+)"),
+    "X": re.compile(r"\|X\|:\s*(\d+)"),
+    "A": re.compile(r"\|A\|:\s*(\d+)"),
+}
+BENCH_COLUMNS = [
+    "variante", "F_estatico", "X_estatico", "A_estatico", "t_preproceso_ms", "estado", "grounding_ms", "F", "X", "A",
+    "h0", "heuristic_ms", "search_ms", "planning_ms", "expanded", "evaluated", "t_planificador_s",
+    "plan_len", "pasos_compuerta", "metric_enhsp", "coste", "valido",
+]
+
+
+# =========================
+# Lectura y escritura de PDDL
+# =========================
+
+def _atom(tok: str):
+    try:
+        return Fraction(tok)
+    except (ValueError, ZeroDivisionError):
+        return tok
+
+
+def parse_sexpr(text: str) -> list:
+    """PDDL -> listas anidadas (símbolos en minúscula, números como Fraction para operar exacto)."""
+    stack = [[]]
+    for tok in TOKEN.findall(sim.strip_comments(text).lower()):
+        if tok == "(":
+            stack.append([])
+        elif tok == ")":
+            if len(stack) < 2:
+                raise ValueError("Paréntesis desbalanceados: sobra ')'")
+            e = stack.pop()
+            stack[-1].append(e)
+        else:
+            stack[-1].append(_atom(tok))
+    if len(stack) != 1 or not stack[0]:
+        raise ValueError("Paréntesis desbalanceados o texto vacío")
+    return stack[0][0]
+
+
+def _num(x: Fraction) -> str:
+    if x.denominator == 1:
+        return str(x.numerator)
+    return repr(float(x))
+
+
+def fmt(e) -> str:
+    if isinstance(e, bool):
+        return "(and)" if e else "(or)"
+    if isinstance(e, Fraction):
+        return _num(e)
+    if isinstance(e, list):
+        return "(" + " ".join(fmt(x) for x in e) + ")"
+    return str(e)
+
+
+def _conjuntos(e) -> list:
+    """Conjunción de primer nivel como lista (aplanando los and anidados)."""
+    if e is None or e is True:
+        return []
+    if isinstance(e, list) and e and e[0] == "and":
+        out = []
+        for x in e[1:]:
+            out.extend(_conjuntos(x))
+        return out
+    return [e]
+
+
+def _y(conjuntos: list):
+    """Conjunción sin duplicados; con un solo elemento se devuelve tal cual."""
+    vistos, out = set(), []
+    for c in conjuntos:
+        k = fmt(c)
+        if k not in vistos:
+            vistos.add(k)
+            out.append(c)
+    return out[0] if len(out) == 1 else ["and", *out]
+
+
+@dataclass
+class Accion:
+    nombre: str
+    parametros: list          # tokens tal cual: ?h - hour ...
+    pre: object               # expresión (o None)
+    efecto: object
+
+    @property
+    def variables(self) -> list:
+        return [t for t in self.parametros if isinstance(t, str) and t.startswith("?")]
+
+
+@dataclass
+class Dominio:
+    nombre: str
+    secciones: list           # :requirements, :types, :constants ... tal cual
+    predicados: list
+    funciones: list
+    acciones: list
+
+
+@dataclass
+class Problema:
+    nombre: str
+    dominio: str
+    objetos: list
+    init: list
+    goal: object
+    metric: object
+    otros: list = field(default_factory=list)
+
+
+def _accion(e: list) -> Accion:
+    campos = dict(zip(e[2::2], e[3::2]))
+    return Accion(e[1], campos.get(":parameters", []), campos.get(":precondition"), campos.get(":effect"))
+
+
+def leer_dominio(text: str) -> Dominio:
+    e = parse_sexpr(text)
+    if e[:1] != ["define"]:
+        raise ValueError("El dominio no empieza por (define ...)")
+    nombre, secciones, predicados, funciones, acciones = None, [], [], [], []
+    for s in e[1:]:
+        head = s[0]
+        if head == "domain":
+            nombre = s[1]
+        elif head == ":predicates":
+            predicados = list(s[1:])
+        elif head == ":functions":
+            funciones = [f for f in s[1:] if isinstance(f, list)]
+        elif head == ":action":
+            acciones.append(_accion(s))
+        else:
+            secciones.append(s)
+    return Dominio(nombre, secciones, predicados, funciones, acciones)
+
+
+def leer_problema(text: str) -> Problema:
+    e = parse_sexpr(text)
+    p = Problema(None, None, [], [], None, None)
+    for s in e[1:]:
+        head = s[0]
+        if head == "problem":
+            p.nombre = s[1]
+        elif head == ":domain":
+            p.dominio = s[1]
+        elif head == ":objects":
+            p.objetos = list(s[1:])
+        elif head == ":init":
+            p.init = list(s[1:])
+        elif head == ":goal":
+            p.goal = s[1]
+        elif head == ":metric":
+            p.metric = s[1:]
+        else:
+            p.otros.append(s)
+    return p
+
+
+def _bloque(etiqueta: str, items: list, ind: str = "    ", por_linea: int = 1) -> list:
+    lines = [f"{ind}({etiqueta}"]
+    for i in range(0, len(items), por_linea):
+        lines.append(ind + "    " + " ".join(fmt(x) for x in items[i:i + por_linea]))
+    lines.append(ind + ")")
+    return lines
+
+
+def _condicion(etiqueta: str, e, ind: str) -> list:
+    if e is None:
+        return []
+    conj = _conjuntos(e)
+    if len(conj) <= 1 and not (isinstance(e, list) and e[:1] == ["and"]):
+        return [f"{ind}{etiqueta} {fmt(e)}"]
+    return [f"{ind}{etiqueta} (and"] + [f"{ind}    {fmt(c)}" for c in conj] + [f"{ind})"]
+
+
+def escribir_dominio(d: Dominio) -> str:
+    lines = [f"(define (domain {d.nombre})"]
+    lines += ["    " + fmt(s) for s in d.secciones]
+    lines += _bloque(":predicates", d.predicados)
+    lines += _bloque(":functions", d.funciones)
+    for a in d.acciones:
+        lines.append("")
+        lines.append(f"    (:action {a.nombre}")
+        lines.append(f"        :parameters {fmt(a.parametros)}")
+        lines += _condicion(":precondition", a.pre, "        ")
+        lines += _condicion(":effect", a.efecto, "        ")
+        lines.append("    )")
+    lines.append(")")
+    return "\n".join(lines) + "\n"
+
+
+def escribir_problema(p: Problema) -> str:
+    lines = [f"(define (problem {p.nombre})", f"    (:domain {p.dominio})"]
+    lines += _bloque(":objects", p.objetos, por_linea=12)
+    lines += _bloque(":init", p.init, por_linea=6)
+    if p.goal is not None:
+        lines += _condicion("(:goal", p.goal, "    ")
+        lines[-1] += ")"
+    if p.metric:
+        lines.append("    (:metric " + " ".join(fmt(x) for x in p.metric) + ")")
+    lines += ["    " + fmt(s) for s in p.otros]
+    lines.append(")")
+    return "\n".join(lines) + "\n"
+
+
+# =========================
+# Utilidades sobre expresiones
+# =========================
+
+def _efectos(e):
+    """Efectos atómicos (aplanando and/when/forall)."""
+    if not isinstance(e, list) or not e:
+        return
+    if e[0] == "and":
+        for x in e[1:]:
+            yield from _efectos(x)
+    elif e[0] == "when":
+        yield from _efectos(e[2])
+    elif e[0] == "forall":
+        yield from _efectos(e[2])
+    else:
+        yield e
+
+
+def _sustituir(e, mapa: dict):
+    if isinstance(e, list):
+        return [_sustituir(x, mapa) for x in e]
+    return mapa.get(e, e) if isinstance(e, str) else e
+
+
+def _reemplazar_terminos(e, valores: dict):
+    """Sustituye los términos de función 0-aria (f) por su valor."""
+    if isinstance(e, list):
+        if len(e) == 1 and e[0] in valores:
+            return valores[e[0]]
+        return [_reemplazar_terminos(x, valores) for x in e]
+    return e
+
+
+def _comparar(op: str, a: Fraction, b: Fraction) -> bool:
+    return {"<": a < b, "<=": a <= b, ">": a > b, ">=": a >= b, "=": a == b}[op]
+
+
+def plegar(e):
+    """Pliega aritmética y comparaciones constantes y simplifica and/or/not con True/False."""
+    if not isinstance(e, list) or not e:
+        return e
+    head, args = e[0], [plegar(x) for x in e[1:]]
+    if head in ARITMETICA and args and all(isinstance(a, Fraction) for a in args):
+        if head == "-" and len(args) == 1:
+            return -args[0]
+        acc = args[0]
+        for a in args[1:]:
+            if head == "+":
+                acc += a
+            elif head == "-":
+                acc -= a
+            elif head == "*":
+                acc *= a
+            elif a != 0:
+                acc /= a
+            else:
+                return [head, *args]
+        return acc
+    if head in COMPARACIONES and len(args) == 2 and all(isinstance(a, Fraction) for a in args):
+        return _comparar(head, *args)
+    if head == "and":
+        if any(a is False for a in args):
+            return False
+        rest = [a for a in args if a is not True]
+        return True if not rest else ["and", *rest]
+    if head == "or":
+        if any(a is True for a in args):
+            return True
+        rest = [a for a in args if a is not False]
+        return False if not rest else (rest[0] if len(rest) == 1 else ["or", *rest])
+    if head == "not" and len(args) == 1 and isinstance(args[0], bool):
+        return not args[0]
+    return [head, *args]
+
+
+def _es_atomo(e, nombres) -> bool:
+    return isinstance(e, list) and bool(e) and isinstance(e[0], str) and e[0] in nombres
+
+
+def _canon(e) -> tuple | None:
+    """Comparación en forma canónica (< | <=, A, B) para comparar precondiciones."""
+    if not (isinstance(e, list) and len(e) == 3 and e[0] in ("<", "<=", ">", ">=")):
+        return None
+    op, a, b = e
+    if op in (">", ">="):
+        op, a, b = ("<" if op == ">" else "<="), b, a
+    return op, fmt(a), fmt(b)
+
+
+def _refutada(c, hechos: list) -> bool:
+    """True si la conjunción `hechos` implica (sintácticamente) que `c` es falsa."""
+    if isinstance(c, list) and c and c[0] == "and":
+        return any(_refutada(x, hechos) for x in c[1:])
+    if isinstance(c, list) and c and c[0] == "or":
+        return all(_refutada(x, hechos) for x in c[1:])
+    k = _canon(c)
+    if k is None:
+        return False
+    op, a, b = k
+    opuestos = {("<=", b, a), ("<", b, a)} if op == "<" else {("<", b, a)}
+    return any(_canon(h) in opuestos for h in hechos)
+
+
+def _normalizar(e):
+    """
+    Aplana and/or anidados, quita duplicados y, en (or X (and (or X Y) ...)), quita X de las
+    disyunciones internas: en esa rama ya se sabe que X es falsa.
+    """
+    if not isinstance(e, list) or not e or e[0] not in ("and", "or"):
+        return e
+    hijos = []
+    for x in (_normalizar(x) for x in e[1:]):
+        hijos.extend(x[1:] if isinstance(x, list) and x[:1] == [e[0]] else [x])
+    if e[0] == "or":
+        claves = {fmt(x) for x in hijos}
+        podados = []
+        for x in hijos:
+            if isinstance(x, list) and x[:1] == ["and"]:
+                conj = []
+                for c in x[1:]:
+                    if isinstance(c, list) and c[:1] == ["or"]:
+                        ramas = [r for r in c[1:] if fmt(r) not in claves]
+                        c = ramas[0] if len(ramas) == 1 else (["or", *ramas] if ramas else c)
+                    conj.append(c)
+                x = _normalizar(["and", *conj])
+            podados.append(x)
+        hijos = podados
+    vistos, out = set(), []
+    for x in hijos:
+        k = fmt(x)
+        if k not in vistos:
+            vistos.add(k)
+            out.append(x)
+    return out[0] if len(out) == 1 else [e[0], *out]
+
+
+def _podar_disyunciones(conj: list) -> list:
+    """Quita de cada (or ...) de primer nivel las ramas que el resto de la conjunción ya refuta."""
+    out = []
+    for i, c in enumerate(conj):
+        if isinstance(c, list) and c[:1] == ["or"]:
+            resto = conj[:i] + conj[i + 1:]
+            ramas = [r for r in c[1:] if not _refutada(r, resto)]
+            if ramas and len(ramas) < len(c) - 1:
+                c = ramas[0] if len(ramas) == 1 else ["or", *ramas]
+        out.append(c)
+    return out
+
+
+# =========================
+# Pasada 1: fluentes estáticos
+# =========================
+
+def funciones_modificadas(d: Dominio) -> set:
+    return {eff[1][0] for a in d.acciones for eff in _efectos(a.efecto)
+            if eff[0] in EFECTOS_NUM and isinstance(eff[1], list)}
+
+
+def valores_iniciales(p: Problema) -> dict:
+    """(nombre, args...) -> valor de los (= (f ...) v) del :init."""
+    out = {}
+    for e in p.init:
+        if isinstance(e, list) and len(e) == 3 and e[0] == "=" and isinstance(e[1], list):
+            out[tuple(e[1])] = e[2]
+    return out
+
+
+def inline_estaticos(d: Dominio, p: Problema) -> dict:
+    """Sustituye las funciones 0-arias sin efectos por su valor inicial y pliega constantes."""
+    modificadas = funciones_modificadas(d)
+    init = valores_iniciales(p)
+    valores, sin_valor, con_parametros = {}, [], []
+    for f in d.funciones:
+        name = f[0]
+        if name in modificadas:
+            continue
+        if len(f) > 1:
+            con_parametros.append(name)
+        elif (name,) in init and isinstance(init[(name,)], Fraction):
+            valores[name] = init[(name,)]
+        else:
+            sin_valor.append(name)
+
+    acciones, descartadas = [], []
+    for a in d.acciones:
+        a.pre = plegar(_reemplazar_terminos(a.pre, valores))
+        a.efecto = plegar(_reemplazar_terminos(a.efecto, valores))
+        if a.pre is False:
+            descartadas.append(a.nombre)
+            continue
+        acciones.append(a)
+    d.acciones = acciones
+    d.funciones = [f for f in d.funciones if f[0] not in valores]
+    p.init = [e for e in p.init if not (isinstance(e, list) and e[:1] == ["="] and isinstance(e[1], list)
+                                        and len(e[1]) == 1 and e[1][0] in valores)]
+    p.goal = plegar(_reemplazar_terminos(p.goal, valores))
+    if p.metric:
+        p.metric = [plegar(_reemplazar_terminos(x, valores)) for x in p.metric]
+    return {"inlinadas": {k: _num(v) for k, v in valores.items()}, "sin_valor_inicial": sin_valor,
+            "estaticas_con_parametros": con_parametros, "acciones_descartadas": descartadas}
+
+
+# =========================
+# Pasada 2: compuertas de prioridad
+# =========================
+
+def _tendencias(d: Dominio, estaticas: dict) -> dict:
+    """nombre de función -> 'cte' | 'dec' | 'inc' | None según sus efectos."""
+    signos = {}
+    for a in d.acciones:
+        for eff in _efectos(a.efecto):
+            if eff[0] not in EFECTOS_NUM or not isinstance(eff[1], list):
+                continue
+            name, amount = eff[1][0], eff[2]
+            if isinstance(amount, list) and len(amount) == 1 and amount[0] in estaticas:
+                amount = estaticas[amount[0]]     # función estática sin inlinar: su valor inicial
+            if eff[0] in ("increase", "decrease") and isinstance(amount, Fraction) and amount >= 0:
+                s = "dec" if eff[0] == "decrease" else "inc"
+            else:
+                s = None
+            signos.setdefault(name, set()).add(s)
+    out = {}
+    for f in d.funciones:
+        s = signos.get(f[0])
+        out[f[0]] = "cte" if not s else (next(iter(s)) if len(s) == 1 else None)
+    return out
+
+
+def _tendencia_termino(e, tendencias: dict):
+    if isinstance(e, Fraction):
+        return "cte"
+    if isinstance(e, list) and e and e[0] in tendencias:
+        return tendencias[e[0]]
+    return None
+
+
+def _monotona(e, tendencias: dict, compuertas: set) -> bool:
+    """Condición que, una vez cierta, sigue cierta (solo puede pasar de falsa a verdadera)."""
+    if not isinstance(e, list) or not e:
+        return False
+    if e[0] in ("and", "or"):
+        return all(_monotona(x, tendencias, compuertas) for x in e[1:])
+    if e[0] in compuertas:
+        return True
+    if e[0] in ("<", "<=", ">", ">=") and len(e) == 3:
+        a, b = (e[1], e[2]) if e[0] in ("<", "<=") else (e[2], e[1])
+        return (_tendencia_termino(a, tendencias) in ("cte", "dec")
+                and _tendencia_termino(b, tendencias) in ("cte", "inc"))
+    return False
+
+
+def _ocurrencias(e, pred: str, negada: bool = False, arriba: bool = True):
+    """(átomo, negada, en_conjunción_de_primer_nivel) de cada aparición de `pred` en una precondición."""
+    if not isinstance(e, list) or not e:
+        return
+    if e[0] == pred:
+        yield e, negada, arriba
+    elif e[0] == "not":
+        yield from _ocurrencias(e[1], pred, not negada, arriba)
+    else:
+        for x in e[1:]:
+            yield from _ocurrencias(x, pred, negada, arriba and e[0] == "and")
+
+
+@dataclass
+class Compuerta:
+    predicado: str
+    accion: Accion
+    contexto: list            # átomos positivos no-compuerta de la precondición (p.ej. hora_actual ?h)
+    condicion: object         # condición numérica con las compuertas previas ya sustituidas
+    dependencias: list        # otras compuertas de su precondición
+
+
+def _candidatas(d: Dominio, p: Problema) -> tuple:
+    """Predicados que añade una única acción cuyo único efecto es añadirlos."""
+    anade, borra = {}, set()
+    for a in d.acciones:
+        for eff in _efectos(a.efecto):
+            if eff[0] == "not" and isinstance(eff[1], list):
+                borra.add(eff[1][0])
+            elif eff[0] not in EFECTOS_NUM:
+                anade.setdefault(eff[0], []).append(a)
+    en_init = {e[0] for e in p.init if isinstance(e, list) and e and e[0] != "="}
+    en_goal = {x[0] for x in _conjuntos(p.goal) if isinstance(x, list)} | {
+        x[1][0] for x in _conjuntos(p.goal) if isinstance(x, list) and x[:1] == ["not"]}
+    out, motivos = {}, {}
+    for pred in (x[0] for x in d.predicados if isinstance(x, list)):
+        acts = anade.get(pred, [])
+        if len(acts) != 1:
+            continue
+        a = acts[0]
+        efs = list(_efectos(a.efecto))
+        if len(efs) != 1:
+            continue
+        if pred in borra or pred in en_init or pred in en_goal:
+            motivos[pred] = f"{pred} se borra, es inicial o aparece en el goal"
+        elif sorted(x for x in efs[0][1:]) != sorted(a.variables):
+            motivos[pred] = f"los argumentos de {pred} no cubren los parámetros de {a.nombre}"
+        else:
+            out[pred] = a
+    return out, motivos
+
+
+def compilar_compuertas(d: Dominio, p: Problema, estaticas: dict | None = None) -> dict:
+    candidatas, motivos = _candidatas(d, p)
+    tendencias = _tendencias(d, estaticas or {})
+    predicados = {x[0] for x in d.predicados if isinstance(x, list)}
+
+    # Condición de cada compuerta (las dependencias primero; un ciclo invalida las implicadas)
+    compiladas: dict = {}
+
+    def resolver(pred: str, pila: tuple = ()) -> Compuerta | None:
+        if pred in compiladas:
+            return compiladas[pred]
+        if pred in pila or pred in motivos:
+            motivos.setdefault(pred, "dependencia circular entre compuertas")
+            return None
+        a = candidatas[pred]
+        contexto, condicion, dependencias = [], [], []
+        for c in _conjuntos(a.pre):
+            if c[:1] == ["not"] and _es_atomo(c[1], {pred}):
+                continue
+            if _es_atomo(c, candidatas):
+                dep = resolver(c[0], pila + (pred,))
+                if dep is None:
+                    motivos[pred] = f"depende de {c[0]}, que no se puede compilar"
+                    return None
+                dependencias.append(c)
+                condicion.append(c)
+            elif _es_atomo(c, predicados):
+                contexto.append(c)
+            elif _monotona(c, tendencias, set(candidatas)):
+                condicion.append(c)
+            else:
+                motivos[pred] = f"la condición {fmt(c)} de {a.nombre} no es monótona"
+                return None
+        if not condicion:
+            motivos[pred] = f"{a.nombre} no tiene condición numérica"
+            return None
+        compiladas[pred] = Compuerta(pred, a, contexto, _expandir(_y(condicion), compiladas), dependencias)
+        return compiladas[pred]
+
+    for pred in list(candidatas):
+        resolver(pred)
+
+    # Seguridad en cada acción que las usa
+    gate_actions = {g.accion.nombre for g in compiladas.values()}
+    for pred, g in list(compiladas.items()):
+        for a in d.acciones:
+            if a.nombre in gate_actions:
+                continue
+            hechos = _conjuntos(a.pre)
+            for atomo, negada, primer_nivel in _ocurrencias(a.pre, pred):
+                mapa = dict(zip(g.accion.variables, atomo[1:]))
+                if negada:
+                    resto = [h for h in hechos if h != ["not", atomo]]
+                    cond = _expandir(_sustituir(g.condicion, mapa), compiladas)
+                    if not primer_nivel or not _refutada(cond, _conjuntos(_expandir(_y(resto), compiladas))):
+                        motivos[pred] = f"(not {fmt(atomo)}) en {a.nombre} no es redundante"
+                elif any(_sustituir(c, mapa) not in hechos for c in g.contexto):
+                    motivos[pred] = f"{a.nombre} usa {fmt(atomo)} sin el contexto {fmt(_y(g.contexto))}"
+            if pred in motivos:
+                break
+        if pred in motivos:
+            del compiladas[pred]
+    # Si una compuerta cae, caen las que dependen de ella
+    cambiado = True
+    while cambiado:
+        cambiado = False
+        for pred, g in list(compiladas.items()):
+            if any(dep[0] not in compiladas for dep in g.dependencias):
+                motivos[pred] = "depende de una compuerta que no se compila"
+                del compiladas[pred]
+                cambiado = True
+
+    # Reescritura del dominio
+    quitar = {g.accion.nombre for g in compiladas.values()}
+    reinsertar = {}
+    acciones = []
+    for a in d.acciones:
+        if a.nombre in quitar:
+            continue
+        usadas = sorted({o[0][0] for pred in compiladas for o in _ocurrencias(a.pre, pred) if not o[1]})
+        if usadas:
+            reinsertar[a.nombre] = [compiladas[pred].accion.nombre for pred in usadas]
+        conj = []
+        for c in _conjuntos(a.pre):
+            if c[:1] == ["not"] and _es_atomo(c[1], compiladas):
+                continue
+            conj.extend(_conjuntos(_expandir(c, compiladas)))
+        a.pre = plegar(_y(_podar_disyunciones(_conjuntos(_normalizar(_y(conj)))))) if conj else ["and"]
+        acciones.append(a)
+    d.acciones = acciones
+    d.predicados = [x for x in d.predicados if not (isinstance(x, list) and x[0] in compiladas)]
+    orden = _orden_dependencias(compiladas)
+    return {
+        "compiladas": {pred: {"accion": compiladas[pred].accion.nombre,
+                              "condicion": fmt(compiladas[pred].condicion)} for pred in orden},
+        "orden": [compiladas[pred].accion.nombre for pred in orden],
+        "no_compiladas": motivos,
+        "reinsertar_antes_de": reinsertar,
+    }
+
+
+def _expandir(e, compiladas: dict):
+    """Sustituye cada átomo positivo de compuerta compilada por su condición."""
+    if not isinstance(e, list) or not e:
+        return e
+    if e[0] in compiladas:
+        g = compiladas[e[0]]
+        return _sustituir(g.condicion, dict(zip(g.accion.variables, e[1:])))
+    return [e[0], *(_expandir(x, compiladas) for x in e[1:])]
+
+
+def _orden_dependencias(compiladas: dict) -> list:
+    orden = []
+
+    def visitar(pred):
+        if pred in orden:
+            return
+        for dep in compiladas[pred].dependencias:
+            visitar(dep[0])
+        orden.append(pred)
+
+    for pred in compiladas:
+        visitar(pred)
+    return orden
+
+
+# =========================
+# Pasada 3: reescalado por dimensión
+# =========================
+
+class _Clases:
+    """Union-find de 'dimensiones': funciones y apariciones de constantes numéricas."""
+
+    def __init__(self):
+        self.padre = {}
+        self.mixtas = set()
+
+    def buscar(self, k):
+        self.padre.setdefault(k, k)
+        while self.padre[k] != k:
+            self.padre[k] = self.padre[self.padre[k]]
+            k = self.padre[k]
+        return k
+
+    def unir(self, a, b):
+        if a is None or b is None:
+            return a if b is None else b
+        ra, rb = self.buscar(a), self.buscar(b)
+        if ra != rb:
+            self.padre[ra] = rb
+        return rb
+
+
+def _dimension(e, uf: _Clases, funciones: set, literales: list, padre=None, idx=None):
+    """Nodo de dimensión de una expresión numérica; registra cada literal con su posición."""
+    if isinstance(e, Fraction):
+        k = ("lit", len(literales))
+        literales.append((padre, idx, k))
+        return uf.buscar(k)
+    if not isinstance(e, list) or not e:
+        return None
+    head = e[0]
+    if head in funciones:
+        return uf.buscar(("f", head))
+    if head in ("+", "-"):
+        nodo = None
+        for i in range(1, len(e)):
+            nodo = uf.unir(nodo, _dimension(e[i], uf, funciones, literales, e, i))
+        return nodo
+    if head in ("*", "/"):
+        dims = [(i, x) for i, x in enumerate(e[1:], 1) if not isinstance(x, Fraction)]
+        if len(dims) == 1:
+            # Factor constante adimensional: no se reescala
+            return _dimension(dims[0][1], uf, funciones, literales, e, dims[0][0])
+        for i, x in dims:
+            d = _dimension(x, uf, funciones, literales, e, i)
+            if d is not None:
+                uf.mixtas.add(d)
+        return None
+    return None
+
+
+def _recorrer_condicion(e, uf, funciones, literales):
+    if not isinstance(e, list) or not e:
+        return
+    if e[0] in COMPARACIONES and len(e) == 3:
+        uf.unir(_dimension(e[1], uf, funciones, literales, e, 1), _dimension(e[2], uf, funciones, literales, e, 2))
+    else:
+        for x in e[1:]:
+            _recorrer_condicion(x, uf, funciones, literales)
+
+
+def _mcd(valores: list) -> Fraction | None:
+    valores = [abs(v) for v in valores if v != 0]
+    if not valores:
+        return None
+    den = math.lcm(*(v.denominator for v in valores))
+    return Fraction(math.gcd(*(int(v * den) for v in valores)), den)
+
+
+def reescalar(d: Dominio, p: Problema) -> dict:
+    """Divide cada dimensión por el MCD de sus constantes en el dominio."""
+    uf = _Clases()
+    funciones = {f[0] for f in d.funciones}
+    lit_dominio, lit_goal = [], []
+    for a in d.acciones:
+        _recorrer_condicion(a.pre, uf, funciones, lit_dominio)
+        for eff in _efectos(a.efecto):
+            if eff[0] in EFECTOS_NUM:
+                uf.unir(_dimension(eff[1], uf, funciones, lit_dominio, eff, 1),
+                        _dimension(eff[2], uf, funciones, lit_dominio, eff, 2))
+    _recorrer_condicion(p.goal, uf, funciones, lit_goal)
+    mixtas = {uf.buscar(k) for k in uf.mixtas}
+
+    por_clase = {}
+    for padre, idx, k in lit_dominio:
+        por_clase.setdefault(uf.buscar(k), []).append(padre[idx])
+    factores = {}
+    for raiz, valores in por_clase.items():
+        g = _mcd(valores)
+        if raiz not in mixtas and g is not None and g != 1:
+            factores[raiz] = g
+
+    for padre, idx, k in lit_dominio + lit_goal:
+        g = factores.get(uf.buscar(k))
+        if g is not None:
+            padre[idx] = padre[idx] / g
+    escala = {}
+    for name in funciones:
+        g = factores.get(uf.buscar(("f", name)))
+        if g is not None:
+            escala[name] = g
+    for e in p.init:
+        if isinstance(e, list) and e[:1] == ["="] and isinstance(e[1], list) and e[1][0] in escala:
+            e[2] = e[2] / escala[e[1][0]]
+    return {"escala": {k: _num(v) for k, v in sorted(escala.items())},
+            "no_escalables": sorted(n for n in funciones if uf.buscar(("f", n)) in mixtas)}
+
+
+# =========================
+# Preproceso completo
+# =========================
+
+def preprocesar(domain_text: str, problem_text: str, estaticos: bool = True, compuertas: bool = True,
+                escala: bool = True) -> tuple:
+    """Devuelve (dominio, problema, informe) ya transformados."""
+    d, p = leer_dominio(domain_text), leer_problema(problem_text)
+    informe = {"dominio": d.nombre, "problema": p.nombre}
+    init, modificadas = valores_iniciales(p), funciones_modificadas(d)
+    estaticas = {f[0]: init[(f[0],)] for f in d.funciones
+                 if f[0] not in modificadas and isinstance(init.get((f[0],)), Fraction)}
+    if p.metric and len(p.metric) == 2 and isinstance(p.metric[1], list) and len(p.metric[1]) == 1:
+        informe["metrica"] = p.metric[1][0]
+    if estaticos:
+        informe["estaticos"] = inline_estaticos(d, p)
+    if compuertas:
+        informe["compuertas"] = compilar_compuertas(d, p, estaticas)
+    if escala:
+        informe["reescalado"] = reescalar(d, p)
+    return d, p, informe
+
+
+def escala_metrica(informe: dict) -> Fraction:
+    """Factor que devuelve la métrica del problema preprocesado a unidades originales."""
+    escala = informe.get("reescalado", {}).get("escala", {})
+    metric = informe.get("metrica")
+    return Fraction(escala.get(metric, "1")) if metric else Fraction(1)
+
+
+def escribir_par(domain: Path, problem: Path, out_dir: Path, **opciones) -> tuple:
+    d, p, informe = preprocesar(domain.read_text(encoding="utf-8", errors="ignore"),
+                                problem.read_text(encoding="utf-8", errors="ignore"), **opciones)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    dom_out = out_dir / f"{domain.stem}_{problem.stem}_pre.pddl"
+    prob_out = out_dir / f"{problem.stem}_pre.pddl"
+    dom_out.write_text(escribir_dominio(d), encoding="utf-8")
+    prob_out.write_text(escribir_problema(p), encoding="utf-8")
+    informe.update({"domain_original": str(domain), "problem_original": str(problem),
+                    "domain": str(dom_out), "problem": str(prob_out)})
+    json_out = out_dir / f"preproceso_{problem.stem}.json"
+    json_out.write_text(json.dumps(informe, indent=2, ensure_ascii=False), encoding="utf-8")
+    return dom_out, prob_out, json_out, informe
+
+
+# =========================
+# Intérprete y restauración del plan
+# =========================
+
+def plan_acciones(text: str) -> list:
+    """Acciones instanciadas del plan ENHSP como tuplas (nombre, arg1, ...)."""
+    return [tuple(m.group(1).lower().split()) for m in RE_PASO.finditer(sim.slice_found_plan(text))]
+
+
+class Interprete:
+    """Semántica PDDL exacta (sin clamp) de un dominio/problema sin preprocesar."""
+
+    def __init__(self, d: Dominio, p: Problema):
+        self.acciones = {a.nombre: a for a in d.acciones}
+        self.hechos = {tuple(e) for e in p.init if isinstance(e, list) and e and e[0] != "="}
+        self.valores = {k: v for k, v in valores_iniciales(p).items()}
+        self.goal = p.goal
+        self.metric = p.metric
+
+    def valor(self, e):
+        if isinstance(e, Fraction):
+            return e
+        if e[0] in ARITMETICA:
+            args = [self.valor(x) for x in e[1:]]
+            return plegar([e[0], *args])
+        key = tuple(e)
+        if key not in self.valores:
+            raise KeyError(f"{fmt(e)} sin valor")
+        return self.valores[key]
+
+    def cumple(self, e) -> bool:
+        if e is None or e is True:
+            return True
+        if e is False:
+            return False
+        head = e[0]
+        if head == "and":
+            return all(self.cumple(x) for x in e[1:])
+        if head == "or":
+            return any(self.cumple(x) for x in e[1:])
+        if head == "not":
+            return not self.cumple(e[1])
+        if head in COMPARACIONES and len(e) == 3:
+            return _comparar(head, self.valor(e[1]), self.valor(e[2]))
+        return tuple(e) in self.hechos
+
+    def instanciar(self, paso: tuple) -> tuple:
+        a = self.acciones.get(paso[0])
+        if a is None:
+            raise KeyError(f"acción desconocida {paso[0]}")
+        mapa = dict(zip(a.variables, paso[1:]))
+        return _sustituir(a.pre, mapa), _sustituir(a.efecto, mapa)
+
+    def aplicable(self, paso: tuple) -> bool:
+        return self.cumple(self.instanciar(paso)[0])
+
+    def aplicar(self, paso: tuple) -> None:
+        _pre, efecto = self.instanciar(paso)
+        borrar, anadir, nuevos = [], [], {}
+        for eff in _efectos(efecto):
+            if eff[0] == "not":
+                borrar.append(tuple(eff[1]))
+            elif eff[0] in EFECTOS_NUM:
+                key, x, v = tuple(eff[1]), self.valor(eff[2]), self.valor(eff[1])
+                op = eff[0]
+                nuevos[key] = {"increase": v + x, "decrease": v - x, "assign": x,
+                               "scale-up": v * x, "scale-down": v / x if x else v}[op]
+            else:
+                anadir.append(tuple(eff))
+        self.hechos.difference_update(borrar)
+        self.hechos.update(anadir)
+        self.valores.update(nuevos)
+
+    def coste(self):
+        if not self.metric or len(self.metric) != 2:
+            return None
+        return self.valor(self.metric[1])
+
+
+def restaurar(pasos: list, d: Dominio, p: Problema, informe: dict) -> tuple:
+    """
+    Reinserta las acciones de compuerta eliminadas y valida contra el par original.
+    Devuelve (pasos_restaurados, coste, motivo_o_None).
+    """
+    comp = informe.get("compuertas", {})
+    orden, antes_de = comp.get("orden", []), comp.get("reinsertar_antes_de", {})
+    it = Interprete(d, p)
+    out = []
+    for i, paso in enumerate(pasos):
+        try:
+            if paso[0] in antes_de and not it.aplicable(paso):
+                # Las compuertas que pide la precondición original, en orden de dependencias
+                for gate in orden:
+                    for args in dict.fromkeys(product(paso[1:], repeat=len(it.acciones[gate].variables))):
+                        g = (gate, *args)
+                        if it.aplicable(g):
+                            it.aplicar(g)
+                            out.append(g)
+                    if it.aplicable(paso):
+                        break
+            if not it.aplicable(paso):
+                return out, None, f"paso {i}: ({' '.join(paso)}) no aplicable en el dominio original"
+            it.aplicar(paso)
+            out.append(paso)
+        except KeyError as ex:
+            return out, None, f"paso {i}: {ex}"
+    if not it.cumple(it.goal):
+        return out, it.coste(), "el plan no alcanza el goal del problema original"
+    return out, it.coste(), None
+
+
+def escribir_plan(pasos: list, metric, out_path: Path, cabecera: str) -> None:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with out_path.open("w", encoding="utf-8", newline="\n") as f:
+        f.write(cabecera + "\n")
+        f.write("Found Plan:\n")
+        for i, paso in enumerate(pasos):
+            f.write(f"{i}.0: ({' '.join(paso)})\n")
+        f.write("\n")
+        f.write(f"Plan-Length:{len(pasos)}\n")
+        f.write(f"Metric (Search):{float(metric) if metric is not None else 'NaN'}\n")
+
+
+# =========================
+# Benchmark antes/después
+# =========================
+
+def tamano_grounding(d: Dominio, p: Problema) -> dict:
+    """Cota estática del grounding: átomos fluentes, variables numéricas y acciones instanciadas."""
+    objetos, actuales, i = {}, [], 0
+    toks = p.objetos
+    while i < len(toks):
+        if toks[i] == "-" and i + 1 < len(toks):
+            objetos.setdefault(toks[i + 1], []).extend(actuales)
+            actuales, i = [], i + 2
+        else:
+            actuales.append(toks[i])
+            i += 1
+    if actuales:
+        objetos.setdefault("object", []).extend(actuales)
+
+    def tipos_de(params: list) -> list:
+        out, vars_ = [], []
+        j = 0
+        while j < len(params):
+            if params[j] == "-":
+                out.extend([params[j + 1]] * len(vars_))
+                vars_, j = [], j + 2
+            else:
+                vars_.append(params[j])
+                j += 1
+        return out + ["object"] * len(vars_)
+
+    def n_instancias(params: list) -> int:
+        n = 1
+        for t in tipos_de(params):
+            n *= len(objetos.get(t, []))
+        return n
+
+    dinamicos = {eff[0] if eff[0] != "not" else eff[1][0]
+                 for a in d.acciones for eff in _efectos(a.efecto) if eff[0] not in EFECTOS_NUM}
+    estaticos = {x[0] for x in d.predicados if isinstance(x, list)} - dinamicos
+    hechos = {tuple(e) for e in p.init if isinstance(e, list) and e and e[0] in estaticos}
+    n_f = sum(n_instancias(x[1:]) for x in d.predicados if isinstance(x, list) and x[0] in dinamicos)
+    n_x = sum(n_instancias(f[1:]) for f in d.funciones)
+    n_a = 0
+    for a in d.acciones:
+        dominios = [objetos.get(t, []) for t in tipos_de(a.parametros)]
+        estaticas = [c for c in _conjuntos(a.pre) if _es_atomo(c, estaticos)]
+        for combo in product(*dominios):
+            mapa = dict(zip(a.variables, combo))
+            if all(tuple(_sustituir(c, mapa)) in hechos for c in estaticas):
+                n_a += 1
+    return {"F_estatico": n_f, "X_estatico": n_x, "A_estatico": n_a}
+
+
+def _lanzar(cmd_template: str, enhsp: str, domain: Path, problem: Path, timeout: float | None) -> tuple:
+    cmd = cmd_template.format(enhsp=enhsp, domain=str(domain), problem=str(problem))
+    t0 = time.perf_counter()
+    try:
+        proc = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=timeout)
+        return proc.stdout + proc.stderr, time.perf_counter() - t0, "ok" if "Found Plan" in proc.stdout else "sin_plan"
+    except subprocess.TimeoutExpired:
+        return "", time.perf_counter() - t0, "timeout"
+
+
+def _estadisticas_enhsp(text: str) -> dict:
+    from analizar_traza_enhsp import RGX_H0, RGX_STATS
+
+    out = {}
+    for key, rgx in {**RGX_GROUNDING, **RGX_STATS}.items():
+        m = rgx.search(text)
+        out[key] = int(m.group(1)) if m else None
+    m = RGX_H0.search(text)
+    out["h0"] = float(m.group(1)) if m else None
+    _acts, out["metric_enhsp"] = sim.parse_plan_text(text, verbose=False)
+    return out
+
+
+def benchmark(domain: Path, problem: Path, out_dir: Path, cmd_template: str, enhsp: str,
+              timeout: float | None, **opciones) -> list:
+    from registro_ejecuciones import hash_files, record_run, scenario_name
+
+    d0 = leer_dominio(domain.read_text(encoding="utf-8", errors="ignore"))
+    p0 = leer_problema(problem.read_text(encoding="utf-8", errors="ignore"))
+    t0 = time.perf_counter()
+    dom_pre, prob_pre, _json, informe = escribir_par(domain, problem, out_dir, **opciones)
+    t_pre = (time.perf_counter() - t0) * 1000
+    d1, p1 = leer_dominio(dom_pre.read_text(encoding="utf-8")), leer_problema(prob_pre.read_text(encoding="utf-8"))
+    gates = set(informe.get("compuertas", {}).get("orden", []))
+    gates |= {n for n in (a.nombre for a in d0.acciones) if n not in {a.nombre for a in d1.acciones}}
+
+    rows = []
+    for variante, dom, prob, dd, pp in (("original", domain, problem, d0, p0),
+                                         ("preprocesado", dom_pre, prob_pre, d1, p1)):
+        row = {"variante": variante, **tamano_grounding(dd, pp),
+               "t_preproceso_ms": round(t_pre, 2) if variante == "preprocesado" else 0.0}
+        log, elapsed, estado = _lanzar(cmd_template, enhsp, dom, prob, timeout)
+        row.update(estado=estado, t_planificador_s=round(elapsed, 3))
+        (out_dir / f"log_{variante}_{problem.stem}.txt").write_text(log, encoding="utf-8")
+        if estado == "ok":
+            row.update(_estadisticas_enhsp(log))
+            pasos = plan_acciones(log)
+            if variante == "preprocesado":
+                restaurados, coste, motivo = restaurar(pasos, d0, p0, informe)
+                if row.get("metric_enhsp") is not None:
+                    row["metric_enhsp"] = float(Fraction(row["metric_enhsp"]) * escala_metrica(informe))
+                escribir_plan(restaurados, coste, out_dir / f"plan_restaurado_{problem.stem}.txt",
+                              "Plan restaurado (preprocesar_pddl.py)")
+            else:
+                restaurados, coste, motivo = restaurar(pasos, d0, p0, {})
+            row.update(plan_len=len(pasos), pasos_compuerta=sum(1 for s in pasos if s[0] in gates),
+                       coste=float(coste) if coste is not None else None, valido=motivo is None)
+            if motivo:
+                print(f"[AVISO] {variante}: {motivo}")
+        rows.append(row)
+        record_run("preprocesar_pddl", "pddl", escenario=scenario_name(problem), estado=estado,
+                   input_hash=hash_files(dom, prob), opciones={"variante": variante, **opciones},
+                   etapas={k: row[k] / 1000.0 for k in ("heuristic_ms", "search_ms") if row.get(k) is not None},
+                   coste=row.get("coste"), plan_len=row.get("plan_len"), t_total_s=elapsed)
+
+    out_csv = out_dir / "preproceso_benchmark.csv"
+    with out_csv.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=BENCH_COLUMNS, extrasaction="ignore")
+        w.writeheader()
+        w.writerows(rows)
+    return rows
+
+
+def _print_benchmark(rows: list) -> None:
+    keys = ["F_estatico", "X_estatico", "A_estatico", "F", "X", "A", "grounding_ms", "h0", "heuristic_ms",
+            "search_ms", "expanded", "t_planificador_s", "plan_len", "pasos_compuerta", "coste", "valido"]
+    print(f"{'':<18}" + "".join(f"{r['variante']:>16}" for r in rows))
+    for k in keys:
+        vals = []
+        for r in rows:
+            v = r.get(k)
+            if isinstance(v, float):
+                v = f"{v:,.2f}" if abs(v) >= 1000 else f"{v:.4g}"
+            vals.append("-" if v is None else str(v))
+        print(f"{k:<18}" + "".join(f"{v:>16}" for v in vals))
+
+
+# =========================
+# CLI
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Preproceso PDDL: fluentes estáticos, compuertas y reescalado")
+    parser.add_argument("domain", help="domain.pddl original")
+    parser.add_argument("problem", help="problem.pddl original")
+    parser.add_argument("--out-dir", type=str, default=None,
+                        help="Carpeta de salida (por defecto, <carpeta del problema>/preprocesado)")
+    parser.add_argument("--sin-estaticos", action="store_true", help="No inlinar fluentes estáticos")
+    parser.add_argument("--sin-compuertas", action="store_true", help="No compilar las compuertas de prioridad")
+    parser.add_argument("--sin-escala", action="store_true", help="No reescalar magnitudes")
+    parser.add_argument("--restaurar", type=str, default=None,
+                        help="Plan ENHSP del par preprocesado: reinsertar compuertas y validar contra el original")
+    parser.add_argument("--out", type=str, default=None, help="Plan restaurado (con --restaurar)")
+    parser.add_argument("--benchmark", action="store_true", help="Planificar original y preprocesado y comparar")
+    parser.add_argument("--enhsp", type=str, default="enhsp.jar", help="Ruta a enhsp.jar")
+    parser.add_argument("--planner-cmd", type=str, default=DEFAULT_PLANNER_CMD,
+                        help="Plantilla del comando con {enhsp}, {domain} y {problem}")
+    parser.add_argument("--timeout", type=float, default=None, help="Tiempo máximo por planificación [s]")
+    args = parser.parse_args()
+
+    domain, problem = Path(args.domain), Path(args.problem)
+    for pth in (domain, problem):
+        if not pth.exists():
+            raise SystemExit(f"No existe {pth}")
+    out_dir = Path(args.out_dir) if args.out_dir else problem.parent / "preprocesado"
+    opciones = {"estaticos": not args.sin_estaticos, "compuertas": not args.sin_compuertas,
+                "escala": not args.sin_escala}
+
+    if args.restaurar:
+        json_path = out_dir / f"preproceso_{problem.stem}.json"
+        informe = json.loads(json_path.read_text(encoding="utf-8")) if json_path.exists() else {}
+        if not informe:
+            print(f"[AVISO] No existe {json_path}: se valida sin reinsertar compuertas")
+        d = leer_dominio(domain.read_text(encoding="utf-8", errors="ignore"))
+        p = leer_problema(problem.read_text(encoding="utf-8", errors="ignore"))
+        text = Path(args.restaurar).read_text(encoding="utf-8", errors="ignore")
+        pasos = plan_acciones(text)
+        restaurados, coste, motivo = restaurar(pasos, d, p, informe)
+        _acts, metric = sim.parse_plan_text(text, verbose=False)
+        if metric is not None:
+            print(f"Métrica ENHSP reescalada: {float(Fraction(metric) * escala_metrica(informe)):,.2f}")
+        print(f"Plan: {len(pasos)} acciones -> {len(restaurados)} con compuertas; "
+              f"coste original {float(coste) if coste is not None else float('nan'):,.2f}")
+        out = Path(args.out) if args.out else Path(args.restaurar).with_name(Path(args.restaurar).stem + "_restaurado.txt")
+        escribir_plan(restaurados, coste, out, "Plan restaurado (preprocesar_pddl.py)")
+        print(f"[OK] {out}")
+        if motivo:
+            print(f"[AVISO] Plan no válido en el par original: {motivo}")
+            raise SystemExit(1)
+        return
+
+    if args.benchmark:
+        rows = benchmark(domain, problem, out_dir, args.planner_cmd, args.enhsp, args.timeout, **opciones)
+        _print_benchmark(rows)
+        print(f"[OK] {out_dir / 'preproceso_benchmark.csv'}")
+        return
+
+    dom_out, prob_out, json_out, informe = escribir_par(domain, problem, out_dir, **opciones)
+    est = informe.get("estaticos", {})
+    comp = informe.get("compuertas", {})
+    esc = informe.get("reescalado", {})
+    if est:
+        print(f"Fluentes estáticos inlinados: {est['inlinadas'] or '-'}")
+    if comp:
+        for pred, info in comp["compiladas"].items():
+            print(f"Compuerta {pred} ({info['accion']}) -> {info['condicion']}")
+        for pred, motivo in comp["no_compiladas"].items():
+            print(f"[AVISO] Compuerta {pred} sin compilar: {motivo}")
+    if esc:
+        print(f"Escalas: {esc['escala'] or '-'}")
+    for pth in (dom_out, prob_out, json_out):
+        print(f"[OK] {pth}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+red_dc.py
+
+Capa de red DC opcional sobre el despacho por unidad (flota_milp.py): barras, líneas con
+reactancia y límite, y ubicación de cada unidad en una barra.
+
+- La matriz B de susceptancias se arma dispersa (scipy.sparse) y se factoriza UNA vez por
+  topología (LU dispersa, caché en memoria por hash de barras/líneas/slack). Nunca se forma la
+  PTDF densa: los flujos de un despacho salen de resolver B·θ = inyecciones y las filas de PTDF
+  se calculan solo para las líneas que se monitorizan.
+- Restricciones de flujo perezosas: se resuelve sin red, se calculan todos los flujos y se añaden
+  límites solo para los pares (línea, hora) con carga ≥ --umbral; se repite hasta que ningún
+  flujo supere su límite. Con un solver persistente (appsi_highs) cada ronda es incremental.
+
+Entradas en la carpeta de datos (además de las de flota_milp.py):
+  buses.csv        bus_id, demand_share[, slack]     (la demanda del sistema se reparte por share)
+  lines.csv        line_id, from_bus, to_bus, x_pu, limit_MW
+  unit_buses.csv   unit_id, bus_id
+
+Uso:
+  python scripts/red_dc.py --data-dir data_red --results-dir results_red --solver appsi_highs
+  (Benchmark) python scripts/red_dc.py --benchmark 30 100 300 500 --hours 24 --solver appsi_highs
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+import flota_milp
+import milp_model
+
+
+# =========================
+# Topología y PTDF dispersa
+# =========================
+
+@dataclass
+class Network:
+    bus_ids: List[str]
+    demand_share: np.ndarray
+    line_ids: List[str]
+    from_idx: np.ndarray
+    to_idx: np.ndarray
+    x_pu: np.ndarray
+    limit: np.ndarray
+    slack: int = 0
+
+    @property
+    def n_buses(self) -> int:
+        return len(self.bus_ids)
+
+    @property
+    def n_lines(self) -> int:
+        return len(self.line_ids)
+
+    def topology_key(self) -> str:
+        h = hashlib.sha1()
+        h.update(repr(self.bus_ids).encode())
+        h.update(np.ascontiguousarray(self.from_idx).tobytes())
+        h.update(np.ascontiguousarray(self.to_idx).tobytes())
+        h.update(np.ascontiguousarray(self.x_pu, dtype=float).tobytes())
+        h.update(str(self.slack).encode())
+        return h.hexdigest()
+
+
+class PTDF:
+    """
+    Factorización LU de la B reducida (sin slack) y filas de PTDF bajo demanda:
+    PTDF[l, :] = b_l · (e_from − e_to)ᵀ · B⁻¹ (B simétrica). Las filas ya calculadas se guardan.
+    """
+
+    def __init__(self, net: Network):
+        self.net = net
+        L, N = net.n_lines, net.n_buses
+        b = 1.0 / net.x_pu
+        rows = np.repeat(np.arange(L), 2)
+        cols = np.column_stack([net.from_idx, net.to_idx]).ravel()
+        vals = np.tile([1.0, -1.0], L)
+        self.A = sp.csr_matrix((vals, (rows, cols)), shape=(L, N))
+        self.b = b
+        B = (self.A.T @ sp.diags(b) @ self.A).tocsc()
+        self.keep = np.array([n for n in range(N) if n != net.slack])
+        self.lu = spla.splu(B[self.keep][:, self.keep].tocsc())
+        self._rows: Dict[int, np.ndarray] = {}
+
+    def flows(self, injections: np.ndarray) -> np.ndarray:
+        """Flujos (L × T) para inyecciones netas por barra (N × T), resolviendo B·θ = p."""
+        theta = np.zeros_like(injections, dtype=float)
+        theta[self.keep] = self.lu.solve(np.ascontiguousarray(injections[self.keep], dtype=float))
+        return self.b[:, None] * (self.A @ theta)
+
+    def rows(self, lines) -> np.ndarray:
+        """Filas de PTDF (len(lines) × N) para las líneas pedidas, calculadas en bloque y memorizadas."""
+        missing = [l for l in lines if l not in self._rows]
+        if missing:
+            rhs = (self.A[missing][:, self.keep].T.toarray() * self.b[missing])
+            sol = self.lu.solve(np.ascontiguousarray(rhs))
+            for j, l in enumerate(missing):
+                row = np.zeros(self.net.n_buses)
+                row[self.keep] = sol[:, j]
+                self._rows[l] = row
+        return np.array([self._rows[l] for l in lines]) if lines else np.zeros((0, self.net.n_buses))
+
+    @property
+    def cached_rows(self) -> int:
+        return len(self._rows)
+
+
+_PTDF_CACHE: Dict[str, PTDF] = {}
+
+
+def get_ptdf(net: Network) -> tuple:
+    """PTDF de la topología (reutilizada si ya se factorizó en este proceso) y si vino de caché."""
+    key = net.topology_key()
+    hit = key in _PTDF_CACHE
+    if not hit:
+        _PTDF_CACHE[key] = PTDF(net)
+    return _PTDF_CACHE[key], hit
+
+
+# =========================
+# Lectura
+# =========================
+
+def read_network(data_dir: Path, fleet: flota_milp.Fleet) -> tuple:
+    """Devuelve (Network, bus de cada unidad)."""
+    buses = flota_milp._read_rows(data_dir / "buses.csv")
+    lines = flota_milp._read_rows(data_dir / "lines.csv")
+    unit_buses = {r["unit_id"]: r["bus_id"] for r in flota_milp._read_rows(data_dir / "unit_buses.csv")}
+
+    bus_ids = [r["bus_id"] for r in buses]
+    pos = {b: i for i, b in enumerate(bus_ids)}
+    share = np.array([float(r.get("demand_share") or 0.0) for r in buses])
+    if share.sum() <= 0:
+        raise ValueError("buses.csv: la suma de demand_share debe ser positiva")
+    slack = next((i for i, r in enumerate(buses) if r.get("slack", "").lower() in ("1", "true", "si", "sí")), 0)
+
+    for r in lines:
+        for k in ("from_bus", "to_bus"):
+            if r[k] not in pos:
+                raise ValueError(f"Línea {r['line_id']}: barra desconocida {r[k]}")
+    missing = [u for u in fleet.unit_ids if u not in unit_buses]
+    if missing:
+        raise ValueError(f"unit_buses.csv: faltan unidades {missing[:5]}{'...' if len(missing) > 5 else ''}")
+
+    net = Network(
+        bus_ids=bus_ids,
+        demand_share=share / share.sum(),
+        line_ids=[r["line_id"] for r in lines],
+        from_idx=np.array([pos[r["from_bus"]] for r in lines]),
+        to_idx=np.array([pos[r["to_bus"]] for r in lines]),
+        x_pu=np.array([float(r["x_pu"]) for r in lines]),
+        limit=np.array([float(r["limit_MW"]) for r in lines]),
+        slack=slack,
+    )
+    return net, np.array([pos[unit_buses[u]] for u in fleet.unit_ids])
+
+
+def synthetic_network(n_buses: int, fleet: flota_milp.Fleet, seed: int = 0) -> tuple:
+    """
+    Anillo con cuerdas aleatorias (≈1.5 líneas por barra, acotado por los pares libres fuera del
+    anillo) y unidades repartidas al azar.
+    """
+    if n_buses < 3:
+        raise ValueError(f"La red sintética necesita al menos 3 barras (anillo), no {n_buses}")
+    rng = np.random.default_rng(seed)
+    ring = [(i, (i + 1) % n_buses) for i in range(n_buses)]
+    extra = set()
+    n_extra = min(n_buses // 2, n_buses * (n_buses - 1) // 2 - n_buses)
+    while len(extra) < n_extra:
+        a, b = rng.integers(0, n_buses, 2)
+        if a != b and (a, b) not in ring and (b, a) not in ring:
+            extra.add((min(a, b), max(a, b)))
+    edges = ring + sorted(extra)
+    share = rng.uniform(0.5, 1.5, n_buses)
+    peak = float(fleet.demand.max())
+    net = Network(
+        bus_ids=[f"b{i}" for i in range(n_buses)],
+        demand_share=share / share.sum(),
+        line_ids=[f"l{k}" for k in range(len(edges))],
+        from_idx=np.array([a for a, _ in edges]),
+        to_idx=np.array([b for _, b in edges]),
+        x_pu=rng.uniform(0.05, 0.3, len(edges)),
+        limit=rng.uniform(1.0, 4.0, len(edges)) * peak / n_buses,
+    )
+    return net, rng.integers(0, n_buses, fleet.n_units)
+
+
+# =========================
+# Despacho con restricciones de red perezosas
+# =========================
+
+@dataclass
+class NetworkResult:
+    summary: dict
+    flows: np.ndarray
+    dispatch: np.ndarray
+    iterations: int = 0
+    monitored: List[tuple] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    converged: bool = True      # False: max_iter agotado con líneas aún por encima de su límite
+
+
+def solve_with_network(fleet: flota_milp.Fleet, net: Network, unit_bus: np.ndarray, solver_name: str = "glpk",
+                       glpk_executable: str | None = None, voll: float | None = None, threshold: float = 0.95,
+                       max_iter: int = 50, tol: float = 1e-6) -> NetworkResult:
+    import pyomo.environ as pyo
+    from pyomo.core.expr.numeric_expr import LinearExpression
+
+    timings = {}
+    t0 = time.perf_counter()
+    ptdf, hit = get_ptdf(net)
+    timings["ptdf_factor_s"] = time.perf_counter() - t0
+    timings["ptdf_cache_hit"] = float(hit)
+
+    t0 = time.perf_counter()
+    model = flota_milp.build_fleet_model(fleet, voll=voll)
+    model.flow_limits = pyo.ConstraintList()
+    solver = milp_model.make_solver(solver_name, glpk_executable)
+    timings["build_s"] = time.perf_counter() - t0
+
+    U, T = fleet.n_units, fleet.n_hours
+    x = list(model.P.values())
+    ens = list(model.ENS.values()) if voll is not None else None
+    # Inyección por barra = Σ unidades en la barra − demanda·share (+ ENS repartida igual que la demanda)
+    gen_to_bus = sp.csr_matrix((np.ones(U), (unit_bus, np.arange(U))), shape=(net.n_buses, U))
+    load = net.demand_share[:, None] * fleet.demand[None, :]
+
+    monitored = set()
+    timings["solve_s"] = 0.0
+    it = 0
+    for it in range(1, max_iter + 1):
+        t0 = time.perf_counter()
+        summary = milp_model.solve_model(model, solver=solver)
+        timings["solve_s"] += time.perf_counter() - t0
+
+        P = flota_milp.dispatch_matrix(model, fleet)
+        inj = gen_to_bus @ P - load
+        if ens is not None:
+            inj = inj + net.demand_share[:, None] * np.array([v.value or 0.0 for v in ens])[None, :]
+        flows = ptdf.flows(inj)
+        loading = np.abs(flows) / net.limit[:, None]
+
+        near = np.argwhere(loading >= threshold)
+        new = [(int(l), int(t)) for l, t in near if (int(l), int(t)) not in monitored]
+        if loading.max(initial=0.0) <= 1.0 + tol or not new:
+            break
+
+        t0 = time.perf_counter()
+        lines = sorted({l for l, _ in new})
+        rows = dict(zip(lines, ptdf.rows(lines)))
+        for l, t in new:
+            coef_u = rows[l][unit_bus]
+            vs = [x[u * T + t] for u in range(U)]
+            coefs = coef_u.tolist()
+            if ens is not None:
+                vs.append(ens[t])
+                coefs.append(float(rows[l] @ net.demand_share))
+            const = -float(rows[l] @ load[:, t])
+            expr = LinearExpression(constant=const, linear_coefs=coefs, linear_vars=vs)
+            model.flow_limits.add((-float(net.limit[l]), expr, float(net.limit[l])))
+            monitored.add((l, t))
+        timings["cuts_s"] = timings.get("cuts_s", 0.0) + time.perf_counter() - t0
+
+    # Sin cortes nuevos la carga ya cumple (o solo excede por debajo del umbral de tolerancia); si el
+    # bucle termina por max_iter con cortes pendientes, el despacho aún viola límites de línea
+    converged = loading.max(initial=0.0) <= 1.0 + tol
+    if not converged:
+        print(f"[AVISO] Red DC: {max_iter} iteraciones sin converger; {int((loading > 1.0 + tol).sum())} "
+              f"(línea, hora) por encima del límite (carga máx. {loading.max() * 100.0:.1f} %)")
+    summary["iterations"] = it
+    summary["flow_constraints"] = len(monitored)
+    summary["max_loading_pct"] = float(loading.max(initial=0.0) * 100.0)
+    summary["network_converged"] = converged
+    return NetworkResult(summary, flows, P, it, sorted(monitored), timings, converged)
+
+
+def export_flows(res: NetworkResult, net: Network, fleet: flota_milp.Fleet, results_dir: Path) -> None:
+    results_dir.mkdir(parents=True, exist_ok=True)
+    with (results_dir / "red_flujos.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(["line_id", "hour", "flow_MW", "limit_MW", "loading_pct"])
+        for l, lid in enumerate(net.line_ids):
+            for k, h in enumerate(fleet.hours):
+                fl = float(res.flows[l, k])
+                w.writerow([lid, h, fl, float(net.limit[l]), abs(fl) / net.limit[l] * 100.0])
+
+
+# =========================
+# Benchmark por tamaño de red
+# =========================
+
+BENCH_COLUMNS = ["buses", "lines", "units", "hours", "iterations", "flow_constraints", "ptdf_rows",
+                 "dense_ptdf_mb", "ptdf_factor_s", "build_s", "solve_s", "cuts_s", "total_cost_usd", "max_loading_pct"]
+
+
+def run_benchmark(sizes, n_hours, solver_name, glpk_executable, voll, threshold, seed, out: Path) -> None:
+    rows = []
+    print(f"{'barras':>6} {'líneas':>6} {'iter':>4} {'cortes':>6} {'factor[s]':>9} {'build[s]':>8} {'solve[s]':>8}  coste")
+    for n_buses in sizes:
+        fleet = flota_milp.synthetic_fleet(max(3, n_buses), n_hours, seed=seed)
+        net, unit_bus = synthetic_network(n_buses, fleet, seed=seed)
+        res = solve_with_network(fleet, net, unit_bus, solver_name, glpk_executable, voll, threshold)
+        ptdf, _ = get_ptdf(net)
+        row = {
+            "buses": net.n_buses, "lines": net.n_lines, "units": fleet.n_units, "hours": n_hours,
+            "iterations": res.iterations, "flow_constraints": len(res.monitored), "ptdf_rows": ptdf.cached_rows,
+            "dense_ptdf_mb": net.n_lines * net.n_buses * 8 / 1e6,
+            "ptdf_factor_s": res.timings["ptdf_factor_s"], "build_s": res.timings["build_s"],
+            "solve_s": res.timings["solve_s"], "cuts_s": res.timings.get("cuts_s", 0.0),
+            "total_cost_usd": res.summary["total_cost_usd"], "max_loading_pct": res.summary["max_loading_pct"],
+        }
+        rows.append(row)
+        print(f"{row['buses']:>6} {row['lines']:>6} {row['iterations']:>4} {row['flow_constraints']:>6} "
+              f"{row['ptdf_factor_s']:>9.3f} {row['build_s']:>8.3f} {row['solve_s']:>8.3f}  {row['total_cost_usd']:,.0f}")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with out.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=BENCH_COLUMNS, lineterminator="\n")
+        w.writeheader()
+        w.writerows(rows)
+    print(f"Resultados: {out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Despacho por unidad con red DC (PTDF dispersa, límites de línea perezosos)")
+    parser.add_argument("--data-dir", type=str, default=None, help="Carpeta de datos con buses.csv, lines.csv y unit_buses.csv")
+    parser.add_argument("--results-dir", type=str, default=None, help="Salida (por defecto, results/ junto a data)")
+    parser.add_argument("--solver", type=str, default="glpk", help="Nombre de solver Pyomo (appsi_highs recomendado: persistente)")
+    parser.add_argument("--glpk-exe", type=str, default=None, help="Ruta a glpsol (por defecto, el del PATH)")
+    parser.add_argument("--voll", type=float, default=None, help="Si se indica, permite ENS penalizada con este VoLL [USD/MWh]")
+    parser.add_argument("--umbral", type=float, default=0.95, help="Carga relativa a partir de la cual se añade el límite de una línea")
+    parser.add_argument("--max-iter", type=int, default=50)
+    parser.add_argument("--benchmark", type=int, nargs="*", default=None, help="Tamaños de red sintética (nº de barras)")
+    parser.add_argument("--hours", type=int, default=24, help="Horas de los casos sintéticos del benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    here = Path(__file__).resolve()
+    if args.benchmark is not None:
+        if any(n < 3 for n in args.benchmark):
+            parser.error("--benchmark: cada red sintética necesita al menos 3 barras")
+        out = Path(args.results_dir or here.parent.parent / "results_benchmarks") / "red_dc_benchmark.csv"
+        run_benchmark(args.benchmark or [30, 100, 300, 500], args.hours, args.solver, args.glpk_exe,
+                      args.voll if args.voll is not None else 1000.0, args.umbral, args.seed, out)
+        return
+    if not args.data_dir:
+        parser.error("--data-dir es obligatorio salvo con --benchmark")
+
+    data_dir = Path(args.data_dir)
+    results_dir = Path(args.results_dir) if args.results_dir else (here.parent.parent / "results")
+    fleet = flota_milp.read_fleet(data_dir)
+    net, unit_bus = read_network(data_dir, fleet)
+    res = solve_with_network(fleet, net, unit_bus, args.solver, args.glpk_exe, args.voll, args.umbral, args.max_iter)
+    flota_milp.export_dispatch(res.dispatch, fleet, res.summary, results_dir)
+    export_flows(res, net, fleet, results_dir)
+
+    print(f"=== MILP con red DC ({net.n_buses} barras, {net.n_lines} líneas, {fleet.n_units} unidades) ===")
+    print(f"Total cost [USD]: {res.summary['total_cost_usd']:.2f}")
+    print(f"Iteraciones: {res.iterations} | límites de flujo añadidos: {len(res.monitored)} | "
+          f"carga máx.: {res.summary['max_loading_pct']:.1f} %")
+    if not res.converged:
+        print(f"[AVISO] Límites de línea sin cumplir tras --max-iter {args.max_iter}: el despacho no es "
+              f"factible para la red (sube --max-iter o baja --umbral)")
+    print("Tiempos [s]: " + "  ".join(f"{k}={v:.3f}" for k, v in res.timings.items() if k.endswith("_s")))
+    print(f"Results: {results_dir / 'milp_dispatch.csv'}  |  {results_dir / 'red_flujos.csv'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+"""
+registro_ejecuciones.py
+
+Registro local (SQLite) de cada ejecución: resoluciones MILP, planes PDDL, despachos con plazo y
+comparativas. Cada fila guarda script, escenario, enfoque, estado, hash de las entradas, opciones
+(JSON), coste, longitud del plan, cobertura de la demanda y tiempo total; los tiempos por etapa van
+en una tabla aparte. Hay índices por (escenario, enfoque, fecha), (enfoque, fecha) y fecha, así que
+las consultas de historial y de regresiones sobre miles de ejecuciones tardan milisegundos.
+
+La base vive en registro_ejecuciones.sqlite (raíz del repo, no versionada). La variable de entorno
+REGISTRO_EJECUCIONES cambia la ruta; con el valor 0/off no se registra nada. Un fallo al registrar
+solo produce un aviso: nunca interrumpe la ejecución que se está registrando.
+
+Uso (consultas):
+  python scripts/registro_ejecuciones.py                                   # últimas 20 ejecuciones
+  python scripts/registro_ejecuciones.py --escenario escenario3 --enfoque pddl --etapa planificacion --ultimos 50
+  python scripts/registro_ejecuciones.py --tendencias
+  python scripts/registro_ejecuciones.py --regresiones --umbral 0.25 --ventana 20
+  python scripts/registro_ejecuciones.py --sql "SELECT enfoque, count(*) FROM ejecuciones GROUP BY enfoque"
+  python scripts/registro_ejecuciones.py --importar results_escenario3/plan_enhsp_escenario3.txt
+  python scripts/registro_ejecuciones.py --benchmark 10000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import perfilado
+
+REPO = Path(__file__).resolve().parent.parent
+DB_DEFAULT = REPO / "registro_ejecuciones.sqlite"
+ENV_DB = "REGISTRO_EJECUCIONES"
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ejecuciones (
+    id         INTEGER PRIMARY KEY,
+    ts         REAL NOT NULL,
+    fecha      TEXT NOT NULL,
+    script     TEXT NOT NULL,
+    escenario  TEXT,
+    enfoque    TEXT NOT NULL,
+    estado     TEXT,
+    input_hash TEXT,
+    opciones   TEXT,
+    coste      REAL,
+    plan_len   INTEGER,
+    cobertura  REAL,
+    t_total_s  REAL,
+    git_head   TEXT
+);
+CREATE TABLE IF NOT EXISTS etapas (
+    run_id   INTEGER NOT NULL REFERENCES ejecuciones(id) ON DELETE CASCADE,
+    etapa    TEXT NOT NULL,
+    segundos REAL NOT NULL,
+    PRIMARY KEY (run_id, etapa)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_ejecuciones_esc_enf_ts ON ejecuciones(escenario, enfoque, ts);
+CREATE INDEX IF NOT EXISTS ix_ejecuciones_enf_ts ON ejecuciones(enfoque, ts);
+CREATE INDEX IF NOT EXISTS ix_ejecuciones_ts ON ejecuciones(ts);
+CREATE INDEX IF NOT EXISTS ix_etapas_etapa ON etapas(etapa, run_id);
+"""
+
+# Tiempos del log de ENHSP -> etapas del registro
+ENHSP_STAGES = {"planning_ms": "planificacion", "heuristic_ms": "heuristica", "search_ms": "busqueda"}
+
+RUN_COLUMNS = ["id", "fecha", "script", "escenario", "enfoque", "estado", "coste", "plan_len", "cobertura", "t_total_s"]
+
+
+# =========================
+# Utilidades para los scripts que registran
+# =========================
+
+class Etapas(dict):
+    """
+    Tiempos por etapa [s]: `with etapas.medir("resolucion"): ...` acumula el tiempo de reloj.
+    Con --profile, cada etapa aparece también en el informe de perfilado.py.
+    """
+
+    @contextmanager
+    def medir(self, nombre: str):
+        t0 = time.perf_counter()
+        try:
+            with perfilado.etapa(nombre):
+                yield
+        finally:
+            self[nombre] = self.get(nombre, 0.0) + time.perf_counter() - t0
+
+
+def scenario_name(path) -> str | None:
+    """'escenario3' a partir de data_escenario3/, results_escenario3/... o models/pddl_escenario3/problem.pddl."""
+    if path is None:
+        return None
+    path = Path(path)
+    for part in (path, *path.parents):
+        for prefix in ("data_", "results_", "pddl_"):
+            if part.name.startswith(prefix):
+                return part.name[len(prefix):]
+    return path.stem or None
+
+
+def hash_files(*paths) -> str | None:
+    """SHA-256 del contenido de los archivos (en orden); None si falta alguno."""
+    import hashlib
+
+    h = hashlib.sha256()
+    try:
+        for p in paths:
+            h.update(Path(p).read_bytes())
+    except (OSError, TypeError):
+        return None
+    return h.hexdigest()
+
+
+def hash_inputs(inputs) -> str:
+    """Hash canónico de entradas ya parseadas (el mismo criterio que la caché MILP)."""
+    from cache_milp import _digest
+
+    return _digest(inputs)
+
+
+def _git_head() -> str | None:
+    """Commit actual leyendo .git directamente (sin lanzar git)."""
+    git = REPO / ".git"
+    try:
+        head = (git / "HEAD").read_text(encoding="utf-8").strip()
+        if head.startswith("ref: "):
+            ref = head[5:]
+            ref_file = git / ref
+            if ref_file.exists():
+                return ref_file.read_text(encoding="utf-8").strip()[:12]
+            for line in (git / "packed-refs").read_text(encoding="utf-8").splitlines():
+                if line.endswith(" " + ref):
+                    return line.split()[0][:12]
+            return None
+        return head[:12]
+    except OSError:
+        return None
+
+
+# =========================
+# Base de datos
+# =========================
+
+def db_path() -> Path | None:
+    """Ruta de la base (REGISTRO_EJECUCIONES o la de por defecto); None si el registro está desactivado."""
+    value = os.environ.get(ENV_DB)
+    if value is None:
+        return DB_DEFAULT
+    if value.strip().lower() in ("", "0", "off", "no", "false"):
+        return None
+    return Path(value)
+
+
+def connect(path: Path | None = None, readonly: bool = False) -> sqlite3.Connection:
+    path = Path(path) if path is not None else (db_path() or DB_DEFAULT)
+    if readonly:
+        con = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=10.0)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(path, timeout=10.0)
+        # WAL: varios scripts (o procesos de un pool) pueden registrar a la vez
+        con.execute("PRAGMA journal_mode=WAL")
+        if con.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            con.executescript(SCHEMA)
+            con.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    con.execute("PRAGMA foreign_keys=ON")
+    con.row_factory = sqlite3.Row
+    return con
+
+
+def _insert(con: sqlite3.Connection, row: dict, etapas: dict | None) -> int:
+    cols = list(row)
+    cur = con.execute(f"INSERT INTO ejecuciones ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                      [row[c] for c in cols])
+    run_id = cur.lastrowid
+    if etapas:
+        con.executemany("INSERT INTO etapas (run_id, etapa, segundos) VALUES (?, ?, ?)",
+                        [(run_id, k, float(v)) for k, v in etapas.items() if v is not None])
+    return run_id
+
+
+def record_run(script: str, enfoque: str, escenario: str | None = None, estado: str | None = None,
+               input_hash: str | None = None, opciones: dict | None = None, etapas: dict | None = None,
+               coste: float | None = None, plan_len: int | None = None, cobertura: float | None = None,
+               t_total_s: float | None = None, db: Path | None = None) -> int | None:
+    """
+    Añade una ejecución al registro y devuelve su id (None si el registro está desactivado o falla).
+    `etapas` son tiempos por etapa en segundos; sin t_total_s se usa su suma.
+    """
+    path = Path(db) if db is not None else db_path()
+    if path is None:
+        return None
+    now = time.time()
+    if t_total_s is None and etapas:
+        t_total_s = sum(v for v in etapas.values() if v is not None)
+    row = {
+        "ts": now, "fecha": datetime.fromtimestamp(now).isoformat(timespec="seconds"),
+        "script": Path(script).name, "escenario": escenario, "enfoque": enfoque, "estado": estado,
+        "input_hash": input_hash,
+        "opciones": json.dumps(opciones, sort_keys=True, default=str) if opciones is not None else None,
+        "coste": None if coste is None else float(coste), "plan_len": plan_len,
+        "cobertura": None if cobertura is None else float(cobertura),
+        "t_total_s": t_total_s, "git_head": _git_head(),
+    }
+    try:
+        con = connect(path)
+        try:
+            with con:
+                return _insert(con, row, etapas)
+        finally:
+            con.close()
+    except (sqlite3.Error, OSError) as ex:
+        print(f"[AVISO] No se pudo registrar la ejecución en {path}: {ex}")
+        return None
+
+
+# =========================
+# Consultas
+# =========================
+
+def _filters(escenario=None, enfoque=None, script=None, desde=None) -> tuple:
+    where, params = [], []
+    for col, val in (("e.escenario", escenario), ("e.enfoque", enfoque), ("e.script", script)):
+        if val is not None:
+            where.append(f"{col} = ?")
+            params.append(val)
+    if desde is not None:
+        where.append("e.ts >= ?")
+        params.append(datetime.fromisoformat(desde).timestamp())
+    return (" WHERE " + " AND ".join(where)) if where else "", params
+
+
+def latest_runs(con, limit: int = 20, **filters) -> list:
+    where, params = _filters(**filters)
+    sql = f"SELECT {', '.join('e.' + c for c in RUN_COLUMNS)} FROM ejecuciones e{where} ORDER BY e.ts DESC LIMIT ?"
+    return [dict(r) for r in con.execute(sql, params + [limit])]
+
+
+def stage_series(con, etapa: str, limit: int = 50, **filters) -> list:
+    """
+    [(fecha, escenario, enfoque, segundos)] de una etapa ('total' = t_total_s), de la más reciente a la más
+    antigua. Los aciertos de caché (estado 'cache', milp_model.py) no resuelven nada y quedan fuera: sus
+    tiempos de milisegundos desplazarían la mediana de tendencias y regresiones.
+    """
+    where, params = _filters(**filters)
+    where += f"{' AND' if where else ' WHERE'} e.estado IS NOT 'cache'"
+    if etapa == "total":
+        sql = (f"SELECT e.fecha, e.escenario, e.enfoque, e.t_total_s AS segundos FROM ejecuciones e{where}"
+               f" AND e.t_total_s IS NOT NULL ORDER BY e.ts DESC LIMIT ?")
+    else:
+        sql = (f"SELECT e.fecha, e.escenario, e.enfoque, s.segundos FROM ejecuciones e "
+               f"JOIN etapas s ON s.run_id = e.id AND s.etapa = ?{where} ORDER BY e.ts DESC LIMIT ?")
+        params = [etapa] + params
+    return [dict(r) for r in con.execute(sql, params + [limit])]
+
+
+def _groups(con, **filters) -> list:
+    where, params = _filters(**filters)
+    return [tuple(r) for r in con.execute(
+        f"SELECT DISTINCT e.escenario, e.enfoque FROM ejecuciones e{where} ORDER BY 1, 2", params)]
+
+
+def trends(con, ventana: int = 20, etapa: str = "total", **filters) -> list:
+    """Por (escenario, enfoque): nº de ejecuciones en la ventana, mediana, última y su razón frente a la mediana."""
+    out = []
+    rest = {k: v for k, v in filters.items() if k not in ("escenario", "enfoque")}
+    for escenario, enfoque in _groups(con, **filters):
+        serie = stage_series(con, etapa, ventana + 1, escenario=escenario, enfoque=enfoque, **rest)
+        if not serie:
+            continue
+        times = [r["segundos"] for r in serie]
+        last, previous = times[0], times[1:]
+        med = statistics.median(previous) if previous else None
+        out.append({"escenario": escenario, "enfoque": enfoque, "n": len(times), "ultima_s": last,
+                    "mediana_s": med, "razon": (last / med) if med else None, "fecha": serie[0]["fecha"]})
+    return out
+
+
+def regressions(con, umbral: float = 0.25, ventana: int = 20, etapa: str = "total", **filters) -> list:
+    """Grupos cuya última ejecución es más lenta que (1 + umbral) × la mediana de las `ventana` anteriores."""
+    return [t for t in trends(con, ventana, etapa, **filters) if t["razon"] is not None and t["razon"] > 1 + umbral]
+
+
+# =========================
+# Importar planes ENHSP ya ejecutados
+# =========================
+
+def import_plan(plan_path: Path, db: Path | None = None) -> int | None:
+    """Registra un plan ENHSP existente: tiempos del log, longitud, métrica y cobertura simulada."""
+    import parse_priorizado_plan_sim as sim
+    from analizar_traza_enhsp import load_trace
+
+    text = plan_path.read_text(encoding="utf-8", errors="replace")
+    stats = load_trace(text, plan_path.stem).stats
+    problem = sim.problem_for_plan(plan_path)
+    cobertura = coste = None
+    if problem is not None and problem.exists():
+        actions, _ = sim.parse_plan_text(text, verbose=False)
+        hours, scalars, per_h = sim.parse_problem(problem, verbose=False)
+        report = sim.simulate(actions, hours, scalars, per_h)
+        demand = report["demand"]
+        cobertura = 1.0 - demand["remaining"] / demand["initial"] if demand["initial"] else None
+        coste = report["total_cost_recalc"]
+    etapas = {etapa: stats[key] / 1000.0 for key, etapa in ENHSP_STAGES.items() if stats.get(key) is not None}
+    return record_run(
+        "enhsp", "pddl", escenario=scenario_name(problem or plan_path), estado="importado",
+        input_hash=hash_files(problem) if problem is not None else None,
+        opciones={"plan": plan_path.name, "problem": problem.name if problem is not None else None,
+                  "expanded": stats.get("expanded"), "evaluated": stats.get("evaluated")},
+        etapas=etapas, coste=coste if coste is not None else stats.get("metric"), plan_len=stats.get("plan_length"),
+        cobertura=cobertura, t_total_s=etapas.get("planificacion"), db=db)
+
+
+# =========================
+# CLI
+# =========================
+
+def _fmt(v) -> str:
+    if v is None:
+        return "-"
+    if isinstance(v, float):
+        return f"{v:,.4g}" if abs(v) < 1e4 else f"{v:,.0f}"
+    return str(v)
+
+
+def print_table(rows: list, columns: list | None = None) -> None:
+    if not rows:
+        print("(sin filas)")
+        return
+    columns = columns or list(rows[0])
+    cells = [[_fmt(r[c]) for c in columns] for r in rows]
+    widths = [max(len(c), *(len(row[i]) for row in cells)) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def _synthetic_db(path: Path, n: int, seed: int = 0) -> None:
+    import random
+
+    rng = random.Random(seed)
+    escenarios = ["caso_base", "escenario1", "escenario2", "escenario3"]
+    enfoques = ["milp", "milp_uc", "pddl", "pddl_por_horas", "comparacion"]
+    con = connect(path)
+    t0 = time.time() - n * 60
+    with con:
+        for i in range(n):
+            esc, enf = rng.choice(escenarios), rng.choice(enfoques)
+            seg = rng.lognormvariate(0, 0.3)
+            row = {"ts": t0 + 60 * i, "fecha": datetime.fromtimestamp(t0 + 60 * i).isoformat(timespec="seconds"),
+                   "script": "sintetico", "escenario": esc, "enfoque": enf, "estado": "optimal",
+                   "coste": 1e6 * rng.random(), "t_total_s": seg}
+            _insert(con, row, {"lectura": 0.05 * seg, "planificacion": 0.9 * seg})
+    con.close()
+
+
+def benchmark(n: int) -> None:
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "registro.sqlite"
+        t0 = time.perf_counter()
+        _synthetic_db(path, n)
+        t_fill = time.perf_counter() - t0
+        con = connect(path, readonly=True)
+        queries = {
+            "últimas 50 (escenario3, pddl)": lambda: latest_runs(con, 50, escenario="escenario3", enfoque="pddl"),
+            "serie planificacion (escenario3, pddl, 50)":
+                lambda: stage_series(con, "planificacion", 50, escenario="escenario3", enfoque="pddl"),
+            "regresiones (todas las combinaciones)": lambda: regressions(con),
+        }
+        print(f"{n} ejecuciones sintéticas insertadas en {t_fill:.2f} s")
+        for label, fn in queries.items():
+            t0 = time.perf_counter()
+            reps = 20
+            for _ in range(reps):
+                fn()
+            print(f"  {label:<45} {(time.perf_counter() - t0) / reps * 1000:8.2f} ms")
+        con.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas sobre el registro SQLite de ejecuciones")
+    parser.add_argument("--db", type=str, default=None, help=f"Base SQLite (por defecto ${ENV_DB} o {DB_DEFAULT.name})")
+    parser.add_argument("--escenario", type=str, default=None, help="p.ej. escenario3, caso_base")
+    parser.add_argument("--enfoque", type=str, default=None, help="p.ej. milp, milp_uc, pddl, pddl_por_horas, hibrido, comparacion")
+    parser.add_argument("--script", type=str, default=None, help="Nombre del script que registró (p.ej. milp_model.py)")
+    parser.add_argument("--desde", type=str, default=None, help="Fecha ISO mínima (p.ej. 2026-01-01)")
+    parser.add_argument("--ultimos", type=int, default=20, help="Número de ejecuciones a mostrar")
+    parser.add_argument("--etapa", type=str, default=None,
+                        help="Serie temporal de una etapa (p.ej. planificacion, resolucion; 'total' = tiempo total)")
+    parser.add_argument("--tendencias", action="store_true", help="Última ejecución frente a la mediana, por escenario y enfoque")
+    parser.add_argument("--regresiones", action="store_true", help="Solo los grupos cuya última ejecución es más lenta")
+    parser.add_argument("--umbral", type=float, default=0.25, help="Regresión si última > (1 + umbral) × mediana")
+    parser.add_argument("--ventana", type=int, default=20, help="Ejecuciones anteriores con las que se compara")
+    parser.add_argument("--sql", type=str, default=None, help="Consulta SQL libre (solo lectura)")
+    parser.add_argument("--importar", type=str, nargs="+", default=None, metavar="PLAN",
+                        help="Registrar planes ENHSP ya ejecutados (plan_enhsp_*.txt)")
+    parser.add_argument("--benchmark", type=int, default=None, metavar="N",
+                        help="Mide las consultas sobre una base temporal con N ejecuciones sintéticas")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+        return
+    path = Path(args.db) if args.db else (db_path() or DB_DEFAULT)
+    if args.importar:
+        for plan in args.importar:
+            run_id = import_plan(Path(plan), db=path)
+            print(f"{plan} -> id {run_id}")
+        return
+    if not path.exists():
+        raise SystemExit(f"No existe el registro {path} (se crea con la primera ejecución registrada)")
+
+    con = connect(path, readonly=True)
+    filters = {"escenario": args.escenario, "enfoque": args.enfoque, "script": args.script, "desde": args.desde}
+    t0 = time.perf_counter()
+    if args.sql:
+        rows = [dict(r) for r in con.execute(args.sql)]
+        print_table(rows)
+    elif args.tendencias or args.regresiones:
+        etapa = args.etapa or "total"
+        fn = regressions if args.regresiones else trends
+        kwargs = {"umbral": args.umbral} if args.regresiones else {}
+        rows = fn(con, ventana=args.ventana, etapa=etapa, **kwargs, **filters)
+        print(f"Etapa '{etapa}', ventana {args.ventana}" + (f", umbral {args.umbral:.0%}" if args.regresiones else ""))
+        print_table(rows, ["escenario", "enfoque", "n", "ultima_s", "mediana_s", "razon", "fecha"])
+    elif args.etapa:
+        rows = stage_series(con, args.etapa, args.ultimos, **filters)
+        print_table(rows)
+        if rows:
+            seg = [r["segundos"] for r in rows]
+            print(f"n={len(seg)}  mediana={statistics.median(seg):.3f} s  min={min(seg):.3f} s  max={max(seg):.3f} s")
+    else:
+        print_table(latest_runs(con, args.ultimos, **filters), RUN_COLUMNS)
+    print(f"({(time.perf_counter() - t0) * 1000:.1f} ms)")
+    con.close()
+
+
+if __name__ == "__main__":
+    main()
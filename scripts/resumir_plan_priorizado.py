@@ -4,6 +4,7 @@ resumir_plan_priorizado.py
 
 Uso:
   python scripts/resumir_plan_priorizado.py <ruta_problem_pddl> <ruta_plan_txt>
+  (Perfilado) ... <ruta_problem_pddl> <ruta_plan_txt> --profile   -> perfil_resumir_plan_priorizado.* junto al plan
 
 """
 
@@ -17,6 +18,8 @@ from pathlib import Path
 from collections import defaultdict, OrderedDict
 from typing import Dict, Tuple, List, Optional
 
+import perfilado
+
 # ==========
 # Regex
 # ==========
@@ -235,9 +238,10 @@ def pretty_print_totals(tot: Dict, params: Dict):
 # Main
 # ==========
 
+@perfilado.perfilable("resumir_plan_priorizado")
 def main():
     if len(sys.argv) < 3:
-        print("Uso: python scripts/resumir_plan_priorizado.py <problem.pddl> <plan.txt>", file=sys.stderr)
+        print("Uso: python scripts/resumir_plan_priorizado.py <problem.pddl> <plan.txt> [--profile]", file=sys.stderr)
         sys.exit(2)
 
     problem_path = Path(sys.argv[1])
@@ -251,9 +255,13 @@ def main():
         sys.exit(1)
 
     try:
-        params = parse_problem(problem_path)
-        counts, _markers = parse_plan(plan_path)
-        rows, tot = build_summary(counts, params)
+        perfilado.salida(plan_path.parent)
+        with perfilado.etapa("parse_problem"):
+            params = parse_problem(problem_path)
+        with perfilado.etapa("parse_plan"):
+            counts, _markers = parse_plan(plan_path)
+        with perfilado.etapa("build_summary"):
+            rows, tot = build_summary(counts, params)
 
         # CSV de salida: mismo directorio del plan
         base = os.path.splitext(os.path.basename(plan_path))[0]
@@ -0,0 +1,323 @@
+"""
+robustez_plan.py
+
+Robustez de un plan PDDL fijo frente a perfiles realizados distintos del pronóstico.
+
+El plan es una secuencia fija de despachos de `unidad_despacho` MW. Se repite contra N muestras de
+demanda y disponibilidad (matrices N × horas) con la misma semántica de recorte que
+parse_priorizado_plan_sim.simulate: cada despacho entrega min(unidad, demanda, disponible,
+presupuesto) y cuenta como clamp si no llega a la unidad. Las acciones consecutivas iguales se
+agrupan en tramos (hora, fuente, k) y cada tramo se resuelve para todas las muestras a la vez:
+
+  servido = min(k·u, m)     clamps = k − min(k, ⌊m/u⌋)     con m = min(demanda, disponible, presupuesto)
+
+así que el coste es O(tramos × N) en NumPy (unas 3 fuentes × horas tramos) y no O(acciones × N).
+El presupuesto hídrico se consume en el orden del plan, igual que en simulate.
+
+Las muestras salen del perfil del problema con el modelo de error de montecarlo_milp.py (normal o
+lognormal relativo, correlación horaria AR(1)) para demanda y PV, y opcionalmente hidro y térmica.
+
+Se reportan las distribuciones de clamps por fuente, demanda restante, horas con déficit
+(restante >= unidad), coste realizado y su diferencia con el coste nominal del plan.
+Con --validar K las K primeras muestras se repiten también con simulate y se comparan.
+
+Salidas en --out-dir: robustez_resumen.csv (media, desvío, cuantiles y P(>0) de cada métrica),
+robustez_horas.csv (probabilidad de déficit y restante medio por hora) y, con --muestras-csv,
+robustez_muestras.csv (una fila por muestra).
+
+Uso:
+  python scripts/robustez_plan.py results_caso_base/plan_enhsp_sat_hadd_priorizado2.txt \\
+      models/pddl_caso_base/problem_priorizado2.pddl --samples 100000 --out-dir results_caso_base
+  (Opcional) --pv-sigma 0.25 --pv-rho 0.8 --demand-sigma 0.05 --demand-rho 0.9
+             --hidro-sigma 0.1 --termica-sigma 0.05 --seed 7 --validar 200 --muestras-csv
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+import parse_priorizado_plan_sim as sim
+from montecarlo_milp import ErrorModel, ar1_rho, summarize
+
+FUENTES = ("pv", "hidro", "termica")
+ACCION_FUENTE = {"despachar_pv": 0, "despachar_hidro": 1, "despachar_termica": 2}
+EPS = 1e-9   # tolerancia de simulate para clamps y saneo
+
+
+# =========================
+# Plan -> tramos
+# =========================
+
+def tramos_plan(actions, hours) -> List[tuple]:
+    """(índice de hora, fuente, k) por cada racha de despachos iguales, en el orden del plan.
+
+    Como en simulate, se ignoran las acciones de horas que no están en el problema y las que no
+    despachan (compuertas y avanzar_hora)."""
+    idx = {h: i for i, h in enumerate(hours)}
+    tramos = []
+    for act, h, _h2 in actions:
+        f = ACCION_FUENTE.get(act)
+        if f is None or h not in idx:
+            continue
+        if tramos and tramos[-1][0] == idx[h] and tramos[-1][1] == f:
+            tramos[-1][2] += 1
+        else:
+            tramos.append([idx[h], f, 1])
+    return [tuple(t) for t in tramos]
+
+
+# =========================
+# Repetición vectorizada
+# =========================
+
+@dataclass
+class Perfiles:
+    """Perfiles realizados (N × horas) y presupuesto hídrico por muestra (None = sin tope)."""
+    demanda: np.ndarray
+    pv: np.ndarray
+    hidro: np.ndarray
+    termica: np.ndarray
+    presupuesto: Optional[np.ndarray] = None
+
+    @property
+    def n(self) -> int:
+        return self.demanda.shape[0]
+
+
+@dataclass
+class Repeticion:
+    clamps: np.ndarray         # (N, 3) despachos recortados por fuente
+    servido: np.ndarray        # (N, 3) MWh servidos por fuente
+    restante_hora: np.ndarray  # (N, horas) demanda sin cubrir
+    coste: np.ndarray          # (N,) USD
+    unidad: float
+
+    @property
+    def restante(self) -> np.ndarray:
+        return self.restante_hora.sum(axis=1)
+
+    @property
+    def horas_deficit(self) -> np.ndarray:
+        return (self.restante_hora >= self.unidad - EPS).sum(axis=1)
+
+
+def _sanear(x: np.ndarray) -> None:
+    x[np.abs(x) < EPS] = 0.0
+
+
+def repetir(tramos, perfiles: Perfiles, unidad: float, costos) -> Repeticion:
+    """Repite los tramos del plan sobre todas las muestras a la vez con los recortes de simulate."""
+    # Layout (horas × N): cada tramo toca una fila contigua
+    d = np.array(perfiles.demanda, dtype=float).T.copy()
+    caps = [np.array(a, dtype=float).T.copy() for a in (perfiles.pv, perfiles.hidro, perfiles.termica)]
+    n = d.shape[1]
+    budget = None if perfiles.presupuesto is None else np.array(perfiles.presupuesto, dtype=float).copy()
+    clamps = np.zeros((3, n), dtype=np.int64)
+    servido = np.zeros((3, n))
+    coste = np.zeros(n)
+    for j, f, k in tramos:
+        cap = caps[f][j]
+        m = np.minimum(d[j], cap)
+        if f == 1 and budget is not None:
+            np.minimum(m, budget, out=m)
+        np.maximum(m, 0.0, out=m)
+        completos = np.minimum(np.floor((m + EPS) / unidad), k)
+        x = np.minimum(k * unidad, m)
+        clamps[f] += k - completos.astype(np.int64)
+        d[j] -= x
+        cap -= x
+        _sanear(d[j])
+        _sanear(cap)
+        if f == 1 and budget is not None:
+            budget -= x
+        servido[f] += x
+        coste += x * costos[f]
+    return Repeticion(clamps=clamps.T, servido=servido.T, restante_hora=d.T, coste=coste, unidad=unidad)
+
+
+def validar(actions, hours, scalars, perfiles: Perfiles, rep: Repeticion, k: int) -> int:
+    """Repite las k primeras muestras con sim.simulate; devuelve cuántas no coinciden."""
+    malas = 0
+    for i in range(min(k, perfiles.n)):
+        per_h = {
+            "demanda": dict(zip(hours, perfiles.demanda[i].tolist())),
+            "pv_disponible": dict(zip(hours, perfiles.pv[i].tolist())),
+            "hidro_disponible_hora": dict(zip(hours, perfiles.hidro[i].tolist())),
+            "termica_disponible_hora": dict(zip(hours, perfiles.termica[i].tolist())),
+        }
+        sc = dict(scalars)
+        if perfiles.presupuesto is not None:
+            sc["presupuesto_hidro_diario"] = float(perfiles.presupuesto[i])
+        r = sim.simulate(actions, hours, sc, per_h)
+        clamps = [r["warnings"].get(f"{f}_clamped", 0) for f in FUENTES]
+        ok = (clamps == rep.clamps[i].tolist()
+              and abs(r["accum_cost_sim"] - rep.coste[i]) <= 1e-6 * max(1.0, abs(r["accum_cost_sim"]))
+              and abs(r["demand"]["remaining"] - rep.restante[i]) <= 1e-6 * max(1.0, r["demand"]["initial"]))
+        if not ok:
+            malas += 1
+            if malas <= 3:
+                print(f"[AVISO] Muestra {i}: simulate da clamps {clamps}, coste {r['accum_cost_sim']:,.2f}, "
+                      f"restante {r['demand']['remaining']:,.3f}; vectorizado {rep.clamps[i].tolist()}, "
+                      f"{rep.coste[i]:,.2f}, {rep.restante[i]:,.3f}")
+    return malas
+
+
+# =========================
+# Muestras
+# =========================
+
+def base_problema(hours, scalars, per_h) -> Perfiles:
+    """Perfil del problema (1 × horas) y presupuesto, si el problema lo inicializa."""
+    fila = lambda fn: np.array([[per_h[fn].get(h, 0.0) for h in hours]])
+    b = scalars.get("presupuesto_hidro_diario")
+    return Perfiles(fila("demanda"), fila("pv_disponible"), fila("hidro_disponible_hora"),
+                    fila("termica_disponible_hora"), None if b is None else np.array([b]))
+
+
+def muestrear(base: Perfiles, n: int, seed: int, errores: dict) -> Perfiles:
+    """N perfiles realizados alrededor de base con un ErrorModel por serie (demanda, pv, hidro, termica)."""
+    rng = np.random.default_rng(seed)
+    serie = lambda nombre: errores[nombre].sample(rng, getattr(base, nombre)[0], n)
+    presupuesto = None if base.presupuesto is None else np.full(n, float(base.presupuesto[0]))
+    return Perfiles(serie("demanda"), serie("pv"), serie("hidro"), serie("termica"), presupuesto)
+
+
+# =========================
+# Salidas
+# =========================
+
+def metricas(rep: Repeticion, coste_nominal: float) -> dict:
+    out = {f"clamps_{f}": rep.clamps[:, i] for i, f in enumerate(FUENTES)}
+    out.update(
+        clamps_total=rep.clamps.sum(axis=1),
+        demanda_restante_mwh=rep.restante,
+        horas_deficit=rep.horas_deficit,
+        coste_usd=rep.coste,
+        delta_coste_usd=rep.coste - coste_nominal,
+    )
+    return out
+
+
+def escribir_resumen(met: dict, quantiles, path: Path) -> None:
+    cols = ["metrica", "mean", "std"] + [f"q{q:g}" for q in quantiles] + ["p_positivo"]
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=cols, lineterminator="\n")
+        w.writeheader()
+        for nombre, v in met.items():
+            w.writerow({"metrica": nombre, **summarize(np.asarray(v, dtype=float), quantiles),
+                        "p_positivo": float((v > EPS).mean())})
+
+
+def escribir_horas(rep: Repeticion, hours, path: Path) -> None:
+    p_def = (rep.restante_hora >= rep.unidad - EPS).mean(axis=0)
+    media = rep.restante_hora.mean(axis=0)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(["hour", "p_deficit", "restante_medio_mwh"])
+        for h, p, r in zip(hours, p_def, media):
+            w.writerow([h, f"{p:.6f}", f"{r:.6f}"])
+
+
+def escribir_muestras(met: dict, path: Path) -> None:
+    nombres = list(met)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(["sample"] + nombres)
+        for i, fila in enumerate(zip(*(met[k].tolist() for k in nombres))):
+            w.writerow([i, *fila])
+
+
+# =========================
+# Main
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Robustez de un plan PDDL fijo frente a perfiles perturbados")
+    parser.add_argument("plan", help="Plan de ENHSP (log con 'Found Plan:')")
+    parser.add_argument("problem", help="problem.pddl del plan (perfil de pronóstico)")
+    parser.add_argument("--samples", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=12345)
+    parser.add_argument("--pv-sigma", type=float, default=0.2, help="Desvío relativo del error de PV")
+    parser.add_argument("--pv-rho", type=ar1_rho, default=0.8, help="Autocorrelación horaria AR(1) del error de PV")
+    parser.add_argument("--pv-dist", type=str, default="lognormal", choices=["normal", "lognormal"])
+    parser.add_argument("--demand-sigma", type=float, default=0.05, help="Desvío relativo del error de demanda")
+    parser.add_argument("--demand-rho", type=ar1_rho, default=0.9, help="Autocorrelación horaria AR(1) del error de demanda")
+    parser.add_argument("--demand-dist", type=str, default="normal", choices=["normal", "lognormal"])
+    parser.add_argument("--hidro-sigma", type=float, default=0.0, help="Desvío relativo de la hidro horaria disponible")
+    parser.add_argument("--termica-sigma", type=float, default=0.0, help="Desvío relativo de la térmica disponible")
+    parser.add_argument("--quantiles", type=str, default="0.05,0.5,0.95,0.99")
+    parser.add_argument("--validar", type=int, default=0, metavar="K", help="Contrasta las K primeras muestras con simulate")
+    parser.add_argument("--out-dir", type=str, default=None, help="Salida (por defecto, la carpeta del plan)")
+    parser.add_argument("--muestras-csv", action="store_true", help="Escribe también robustez_muestras.csv")
+    args = parser.parse_args()
+
+    plan_path, problem_path = Path(args.plan), Path(args.problem)
+    for p in (plan_path, problem_path):
+        if not p.exists():
+            sys.exit(f"[ERROR] No existe: {p}")
+    quantiles = [float(q) for q in args.quantiles.split(",") if q.strip()]
+
+    actions, _metric = sim.parse_plan(plan_path, verbose=False)
+    hours, scalars, per_h = sim.parse_problem(problem_path, verbose=False)
+    if not actions:
+        sys.exit(f"[ERROR] No se reconocieron acciones en {plan_path}")
+    unidad = scalars.get("unidad_despacho", 10.0)
+    costos = tuple(scalars.get(f"costo_{f}", 0.0) for f in FUENTES)
+    tramos = tramos_plan(actions, hours)
+
+    base = base_problema(hours, scalars, per_h)
+    nominal = repetir(tramos, base, unidad, costos)
+    errores = {
+        "demanda": ErrorModel(args.demand_sigma, args.demand_rho, args.demand_dist),
+        "pv": ErrorModel(args.pv_sigma, args.pv_rho, args.pv_dist),
+        "hidro": ErrorModel(args.hidro_sigma),
+        "termica": ErrorModel(args.termica_sigma),
+    }
+    t0 = time.perf_counter()
+    perfiles = muestrear(base, args.samples, args.seed, errores)
+    t_muestras = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    rep = repetir(tramos, perfiles, unidad, costos)
+    t_rep = time.perf_counter() - t0
+
+    print(f"=== Robustez de {plan_path.name}: {len(actions):,} acciones en {len(tramos)} tramos, "
+          f"{args.samples:,} muestras × {len(hours)} h ===")
+    print(f"Muestreo {t_muestras:.2f} s, repetición {t_rep:.2f} s")
+    print(f"Nominal: coste {nominal.coste[0]:,.2f} $, clamps {nominal.clamps[0].tolist()}, "
+          f"restante {nominal.restante[0]:,.0f} MWh")
+    met = metricas(rep, float(nominal.coste[0]))
+    etiquetas = [f"q{q:g}" for q in quantiles]
+    print(f"  {'métrica':<22}{'media':>14}" + "".join(f"{e:>14}" for e in etiquetas) + f"{'P(>0)':>9}")
+    for nombre, v in met.items():
+        s = summarize(np.asarray(v, dtype=float), quantiles)
+        print(f"  {nombre:<22}{s['mean']:>14,.2f}" + "".join(f"{s[e]:>14,.2f}" for e in etiquetas)
+              + f"{(v > EPS).mean():>9.3f}")
+
+    if args.validar:
+        malas = validar(actions, hours, scalars, perfiles, rep, args.validar)
+        n_val = min(args.validar, perfiles.n)
+        if malas:
+            print(f"[AVISO] {malas}/{n_val} muestras no coinciden con simulate")
+        else:
+            print(f"[OK] {n_val} muestras idénticas a simulate (clamps, coste y restante)")
+
+    out_dir = Path(args.out_dir) if args.out_dir else plan_path.parent
+    out_dir.mkdir(parents=True, exist_ok=True)
+    escribir_resumen(met, quantiles, out_dir / "robustez_resumen.csv")
+    escribir_horas(rep, hours, out_dir / "robustez_horas.csv")
+    print(f"-> {out_dir / 'robustez_resumen.csv'}")
+    print(f"-> {out_dir / 'robustez_horas.csv'}")
+    if args.muestras_csv:
+        escribir_muestras(met, out_dir / "robustez_muestras.csv")
+        print(f"-> {out_dir / 'robustez_muestras.csv'}")
+
+
+if __name__ == "__main__":
+    main()
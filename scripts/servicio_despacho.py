@@ -0,0 +1,350 @@
+"""
+servicio_despacho.py
+
+Servicio HTTP local que mantiene "calientes" los escenarios leídos (_read_csvs) y los
+modelos MILP ya construidos (build_model), para atender re-despachos y verificaciones
+de planes sin re-importar Pyomo ni reconstruir el modelo en cada petición.
+
+Las peticiones se resuelven en un pool de procesos: cada worker guarda su propia caché
+de escenarios/modelos/solver (los solvers en proceso, como HiGHS, no admiten solves
+concurrentes desde varios hilos de un mismo proceso).
+
+Uso:
+  python scripts/servicio_despacho.py
+  (Opcional) python scripts/servicio_despacho.py --host 127.0.0.1 --port 8765 --workers 4 --solver appsi_highs
+
+Peticiones (JSON):
+  POST /dispatch  {"scenario": "escenario1", "demand": {"19": 1100}}   (o "data_dir": "...")
+                  "demand" admite una lista con las 24 horas o un dict parcial hora -> MW.
+  POST /verify    {"problem": "models/.../problem.pddl", "plan": "results_.../plan.txt"}
+  GET  /stats     peticiones, errores y latencias p50/p95 por endpoint
+  GET  /health
+
+Cada respuesta incluye "latency_ms" con el desglose de la petición (carga, construcción, solve/simulación).
+Errores: 400 con un mensaje legible si la petición no es válida (p.ej. demanda negativa o fuera del
+horizonte) y 422 con "termination" si el modelo no tiene solución con la demanda pedida.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import multiprocessing
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import milp_model
+import parse_priorizado_plan_sim as sim
+import verificar_y_visualizar_plan_priorizado as ver
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _ms(t0: float) -> float:
+    return (time.perf_counter() - t0) * 1000.0
+
+
+# =========================
+# Cachés en memoria
+# =========================
+
+def resolve_scenario(req: dict) -> Path:
+    if req.get("data_dir"):
+        return Path(req["data_dir"]).resolve()
+    name = str(req.get("scenario", "caso_base"))
+    return (REPO_ROOT / (name if name.startswith("data_") else f"data_{name}")).resolve()
+
+
+class ScenarioCache:
+    """Escenario -> datos leídos, modelo construido y solver (vive dentro de un worker)."""
+
+    def __init__(self, solver_name: str, glpk_executable: str | None):
+        self.solver_name = solver_name
+        self.glpk_executable = glpk_executable
+        self._entries = {}
+
+    def get(self, data_dir: Path, latency: dict):
+        entry = self._entries.get(data_dir)
+        if entry is not None:
+            latency["load"] = latency["build"] = 0.0
+            return entry, True
+        t0 = time.perf_counter()
+        inputs = milp_model._read_csvs(data_dir)
+        latency["load"] = _ms(t0)
+        t0 = time.perf_counter()
+        entry = {
+            "inputs": inputs,
+            "model": milp_model.build_model(*inputs),
+            "solver": milp_model.make_solver(self.solver_name, self.glpk_executable),
+        }
+        latency["build"] = _ms(t0)
+        self._entries[data_dir] = entry
+        return entry, False
+
+
+class ProblemCache:
+    """Problemas PDDL parseados, por ruta y mtime (el plan se relee en cada petición)."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, problem_path: Path):
+        key = (str(problem_path.resolve()), problem_path.stat().st_mtime_ns)
+        if key not in self._entries:
+            self._entries[key] = (
+                sim.parse_problem(problem_path, verbose=False),
+                ver.parse_problem(problem_path),
+            )
+        return self._entries[key]
+
+
+class Stats:
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._lat = defaultdict(lambda: deque(maxlen=window))
+        self._count = defaultdict(int)
+        self._errors = defaultdict(int)
+
+    def record(self, endpoint: str, total_ms: float, ok: bool):
+        with self._lock:
+            self._count[endpoint] += 1
+            if not ok:
+                self._errors[endpoint] += 1
+            self._lat[endpoint].append(total_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            out = {}
+            for ep, n in self._count.items():
+                lat = sorted(self._lat[ep])
+                out[ep] = {
+                    "requests": n,
+                    "errors": self._errors[ep],
+                    "p50_ms": statistics.median(lat) if lat else None,
+                    "p95_ms": lat[min(len(lat) - 1, int(0.95 * len(lat)))] if lat else None,
+                }
+            return out
+
+
+# =========================
+# Operaciones
+# =========================
+
+class SinSolucion(Exception):
+    """El MILP no tiene solución con la demanda pedida; el argumento es la termination_condition (HTTP 422)."""
+
+
+def _mw(h, v) -> float:
+    if isinstance(v, bool) or not isinstance(v, (int, float)) or not math.isfinite(v) or v < 0:
+        raise ValueError(f"'demand' en la hora {h}: se esperaba un número >= 0 [MW], no {v!r}")
+    return float(v)
+
+
+def _apply_demand(entry: dict, override) -> None:
+    """Valida toda la demanda pedida antes de tocar el modelo en caché."""
+    hours, demand_map = entry["inputs"][0], entry["inputs"][1]
+    values = dict(demand_map)
+    if isinstance(override, list):
+        if len(override) != len(hours):
+            raise ValueError(f"'demand' debe tener {len(hours)} valores")
+        values.update((h, _mw(h, v)) for h, v in zip(hours, override))
+    elif isinstance(override, dict):
+        for h, v in override.items():
+            try:
+                h = int(h)
+            except (TypeError, ValueError):
+                raise ValueError(f"Hora no válida en 'demand': {h!r}") from None
+            if h not in values:
+                raise ValueError(f"Hora fuera del horizonte: {h}")
+            values[h] = _mw(h, v)
+    elif override is not None:
+        raise ValueError("'demand' debe ser una lista o un dict hora -> MW")
+    model = entry["model"]
+    for h in hours:
+        model.demand[h] = float(values[h])
+
+
+def dispatch(req: dict, scenarios: ScenarioCache) -> dict:
+    latency = {}
+    data_dir = resolve_scenario(req)
+    if not data_dir.is_dir():
+        raise ValueError(f"No existe el escenario: {data_dir}")
+    entry, hit = scenarios.get(data_dir, latency)
+    _apply_demand(entry, req.get("demand"))
+    t0 = time.perf_counter()
+    summary = milp_model.solve_model(entry["model"], solver=entry["solver"], load_solutions=False)
+    latency["solve"] = _ms(t0)
+    if summary["total_cost_usd"] is None:
+        raise SinSolucion(summary["termination_condition"])
+    rows = milp_model.extract_dispatch(entry["model"])
+    return {
+        "scenario": str(data_dir.name),
+        "summary": summary,
+        "dispatch": rows,
+        "cache_hit": hit,
+        "latency_ms": latency,
+    }
+
+
+def verify_plan(req: dict, problems: ProblemCache) -> dict:
+    latency = {}
+    problem_path = Path(req["problem"])
+    plan_path = Path(req["plan"])
+    for p in (problem_path, plan_path):
+        if not p.exists():
+            raise ValueError(f"No existe el archivo: {p}")
+
+    t0 = time.perf_counter()
+    (hours, scalars, per_h), params = problems.get(problem_path)
+    latency["problem"] = _ms(t0)
+
+    t0 = time.perf_counter()
+    actions, metric = sim.parse_plan(plan_path, verbose=False)
+    markers = ver.parse_plan(plan_path)
+    latency["plan"] = _ms(t0)
+
+    t0 = time.perf_counter()
+    report = sim.simulate(actions, hours, scalars, per_h)
+    counts, demanda_final, ultimo_to = ver.simulate_plan(markers, params)
+    rows, _totals = ver.build_summary(counts, demanda_final, params)
+    warnings = ver.verify(rows, params)
+    goal_msgs, goal_ok, h_goal = ver.evaluate_goal(rows, ultimo_to, params)
+    latency["verify"] = _ms(t0)
+
+    report.pop("per_hour", None)
+    return {
+        "metric_enhsp": metric,
+        "simulation": report,
+        "goal_ok": goal_ok,
+        "goal_hour": h_goal,
+        "goal_msgs": goal_msgs,
+        "warnings": warnings,
+        "latency_ms": latency,
+    }
+
+
+# =========================
+# Workers (estado por proceso)
+# =========================
+
+_SCENARIOS: ScenarioCache | None = None
+_PROBLEMS: ProblemCache | None = None
+
+
+def _init_worker(solver_name: str, glpk_executable: str | None, preload: list):
+    global _SCENARIOS, _PROBLEMS
+    _SCENARIOS = ScenarioCache(solver_name, glpk_executable)
+    _PROBLEMS = ProblemCache()
+    for name in preload:
+        _SCENARIOS.get(resolve_scenario({"scenario": name}), {})
+
+
+def _run_job(endpoint: str, req: dict) -> dict:
+    if endpoint == "/dispatch":
+        return dispatch(req, _SCENARIOS)
+    return verify_plan(req, _PROBLEMS)
+
+
+# =========================
+# Servidor HTTP
+# =========================
+
+class DispatchServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, workers: int, solver_name: str, glpk_executable: str | None, preload: list):
+        super().__init__(addr, DispatchHandler)
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(solver_name, glpk_executable, list(preload)),
+        )
+        self.stats = Stats()
+        self.scenarios_seen = set()
+        self._seen_lock = threading.Lock()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+class DispatchHandler(BaseHTTPRequestHandler):
+    server: DispatchServer
+
+    def _send(self, code: int, payload: dict):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            with self.server._seen_lock:
+                seen = sorted(self.server.scenarios_seen)
+            self._send(200, {"status": "ok", "scenarios": seen})
+        elif self.path == "/stats":
+            self._send(200, self.server.stats.snapshot())
+        else:
+            self._send(404, {"error": f"Ruta desconocida: {self.path}"})
+
+    def do_POST(self):
+        if self.path not in ("/dispatch", "/verify"):
+            self._send(404, {"error": f"Ruta desconocida: {self.path}"})
+            return
+
+        t0 = time.perf_counter()
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            req = json.loads(self.rfile.read(length) or b"{}")
+            result = self.server.pool.submit(_run_job, self.path, req).result()
+            code = 200
+            if self.path == "/dispatch":
+                with self.server._seen_lock:
+                    self.server.scenarios_seen.add(result["scenario"])
+        except SinSolucion as ex:
+            result, code = {"error": f"El despacho no tiene solución con esa demanda ({ex})", "termination": str(ex)}, 422
+        except KeyError as ex:
+            result, code = {"error": f"Falta el campo {ex}"}, 400
+        except ValueError as ex:
+            result, code = {"error": str(ex)}, 400
+        except Exception as ex:
+            result, code = {"error": repr(ex)}, 500
+        total = _ms(t0)
+        result.setdefault("latency_ms", {})["total"] = total
+        self.server.stats.record(self.path, total, code == 200)
+        self._send(code, result)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio local de despacho MILP y verificación de planes PDDL")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=4, help="Procesos worker (peticiones resueltas en paralelo)")
+    parser.add_argument("--solver", type=str, default="glpk", help="Nombre de solver Pyomo (glpk, cbc, appsi_highs, etc.)")
+    parser.add_argument("--glpk-exe", type=str, default=None, help="Ruta a glpsol (por defecto, el del PATH)")
+    parser.add_argument("--preload", nargs="*", default=[], help="Escenarios que cada worker carga al arrancar (p.ej. caso_base escenario1)")
+    args = parser.parse_args()
+
+    server = DispatchServer((args.host, args.port), args.workers, args.solver, args.glpk_exe, args.preload)
+    print(f"=== Servicio de despacho en http://{args.host}:{server.server_port} (workers={args.workers}, solver={args.solver}) ===")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+El emulador de emular_priorizado.py frente a los planes ENHSP versionados (ejecutar con pytest):
+
+  python -m pytest -q scripts/test_emular_priorizado.py
+"""
+from pathlib import Path
+
+import pytest
+
+import emular_priorizado as emu
+import parse_priorizado_plan_sim as sim
+
+REPO = Path(__file__).resolve().parent.parent
+# (dominio, problema, plan, nº de acciones, coste)
+PLANES = [
+    ("models/pddl_caso_base/domain_priorizado.pddl", "models/pddl_caso_base/problem_priorizado.pddl",
+     "results_caso_base/plan_enhsp_sat_hadd_priorizado.txt", 1779, 942650),
+    ("models/pddl_caso_base/domain_priorizado2.pddl", "models/pddl_caso_base/problem_priorizado2.pddl",
+     "results_caso_base/plan_enhsp_sat_hadd_priorizado2.txt", 1971, 649650),
+    ("models/pddl_escenario1/domain_escenario1.pddl", "models/pddl_escenario1/problem_escenario1.pddl",
+     "results_escenario1/plan_enhsp_escenario1.txt", 579, 1108800),
+    ("models/pddl_escenario2/domain_escenario2.pddl", "models/pddl_escenario2/problem_escenario2.pddl",
+     "results_escenario2/plan_enhsp_escenario2.txt", 331, 1442000),
+    ("models/pddl_escenario3/domain_escenario3.pddl", "models/pddl_escenario3/problem_escenario3.pddl",
+     "results_escenario3/plan_enhsp_escenario3.txt", 16566, 356250),
+]
+
+
+@pytest.mark.parametrize("domain, problem, plan_path, n_acciones, coste", PLANES, ids=[p[2] for p in PLANES])
+def test_reproduce_plan_enhsp(domain, problem, plan_path, n_acciones, coste, tmp_path):
+    em = emu.emular(emu.leer(REPO / domain, REPO / problem))
+    plan, _metric = sim.parse_plan(REPO / plan_path, verbose=False)
+
+    estado, detalle = emu.comparar(em, plan)
+    assert estado == "identico", detalle
+    assert em.n_acciones == len(plan) == n_acciones
+    assert em.coste == coste
+    assert em.plan_existe
+
+    # Las dos salidas del plan se releen igual que el log de ENHSP
+    emu.escribir_enhsp(em, tmp_path / "plan.txt")
+    assert sim.parse_plan(tmp_path / "plan.txt", verbose=False)[0] == plan
+    emu.escribir_rle(em, tmp_path / "plan.rle")
+    assert emu.leer_rle(tmp_path / "plan.rle") == plan
@@ -0,0 +1,56 @@
+"""
+Unit commitment de milp_model.py: arranque/parada ligados al estado (ejecutar con pytest):
+
+  python -m pytest -q scripts/test_milp_uc.py
+
+Necesita Pyomo y HiGHS (appsi_highs); sin ellos los casos se omiten.
+"""
+import pytest
+
+pyo = pytest.importorskip("pyomo.environ")
+pytest.importorskip("highspy")
+
+import milp_model
+
+HOURS = [0, 1, 2, 3]
+RAMPA = 50.0
+UC = {"p_min": 0.0, "startup_cost": 0.0, "min_up": 1, "min_down": 1, "initial_on": 1}
+
+
+def _modelo():
+    """Salto de demanda de 300 MW con rampa térmica de 50 MW/h y solo térmica: la rampa limita."""
+    demand = dict(zip(HOURS, [100.0, 400.0, 400.0, 400.0]))
+    zeros = dict.fromkeys(HOURS, 0.0)
+    thermal = dict.fromkeys(HOURS, 500.0)
+    return milp_model.build_model(HOURS, demand, zeros, zeros, thermal, (0.0, 0.0, 100.0),
+                                  (None, RAMPA, None), voll=1000.0, uc=dict(UC))
+
+
+def _resolver(m):
+    summary = milp_model.solve_model(m, solver=milp_model.make_solver("appsi_highs"))
+    assert summary["termination_condition"] == "optimal"
+    return summary["total_cost_usd"]
+
+
+def test_arranque_y_parada_ligados_al_estado():
+    m = _modelo()
+    assert set(m.uc_start) == set(m.uc_stop) == set(HOURS)
+    _resolver(m)
+    for t in HOURS:
+        u, v, w = pyo.value(m.u[t]), pyo.value(m.v[t]), pyo.value(m.w[t])
+        assert v <= u + 1e-6, f"h{t}: arranque con la unidad parada"
+        assert w <= 1 - u + 1e-6, f"h{t}: parada con la unidad en marcha"
+        if t > HOURS[0]:
+            # En marcha todo el día: ningún arranque fantasma abre el margen de rampa
+            assert pyo.value(m.P_thermal[t] - m.P_thermal[t - 1]) <= RAMPA + 1e-6
+
+
+def test_sin_ligaduras_aparecen_arranques_fantasma():
+    """Sin uc_start/uc_stop el óptimo usa v = w = 1 sin cambio de estado para saltarse la rampa."""
+    con = _resolver(_modelo())
+    m = _modelo()
+    m.uc_start.deactivate()
+    m.uc_stop.deactivate()
+    sin = _resolver(m)
+    assert sin < con - 1.0
+    assert any(pyo.value(m.v[t]) > 0.5 and pyo.value(m.w[t]) > 0.5 for t in HOURS)
@@ -0,0 +1,52 @@
+"""
+La repetición vectorizada de robustez_plan.py frente a parse_priorizado_plan_sim.simulate sobre
+muestras perturbadas de los planes versionados (ejecutar con pytest):
+
+  python -m pytest -q scripts/test_robustez_plan.py
+"""
+from pathlib import Path
+
+import pytest
+
+import parse_priorizado_plan_sim as sim
+import robustez_plan as rob
+from montecarlo_milp import ErrorModel
+
+REPO = Path(__file__).resolve().parent.parent
+# (plan, problema, nº de muestras contrastadas con simulate)
+CASOS = [
+    ("results_caso_base/plan_enhsp_sat_hadd_priorizado2.txt", "models/pddl_caso_base/problem_priorizado2.pddl", 300),
+    ("results_escenario1/plan_enhsp_escenario1.txt", "models/pddl_escenario1/problem_escenario1.pddl", 300),
+    ("results_escenario2/plan_enhsp_escenario2.txt", "models/pddl_escenario2/problem_escenario2.pddl", 300),
+    ("results_escenario3/plan_enhsp_escenario3.txt", "models/pddl_escenario3/problem_escenario3.pddl", 60),
+]
+ERRORES = {
+    "demanda": ErrorModel(0.08, 0.9, "normal"),
+    "pv": ErrorModel(0.3, 0.8, "lognormal"),
+    "hidro": ErrorModel(0.1),
+    "termica": ErrorModel(0.1),
+}
+
+
+def _plan(plan, problem):
+    actions, _metric = sim.parse_plan(REPO / plan, verbose=False)
+    hours, scalars, per_h = sim.parse_problem(REPO / problem, verbose=False)
+    unidad = scalars.get("unidad_despacho", 10.0)
+    costos = tuple(scalars.get(f"costo_{f}", 0.0) for f in rob.FUENTES)
+    return actions, hours, scalars, per_h, rob.tramos_plan(actions, hours), unidad, costos
+
+
+@pytest.mark.parametrize("plan, problem, n", CASOS, ids=[c[0] for c in CASOS])
+def test_repetir_igual_a_simulate(plan, problem, n):
+    actions, hours, scalars, per_h, tramos, unidad, costos = _plan(plan, problem)
+
+    base = rob.base_problema(hours, scalars, per_h)
+    nominal = rob.repetir(tramos, base, unidad, costos)
+    r = sim.simulate(actions, hours, scalars, per_h)
+    assert nominal.coste[0] == pytest.approx(r["accum_cost_sim"])
+    assert rob.validar(actions, hours, scalars, base, nominal, 1) == 0
+
+    perfiles = rob.muestrear(base, n, seed=7, errores=ERRORES)
+    rep = rob.repetir(tramos, perfiles, unidad, costos)
+    assert rep.clamps.sum() > 0, "las perturbaciones deberían recortar algún despacho"
+    assert rob.validar(actions, hours, scalars, perfiles, rep, n) == 0
@@ -0,0 +1,75 @@
+"""
+Presupuesto de arranque de los scripts (ejecutar con pytest):
+
+  python -m pytest -q scripts/test_startup.py
+
+El presupuesto del resumen se puede ajustar con TFM_STARTUP_BUDGET_MS (por defecto 150 ms).
+"""
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCRIPTS = Path(__file__).resolve().parent
+REPO = SCRIPTS.parent
+PROBLEM = REPO / "models" / "pddl_caso_base" / "problem_priorizado2.pddl"
+PLAN = REPO / "results_caso_base" / "plan_enhsp_sat_hadd_priorizado2.txt"
+
+HEAVY = ("pandas", "numpy", "matplotlib", "pyomo")
+BUDGET_MS = float(os.environ.get("TFM_STARTUP_BUDGET_MS", "150"))
+
+
+def _run(args, importtime=False):
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + args
+    return subprocess.run(cmd, capture_output=True, text=True, cwd=REPO)
+
+
+def _heavy_imports(stderr: str):
+    loaded = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        name = line.rsplit("|", 1)[-1].strip()
+        if name.split(".")[0] in HEAVY:
+            loaded.add(name.split(".")[0])
+    return loaded
+
+
+def _copy_plan(tmp_path):
+    plan = tmp_path / PLAN.name
+    shutil.copyfile(PLAN, plan)
+    return plan
+
+
+def test_resumir_plan_within_budget(tmp_path):
+    plan = _copy_plan(tmp_path)
+    args = [str(SCRIPTS / "resumir_plan_priorizado.py"), str(PROBLEM), str(plan)]
+    best = float("inf")
+    for _ in range(5):
+        t0 = time.perf_counter()
+        proc = _run(args)
+        best = min(best, (time.perf_counter() - t0) * 1000.0)
+        assert proc.returncode == 0, proc.stderr
+    assert best < BUDGET_MS, f"resumir_plan_priorizado.py tardó {best:.0f} ms (presupuesto {BUDGET_MS:.0f} ms)"
+
+
+def test_plan_paths_use_stdlib_only(tmp_path):
+    plan = _copy_plan(tmp_path)
+    runs = [
+        [str(SCRIPTS / "resumir_plan_priorizado.py"), str(PROBLEM), str(plan)],
+        [str(SCRIPTS / "parse_priorizado_plan_sim.py"), str(plan), str(PROBLEM)],
+        [str(SCRIPTS / "verificar_y_visualizar_plan_priorizado.py"), str(PROBLEM), str(plan), "--no-excel", "--no-plots"],
+    ]
+    for args in runs:
+        proc = _run(args, importtime=True)
+        assert proc.returncode == 0, proc.stderr
+        assert not _heavy_imports(proc.stderr), f"{Path(args[0]).name}: {_heavy_imports(proc.stderr)}"
+
+
+def test_help_does_not_import_heavy_modules():
+    for script in ("milp_model.py", "comparar_resultados_fase5.py"):
+        proc = _run([str(SCRIPTS / script), "--help"], importtime=True)
+        assert proc.returncode == 0, proc.stderr
+        assert not _heavy_imports(proc.stderr), f"{script}: {_heavy_imports(proc.stderr)}"
@@ -0,0 +1,60 @@
+"""
+Paridad entre check() (NumPy) y check_tabla() (biblioteca estándar) de verificar_restricciones.py
+sobre los despachos versionados (ejecutar con pytest):
+
+  python -m pytest -q scripts/test_verificar_restricciones.py
+"""
+import math
+from pathlib import Path
+
+import pytest
+
+import verificar_restricciones as vr
+from escenarios import load_scenario_dir
+
+REPO = Path(__file__).resolve().parent.parent
+DESPACHOS = [
+    "results_caso_base/milp_dispatch.csv",
+    "results_caso_base/pddl_dispatch_priorizado_sim.csv",
+    "results_escenario1/milp_dispatch.csv",
+    "results_escenario2/milp_dispatch.csv",
+    "results_escenario3/milp_dispatch.csv",
+]
+
+
+def _caso(rel):
+    path = REPO / rel
+    hours, pv, hydro, thermal = vr.leer_despacho(path)
+    lim = vr.Limites.de_escenario(load_scenario_dir(vr.carpeta_datos(path), n_hours=None))
+    assert len(hours) == len(lim.demand)
+    return [f"h{h}" for h in hours], pv, hydro, thermal, lim
+
+
+def _assert_paridad(pv, hydro, thermal, lim, horas, tolerancias=None):
+    a = vr.check_tabla(pv, hydro, thermal, lim, tolerancias=tolerancias)
+    b = vr.check(pv, hydro, thermal, lim, tolerancias=tolerancias)
+    assert a.ok[0] == bool(b.ok[0])
+    assert a.resumen() == b.resumen(0)
+    assert a.mensajes(0, horas) == b.mensajes(0, horas)
+    for k in vr.CHECKS:
+        assert a.magnitudes[k] == pytest.approx(b.magnitudes[k].reshape(-1).tolist(), abs=1e-9)
+    return a
+
+
+@pytest.mark.parametrize("rel", DESPACHOS)
+def test_check_tabla_igual_a_check(rel):
+    horas, pv, hydro, thermal, lim = _caso(rel)
+    _assert_paridad(pv, hydro, thermal, lim, horas)
+    _assert_paridad(pv, hydro, thermal, lim, horas, tolerancias={"deficit": 50.0})
+
+
+@pytest.mark.parametrize("rel", DESPACHOS)
+def test_check_tabla_igual_a_check_con_violaciones(rel):
+    horas, pv, hydro, thermal, lim = _caso(rel)
+    # Térmica +20 %, una hora de hidro negativa y presupuesto/rampas más estrictos: todas las tablas violan
+    thermal = [1.2 * x for x in thermal]
+    hydro = [-5.0] + hydro[1:]
+    budget = lim.hydro_budget if not math.isnan(lim.hydro_budget) else sum(hydro)
+    lim = vr.Limites(lim.demand, lim.pv_avail, lim.hydro_max, lim.thermal_max, 0.5 * budget, 10.0, 10.0)
+    ver = _assert_paridad(pv, hydro, thermal, lim, horas)
+    assert not ver.ok[0]
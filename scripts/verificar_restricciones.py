@@ -0,0 +1,459 @@
+"""
+verificar_restricciones.py
+
+Verificador vectorizado de restricciones para cualquier tabla de despacho, MILP o PDDL. Recibe n
+despachos a la vez como arrays (n × H) de PV, hidro y térmica y comprueba todo sin bucles por hora:
+
+  negativo                         generación < 0 (suma de las partes negativas de las tres fuentes)
+  pv_cap / hidro_cap / termica_cap exceso sobre la disponibilidad horaria
+  deficit / exceso                 balance: demanda no servida (descontada la ENS declarada) y
+                                   despacho por encima de la demanda
+  presupuesto_hidro                energía hidro del día por encima de hydro_energy_budget_MWh (n,)
+  rampa_termica / rampa_hidro      |P[t] - P[t-1]| por encima de la rampa (n × H-1)
+
+check() devuelve una Verificacion con la magnitud de cada violación (MW o MWh; 0 si se cumple),
+las máscaras magnitud > tolerancia, el estado por tabla (ok) y los mensajes por hora en el formato
+de verify(). La tolerancia es configurable por comprobación: los planes PDDL pueden dejar sin
+servir menos de una unidad_despacho por hora, así que para ellos se usa tolerancias={"deficit": unidad}.
+
+check_tabla() hace lo mismo para una sola tabla con la biblioteca estándar: es el camino de los
+scripts de plan, que no deben importar NumPy (ver test_startup.py). Su ok corta en la primera
+violación y solo construye las magnitudes por hora si hay algo que informar, así que verify() lo usa
+directamente en cada plan. Los informes por tabla (resumen, mensajes) son el mismo código en ambos caminos.
+
+Los límites (Limites) salen de una carpeta data_*, de un ScenarioBatch, de las entradas de
+milp_model.py o de los parámetros de un problema PDDL. Los dominios PDDL no modelan las rampas (y
+el priorizado2 tampoco el presupuesto), así que para los planes se completan con el
+system_constraints.csv de la carpeta data_* del escenario, deducida de la ruta del plan o del problema.
+
+Se ejecuta solo al final de milp_model.py, parse_priorizado_plan_sim.py y
+verificar_y_visualizar_plan_priorizado.py.
+
+Uso:
+  python scripts/verificar_restricciones.py results_caso_base/milp_dispatch.csv --data-dir data_caso_base
+  python scripts/verificar_restricciones.py results_caso_base/pddl_dispatch_priorizado_sim.csv --tol-deficit 10
+  python scripts/verificar_restricciones.py --benchmark 100000 --data-dir data_caso_base
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+import time
+from dataclasses import dataclass, field, replace
+from itertools import chain, repeat
+from operator import add, sub
+from pathlib import Path
+from typing import Dict, List, Optional
+
+REPO = Path(__file__).resolve().parent.parent
+TOL = 1e-6
+NAN = math.nan
+
+# Comprobación -> texto de los mensajes (mismo registro que verify())
+CHECKS = {
+    "negativo": "Generación negativa",
+    "pv_cap": "PV excede capacidad",
+    "hidro_cap": "Hidro excede capacidad",
+    "termica_cap": "Térmica excede capacidad",
+    "deficit": "Demanda no servida",
+    "exceso": "Despacho > demanda",
+    "presupuesto_hidro": "Hidro excede el presupuesto diario",
+    "rampa_termica": "Rampa térmica excedida",
+    "rampa_hidro": "Rampa hidro excedida",
+}
+# Claves de system_constraints.csv (las mismas que escenarios.CONSTRAINT_SERIES)
+CONSTRAINT_KEYS = ("hydro_energy_budget_MWh", "thermal_ramp_MW_per_h", "hydro_ramp_MW_per_h")
+
+
+# =========================
+# Límites
+# =========================
+
+def _nan(x):
+    return NAN if x is None else x
+
+
+@dataclass
+class Limites:
+    """
+    Límites de una o varias tablas: perfiles (H,) o (n × H) y escalares o (n,), como listas o arrays.
+    Como en ScenarioBatch, NaN significa 'sin límite' (también en los perfiles de capacidad y demanda).
+    """
+    demand: object
+    pv_avail: object
+    hydro_max: object
+    thermal_max: object
+    hydro_budget: object = NAN
+    ramp_thermal: object = NAN
+    ramp_hydro: object = NAN
+
+    @classmethod
+    def de_escenario(cls, sc) -> "Limites":
+        """Desde escenarios.ScenarioData (una carpeta data_*)."""
+        return cls(sc.demand, sc.pv_avail, sc.hydro_max, sc.thermal_max,
+                   _nan(sc.hydro_budget), _nan(sc.ramp_thermal), _nan(sc.ramp_hydro))
+
+    @classmethod
+    def de_lote(cls, batch) -> "Limites":
+        """Desde escenarios.ScenarioBatch: una fila de límites por tabla."""
+        return cls(batch.demand, batch.pv_avail, batch.hydro_max, batch.thermal_max,
+                   batch.hydro_budget, batch.ramp_thermal, batch.ramp_hydro)
+
+    @classmethod
+    def de_entradas(cls, inputs: tuple) -> "Limites":
+        """Desde la tupla de milp_model._read_csvs (horas, mapas por hora, costes, restricciones)."""
+        hours, demand, pv, hydro, thermal, _costs, (budget, ramp_th, ramp_hy) = inputs
+        col = lambda m: [float(m[t]) for t in hours]
+        return cls(col(demand), col(pv), col(hydro), col(thermal), _nan(budget), _nan(ramp_th), _nan(ramp_hy))
+
+    @classmethod
+    def de_problema(cls, hours, scalars: dict, per_h: dict) -> "Limites":
+        """Desde parse_priorizado_plan_sim.parse_problem (horas enteras, escalares y funciones por hora)."""
+        col = lambda fn: [float(per_h.get(fn, {}).get(h, NAN)) for h in hours]
+        return cls(col("demanda"), col("pv_disponible"), col("hidro_disponible_hora"), col("termica_disponible_hora"),
+                   scalars.get("presupuesto_hidro_diario", NAN))
+
+    def completar(self, data_dir) -> "Limites":
+        """Rellena el presupuesto y las rampas que no tengan límite con los de system_constraints.csv."""
+        budget, ramp_th, ramp_hy = leer_restricciones(data_dir)
+        keep = lambda own, other: own if not (isinstance(own, float) and math.isnan(own)) else _nan(other)
+        return replace(self, hydro_budget=keep(self.hydro_budget, budget),
+                       ramp_thermal=keep(self.ramp_thermal, ramp_th), ramp_hydro=keep(self.ramp_hydro, ramp_hy))
+
+
+def leer_restricciones(data_dir) -> tuple:
+    """(presupuesto hidro, rampa térmica, rampa hidro) de system_constraints.csv; None si falta la clave."""
+    import csv
+
+    with (Path(data_dir) / "system_constraints.csv").open(newline="", encoding="utf-8-sig") as f:
+        values = {r["key"].strip(): float(r["value"]) for r in csv.DictReader(f) if r.get("key")}
+    return tuple(values.get(k) for k in CONSTRAINT_KEYS)
+
+
+def carpeta_datos(*paths) -> Optional[Path]:
+    """Carpeta data_<escenario> del repo para la primera ruta (plan, problema, results_*) que la identifique."""
+    from registro_ejecuciones import scenario_name
+
+    for p in (Path(q) for q in paths if q is not None):
+        for cand in (p, p.parent):
+            esc = scenario_name(cand)
+            if esc and (REPO / f"data_{esc}").is_dir():
+                return REPO / f"data_{esc}"
+    return None
+
+
+# =========================
+# Informes por tabla (comunes a los dos caminos)
+# =========================
+
+def _resumen(mag: dict, mask: dict) -> str:
+    parts = []
+    for k in CHECKS:
+        bad = [m for m, b in zip(mag[k], mask[k]) if b]
+        if bad:
+            parts.append(f"{k} {len(bad)} (máx {max(bad):,.3f})")
+    return "OK" if not parts else "; ".join(parts)
+
+
+def _mensajes(mag: dict, mask: dict, d: dict, horas: Optional[List[str]]) -> List[str]:
+    horas = horas if horas is not None else [f"h{t}" for t in range(len(d["pv"]))]
+    out = []
+    for k, label in CHECKS.items():
+        for t, bad in enumerate(mask[k]):
+            if not bad:
+                continue
+            m = mag[k][t]
+            if k == "presupuesto_hidro":
+                out.append(f"{label}: hidro={sum(d['hidro']):g} MWh > presupuesto={d['presupuesto']:g} MWh")
+            elif k == "negativo":
+                out.append(f"[{horas[t]}] {label}: {m:g} MW")
+            elif k.endswith("_cap"):
+                src = k[:-4]
+                out.append(f"[{horas[t]}] {label}: usado={d[src][t]:g} > cap={d[src + '_max'][t]:g}")
+            elif k == "deficit":
+                out.append(f"[{horas[t]}] {label}: {m:g} MW (total={d['total'][t]:g}, demanda={d['demanda'][t]:g})")
+            elif k == "exceso":
+                out.append(f"[{horas[t]}] {label}: total={d['total'][t]:g} > demanda={d['demanda'][t]:g}")
+            else:
+                src, rampa = ("termica", d["rampa_t"]) if k == "rampa_termica" else ("hidro", d["rampa_h"])
+                out.append(f"[{horas[t]}->{horas[t + 1]}] {label}: "
+                           f"ΔP={d[src][t + 1] - d[src][t]:+g} MW, rampa={rampa:g} MW/h")
+    return out
+
+
+# =========================
+# Verificación vectorizada (NumPy)
+# =========================
+
+@dataclass
+class Verificacion:
+    """Magnitudes de violación por comprobación: (n × H), (n × H-1) para rampas y (n,) para el presupuesto."""
+    magnitudes: Dict[str, object]
+    tolerancias: Dict[str, float]
+    datos: Dict[str, object] = field(repr=False, default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.magnitudes["presupuesto_hidro"])
+
+    @property
+    def mascaras(self) -> Dict[str, object]:
+        return {k: m > self.tolerancias[k] for k, m in self.magnitudes.items()}
+
+    def conteos(self) -> Dict[str, object]:
+        """Número de horas (o 0/1 para el presupuesto) con violación, por tabla."""
+        return {k: m.reshape(len(self), -1).sum(axis=1) for k, m in self.mascaras.items()}
+
+    @property
+    def ok(self):
+        import numpy as np
+
+        bad = np.zeros(len(self), dtype=bool)
+        for m in self.mascaras.values():
+            bad |= m.reshape(len(self), -1).any(axis=1)
+        return ~bad
+
+    def _fila(self, i: int) -> tuple:
+        row = lambda a: a[i].reshape(-1).tolist()
+        d = {k: (v[i].tolist()) for k, v in self.datos.items()}
+        return ({k: row(m) for k, m in self.magnitudes.items()}, {k: row(m) for k, m in self.mascaras.items()}, d)
+
+    def resumen(self, i: int = 0) -> str:
+        """Una línea: 'OK' o las comprobaciones violadas con su número de horas y peor magnitud."""
+        mag, mask, _ = self._fila(i)
+        return _resumen(mag, mask)
+
+    def mensajes(self, i: int = 0, horas: Optional[List[str]] = None) -> List[str]:
+        """Mensajes por hora de la tabla i (formato de verify(): '[h] texto: detalle')."""
+        return _mensajes(*self._fila(i), horas)
+
+
+def _tolerancias(tol: float, tolerancias: Optional[Dict[str, float]]) -> Dict[str, float]:
+    tols = {k: tol for k in CHECKS}
+    tols.update(tolerancias or {})
+    return tols
+
+
+def check(pv, hydro, thermal, lim: Limites, ens=None, tol: float = TOL,
+          tolerancias: Optional[Dict[str, float]] = None) -> Verificacion:
+    """
+    Verifica n despachos a la vez. pv, hydro, thermal (y ens, si el modelo tiene energía no servida)
+    son (n × H) o (H,); los límites se difunden a esa forma. tolerancias ajusta la de cada comprobación.
+    """
+    import numpy as np
+
+    pv, hydro, thermal = (np.atleast_2d(np.asarray(a, dtype=float)) for a in (pv, hydro, thermal))
+    shape = np.broadcast_shapes(pv.shape, hydro.shape, thermal.shape)
+    pv, hydro, thermal = (np.broadcast_to(a, shape) for a in (pv, hydro, thermal))
+    n = shape[0]
+    prof = lambda a: np.broadcast_to(np.asarray(a, dtype=float), shape)
+    esc = lambda a: np.broadcast_to(np.asarray(a, dtype=float), (n,))
+    demand, pv_max, hy_max, th_max = prof(lim.demand), prof(lim.pv_avail), prof(lim.hydro_max), prof(lim.thermal_max)
+    budget, ramp_t, ramp_h = esc(lim.hydro_budget), esc(lim.ramp_thermal), esc(lim.ramp_hydro)
+
+    total = pv + hydro + thermal
+    served = total if ens is None else total + prof(ens)
+    # np.fmax ignora los NaN: un límite NaN no genera violación
+    mag = {
+        "negativo": np.fmax(-pv, 0) + np.fmax(-hydro, 0) + np.fmax(-thermal, 0),
+        "pv_cap": np.fmax(pv - pv_max, 0),
+        "hidro_cap": np.fmax(hydro - hy_max, 0),
+        "termica_cap": np.fmax(thermal - th_max, 0),
+        "deficit": np.fmax(demand - served, 0),
+        "exceso": np.fmax(total - demand, 0),
+        "presupuesto_hidro": np.fmax(hydro.sum(axis=1) - budget, 0),
+        "rampa_termica": np.fmax(np.abs(np.diff(thermal, axis=1)) - ramp_t[:, None], 0),
+        "rampa_hidro": np.fmax(np.abs(np.diff(hydro, axis=1)) - ramp_h[:, None], 0),
+    }
+    datos = {"pv": pv, "hidro": hydro, "termica": thermal, "total": total, "demanda": demand,
+             "pv_max": pv_max, "hidro_max": hy_max, "termica_max": th_max,
+             "presupuesto": budget, "rampa_t": ramp_t, "rampa_h": ramp_h}
+    return Verificacion(mag, _tolerancias(tol, tolerancias), datos)
+
+
+# =========================
+# Una tabla (biblioteca estándar)
+# =========================
+
+class VerificacionTabla:
+    """
+    Resultado de check_tabla: misma interfaz que Verificacion para la tabla 0, con listas. ok recorre las
+    series de magnitudes y corta en la primera violación; las listas completas se construyen solo si se
+    piden (magnitudes, mascaras, resumen o mensajes de una tabla con violaciones).
+    """
+
+    def __init__(self, series: dict, tolerancias: dict, datos: dict):
+        self._series, self.tolerancias, self.datos = series, tolerancias, datos
+        self._magnitudes = None
+        # exceso > tol equivale a magnitud > tol salvo con tol < 0, donde toda hora viola
+        self.ok = [not any(tolerancias[k] < 0 or any(map(float(tolerancias[k]).__lt__, f()))
+                           for k, f in series.items())]
+
+    def __len__(self) -> int:
+        return 1
+
+    @property
+    def magnitudes(self) -> Dict[str, List[float]]:
+        if self._magnitudes is None:
+            self._magnitudes = {k: [_pos(x) for x in f()] for k, f in self._series.items()}
+        return self._magnitudes
+
+    @property
+    def mascaras(self) -> Dict[str, List[bool]]:
+        return {k: [m > self.tolerancias[k] for m in ms] for k, ms in self.magnitudes.items()}
+
+    def resumen(self, i: int = 0) -> str:
+        return "OK" if self.ok[0] else _resumen(self.magnitudes, self.mascaras)
+
+    def mensajes(self, i: int = 0, horas: Optional[List[str]] = None) -> List[str]:
+        return [] if self.ok[0] else _mensajes(self.magnitudes, self.mascaras, self.datos, horas)
+
+
+def _pos(x: float) -> float:
+    """Parte positiva; NaN (límite ausente) cuenta como 0, igual que np.fmax en check()."""
+    return x if x > 0 else 0.0
+
+
+def check_tabla(pv, hydro, thermal, lim: Limites, ens=None, tol: float = TOL,
+                tolerancias: Optional[Dict[str, float]] = None) -> VerificacionTabla:
+    """Las mismas comprobaciones que check() para un único despacho (listas por hora), sin NumPy."""
+    pv, hydro, thermal = list(map(float, pv)), list(map(float, hydro)), list(map(float, thermal))
+    total = list(map(add, map(add, pv, hydro), thermal))
+    served = total if ens is None else list(map(add, total, map(float, ens)))
+    demand, pv_max, hy_max, th_max = (list(map(float, a)) for a in
+                                      (lim.demand, lim.pv_avail, lim.hydro_max, lim.thermal_max))
+    budget, ramp_t, ramp_h = (float(_nan(x)) for x in (lim.hydro_budget, lim.ramp_thermal, lim.ramp_hydro))
+    # Series del exceso sobre cada límite (magnitud = parte positiva); map/sub mantienen ok en C
+    dif = lambda a, b: lambda: map(sub, a, b)
+    rampa = lambda p, r: ((lambda: repeat(0.0, len(p) - 1)) if math.isnan(r) else
+                          lambda: map(sub, map(abs, map(sub, p[1:], p[:-1])), repeat(r)))
+    series = {
+        "negativo": lambda: ((_pos(-a) + _pos(-b) + _pos(-c) for a, b, c in zip(pv, hydro, thermal))
+                             if any(map(0.0.__gt__, chain(pv, hydro, thermal))) else repeat(0.0, len(pv))),
+        "pv_cap": dif(pv, pv_max),
+        "hidro_cap": dif(hydro, hy_max),
+        "termica_cap": dif(thermal, th_max),
+        "deficit": dif(demand, served),
+        "exceso": dif(total, demand),
+        "presupuesto_hidro": lambda: (sum(hydro) - budget,),
+        "rampa_termica": rampa(thermal, ramp_t),
+        "rampa_hidro": rampa(hydro, ramp_h),
+    }
+    datos = {"pv": pv, "hidro": hydro, "termica": thermal, "total": total, "demanda": demand,
+             "pv_max": pv_max, "hidro_max": hy_max, "termica_max": th_max,
+             "presupuesto": budget, "rampa_t": ramp_t, "rampa_h": ramp_h}
+    return VerificacionTabla(series, _tolerancias(tol, tolerancias), datos)
+
+
+# =========================
+# Entrada / salida
+# =========================
+
+def leer_despacho(path) -> tuple:
+    """(horas, pv, hidro, térmica) como listas desde un CSV de despacho (milp_dispatch.csv, pddl_dispatch_*.csv, ...)."""
+    from milp_model import read_dispatch_csv
+
+    dispatch = read_dispatch_csv(Path(path))
+    hours = sorted(dispatch)
+    pv, hydro, thermal = ([dispatch[h][j] for h in hours] for j in range(3))
+    return hours, pv, hydro, thermal
+
+
+def imprimir(ver, titulo: str, i: int = 0, horas: Optional[List[str]] = None, max_lineas: int = 10) -> None:
+    """Resumen en consola tras un despacho: [OK] o [AVISO] con las primeras violaciones."""
+    if ver.ok[i]:
+        print(f"[OK] Restricciones ({titulo}): capacidad, balance, presupuesto hidro, rampas y signo")
+        return
+    msgs = ver.mensajes(i, horas)
+    print(f"[AVISO] Restricciones ({titulo}): {ver.resumen(i)}")
+    for m in msgs[:max_lineas]:
+        print(f"  {m}")
+    if len(msgs) > max_lineas:
+        print(f"  ... y {len(msgs) - max_lineas} más")
+
+
+# =========================
+# Benchmark
+# =========================
+
+def _candidatos(lim: Limites, n: int, seed: int = 0, sigma: float = 0.05) -> tuple:
+    """n despachos en orden de mérito sobre los límites; la mitad lleva ruido (y casi siempre viola algo)."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    demand = np.broadcast_to(np.asarray(lim.demand, dtype=float), (n, len(lim.demand)))
+    pv = np.minimum(demand, lim.pv_avail)
+    hydro = np.minimum(demand - pv, lim.hydro_max)
+    thermal = np.minimum(demand - pv - hydro, lim.thermal_max)
+    noisy = rng.random((n, 1)) < 0.5
+    noise = lambda a: np.where(noisy, a * (1 + sigma * rng.standard_normal(a.shape)), a)
+    return noise(pv), noise(hydro), noise(thermal)
+
+
+def benchmark(lim: Limites, n: int, repeats: int = 5) -> dict:
+    """Mejor tiempo de check() + ok sobre n despachos sintéticos; compara con check_tabla en una muestra."""
+    pv, hydro, thermal = _candidatos(lim, n)
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        ok = check(pv, hydro, thermal, lim).ok
+        best = min(best, time.perf_counter() - t0)
+    sample = range(min(n, 200))
+    t0 = time.perf_counter()
+    ok_tabla = [check_tabla(pv[i], hydro[i], thermal[i], lim).ok[0] for i in sample]
+    per_table = (time.perf_counter() - t0) / len(sample)
+    if ok_tabla != ok[:len(sample)].tolist():
+        raise AssertionError("check() y check_tabla() discrepan en la muestra del benchmark")
+    return {"tablas": n, "horas": pv.shape[1], "segundos": best, "tablas_por_s": n / best,
+            "validas": int(ok.sum()), "tablas_por_s_stdlib": 1.0 / per_table}
+
+
+# =========================
+# Main
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Verificación vectorizada de restricciones de despachos MILP/PDDL")
+    parser.add_argument("csv", nargs="*", help="CSV de despacho por hora (milp_dispatch.csv, pddl_dispatch_*.csv, ...)")
+    parser.add_argument("--data-dir", type=str, default=None,
+                        help="Carpeta data_* con los límites (por defecto, la del escenario deducido de la ruta del CSV)")
+    parser.add_argument("--tol", type=float, default=TOL, help="Tolerancia de todas las comprobaciones [MW]")
+    parser.add_argument("--tol-deficit", type=float, default=None,
+                        help="Tolerancia de demanda no servida (p.ej. la unidad_despacho para planes PDDL)")
+    parser.add_argument("--benchmark", type=int, default=None, metavar="N",
+                        help="Mide cuántas tablas por segundo se verifican con N despachos sintéticos")
+    args = parser.parse_args()
+    if not args.csv and not args.benchmark:
+        parser.error("indica al menos un CSV o --benchmark N")
+
+    from escenarios import load_scenario_dir
+
+    tolerancias = {"deficit": args.tol_deficit} if args.tol_deficit is not None else None
+    failed = 0
+    for path in args.csv:
+        data_dir = Path(args.data_dir) if args.data_dir else carpeta_datos(path)
+        if data_dir is None:
+            print(f"[AVISO] {path}: no se pudo deducir la carpeta data_*; usa --data-dir")
+            failed += 1
+            continue
+        hours, pv, hydro, thermal = leer_despacho(path)
+        lim = Limites.de_escenario(load_scenario_dir(data_dir, n_hours=None))
+        if len(hours) != len(lim.demand):
+            print(f"[AVISO] {path}: {len(hours)} horas frente a {len(lim.demand)} en {data_dir.name}")
+            failed += 1
+            continue
+        ver = check(pv, hydro, thermal, lim, tol=args.tol, tolerancias=tolerancias)
+        imprimir(ver, f"{path} vs {data_dir.name}", horas=[f"h{h}" for h in hours], max_lineas=50)
+        failed += int(not ver.ok[0])
+
+    if args.benchmark:
+        data_dir = Path(args.data_dir) if args.data_dir else REPO / "data_caso_base"
+        r = benchmark(Limites.de_escenario(load_scenario_dir(data_dir)), args.benchmark)
+        print(f"{r['tablas']} despachos × {r['horas']} h verificados en {r['segundos'] * 1000:.1f} ms "
+              f"({r['tablas_por_s']:,.0f} tablas/s; {r['validas']} sin violaciones)")
+        print(f"Una tabla sin NumPy (check_tabla): {r['tablas_por_s_stdlib']:,.0f} tablas/s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
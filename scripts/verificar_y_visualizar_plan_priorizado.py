@@ -5,29 +5,42 @@ verificar_y_visualizar_plan_priorizado.py
 
 Uso:
   python scripts/verificar_y_visualizar_plan_priorizado.py <ruta_problem_pddl> <ruta_plan_txt>
+  (Perfilado) ... <ruta_problem_pddl> <ruta_plan_txt> --profile   -> perfil_*.pstats|txt|collapsed junto al plan
+  (Opcional) --no-excel --no-plots  -> solo verificación (sin pandas ni matplotlib)
 
 
 """
 
 from __future__ import annotations
 
+import argparse
 import re
 import sys
 import os
 from pathlib import Path
 from collections import defaultdict, OrderedDict
+from itertools import repeat
 from typing import Dict, Tuple, List, Optional
 
+import perfilado
+
 # --- Dependencias opcionales (errores amigables si faltan) ---
-try:
-    import pandas as pd
-except Exception:
-    pd = None
+# Se importan solo al exportar Excel/gráficas: la verificación usa la biblioteca estándar.
 
-try:
-    import matplotlib.pyplot as plt
-except Exception:
-    plt = None
+def _optional_pandas():
+    try:
+        import pandas as pd
+    except Exception:
+        pd = None
+    return pd
+
+
+def _optional_pyplot():
+    try:
+        import matplotlib.pyplot as plt
+    except Exception:
+        plt = None
+    return plt
 
 
 # =========================
@@ -47,6 +60,8 @@ RGX_ESCALAR = {
     "unidad_despacho": re.compile(r"\(=\s*\(unidad_despacho\)\s*([+-]?\d+(?:\.\d+)?)\)", re.IGNORECASE),
 }
 
+RGX_PRESUPUESTO = re.compile(r"\(=\s*\(presupuesto_hidro_diario\)\s*([+-]?\d+(?:\.\d+)?)\)", re.IGNORECASE)
+
 RGX_SERIES = {
     "demanda": re.compile(r"\(=\s*\(demanda\s+(h\d{1,2})\)\s*([+-]?\d+(?:\.\d+)?)\)", re.IGNORECASE),
     "pv": re.compile(r"\(=\s*\(pv_disponible\s+(h\d{1,2})\)\s*([+-]?\d+(?:\.\d+)?)\)", re.IGNORECASE),
@@ -105,7 +120,7 @@ def parse_problem(problem_path: Path):
             val = float(m.group(2))
             series[k][h] = val
 
-    return {
+    out = {
         "unidad_despacho": esc["unidad_despacho"],
         "costo_pv": esc["costo_pv"],
         "costo_hidro": esc["costo_hidro"],
@@ -115,6 +130,13 @@ def parse_problem(problem_path: Path):
         "cap_hidro": series["hidro"],
         "cap_termica": series["termica"],
     }
+    # Opcional: el priorizado2 no tiene tope diario de hidro (la línea está comentada)
+    # (se descartan las coincidencias precedidas de ';' en su línea, sin quitar los comentarios de todo el texto)
+    for m in RGX_PRESUPUESTO.finditer(text):
+        if ";" not in text[text.rfind("\n", 0, m.start()) + 1:m.start()]:
+            out["presupuesto_hidro"] = float(m.group(1))
+            break
+    return out
 
 
 # =========================
@@ -221,34 +243,39 @@ def build_summary(counts, demanda_final, params):
 # =========================
 
 def verify(rows: List[Dict], params: Dict) -> List[str]:
-    caps_pv = params.get("cap_pv", {})
-    caps_h = params.get("cap_hidro", {})
-    caps_t = params.get("cap_termica", {})
-    warnings: List[str] = []
-
-    for r in rows:
-        h = r["hora"]
-        pv_mw = r["pv_mw"]
-        h_mw = r["hidro_mw"]
-        t_mw = r["termica_mw"]
-
-        cap_pv = caps_pv.get(h, None)
-        cap_h = caps_h.get(h, None)
-        cap_t = caps_t.get(h, None)
-
-        if cap_pv is not None and pv_mw > cap_pv + 1e-6:
-            warnings.append(f"[{h}] PV excede capacidad: usado={pv_mw} > cap={cap_pv}")
-        if cap_h is not None and h_mw > cap_h + 1e-6:
-            warnings.append(f"[{h}] Hidro excede capacidad: usado={h_mw} > cap={cap_h}")
-        if cap_t is not None and t_mw > cap_t + 1e-6:
-            warnings.append(f"[{h}] Térmica excede capacidad: usado={t_mw} > cap={cap_t}")
-
-        dem_ini = r.get("demanda_inicial", None)
-        total = r["total_despachado_mw"]
-        if isinstance(dem_ini, (int, float)) and total - dem_ini > 1e-6:
-            warnings.append(f"[{h}] Despacho > demanda: total={total} > demanda={dem_ini}")
-
-    return warnings
+    """
+    Capacidad, balance (exceso y demanda no servida >= unidad_despacho), presupuesto hidro, rampas y
+    signo con el verificador vectorizado (verificar_restricciones.py). Las rampas y el presupuesto
+    solo se comprueban si params los trae (ver limits_from_data).
+    """
+    import verificar_restricciones as vr
+
+    horas = [r["hora"] for r in rows]
+    col = lambda k: [r[k] for r in rows]
+    serie = lambda k: list(map(params.get(k, {}).get, horas, repeat(vr.NAN)))
+    dem = [d if isinstance(d, (int, float)) else vr.NAN for d in col("demanda_inicial")]
+    lim = vr.Limites(dem, serie("cap_pv"), serie("cap_hidro"), serie("cap_termica"),
+                     params.get("presupuesto_hidro", vr.NAN), params.get("rampa_termica", vr.NAN),
+                     params.get("rampa_hidro", vr.NAN))
+    ver = vr.check_tabla(col("pv_mw"), col("hidro_mw"), col("termica_mw"), lim,
+                         tolerancias={"deficit": params["unidad_despacho"] - vr.TOL})
+    return ver.mensajes(0, horas)
+
+
+def limits_from_data(params: Dict, data_dir: Optional[Path]) -> Dict:
+    """Añade a params el presupuesto hidro y las rampas de system_constraints.csv (el dominio no los modela)."""
+    if data_dir is None:
+        return params
+    from verificar_restricciones import leer_restricciones
+
+    budget, ramp_th, ramp_hy = leer_restricciones(data_dir)
+    out = dict(params)
+    if budget is not None:
+        out.setdefault("presupuesto_hidro", budget)
+    for key, value in (("rampa_termica", ramp_th), ("rampa_hidro", ramp_hy)):
+        if value is not None:
+            out[key] = value
+    return out
 
 
 def evaluate_goal(rows: List[Dict], ultimo_to: Optional[str], params: Dict):
@@ -306,6 +333,7 @@ def evaluate_goal(rows: List[Dict], ultimo_to: Optional[str], params: Dict):
 # =========================
 
 def export_excel(rows: List[Dict], totals: Dict, out_xlsx: Path):
+    pd = _optional_pandas()
     if pd is None:
         print("ADVERTENCIA: pandas no disponible; se omite Excel.", file=sys.stderr)
         return
@@ -328,6 +356,8 @@ def export_excel(rows: List[Dict], totals: Dict, out_xlsx: Path):
 
 
 def export_plots(rows: List[Dict], out_png_dispatch: Path, out_png_cost: Path):
+    pd = _optional_pandas()
+    plt = _optional_pyplot()
     if plt is None or pd is None:
         print("ADVERTENCIA: matplotlib/pandas no disponible; se omiten gráficas.", file=sys.stderr)
         return
@@ -393,13 +423,20 @@ def export_verification_report(warnings: List[str], goal_msgs: List[str], goal_o
 # Main
 # =========================
 
+@perfilado.perfilable("verificar_y_visualizar_plan_priorizado")
 def main():
-    if len(sys.argv) < 3:
-        print("Uso: python scripts/verificar_y_visualizar_plan_priorizado.py <problem.pddl> <plan.txt>", file=sys.stderr)
-        sys.exit(2)
-
-    problem_path = Path(sys.argv[1])
-    plan_path = Path(sys.argv[2])
+    parser = argparse.ArgumentParser(description="Verificación y visualización de un plan ENHSP (dominio priorizado)")
+    parser.add_argument("problem", help="Ruta al problem.pddl")
+    parser.add_argument("plan", help="Ruta al plan.txt de ENHSP")
+    parser.add_argument("--no-excel", action="store_true", help="No exportar el Excel de resumen (evita importar pandas)")
+    parser.add_argument("--no-plots", action="store_true", help="No generar gráficas (evita importar matplotlib)")
+    parser.add_argument("--data-dir", type=str, default=None,
+                        help="Carpeta data_* con rampas y presupuesto hidro (por defecto, la del escenario del plan/problema)")
+    perfilado.add_profile_args(parser)
+    args = parser.parse_args()
+
+    problem_path = Path(args.problem)
+    plan_path = Path(args.plan)
 
     if not problem_path.exists():
         print(f"ERROR: No existe el archivo problem: {problem_path}", file=sys.stderr)
@@ -409,14 +446,19 @@ def main():
         sys.exit(1)
 
     try:
-        params = parse_problem(problem_path)
-        markers = parse_plan(plan_path)
+        perfilado.salida(plan_path.parent)
+        with perfilado.etapa("parse_problem"):
+            params = parse_problem(problem_path)
+        with perfilado.etapa("parse_plan"):
+            markers = parse_plan(plan_path)
 
         # ---- Simulación (clave) ----
-        counts, demanda_final, ultimo_to = simulate_plan(markers, params)
+        with perfilado.etapa("simulate_plan"):
+            counts, demanda_final, ultimo_to = simulate_plan(markers, params)
 
         # Construir resumen a partir de la simulación
-        rows, totals = build_summary(counts, demanda_final, params)
+        with perfilado.etapa("build_summary"):
+            rows, totals = build_summary(counts, demanda_final, params)
 
         base = os.path.splitext(os.path.basename(plan_path))[0]
         out_dir = plan_path.parent
@@ -427,11 +469,19 @@ def main():
         out_verify = out_dir / f"verificacion_{base}.txt"
 
         # Exportar tablas y gráficas
-        export_excel(rows, totals, out_xlsx)
-        export_plots(rows, out_png_dispatch, out_png_cost)
+        if not args.no_excel:
+            with perfilado.etapa("export_excel"):
+                export_excel(rows, totals, out_xlsx)
+        if not args.no_plots:
+            with perfilado.etapa("export_plots"):
+                export_plots(rows, out_png_dispatch, out_png_cost)
 
         # Verificación general
-        warnings = verify(rows, params)
+        with perfilado.etapa("verify"):
+            import verificar_restricciones as vr
+
+            data_dir = Path(args.data_dir) if args.data_dir else vr.carpeta_datos(plan_path, problem_path)
+            warnings = verify(rows, limits_from_data(params, data_dir))
 
         # Verificación del GOAL modificado
         goal_msgs, goal_ok, h_goal = evaluate_goal(rows, ultimo_to, params)
@@ -450,8 +500,10 @@ def main():
             print(f"Verificación general: {len(warnings)} observación(es). Revisa {out_verify.name}")
         else:
             print("Verificación general: sin observaciones.")
-        print(f"Excel:   {out_xlsx}")
-        print(f"Gráficas: {out_png_dispatch} | {out_png_cost}")
+        if not args.no_excel:
+            print(f"Excel:   {out_xlsx}")
+        if not args.no_plots:
+            print(f"Gráficas: {out_png_dispatch} | {out_png_cost}")
         print(f"Reporte: {out_verify}\n")
 
     except Exception as ex: